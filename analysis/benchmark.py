@@ -0,0 +1,397 @@
+"""
+Benchmark harness for the B+ tree operations
+
+Measures the cost of one operation on a tree that already holds n entries:
+- every operation is timed on its own with time.perf_counter_ns;
+- warm-up repeats are run and discarded before the measured repeats;
+- the garbage collector is disabled while timing (unless gc=True);
+- the median, p95 and p99 latencies are reported, plus the mean of every repeat
+  so two runs can be compared statistically (analysis/compare_benchmarks.py);
+- results are written as JSON along with the machine metadata.
+
+The tree holds the even keys 0, 2, ..., 2(n - 1), so the odd keys are the missing
+ones: search_missing looks them up and insert adds them. Write operations undo
+their changes after each repeat (untimed), so one tree serves every measurement
+of a size. The keys an operation touches follow a distribution:
+    sequential  consecutive keys from a random offset
+    reverse     the same, in descending order
+    random      uniform
+    zipf        skewed (a few hot keys take most accesses), scrambled over the key space
+"mixed:R" runs R% lookups and (100 - R)% inserts, in random order.
+
+Run it with:
+    python3 -m analysis.benchmark
+    python3 -m analysis.benchmark --sizes 1000,1000000,10000000 --operations search,mixed:90
+    python3 -m analysis.benchmark --distributions zipf --repeats 10 --output results.json
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from array import array
+from bplus_tree import BPlusTree
+from percentiles import percentile
+
+DISTRIBUTIONS = ["sequential", "random", "reverse", "zipf"]
+OPERATIONS = ["insert", "search", "search_missing", "delete", "range"]
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+RANGE_SPAN = 100  # Keys returned by each range query
+ZIPF_EXPONENT = 1.1
+SCRAMBLE = 2_654_435_761  # Multiplier spreading the zipf hot keys over the key space
+
+
+# ----- Workloads -----
+
+
+def zipf_ranks(n, count, rng, s=ZIPF_EXPONENT):
+    """
+    count ranks in [0, n) following a (bounded, discretized) power law of exponent s.
+    Uses the inverse CDF of the continuous distribution, so it needs no O(n) table.
+    """
+    ranks = []
+    if s == 1:
+        for _ in range(count):
+            ranks.append(min(n - 1, int(n ** rng.random()) - 1))
+        return ranks
+    top = n ** (1 - s) - 1
+    for _ in range(count):
+        x = (top * rng.random() + 1) ** (1 / (1 - s))
+        ranks.append(min(n - 1, int(x) - 1))
+    return ranks
+
+
+def key_indexes(distribution, n, count, rng):
+    """Indexes in [0, n) of the count entries an operation will touch"""
+    if distribution == "sequential":
+        start = rng.randrange(n)
+        return [(start + i) % n for i in range(count)]
+    if distribution == "reverse":
+        start = rng.randrange(n)
+        return [(start - i) % n for i in range(count)]
+    if distribution == "random":
+        return [rng.randrange(n) for _ in range(count)]
+    if distribution == "zipf":
+        return [rank * SCRAMBLE % n for rank in zipf_ranks(n, count, rng)]
+    raise ValueError(f"Unknown distribution: {distribution}")
+
+
+def parse_operation(operation):
+    """Return (name, read ratio); the ratio is only set for "mixed:R" """
+    name, _, ratio = operation.partition(":")
+    if name == "mixed":
+        read_ratio = int(ratio or 90) / 100
+        if not 0 <= read_ratio <= 1:
+            raise ValueError(f"Invalid read percentage: {operation}")
+        return name, read_ratio
+    if name not in OPERATIONS or ratio:
+        raise ValueError(f"Unknown operation: {operation}")
+    return name, None
+
+
+def build_tree(size, order):
+    tree = BPlusTree(order)
+    for i in range(size):
+        tree.insert(2 * i, i)
+    return tree
+
+
+# ----- Timed loops -----
+# One loop per operation, so the timed region only contains the call itself
+
+
+def timed_calls(func, args, latencies):
+    clock = time.perf_counter_ns
+    for arg in args:
+        start = clock()
+        func(arg)
+        latencies.append(clock() - start)
+
+
+def timed_inserts(tree, keys, latencies):
+    clock = time.perf_counter_ns
+    insert = tree.insert
+    for key in keys:
+        start = clock()
+        insert(key, key)
+        latencies.append(clock() - start)
+
+
+def timed_ranges(tree, starts, latencies):
+    clock = time.perf_counter_ns
+    range_query = tree.range_query
+    for start_key in starts:
+        end_key = start_key + 2 * (RANGE_SPAN - 1)
+        start = clock()
+        range_query(start_key, end_key)
+        latencies.append(clock() - start)
+
+
+def timed_mixed(tree, plan, latencies):
+    clock = time.perf_counter_ns
+    search, insert = tree.search_value, tree.insert
+    for is_read, key in plan:
+        if is_read:
+            start = clock()
+            search(key)
+        else:
+            start = clock()
+            insert(key, key)
+        latencies.append(clock() - start)
+
+
+def run_once(tree, name, read_ratio, indexes, rng, latencies):
+    """Run the operation on the given entry indexes, then undo its changes"""
+    if name == "search":
+        timed_calls(tree.search_value, [2 * i for i in indexes], latencies)
+    elif name == "search_missing":
+        timed_calls(tree.search_value, [2 * i + 1 for i in indexes], latencies)
+    elif name == "range":
+        timed_ranges(tree, [2 * i for i in indexes], latencies)
+    elif name == "insert":
+        keys = [2 * i + 1 for i in indexes]
+        timed_inserts(tree, keys, latencies)
+        for key in set(keys):
+            tree.delete(key)
+    elif name == "delete":
+        keys = list(dict.fromkeys(2 * i for i in indexes))  # Each key only once
+        timed_calls(tree.delete, keys, latencies)
+        for key in keys:
+            tree.insert(key, key // 2)
+    else:  # mixed
+        plan = [
+            (True, 2 * i) if rng.random() < read_ratio else (False, 2 * i + 1)
+            for i in indexes
+        ]
+        timed_mixed(tree, plan, latencies)
+        for key in {key for is_read, key in plan if not is_read}:
+            tree.delete(key)
+
+
+def summarize(latencies):
+    ordered = sorted(latencies)
+    return {
+        "median_ns": percentile(ordered, 50),
+        "p95_ns": percentile(ordered, 95),
+        "p99_ns": percentile(ordered, 99),
+        "min_ns": ordered[0],
+        "max_ns": ordered[-1],
+        "mean_ns": sum(ordered) / len(ordered),
+    }
+
+
+def measure(
+    tree,
+    size,
+    operation,
+    distribution,
+    ops=10_000,
+    repeats=5,
+    warmups=1,
+    seed=0,
+    gc_enabled=False,
+):
+    """
+    Time ops calls of the operation on a tree holding size entries.
+    Returns the result record (latency statistics over every measured call).
+    """
+    name, read_ratio = parse_operation(operation)
+    rng = random.Random(seed)
+    latencies = array("Q")
+    repeat_means = []
+    for repeat in range(warmups + repeats):
+        indexes = key_indexes(distribution, size, ops, rng)
+        current = array("Q")
+        gc.collect()
+        if not gc_enabled:
+            gc.disable()
+        try:
+            run_once(tree, name, read_ratio, indexes, rng, current)
+        finally:
+            gc.enable()
+        if repeat >= warmups:
+            latencies.extend(current)
+            repeat_means.append(sum(current) / len(current))
+
+    result = {
+        "operation": operation,
+        "distribution": distribution,
+        "size": size,
+        "order": tree.m,
+        "ops": ops,
+        "repeats": repeats,
+    }
+    result.update(summarize(latencies))
+    result["repeat_means_ns"] = repeat_means
+    result["ops_per_s"] = 1e9 / (sum(repeat_means) / len(repeat_means))
+    return result
+
+
+# ----- Metadata -----
+
+
+def timer_overhead_ns(samples=10_000):
+    """Median cost of an empty timed region (included in every latency)"""
+    clock = time.perf_counter_ns
+    values = []
+    for _ in range(samples):
+        start = clock()
+        values.append(clock() - start)
+    return percentile(sorted(values), 50)
+
+
+def git_commit():
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def machine_metadata():
+    clock = time.get_clock_info("perf_counter")
+    return {
+        "timestamp": datetime.datetime.now().astimezone().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "hostname": platform.node(),
+        "git_commit": git_commit(),
+        "timer_resolution_ns": clock.resolution * 1e9,
+        "timer_overhead_ns": timer_overhead_ns(),
+    }
+
+
+# ----- Suite -----
+
+
+def run_suite(
+    sizes=DEFAULT_SIZES,
+    operations=OPERATIONS,
+    distributions=DISTRIBUTIONS,
+    order=64,
+    ops=10_000,
+    repeats=5,
+    warmups=1,
+    seed=0,
+    gc_enabled=False,
+    log=print,
+):
+    """Measure every (size, operation, distribution), one tree built per size"""
+    for operation in operations:
+        parse_operation(operation)  # Fail before building anything
+    settings = {
+        "order": order,
+        "ops": ops,
+        "repeats": repeats,
+        "warmups": warmups,
+        "seed": seed,
+        "gc_enabled": gc_enabled,
+    }
+    results = []
+    for size in sizes:
+        start = time.perf_counter()
+        tree = build_tree(size, order)
+        log(f"n={size:,}: tree built in {time.perf_counter() - start:.1f} s")
+        for operation in operations:
+            for distribution in distributions:
+                result = measure(
+                    tree,
+                    size,
+                    operation,
+                    distribution,
+                    ops,
+                    repeats,
+                    warmups,
+                    seed,
+                    gc_enabled,
+                )
+                results.append(result)
+                log(
+                    f"  {operation:<16}{distribution:<12}"
+                    f"median {result['median_ns']:>8,} ns  p95 {result['p95_ns']:>8,} ns"
+                    f"  p99 {result['p99_ns']:>8,} ns"
+                )
+    return {"metadata": machine_metadata(), "settings": settings, "results": results}
+
+
+def save(run, path):
+    with open(path, "w") as f:
+        json.dump(run, f, indent=2)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def size_list(text):
+    return [int(float(size)) for size in text.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="B+ tree benchmark harness")
+    parser.add_argument(
+        "--sizes",
+        type=size_list,
+        default=DEFAULT_SIZES,
+        help="comma-separated tree sizes (1e7 is accepted)",
+    )
+    parser.add_argument(
+        "--operations",
+        default=",".join(OPERATIONS),
+        help=f"comma-separated, among {', '.join(OPERATIONS)} and mixed:R (R%% reads)",
+    )
+    parser.add_argument("--distributions", default=",".join(DISTRIBUTIONS))
+    parser.add_argument("--order", type=int, default=64)
+    parser.add_argument(
+        "--ops", type=int, default=10_000, help="timed calls per repeat"
+    )
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--warmups", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--gc",
+        action="store_true",
+        help="keep the garbage collector enabled while timing",
+    )
+    parser.add_argument("--output", default="analysis/benchmark_results.json")
+    args = parser.parse_args(argv)
+
+    distributions = args.distributions.split(",")
+    for distribution in distributions:
+        if distribution not in DISTRIBUTIONS:
+            parser.error(f"Unknown distribution: {distribution}")
+    try:
+        run = run_suite(
+            args.sizes,
+            args.operations.split(","),
+            distributions,
+            args.order,
+            args.ops,
+            args.repeats,
+            args.warmups,
+            args.seed,
+            args.gc,
+        )
+    except ValueError as error:
+        parser.error(str(error))
+    save(run, args.output)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Compare benchmark runs and fit the measured complexity
+
+Works on the JSON files written by analysis/benchmark.py.
+
+compare OLD NEW
+    Matches the measurements of two runs (same operation, distribution, size and
+    order) and reports the speedup or slowdown of each one, with a bootstrap
+    confidence interval over the repeat means. A measurement is a regression when
+    it is slower than the threshold and the whole interval is above 1 (so noise
+    alone doesn't fail the comparison).
+
+fit RUN
+    Fits time(n) = b * f(n) for f in O(1), O(log n), O(n) and O(n log n) on every
+    operation measured at 3 sizes or more, and reports the model that fits best.
+    An operation whose best model grows faster than expected (every B+ tree
+    operation is O(log n)) is a complexity regression: an accidental linear scan
+    shows up as O(n) here.
+
+Both exit with status 1 when they find a regression.
+
+Run it with:
+    python3 -m analysis.compare_benchmarks compare old.json new.json --threshold 0.05
+    python3 -m analysis.compare_benchmarks fit new.json
+"""
+
+import argparse
+import math
+import random
+import sys
+from analysis.benchmark import load
+
+# Complexity models, from the slowest growing to the fastest
+MODELS = {
+    "O(1)": lambda n: 1.0,
+    "O(log n)": lambda n: math.log(n),
+    "O(n)": lambda n: float(n),
+    "O(n log n)": lambda n: n * math.log(n),
+}
+RANK = {name: rank for rank, name in enumerate(MODELS)}
+
+# Expected complexity of the harness operations ("mixed:R" uses "mixed")
+EXPECTED = {
+    "insert": "O(log n)",
+    "search": "O(log n)",
+    "search_missing": "O(log n)",
+    "delete": "O(log n)",
+    "range": "O(log n)",  # O(log n + k) with a fixed k
+    "mixed": "O(log n)",
+}
+
+
+# ----- Comparison -----
+
+
+def cell(result):
+    return (
+        result["operation"],
+        result["distribution"],
+        result["size"],
+        result["order"],
+    )
+
+
+def mean(values):
+    return sum(values) / len(values)
+
+
+def bootstrap_ratio(old, new, confidence=0.95, resamples=2000, seed=0):
+    """Confidence interval of mean(new) / mean(old), resampling both sides"""
+    rng = random.Random(seed)
+    ratios = sorted(
+        mean(rng.choices(new, k=len(new))) / mean(rng.choices(old, k=len(old)))
+        for _ in range(resamples)
+    )
+    tail = (1 - confidence) / 2
+    low = ratios[int(tail * (resamples - 1))]
+    high = ratios[int((1 - tail) * (resamples - 1))]
+    return low, high
+
+
+def compare(old_run, new_run, threshold=0.05, confidence=0.95):
+    """
+    Returns one row per measurement found in both runs:
+    (cell, old mean, new mean, ratio, (low, high), status)
+    where ratio = new / old time (> 1 is slower).
+    """
+    old_results = {cell(r): r for r in old_run["results"]}
+    rows = []
+    for result in new_run["results"]:
+        old = old_results.get(cell(result))
+        if old is None:
+            continue
+        old_means, new_means = old["repeat_means_ns"], result["repeat_means_ns"]
+        ratio = mean(new_means) / mean(old_means)
+        low, high = bootstrap_ratio(old_means, new_means, confidence)
+        if ratio > 1 + threshold and low > 1:
+            status = "REGRESSION"
+        elif ratio < 1 - threshold and high < 1:
+            status = "faster"
+        else:
+            status = "same"
+        rows.append(
+            (cell(result), mean(old_means), mean(new_means), ratio, (low, high), status)
+        )
+    return rows
+
+
+def print_comparison(rows, confidence, out=sys.stdout):
+    out.write(
+        f"{'Operation':<16}{'Dist.':<12}{'Size':>10}{'Order':>6}"
+        f"{'Old (ns)':>11}{'New (ns)':>11}{'New/Old':>9}"
+        f"{f'{confidence:.0%} CI':>16}  Status\n"
+    )
+    out.write("-" * 105 + "\n")
+    for (
+        (operation, distribution, size, order),
+        old,
+        new,
+        ratio,
+        (low, high),
+        status,
+    ) in rows:
+        out.write(
+            f"{operation:<16}{distribution:<12}{size:>10,}{order:>6}"
+            f"{old:>11,.0f}{new:>11,.0f}{ratio:>9.3f}"
+            f"{f'[{low:.3f}, {high:.3f}]':>16}  {status}\n"
+        )
+
+
+# ----- Complexity fitting -----
+
+
+def fit_model(sizes, times, f):
+    """
+    Least squares fit of time = b * f(n), without an intercept (like Google
+    Benchmark): the model has to explain how the time grows, not only its level.
+    Returns (b, RMS error relative to the mean time).
+    """
+    xs = [f(n) for n in sizes]
+    b = sum(x * t for x, t in zip(xs, times)) / sum(x * x for x in xs)
+    rms = math.sqrt(sum((b * x - t) ** 2 for x, t in zip(xs, times)) / len(times))
+    return b, rms / (sum(times) / len(times))
+
+
+def best_model(sizes, times):
+    """Returns (best model name, {model: relative RMS error})"""
+    errors = {name: fit_model(sizes, times, f)[1] for name, f in MODELS.items()}
+    return min(errors, key=lambda name: (errors[name], RANK[name])), errors
+
+
+def fit_complexity(run, metric="median_ns"):
+    """
+    Returns one row per (operation, distribution, order) measured at 3 sizes or more:
+    (operation, distribution, order, best model, errors, expected, status)
+    """
+    groups = {}
+    for result in run["results"]:
+        key = (result["operation"], result["distribution"], result["order"])
+        groups.setdefault(key, []).append((result["size"], result[metric]))
+
+    rows = []
+    for (operation, distribution, order), points in groups.items():
+        points.sort()
+        if len(points) < 3:
+            continue
+        sizes = [size for size, _ in points]
+        times = [max(time, 1) for _, time in points]
+        best, errors = best_model(sizes, times)
+        expected = EXPECTED.get(operation.partition(":")[0])
+        if expected is None:
+            status = "-"
+        elif RANK[best] > RANK[expected]:
+            status = "REGRESSION"
+        else:
+            status = "ok"
+        rows.append((operation, distribution, order, best, errors, expected, status))
+    return rows
+
+
+def print_fit(rows, out=sys.stdout):
+    out.write(f"{'Operation':<16}{'Dist.':<12}{'Order':>6}  {'Best fit':<12}")
+    out.write("".join(f"{name:>12}" for name in MODELS))
+    out.write(f"  {'Expected':<10}Status\n")
+    out.write("-" * 112 + "\n")
+    for operation, distribution, order, best, errors, expected, status in rows:
+        out.write(f"{operation:<16}{distribution:<12}{order:>6}  {best:<12}")
+        out.write("".join(f"{errors[name]:>12.1%}" for name in MODELS))
+        out.write(f"  {expected or '-':<10}{status}\n")
+    out.write("(columns: relative RMS error of each model)\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare and fit benchmark runs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compare_parser = commands.add_parser("compare", help="compare two runs")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.05,
+        help="slowdown reported as a regression (0.05 = 5%%)",
+    )
+    compare_parser.add_argument("--confidence", type=float, default=0.95)
+
+    fit_parser = commands.add_parser("fit", help="fit the complexity of a run")
+    fit_parser.add_argument("run")
+    fit_parser.add_argument(
+        "--metric", default="median_ns", choices=["median_ns", "mean_ns", "p99_ns"]
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        rows = compare(load(args.old), load(args.new), args.threshold, args.confidence)
+        if not rows:
+            parser.error("the two runs have no measurement in common")
+        print_comparison(rows, args.confidence)
+        failures = [row for row in rows if row[-1] == "REGRESSION"]
+        print(
+            f"\n{len(failures)} regression(s) slower than {args.threshold:.0%} "
+            f"out of {len(rows)} measurements"
+        )
+    else:
+        rows = fit_complexity(load(args.run), args.metric)
+        if not rows:
+            parser.error("no operation was measured at 3 sizes or more")
+        print_fit(rows)
+        failures = [row for row in rows if row[-1] == "REGRESSION"]
+        print(f"\n{len(failures)} operation(s) grow faster than expected")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
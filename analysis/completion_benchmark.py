@@ -0,0 +1,98 @@
+"""
+Tab completion latency benchmark
+
+Builds a large filesystem, then "types" paths one character at a time and
+completes after every key press, like a user pressing Tab as they go.
+Compares the prefix-scan Completer (with its per-prefix cache) against the
+naive approach of filtering every key of the tree on each key press, and
+checks the latency against the budget of one frame at 60 FPS.
+
+Run it with:
+    python3 -m analysis.completion_benchmark
+    python3 -m analysis.completion_benchmark --entries 1000000 --layout inode
+"""
+
+import argparse
+import random
+import time
+from commands import VirtualFileSystem
+from completion import Completer
+from percentiles import percentile
+
+FRAME_MS = 1000 / 60
+
+
+def build(layout, entries, files_per_dir=1000):
+    vfs = VirtualFileSystem(order=64, layout=layout, cache_size=0)
+    for d in range((entries + files_per_dir - 1) // files_per_dir):
+        vfs.mkdir(f"/dir_{d:05d}")
+        for f in range(min(files_per_dir, entries - d * files_per_dir)):
+            vfs.touch(f"/dir_{d:05d}/file_{f:04d}.txt")
+    return vfs
+
+
+def naive_complete(vfs, text):
+    """Filter every key of the tree (what completion would cost without range scans)"""
+    word = "/" + text.rpartition(" /")[2]
+    return [key for key in vfs.tree.get_all_leaf_keys() if str(key).startswith(word)]
+
+
+def keystrokes(typed_paths):
+    """Every intermediate input while typing "cat <path>" for each path"""
+    for path in typed_paths:
+        for end in range(1, len(path) + 1):
+            yield "cat " + path[:end]
+
+
+def run_completion_benchmark(entries=200_000, layout="path", paths=20, seed=42):
+    print(f"Building {entries:,} entries ({layout} layout)...")
+    start = time.perf_counter()
+    vfs = build(layout, entries)
+    print(f"Built in {time.perf_counter() - start:.1f} s\n")
+
+    rng = random.Random(seed)
+    dirs = (entries + 999) // 1000
+    typed = [
+        f"/dir_{rng.randrange(dirs):05d}/file_{rng.randrange(min(entries, 1000)):04d}.txt"
+        for _ in range(paths)
+    ]
+
+    completer = Completer(vfs)
+    latencies = []
+    for text in keystrokes(typed):
+        start = time.perf_counter_ns()
+        completer.complete(text)
+        latencies.append(time.perf_counter_ns() - start)
+    latencies.sort()
+
+    naive = []
+    for text in list(keystrokes(typed[:1]))[:3]:  # A few are enough, it's O(N)
+        start = time.perf_counter_ns()
+        naive_complete(vfs, text)
+        naive.append(time.perf_counter_ns() - start)
+    naive.sort()
+
+    print(f"{'':<22}{'p50 (ms)':>10}{'p99 (ms)':>10}{'max (ms)':>10}")
+    print("-" * 52)
+    for name, values in (
+        ("Prefix scan + cache", latencies),
+        ("Filter all keys", naive),
+    ):
+        print(
+            f"{name:<22}{percentile(values, 50) / 1e6:>10.3f}"
+            f"{percentile(values, 99) / 1e6:>10.3f}{values[-1] / 1e6:>10.3f}"
+        )
+    print(
+        f"\n{len(latencies)} key presses, {completer.scans} tree scans "
+        f"({1 - completer.scans / len(latencies):.0%} served from the cache)"
+    )
+    within = percentile(latencies, 99) / 1e6 < FRAME_MS
+    print(f"p99 {'within' if within else 'OVER'} one frame ({FRAME_MS:.1f} ms)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tab completion latency benchmark")
+    parser.add_argument("--entries", type=int, default=200_000)
+    parser.add_argument("--layout", choices=["path", "inode"], default="path")
+    args = parser.parse_args()
+    run_completion_benchmark(args.entries, args.layout)
@@ -1,8 +1,16 @@
-import time
-import matplotlib.pyplot as plt
-import numpy as np
-from bplus_tree import BPlusTree
-import math
+from analysis.benchmark import RANGE_SPAN, run_suite, save
+
+# matplotlib and numpy are only imported by the plotting methods,
+# measuring the operations doesn't need them
+
+# Operation name in the charts -> operation of the benchmark harness
+OPERATIONS = {
+    "Insert": "insert",
+    "Search (existing)": "search",
+    "Search (missing)": "search_missing",
+    "Range Query": "range",
+    "Delete": "delete",
+}
 
 
 class BPlusTreeComplexityAnalysis:
@@ -10,91 +18,82 @@ class BPlusTreeComplexityAnalysis:
     Class to analyze and visualize the time complexity of B+ tree operations.
     """
 
-    def __init__(self):
+    def __init__(self, ops=5_000, repeats=5):
         self.results = {}
+        self.ops = ops  # Timed calls per repeat
+        self.repeats = repeats
 
-    def measure_operation_time(self, operation_func, data_sizes, tree_order=4):
+    def measure_operation_time(
+        self, data_sizes, tree_order=4, distribution="random", output=None, workers=1
+    ):
+        """
+        Measure the median time of one call of every operation (in seconds) on trees
+        holding each data size, with the benchmark harness (analysis/benchmark.py):
+        warm-up, repeated runs and GC disabled while timing.
+        With workers > 1 the measurements are spread over worker processes
+        (analysis/parallel_benchmark.py).
         """
-        Measure execution time for different data sizes.
+        if workers > 1:
+            from analysis.parallel_benchmark import run_parallel_suite
+
+            run = run_parallel_suite(
+                data_sizes,
+                list(OPERATIONS.values()),
+                [tree_order],
+                [distribution],
+                workers,
+                ops=self.ops,
+                repeats=self.repeats,
+            )
+        else:
+            run = run_suite(
+                data_sizes,
+                list(OPERATIONS.values()),
+                [distribution],
+                order=tree_order,
+                ops=self.ops,
+                repeats=self.repeats,
+            )
+        if output:
+            save(run, output)
+        self.load_results(run, tree_order, distribution)
+        return run
+
+    def load_results(self, run, order, distribution="random"):
         """
-        times = []
-
-        for size in data_sizes:
-            # Create a fresh tree for each test
-            tree = BPlusTree(tree_order)
-
-            # Prepare data if needed
-            if operation_func.__name__ == "test_search":
-                # Insert data first for search operations
-                for i in range(size):
-                    tree.insert(i, f"value_{i}")
-
-            # Measure operation time
-            start_time = time.time()
-            operation_func(tree, size)
-            end_time = time.time()
-
-            times.append(end_time - start_time)
-
-        return times
-
-    def test_insert(self, tree, size):
-        """Test insertion operation"""
-        for i in range(size):
-            tree.insert(i, f"value_{i}")
-
-    def test_search(self, tree, size):
-        """Test search operation"""
-        for i in range(size):
-            tree.search_value(i)
-
-    def test_search_missing(self, tree, size):
-        """Test search for non-existent keys"""
-        for i in range(size):
-            tree.search_value(size + i)  # Search for keys that don't exist
-
-    def test_range_query(self, tree, size):
-        """Test range query operation"""
-        # Insert data first
-        for i in range(size):
-            tree.insert(i, f"value_{i}")
-
-        # Perform range queries
-        for i in range(0, size, max(1, size // 10)):
-            end = min(i + size // 10, size)
-            tree.range_query(i, end)
-
-    def test_delete(self, tree, size):
-        """Test deletion operation"""
-        # Insert data first
-        for i in range(size):
-            tree.insert(i, f"value_{i}")
-
-        # Delete half the keys
-        for i in range(0, size, 2):
-            tree.delete(i)
-
-    def analyze_complexities(self):
+        Use the measurements of a harness run (serial or parallel) of one tree
+        order and distribution for the charts.
+        """
+        self.results = {}
+        for op_name, operation in OPERATIONS.items():
+            records = sorted(
+                (
+                    r
+                    for r in run["results"]
+                    if r["operation"] == operation
+                    and r["order"] == order
+                    and r["distribution"] == distribution
+                ),
+                key=lambda r: r["size"],
+            )
+            if not records:
+                continue  # Not measured in this run
+            self.results[op_name] = {
+                "sizes": [r["size"] for r in records],
+                "times": [r["median_ns"] / 1e9 for r in records],
+            }
+
+    def analyze_complexities(
+        self, data_sizes=(100, 1_000, 10_000, 100_000, 1_000_000), workers=1
+    ):
         """
         Analyze and plot the time complexity of all B+ tree operations.
         """
         # Data sizes to test (logarithmic scale for better visualization)
-        data_sizes = [10, 50, 100, 500, 1000, 2000, 5000]
-
-        # Define operations to test
-        operations = {
-            "Insert": self.test_insert,
-            "Search (existing)": self.test_search,
-            "Search (missing)": self.test_search_missing,
-            "Range Query": self.test_range_query,
-            "Delete": self.test_delete,
-        }
-
-        # Measure times for each operation
-        for op_name, op_func in operations.items():
-            print(f"Measuring {op_name}...")
-            times = self.measure_operation_time(op_func, data_sizes)
-            self.results[op_name] = {"sizes": data_sizes, "times": times}
+        print("Measuring the operations...")
+        self.measure_operation_time(
+            list(data_sizes), output="analysis/complexity_results.json", workers=workers
+        )
 
         # Create the complexity analysis plot
         self.plot_complexity_analysis()
@@ -102,10 +101,28 @@ class BPlusTreeComplexityAnalysis:
         # Create theoretical vs actual comparison
         self.plot_theoretical_vs_actual()
 
+    def analyze_memory(
+        self, data_sizes=(1_000, 10_000, 100_000), orders=(4, 16, 64, 256, 1024)
+    ):
+        """
+        Measure the memory footprint of trees of every order and key type
+        (analysis/memory_benchmark.py) and plot it next to the time charts.
+        """
+        from analysis.memory_benchmark import plot_memory, run_memory_suite
+
+        print("Measuring the memory footprint...")
+        run = run_memory_suite(list(data_sizes), list(orders))
+        save(run, "analysis/memory_results.json")
+        plot_memory(run, show=True)
+        return run
+
     def plot_complexity_analysis(self):
         """
         Plot the time complexity analysis for all operations.
         """
+        import matplotlib.pyplot as plt
+        import numpy as np
+
         plt.figure(figsize=(15, 10))
 
         # Create subplots for different operations
@@ -148,9 +165,16 @@ class BPlusTreeComplexityAnalysis:
 
             elif op_name == "Range Query":
                 # O(log n + k) where k is the range size
-                # For this test, k is proportional to n, so O(n)
-                theoretical = sizes * (data["times"][-1] / sizes[-1])
-                ax.plot(sizes, theoretical, "--", color="gray", label="O(n)", alpha=0.7)
+                # Every query returns RANGE_SPAN keys, so only the log n part grows
+                theoretical = np.log(sizes) * (data["times"][-1] / np.log(sizes[-1]))
+                ax.plot(
+                    sizes,
+                    theoretical,
+                    "--",
+                    color="gray",
+                    label=f"O(log n + k), k={RANGE_SPAN}",
+                    alpha=0.7,
+                )
 
             elif op_name == "Delete":
                 # O(log n) for deletion
@@ -160,7 +184,7 @@ class BPlusTreeComplexityAnalysis:
                 )
 
             ax.set_xlabel("Data Size (n)")
-            ax.set_ylabel("Time (seconds)")
+            ax.set_ylabel("Time per operation (seconds)")
             ax.set_title(f"{op_name} - Time Complexity")
             ax.legend()
             ax.grid(True, alpha=0.3)
@@ -180,6 +204,8 @@ class BPlusTreeComplexityAnalysis:
         """
         Create a comprehensive comparison of theoretical vs actual complexities.
         """
+        import matplotlib.pyplot as plt
+
         plt.figure(figsize=(16, 12))
 
         # Define theoretical complexities
@@ -209,7 +235,7 @@ class BPlusTreeComplexityAnalysis:
             )
 
         ax1.set_xlabel("Data Size (n)")
-        ax1.set_ylabel("Time (seconds)")
+        ax1.set_ylabel("Time per operation (seconds)")
         ax1.set_title("B+ Tree Operations - Time Complexity Comparison")
         ax1.legend()
         ax1.grid(True, alpha=0.3)
@@ -333,6 +359,7 @@ def run_complexity_analysis():
 
     analyzer = BPlusTreeComplexityAnalysis()
     analyzer.analyze_complexities()
+    analyzer.analyze_memory()
     analyzer.print_complexity_summary()
 
     print("\nAnalysis complete! Check the generated PNG files for visualizations.")
@@ -0,0 +1,74 @@
+"""
+Parallel grep benchmark for the VirtualFileSystem
+
+Fills a filesystem with text files and measures grep throughput with
+1, 2, 4 and 8 worker processes.
+
+Run it with:
+    python3 -m analysis.grep_benchmark
+"""
+
+import os
+import random
+import time
+from commands import VirtualFileSystem
+
+WORDS = ["tree", "leaf", "node", "split", "merge", "key", "value", "order", "root"]
+
+
+def build_filesystem(files, lines_per_file, seed=42):
+    """Return the (path, content) list of a synthetic code base"""
+    rng = random.Random(seed)
+    entries = []
+    for i in range(files):
+        lines = [" ".join(rng.choices(WORDS, k=8)) for _ in range(lines_per_file)]
+        if i % 10 == 0:
+            lines[rng.randrange(lines_per_file)] += " TODO rebalance"
+        entries.append(
+            (f"/src/module_{i // 100:02d}/file_{i:05d}.py", "\n".join(lines))
+        )
+    return entries
+
+
+def fill(vfs, entries):
+    vfs.mkdir("/src")
+    for path, content in entries:
+        directory = path.rsplit("/", 1)[0]
+        vfs.mkdir(directory)  # Already-existing directories are just reported
+        vfs.write(path, content)
+
+
+def run_grep_benchmark(
+    files=4000, lines_per_file=50, workers=(1, 2, 4, 8), batch_size=64
+):
+    entries = build_filesystem(files, lines_per_file)
+    megabytes = sum(len(content) for _, content in entries) / 1e6
+    print(
+        f"{files} files, {megabytes:.1f} MB of content, batch size {batch_size}, "
+        f"{os.cpu_count()} CPUs\n"
+    )
+
+    print(f"{'Workers':<10}{'Time (s)':>10}{'MB/s':>10}{'Matches':>10}{'Speedup':>10}")
+    print("-" * 50)
+    baseline = None
+    for count in workers:
+        vfs = VirtualFileSystem(
+            order=64, grep_workers=count, grep_batch_size=batch_size
+        )
+        fill(vfs, entries)
+        list(vfs.iter_grep("TODO", "/src"))  # Warm-up: starts the worker processes
+
+        start = time.perf_counter()
+        matches = sum(1 for _ in vfs.iter_grep(r"TODO \w+", "/src"))
+        elapsed = time.perf_counter() - start
+        vfs.searcher.close()
+
+        baseline = baseline or elapsed
+        print(
+            f"{count:<10}{elapsed:>10.3f}{megabytes / elapsed:>10.1f}"
+            f"{matches:>10}{baseline / elapsed:>9.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    run_grep_benchmark()
@@ -0,0 +1,88 @@
+"""
+Secondary index benchmark for the VirtualFileSystem
+
+Measures the cost the (extension, path) and (type, path) indexes add to
+writes, and what they save on find/ls filters.
+
+Run it with:
+    python3 -m analysis.index_benchmark
+"""
+
+import time
+from commands import VirtualFileSystem
+
+EXTENSIONS = [".py", ".md", ".txt", ".json"]
+
+
+def build_paths(dirs, files_per_dir):
+    """Two-level hierarchy: /dir_i/sub_j with files spread over a few extensions"""
+    dir_paths = []
+    file_paths = []
+    for i in range(dirs):
+        dir_paths.append(f"/dir_{i:03d}")
+        for j in range(4):
+            sub = f"/dir_{i:03d}/sub_{j}"
+            dir_paths.append(sub)
+            for k in range(files_per_dir):
+                ext = EXTENSIONS[k % len(EXTENSIONS)]
+                file_paths.append(f"{sub}/file_{k:03d}{ext}")
+    return dir_paths, file_paths
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def run_writes(vfs, dirs, files):
+    results = {}
+    results["mkdir"] = timed(lambda: [vfs.mkdir(d) for d in dirs])
+    results["touch"] = timed(lambda: [vfs.touch(f) for f in files])
+    results["mv"] = timed(
+        lambda: [vfs.mv(dirs[0], "/moved"), vfs.mv("/moved", dirs[0])]
+    )
+    results["rm"] = timed(lambda: [vfs.rm(f) for f in files[: len(files) // 2]])
+    return results
+
+
+def run_queries(vfs):
+    queries = {
+        "find -name *.py": lambda: list(vfs.iter_find("/", name="*.py")),
+        "find -type d": lambda: list(vfs.iter_find("/", entry_type="d")),
+        "ls / -type d": lambda: vfs.ls("/", entry_type="d"),
+    }
+    return {name: timed(query) for name, query in queries.items()}
+
+
+def run_index_benchmark(dirs=100, files_per_dir=50, order=32, layout="path"):
+    dir_paths, file_paths = build_paths(dirs, files_per_dir)
+    print(
+        f"{len(dir_paths)} directories, {len(file_paths)} files "
+        f"(order={order}, layout={layout})\n"
+    )
+
+    plain = VirtualFileSystem(order=order, layout=layout)
+    indexed = VirtualFileSystem(order=order, layout=layout, indexes=True)
+
+    print("Write overhead")
+    print(f"{'Operation':<18}{'plain (s)':>12}{'indexed (s)':>14}{'overhead':>10}")
+    print("-" * 54)
+    plain_writes = run_writes(plain, dir_paths, file_paths)
+    indexed_writes = run_writes(indexed, dir_paths, file_paths)
+    for op, p in plain_writes.items():
+        i = indexed_writes[op]
+        print(f"{op:<18}{p:>12.4f}{i:>14.4f}{(i / p - 1) * 100:>9.0f}%")
+
+    print("\nFilter queries")
+    print(f"{'Query':<18}{'plain (s)':>12}{'indexed (s)':>14}{'speedup':>10}")
+    print("-" * 54)
+    plain_queries = run_queries(plain)
+    indexed_queries = run_queries(indexed)
+    for query, p in plain_queries.items():
+        i = indexed_queries[query]
+        print(f"{query:<18}{p:>12.4f}{i:>14.4f}{p / i:>9.1f}x")
+
+
+if __name__ == "__main__":
+    run_index_benchmark()
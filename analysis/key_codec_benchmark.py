@@ -0,0 +1,129 @@
+"""
+Key codec benchmark
+
+Compares the B+ tree with its keys as Python objects and with the same keys
+encoded by key_codec.py (order-preserving bytes), for three kinds of keys:
+    paths   full path strings, like the path layout ("/d12/s3/file_0042.txt")
+    tuples  (parent inode, name) pairs, like the inode layout
+    ints    random integers
+and four operations on n keys: sorting them (comparisons only), inserting them
+one by one into an empty tree, and looking all of them up (search_value one by
+one, then search_values in one batch). The "encoded" column works on keys encoded
+beforehand, so it only shows the cost of the comparisons; "codec" is the
+EncodedBPlusTree, which encodes every key it is given (and "encode"/"decode" are
+the cost of the codec itself). Times are the median of the repeats, in ms.
+
+Run it with:
+    python3 -m analysis.key_codec_benchmark
+    python3 -m analysis.key_codec_benchmark --keys 1e6 --order 128 --repeats 5
+"""
+
+import argparse
+import random
+import statistics
+import time
+from analysis.benchmark import size_list
+from bplus_tree import BPlusTree
+from key_codec import EncodedBPlusTree, decode_key, encode_key
+
+WORKLOADS = ["paths", "tuples", "ints"]
+
+
+def make_keys(workload, n, rng):
+    if workload == "paths":
+        return [
+            f"/d{rng.randrange(100)}/s{rng.randrange(20)}/file_{i:06}.txt"
+            for i in range(n)
+        ]
+    if workload == "tuples":
+        return [(rng.randrange(n // 50 + 1), f"file_{i:06}.txt") for i in range(n)]
+    return rng.sample(range(-(10**12), 10**12), n)
+
+
+def timed(func, repeats):
+    """Median milliseconds of func()"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def filled(tree, keys):
+    for key in keys:
+        tree.insert(key, None)
+    return tree
+
+
+def measure(workload, n, order, repeats, seed=0):
+    """{operation: (raw ms, encoded ms, codec ms)} for one kind of keys"""
+    rng = random.Random(seed)
+    keys = list(dict.fromkeys(make_keys(workload, n, rng)))  # Unique
+    encoded = [encode_key(key) for key in keys]
+    raw_tree = filled(BPlusTree(order), keys)
+    bytes_tree = filled(BPlusTree(order), encoded)
+    codec_tree = filled(EncodedBPlusTree(order), keys)
+
+    results = {
+        "sort": (
+            timed(lambda: sorted(keys), repeats),
+            timed(lambda: sorted(encoded), repeats),
+            timed(lambda: sorted(keys, key=encode_key), repeats),
+        ),
+        "insert": (
+            timed(lambda: filled(BPlusTree(order), keys), repeats),
+            timed(lambda: filled(BPlusTree(order), encoded), repeats),
+            timed(lambda: filled(EncodedBPlusTree(order), keys), repeats),
+        ),
+        "search_value": (
+            timed(lambda: [raw_tree.search_value(key) for key in keys], repeats),
+            timed(lambda: [bytes_tree.search_value(key) for key in encoded], repeats),
+            timed(lambda: [codec_tree.search_value(key) for key in keys], repeats),
+        ),
+        "search_values": (
+            timed(lambda: raw_tree.search_values(keys), repeats),
+            timed(lambda: bytes_tree.search_values(encoded), repeats),
+            timed(lambda: codec_tree.search_values(keys), repeats),
+        ),
+    }
+    encode = timed(lambda: [encode_key(key) for key in keys], repeats)
+    decode = timed(lambda: [decode_key(key) for key in encoded], repeats)
+    return results, encode, decode
+
+
+def run_key_codec_benchmark(n=100_000, workloads=WORKLOADS, order=64, repeats=3):
+    print(f"{n:,} keys, order {order}, median of {repeats} runs (ms)\n")
+    print(f"{'Keys':<8}{'Operation':<15}{'raw':>10}{'encoded':>10}{'codec':>10}")
+    print("-" * 53)
+    all_results = {}
+    for workload in workloads:
+        results, encode, decode = measure(workload, n, order, repeats)
+        for operation, (raw, encoded, codec) in results.items():
+            print(
+                f"{workload:<8}{operation:<15}{raw:>10.1f}{encoded:>10.1f}{codec:>10.1f}"
+            )
+        print(
+            f"{workload:<8}{'encode/decode':<15}{'':>10}{encode:>10.1f}{decode:>10.1f}"
+        )
+        all_results[workload] = results
+    return all_results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the key codec")
+    parser.add_argument("--keys", default="100000", help="number of keys")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS))
+    parser.add_argument("--order", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args(argv)
+    run_key_codec_benchmark(
+        size_list(args.keys)[0],
+        args.workloads.split(","),
+        args.order,
+        args.repeats,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Storage layout benchmark for the VirtualFileSystem
+
+Compares the path-keyed layout (one key per full path) with the inode layout
+(inode table + (parent inode, name) directory entries) on the same hierarchy.
+
+Run it with:
+    python3 -m analysis.layout_benchmark
+"""
+
+import time
+from commands import VirtualFileSystem
+
+
+def build_paths(fan_out, depth, files_per_dir):
+    """
+    Return (dirs, files) for a balanced hierarchy, parents always before children.
+    """
+    dirs = []
+    files = []
+    level = ["/"]
+    for _ in range(depth):
+        next_level = []
+        for parent in level:
+            base = "" if parent == "/" else parent
+            for i in range(fan_out):
+                path = f"{base}/dir_{i:03d}"
+                dirs.append(path)
+                next_level.append(path)
+            for i in range(files_per_dir):
+                files.append(f"{base}/file_{i:03d}.txt")
+        level = next_level
+    return dirs, files
+
+
+def timed(func, items):
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    return time.perf_counter() - start
+
+
+def benchmark_layout(layout, dirs, files, order):
+    vfs = VirtualFileSystem(order=order, layout=layout)
+    results = {}
+
+    results["mkdir"] = timed(vfs.mkdir, dirs)
+    results["touch"] = timed(vfs.touch, files)
+
+    def cd(path):
+        vfs.cd(path)
+
+    results["cd"] = timed(cd, dirs)
+    results["ls"] = timed(vfs.ls, dirs)
+
+    # Rename the first top-level directory back and forth (drags its whole subtree)
+    top = dirs[0]
+
+    def mv(_):
+        vfs.mv(top, top + "_renamed")
+        vfs.mv(top + "_renamed", top)
+
+    results["mv (x2)"] = timed(mv, range(10)) / 10
+    results["rm"] = timed(vfs.rm, list(reversed(files)))
+    return results
+
+
+def run_layout_benchmark(fan_out=8, depth=4, files_per_dir=4, order=32):
+    dirs, files = build_paths(fan_out, depth, files_per_dir)
+    print(
+        f"Hierarchy: {len(dirs)} directories, {len(files)} files "
+        f"(fan-out={fan_out}, depth={depth}, order={order})\n"
+    )
+
+    path_results = benchmark_layout("path", dirs, files, order)
+    inode_results = benchmark_layout("inode", dirs, files, order)
+
+    print(f"{'Operation':<12}{'path (s)':>14}{'inode (s)':>14}{'speedup':>10}")
+    print("-" * 50)
+    for op in path_results:
+        p, i = path_results[op], inode_results[op]
+        print(f"{op:<12}{p:>14.6f}{i:>14.6f}{p / i:>9.2f}x")
+
+
+if __name__ == "__main__":
+    run_layout_benchmark()
@@ -0,0 +1,269 @@
+"""
+Memory footprint of the B+ tree
+
+Builds trees of several orders and sizes and measures, for each one:
+- the bytes allocated by the tree itself (nodes and their key/value/child lists),
+  with tracemalloc, and per entry; the keys are allocated beforehand and counted
+  apart, since the tree only holds references to them;
+- the number of objects the tree is made of (leaves, internal nodes, lists),
+  and their shallow size from sys.getsizeof as a check;
+- the height and the leaf fill factor (keys per leaf / maximum keys per leaf),
+  from BPlusTree.stats().
+
+Key types:
+    int      0, 1, 2, ...
+    short    short strings ("key_0000042")
+    path     deep path strings, like the keys of the PathLayout
+             ("/srv/data/project_04/src/module_12/pkg_7/file_0000042.txt")
+Keys are inserted in random order by default (sequential inserts leave the leaves
+half full, see --insert-order) and every value is the key itself.
+
+Run it with:
+    python3 -m analysis.memory_benchmark
+    python3 -m analysis.memory_benchmark --sizes 1e4,1e6,3e6 --orders 4,64,1024 --key-types int
+    python3 -m analysis.memory_benchmark --plot
+"""
+
+import argparse
+import gc
+import random
+import sys
+import time
+import tracemalloc
+from analysis.benchmark import machine_metadata, save, size_list
+from bplus_tree import BPlusTree, InternalNode
+
+KEY_TYPES = ["int", "short", "path"]
+DEFAULT_ORDERS = [4, 16, 64, 256, 1024]
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+
+def make_keys(key_type, size):
+    if key_type == "int":
+        return list(range(size))
+    if key_type == "short":
+        return [f"key_{i:07d}" for i in range(size)]
+    if key_type == "path":
+        return [
+            f"/srv/data/project_{i % 97:02d}/src/module_{i % 89:02d}"
+            f"/pkg_{i % 7}/file_{i:07d}.txt"
+            for i in range(size)
+        ]
+    raise ValueError(f"Unknown key type: {key_type}")
+
+
+def tree_shape(tree):
+    """
+    Height, node counts and leaf fill from tree.stats(), plus the number of lists
+    and the shallow size (sys.getsizeof) of every node, counted level by level
+    """
+    stats = tree.stats()
+    shape = {
+        field: stats[field]
+        for field in ("height", "leaves", "internal_nodes", "leaf_fill")
+    }
+    shape["lists"] = 2 * (stats["leaves"] + stats["internal_nodes"])
+    shallow_bytes = 0
+    level = [tree.root]
+    while level:
+        below = []
+        for node in level:
+            shallow_bytes += sys.getsizeof(node) + sys.getsizeof(node.__dict__)
+            shallow_bytes += sys.getsizeof(node.keys)
+            if isinstance(node, InternalNode):
+                shallow_bytes += sys.getsizeof(node.children)
+                below.extend(node.children)
+            else:
+                shallow_bytes += sys.getsizeof(node.values)
+        level = below
+    shape["shallow_bytes"] = shallow_bytes
+    return shape
+
+
+def measure_memory(key_type, size, order, insert_order="random", seed=0):
+    """Build one tree and return its memory record"""
+    keys = make_keys(key_type, size)
+    if insert_order == "random":
+        random.Random(seed).shuffle(keys)
+
+    # The keys already exist, so only what the tree allocates is traced
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        tree = BPlusTree(order)
+        for key in keys:
+            tree.insert(key, key)
+        elapsed = time.perf_counter() - start
+        gc.collect()
+        tree_bytes = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        copy = make_keys(key_type, size)  # Same keys again, traced this time
+        key_bytes = tracemalloc.get_traced_memory()[0] - before
+        key_bytes -= sys.getsizeof(copy)  # Without the list holding them
+        del copy
+    finally:
+        tracemalloc.stop()
+
+    record = {
+        "key_type": key_type,
+        "size": size,
+        "order": order,
+        "insert_order": insert_order,
+        "tree_bytes": tree_bytes,
+        "key_bytes": key_bytes,
+        "tree_bytes_per_entry": tree_bytes / size,
+        "key_bytes_per_entry": key_bytes / size,
+        "build_s": elapsed,
+    }
+    record.update(tree_shape(tree))
+    return record
+
+
+def run_memory_suite(
+    sizes=DEFAULT_SIZES,
+    orders=DEFAULT_ORDERS,
+    key_types=KEY_TYPES,
+    insert_order="random",
+    seed=0,
+    log=print,
+):
+    for key_type in key_types:
+        make_keys(key_type, 0)  # Fail before building anything
+    settings = {"insert_order": insert_order, "seed": seed}
+    results = []
+    for key_type in key_types:
+        for order in orders:
+            for size in sizes:
+                record = measure_memory(key_type, size, order, insert_order, seed)
+                results.append(record)
+                log(
+                    f"{key_type:<6}order {order:<5}n={size:<10,}"
+                    f"{record['tree_bytes_per_entry']:>7.1f} B/entry (+{record['key_bytes_per_entry']:.0f} keys)"
+                    f"  height {record['height']}  leaves {record['leaves']:,}"
+                    f"  fill {record['leaf_fill']:.0%}"
+                )
+    return {"metadata": machine_metadata(), "settings": settings, "results": results}
+
+
+def plot_memory(run, path="analysis/bplus_tree_memory_analysis.png", show=False):
+    """Bytes per entry, leaf fill and height, next to the complexity charts"""
+    import matplotlib.pyplot as plt
+
+    results = run["results"]
+    key_types = list(dict.fromkeys(r["key_type"] for r in results))
+    orders = sorted({r["order"] for r in results})
+    largest = max(r["size"] for r in results)
+    middle = orders[len(orders) // 2]
+
+    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
+    (per_size, per_order), (fill, height) = axes
+
+    for key_type in key_types:
+        records = [
+            r for r in results if r["key_type"] == key_type and r["order"] == middle
+        ]
+        per_size.plot(
+            [r["size"] for r in records],
+            [r["tree_bytes_per_entry"] for r in records],
+            "o-",
+            label=f"{key_type} keys",
+        )
+        records = [
+            r for r in results if r["key_type"] == key_type and r["size"] == largest
+        ]
+        per_order.plot(
+            [r["order"] for r in records],
+            [r["tree_bytes_per_entry"] for r in records],
+            "o-",
+            label=f"{key_type} keys",
+        )
+    per_size.set_title(f"Tree bytes per entry (order {middle})")
+    per_size.set_xlabel("Data Size (n)")
+    per_order.set_title(f"Tree bytes per entry (n = {largest:,})")
+    per_order.set_xlabel("Order (m)")
+
+    records = [r for r in results if r["key_type"] == key_types[0]]
+    for order in orders:
+        by_order = [r for r in records if r["order"] == order]
+        height.plot(
+            [r["size"] for r in by_order],
+            [r["height"] for r in by_order],
+            "o-",
+            label=f"order {order}",
+        )
+    by_size = [r for r in records if r["size"] == largest]
+    fill.bar([str(r["order"]) for r in by_size], [r["leaf_fill"] for r in by_size])
+    fill.set_ylim(0, 1)
+    fill.set_title(f"Leaf fill factor (n = {largest:,})")
+    fill.set_xlabel("Order (m)")
+    height.set_title("Tree height")
+    height.set_xlabel("Data Size (n)")
+
+    for ax in (per_size, per_order, height):
+        ax.set_xscale("log")
+        ax.legend()
+    for ax in (per_size, per_order, fill, height):
+        ax.grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=300, bbox_inches="tight")
+    if show:
+        plt.show()
+    plt.close(fig)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="B+ tree memory footprint benchmark")
+    parser.add_argument(
+        "--sizes",
+        type=size_list,
+        default=DEFAULT_SIZES,
+        help="comma-separated tree sizes (1e6 is accepted)",
+    )
+    parser.add_argument(
+        "--orders",
+        type=size_list,
+        default=DEFAULT_ORDERS,
+        help="comma-separated tree orders",
+    )
+    parser.add_argument("--key-types", default=",".join(KEY_TYPES))
+    parser.add_argument(
+        "--insert-order", choices=["random", "sequential"], default="random"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="analysis/memory_results.json")
+    parser.add_argument(
+        "--plot",
+        action="store_true",
+        help="also draw analysis/bplus_tree_memory_analysis.png (needs matplotlib)",
+    )
+    args = parser.parse_args(argv)
+
+    if any(order < 3 for order in args.orders):
+        parser.error("the order of a B+ tree is at least 3")
+    try:
+        run = run_memory_suite(
+            args.sizes,
+            args.orders,
+            args.key_types.split(","),
+            args.insert_order,
+            args.seed,
+        )
+    except ValueError as error:
+        parser.error(str(error))
+    save(run, args.output)
+    print(f"\nResults written to {args.output}")
+    if args.plot:
+        plot_memory(run)
+        print("Plot written to analysis/bplus_tree_memory_analysis.png")
+
+
+if __name__ == "__main__":
+    main()
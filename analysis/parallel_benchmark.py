@@ -0,0 +1,314 @@
+"""
+Parallel benchmark runner
+
+Runs the benchmark harness (analysis/benchmark.py) over every
+(operation, size, order, distribution) cell of a sweep, spreading the cells over
+a pool of worker processes:
+- each cell runs in a worker process of its own, which exits after it, so a cell
+  never inherits the heap or the caches of the previous one;
+- at most one cell runs per worker slot, and on Linux each worker is pinned to the
+  CPU of its slot (os.sched_setaffinity), so cells don't migrate and compete;
+- every finished cell is appended to a checkpoint file (one JSON line each), so an
+  interrupted sweep resumes where it stopped when run again;
+- the results are aggregated in the format of the harness, so the complexity
+  charts and analysis/compare_benchmarks.py can use them.
+
+Each cell builds its own tree. That costs more CPU time than the serial suite
+(which builds one tree per size), but the cells are independent.
+
+Run it with:
+    python3 -m analysis.parallel_benchmark --sizes 1e3,1e5,1e6 --orders 4,64,256 --workers 4
+    python3 -m analysis.parallel_benchmark ... --plot
+Run the same command again after an interruption to resume.
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+from itertools import product
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import wait
+from analysis.benchmark import (
+    DEFAULT_SIZES,
+    DISTRIBUTIONS,
+    OPERATIONS,
+    build_tree,
+    machine_metadata,
+    measure,
+    parse_operation,
+    save,
+    size_list,
+)
+
+DEFAULT_CHECKPOINT = "analysis/benchmark_checkpoint.jsonl"
+
+
+def cell_key(cell):
+    """(operation, distribution, size, order) of a cell or of a result record"""
+    return (cell["operation"], cell["distribution"], cell["size"], cell["order"])
+
+
+def sweep(sizes, operations, orders, distributions):
+    """Every cell, the small trees first so partial results cover every operation"""
+    return [
+        {"operation": o, "distribution": d, "size": s, "order": m}
+        for s, m, o, d in product(sizes, orders, operations, distributions)
+    ]
+
+
+def ignore_interrupts():
+    """Worker initializer: Ctrl+C is handled by the parent, which stops the workers"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def cell_process(conn, cell, settings, cpu):
+    """Target of the process of one cell: sends back (True, result) or (False, error)"""
+    ignore_interrupts()
+    try:
+        reply = True, run_cell(cell, settings, cpu)
+    except Exception as error:
+        reply = False, error
+    conn.send(reply)
+    conn.close()
+
+
+def run_cell(cell, settings, cpu=None):
+    """Worker: build the tree of the cell and measure it. Returns the result record"""
+    if cpu is not None and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, {cpu})
+        except OSError:
+            pass  # The CPU isn't available to this process
+    start = time.perf_counter()
+    tree = build_tree(cell["size"], cell["order"])
+    build_s = time.perf_counter() - start
+    result = measure(
+        tree,
+        cell["size"],
+        cell["operation"],
+        cell["distribution"],
+        settings["ops"],
+        settings["repeats"],
+        settings["warmups"],
+        settings["seed"],
+        settings["gc_enabled"],
+    )
+    result["build_s"] = build_s
+    return result
+
+
+# ----- Checkpoint -----
+# The first line holds the settings, every other line a result record
+
+
+def read_checkpoint(path, settings):
+    """
+    Results saved by a previous run with the same measurement settings
+    (the sizes, operations, orders and distributions can differ: a sweep can be
+    extended and only the new cells are measured)
+    """
+    try:
+        with open(path) as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+    except json.JSONDecodeError:
+        raise ValueError(f"Corrupted checkpoint: {path}")
+    if not lines:
+        return []
+    if lines[0].get("settings") != settings:
+        raise ValueError(
+            f"{path} was made with other settings, delete it to start over"
+        )
+    return lines[1:]
+
+
+def open_checkpoint(path, settings, resumed):
+    if resumed:
+        return open(path, "a")
+    f = open(path, "w")
+    f.write(json.dumps({"settings": settings}) + "\n")
+    f.flush()
+    return f
+
+
+def run_parallel_suite(
+    sizes=DEFAULT_SIZES,
+    operations=OPERATIONS,
+    orders=(64,),
+    distributions=DISTRIBUTIONS,
+    workers=None,
+    ops=10_000,
+    repeats=5,
+    warmups=1,
+    seed=0,
+    gc_enabled=False,
+    checkpoint=DEFAULT_CHECKPOINT,
+    log=print,
+):
+    """
+    Measure every cell in a pool of worker processes. Returns the aggregated run
+    ({"metadata", "settings", "results"}, results in sweep order).
+    """
+    for operation in operations:
+        parse_operation(operation)  # Fail before starting any worker
+    workers = workers or os.cpu_count() or 1
+    settings = {
+        "ops": ops,
+        "repeats": repeats,
+        "warmups": warmups,
+        "seed": seed,
+        "gc_enabled": gc_enabled,
+    }
+    cells = sweep(sizes, operations, orders, distributions)
+    done = {}
+    if checkpoint:
+        done = {cell_key(r): r for r in read_checkpoint(checkpoint, settings)}
+        if done:
+            log(f"Resuming: {len(done)} cells already measured in {checkpoint}")
+    pending = [cell for cell in cells if cell_key(cell) not in done]
+
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+    free_slots = list(range(workers))
+    running = {}  # Receiving end of a cell's pipe -> (slot, process of the cell)
+    start = time.perf_counter()
+    finished = 0
+    out = open_checkpoint(checkpoint, settings, bool(done)) if checkpoint else None
+    try:
+        while pending or running:
+            while pending and free_slots:
+                slot = free_slots.pop()
+                cpu = cpus[slot % len(cpus)] if cpus else None
+                receiver, sender = Pipe(duplex=False)
+                args = (sender, pending.pop(0), settings, cpu)
+                process = Process(target=cell_process, args=args, daemon=True)
+                process.start()
+                sender.close()  # The pipe reports EOF if the process dies
+                running[receiver] = slot, process
+            for receiver in wait(list(running)):
+                slot, process = running.pop(receiver)
+                try:
+                    ok, result = receiver.recv()
+                except EOFError:
+                    process.join()
+                    raise RuntimeError(
+                        f"A worker process died (exit code {process.exitcode})"
+                    ) from None
+                finally:
+                    receiver.close()
+                process.join()
+                free_slots.append(slot)
+                if not ok:
+                    raise result
+                done[cell_key(result)] = result
+                finished += 1
+                if out:
+                    out.write(json.dumps(result) + "\n")
+                    out.flush()
+                elapsed = time.perf_counter() - start
+                remaining = len(pending) + len(running)
+                log(
+                    f"[{len(cells) - remaining}/{len(cells)}] {result['operation']:<16}"
+                    f"{result['distribution']:<12}n={result['size']:<10,}"
+                    f"order {result['order']:<5}median {result['median_ns']:>8,} ns"
+                    f"  (eta {elapsed / finished * remaining:.0f} s)"
+                )
+    except BaseException:
+        # The running cells are lost: stop their workers instead of waiting for them
+        for receiver, (_, process) in running.items():
+            process.terminate()
+            process.join()
+            receiver.close()
+        if out:
+            log(
+                f"Interrupted: {len(done)} cells saved in {checkpoint}, run again to resume"
+            )
+        raise
+    finally:
+        if out:
+            out.close()
+
+    results = [done[cell_key(cell)] for cell in cells]
+    settings.update(orders=list(orders), workers=workers)
+    return {"metadata": machine_metadata(), "settings": settings, "results": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel B+ tree benchmark runner")
+    parser.add_argument(
+        "--sizes",
+        type=size_list,
+        default=DEFAULT_SIZES,
+        help="comma-separated tree sizes (1e7 is accepted)",
+    )
+    parser.add_argument(
+        "--operations",
+        default=",".join(OPERATIONS),
+        help=f"comma-separated, among {', '.join(OPERATIONS)} and mixed:R (R%% reads)",
+    )
+    parser.add_argument("--orders", type=size_list, default=[64])
+    parser.add_argument("--distributions", default="random")
+    parser.add_argument(
+        "--workers", type=int, default=None, help="default: one per CPU"
+    )
+    parser.add_argument(
+        "--ops", type=int, default=10_000, help="timed calls per repeat"
+    )
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--warmups", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--gc",
+        action="store_true",
+        help="keep the garbage collector enabled while timing",
+    )
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--output", default="analysis/benchmark_results.json")
+    parser.add_argument(
+        "--plot",
+        action="store_true",
+        help="draw the complexity charts of the first order from the results",
+    )
+    args = parser.parse_args(argv)
+
+    distributions = args.distributions.split(",")
+    for distribution in distributions:
+        if distribution not in DISTRIBUTIONS:
+            parser.error(f"Unknown distribution: {distribution}")
+    try:
+        run = run_parallel_suite(
+            args.sizes,
+            args.operations.split(","),
+            args.orders,
+            distributions,
+            args.workers,
+            args.ops,
+            args.repeats,
+            args.warmups,
+            args.seed,
+            args.gc,
+            args.checkpoint,
+        )
+    except ValueError as error:
+        parser.error(str(error))
+    except KeyboardInterrupt:
+        sys.exit(130)
+    save(run, args.output)
+    if args.checkpoint:
+        os.remove(args.checkpoint)  # Everything is in the output now
+    print(f"\nResults written to {args.output}")
+
+    if args.plot:
+        from analysis.complexity_analysis import BPlusTreeComplexityAnalysis
+
+        analyzer = BPlusTreeComplexityAnalysis()
+        analyzer.load_results(run, order=args.orders[0], distribution=distributions[0])
+        analyzer.plot_complexity_analysis()
+        analyzer.plot_theoretical_vs_actual()
+
+
+if __name__ == "__main__":
+    main()
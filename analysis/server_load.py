@@ -0,0 +1,170 @@
+"""
+Load generator for the filesystem server (vfs_server.py)
+
+Starts a server in a subprocess (or uses a running one with --socket), fills it
+with directories and files, then runs concurrent sessions through one pooled
+asyncio client for a fixed duration. Every session sends its commands in batches
+of --pipeline commands (1 = one round trip per command), reading files, listing
+directories and, for --writes percent of them, overwriting files. Reports the
+requests per second and the latency of the batches for every pipeline depth.
+
+Run it with:
+    python3 -m analysis.server_load
+    python3 -m analysis.server_load --sessions 32 --pipeline 1,16,64 --duration 5
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from percentiles import percentile
+from vfs_client import ClientPool
+
+DIRS = 20
+FILES_PER_DIR = 50
+
+
+def commands(rng, write_ratio):
+    """An endless mix of reads (cat, ls, cd) and writes (echo > file)"""
+    while True:
+        directory = f"/load/d{rng.randrange(DIRS)}"
+        file = f"{directory}/f{rng.randrange(FILES_PER_DIR)}.txt"
+        if rng.random() < write_ratio:
+            yield f"echo {rng.random():.6f} > {file}"
+        else:
+            yield rng.choice([f"cat {file}", f"ls {directory}", f"cd {directory}"])
+
+
+async def fill(pool):
+    session = await pool.session()
+    cmds = ["mkdir /load"]
+    for d in range(DIRS):
+        cmds.append(f"mkdir /load/d{d}")
+        for f in range(FILES_PER_DIR):
+            cmds.append(f"echo file {d} {f} > /load/d{d}/f{f}.txt")
+    await session.run_many(cmds)
+    await session.close()
+
+
+async def run_session(pool, depth, write_ratio, deadline, seed, latencies):
+    """One session sending batches until the deadline. Returns its request count"""
+    session = await pool.session()
+    stream = commands(random.Random(seed), write_ratio)
+    count = 0
+    clock = time.perf_counter
+    while clock() < deadline:
+        batch = [next(stream) for _ in range(depth)]
+        start = clock()
+        await session.run_many(batch)
+        latencies.append(clock() - start)
+        count += depth
+    await session.close()
+    return count
+
+
+async def measure(path, sessions, depth, write_ratio, duration, connections):
+    latencies = []
+    async with ClientPool(path, connections) as pool:
+        deadline = time.perf_counter() + duration
+        start = time.perf_counter()
+        counts = await asyncio.gather(
+            *(
+                run_session(pool, depth, write_ratio, deadline, seed, latencies)
+                for seed in range(sessions)
+            )
+        )
+        elapsed = time.perf_counter() - start
+    return sum(counts), elapsed, sorted(latencies)
+
+
+async def prepare(path):
+    async with ClientPool(path, 1) as pool:
+        await fill(pool)
+
+
+def start_server(path, threads):
+    process = subprocess.Popen(
+        [sys.executable, "vfs_server.py", "--socket", path, "--order", "32"]
+        + ["--threads", str(threads)],
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while not os.path.exists(path):
+        if process.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("The server didn't start")
+        time.sleep(0.05)
+    return process
+
+
+def run_load(
+    socket=None,
+    sessions=16,
+    pipeline=(1, 8, 32),
+    write_ratio=0.1,
+    duration=3.0,
+    connections=4,
+    threads=4,
+):
+    own = socket is None
+    if own:
+        socket = os.path.join(tempfile.mkdtemp(), "vfs.sock")
+        server = start_server(socket, threads)
+    results = []
+    try:
+        asyncio.run(prepare(socket))
+        print(
+            f"{sessions} sessions over {connections} connections, "
+            f"{write_ratio:.0%} writes, {duration:g} s per run, {os.cpu_count()} CPUs\n"
+        )
+        print(
+            f"{'Pipeline':<10}{'Requests':>10}{'Req/s':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}"
+        )
+        print("-" * 50)
+        for depth in pipeline:
+            count, elapsed, latencies = asyncio.run(
+                measure(socket, sessions, depth, write_ratio, duration, connections)
+            )
+            p50 = percentile(latencies, 50) * 1000
+            p99 = percentile(latencies, 99) * 1000
+            print(
+                f"{depth:<10}{count:>10,}{count / elapsed:>10,.0f}{p50:>10.2f}{p99:>10.2f}"
+            )
+            results.append((depth, count, count / elapsed))
+    finally:
+        if own:
+            server.terminate()
+            server.wait()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load the filesystem server")
+    parser.add_argument("--socket", help="a running server (default: start one)")
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument(
+        "--pipeline",
+        default="1,8,32",
+        help="comma-separated commands per batch (1: no pipelining)",
+    )
+    parser.add_argument("--writes", type=float, default=10, help="percent of writes")
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per run")
+    parser.add_argument("--connections", type=int, default=4, help="client pool size")
+    parser.add_argument("--threads", type=int, default=4, help="server threads")
+    args = parser.parse_args(argv)
+    run_load(
+        args.socket,
+        args.sessions,
+        [int(depth) for depth in args.pipeline.split(",")],
+        args.writes / 100,
+        args.duration,
+        args.connections,
+        args.threads,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Sharded B+ tree benchmark
+
+Loads the same random keys into a ShardedBPlusTree (sharded_tree.py) allowed 1, 2,
+4 and 8 shards, letting it split its shards as it grows, then measures the
+throughput of batched lookups (get_many) and batched overwrites (insert_many).
+The first row is a local BPlusTree doing the same work one call at a time.
+Batches are what let the shards work at the same time: the throughput can only
+grow with the number of shards up to the number of CPUs.
+
+Run it with:
+    python3 -m analysis.shard_benchmark
+    python3 -m analysis.shard_benchmark --entries 1e6 --shards 1,2,4,8,16 --batch 2000
+"""
+
+import argparse
+import os
+import random
+import time
+from analysis.benchmark import size_list
+from bplus_tree import BPlusTree
+from sharded_tree import ShardedBPlusTree
+
+
+def batches(values, size):
+    return [values[i : i + size] for i in range(0, len(values), size)]
+
+
+class LocalTree:
+    """A BPlusTree with the batch interface, for the baseline"""
+
+    def __init__(self, order):
+        self.tree = BPlusTree(order)
+
+    def insert_many(self, items):
+        for key, value in items:
+            self.tree.insert(key, value)
+
+    def get_many(self, keys):
+        return [self.tree.search_value(key) for key in keys]
+
+
+def timed(func, batches):
+    """Operations per second of func over every batch"""
+    start = time.perf_counter()
+    for batch in batches:
+        func(batch)
+    return sum(len(batch) for batch in batches) / (time.perf_counter() - start)
+
+
+def measure(tree, keys, lookups, batch_size, seed):
+    """(load seconds, lookups/s, overwrites/s) of a tree with the batch interface"""
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for batch in batches([(key, key) for key in keys], batch_size):
+        tree.insert_many(batch)
+    load = time.perf_counter() - start
+    reads = batches([rng.choice(keys) for _ in range(lookups)], batch_size)
+    writes = batches([(rng.choice(keys), 0) for _ in range(lookups)], batch_size)
+    return load, timed(tree.get_many, reads), timed(tree.insert_many, writes)
+
+
+def run_shard_benchmark(
+    entries=200_000, shards=(1, 2, 4, 8), lookups=200_000, batch_size=1_000, order=64
+):
+    keys = list(range(entries))
+    random.Random(0).shuffle(keys)
+    print(
+        f"{entries:,} keys, {lookups:,} lookups and overwrites in batches of "
+        f"{batch_size:,}, order {order}, {os.cpu_count()} CPUs\n"
+    )
+    print(
+        f"{'Shards':<8}{'Load (s)':>10}{'Lookups/s':>12}{'Writes/s':>12}"
+        f"{'Speedup':>9}{'Shard sizes':>22}"
+    )
+    print("-" * 73)
+    load, reads, writes = measure(LocalTree(order), keys, lookups, batch_size, 1)
+    print(f"{'local':<8}{load:>10.2f}{reads:>12,.0f}{writes:>12,.0f}")
+
+    baseline = None
+    results = []
+    for count in shards:
+        window = max(entries // (4 * count), 1_000)  # Enough windows to split
+        with ShardedBPlusTree(order, max_shards=count, window=window) as tree:
+            load, reads, writes = measure(tree, keys, lookups, batch_size, 1)
+            sizes = [shard["entries"] for shard in tree.stats()]
+        baseline = baseline or reads
+        results.append((count, len(sizes), load, reads, writes))
+        print(
+            f"{count:<8}{load:>10.2f}{reads:>12,.0f}{writes:>12,.0f}"
+            f"{reads / baseline:>8.2f}x"
+            f"{f'{len(sizes)}: {min(sizes):,}-{max(sizes):,}':>22}"
+        )
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sharded B+ tree throughput")
+    parser.add_argument("--entries", type=lambda text: size_list(text)[0])
+    parser.add_argument("--shards", type=size_list, default=[1, 2, 4, 8])
+    parser.add_argument("--lookups", type=lambda text: size_list(text)[0])
+    parser.add_argument("--batch", type=int, default=1_000)
+    parser.add_argument("--order", type=int, default=64)
+    args = parser.parse_args(argv)
+    run_shard_benchmark(
+        args.entries or 200_000,
+        args.shards,
+        args.lookups or 200_000,
+        args.batch,
+        args.order,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Startup (import time) benchmark for the entry points
+
+Imports each entry point in a fresh interpreter with "python -X importtime",
+and checks the result against an import-time budget:
+- the total import time of the entry point (median of several runs) must stay
+  under its budget, and under baseline * (1 + threshold) when a baseline is given;
+- heavy modules that an entry point only needs on demand (Textual, matplotlib,
+  numpy, multiprocessing) must not be imported at all.
+The interpreter's own startup imports (site, encodings...) are not counted.
+
+Run it with:
+    python3 -m analysis.startup_benchmark
+    python3 -m analysis.startup_benchmark --save startup.json
+    python3 -m analysis.startup_benchmark --baseline startup.json --threshold 0.2
+It exits with status 1 when an entry point is over its budget.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY = ["textual", "matplotlib", "numpy", "multiprocessing", "concurrent.futures"]
+
+# module -> (budget in ms, modules it must not import)
+ENTRY_POINTS = {
+    "shell": (60, LAZY),
+    "commands": (40, LAZY),
+    "tui": (600, ["matplotlib", "numpy", "multiprocessing"]),
+    "analysis.complexity_analysis": (40, LAZY),
+    "filesystem_visualization.filesystem_visualization": (60, LAZY),
+}
+
+
+def import_times(code):
+    """
+    Run code in a fresh interpreter with -X importtime.
+    Returns {module: (self_us, cumulative_us, depth)} for every module it imported.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2  # " name" is top-level
+        times[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return times
+
+
+def imported_modules(module):
+    """Modules imported by "import module", without the interpreter startup ones"""
+    startup = import_times("pass")
+    return {
+        name: timing
+        for name, timing in import_times(f"import {module}").items()
+        if name not in startup
+    }
+
+
+def total_ms(modules):
+    """Import time of the top-level imports (the nested ones are already included)"""
+    return sum(cum for _, cum, depth in modules.values() if depth == 0) / 1000
+
+
+def forbidden_imports(modules, forbidden):
+    return sorted(
+        name
+        for name in modules
+        if any(name == f or name.startswith(f + ".") for f in forbidden)
+    )
+
+
+def measure(module, runs):
+    """Median import time in ms, and the modules imported by the last run"""
+    samples = []
+    for _ in range(runs):
+        modules = imported_modules(module)
+        samples.append(total_ms(modules))
+    return statistics.median(samples), modules
+
+
+def run_startup_benchmark(runs=5, baseline=None, threshold=0.2, save=None):
+    previous = {}
+    if baseline:
+        with open(baseline) as f:
+            previous = json.load(f)["entry_points"]
+
+    print(f"{'Entry point':<52}{'Import (ms)':>12}{'Budget':>8}{'Baseline':>10}")
+    print("-" * 82)
+    results = {}
+    failures = []
+    for module, (budget, forbidden) in ENTRY_POINTS.items():
+        elapsed, modules = measure(module, runs)
+        results[module] = elapsed
+        base = previous.get(module)
+        print(
+            f"{module:<52}{elapsed:>12.1f}{budget:>8}"
+            f"{'-' if base is None else f'{base:.1f}':>10}"
+        )
+
+        if elapsed > budget:
+            failures.append(
+                f"{module}: {elapsed:.1f} ms is over the {budget} ms budget"
+            )
+        if base is not None and elapsed > base * (1 + threshold):
+            failures.append(
+                f"{module}: {elapsed:.1f} ms is {elapsed / base - 1:.0%} slower "
+                f"than the baseline ({base:.1f} ms)"
+            )
+        heavy = forbidden_imports(modules, forbidden)
+        if heavy:
+            failures.append(f"{module}: imports {', '.join(heavy[:5])} at startup")
+
+        # The slowest imports are where to look when the budget is exceeded
+        slowest = sorted(modules.items(), key=lambda item: -item[1][0])[:3]
+        print(
+            "    slowest: "
+            + ", ".join(
+                f"{name} {self_us / 1000:.1f}" for name, (self_us, _, _) in slowest
+            )
+        )
+
+    if save:
+        with open(save, "w") as f:
+            json.dump({"python": sys.version, "entry_points": results}, f, indent=2)
+
+    print()
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if not failures:
+        print("All entry points are within their import-time budget")
+    return not failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--runs", type=int, default=5, help="runs per entry point")
+    parser.add_argument("--baseline", metavar="FILE", help="JSON saved with --save")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="allowed slowdown over the baseline (0.2 = 20%%)",
+    )
+    parser.add_argument("--save", metavar="FILE", help="save the results as JSON")
+    args = parser.parse_args(argv)
+    ok = run_startup_benchmark(args.runs, args.baseline, args.threshold, args.save)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
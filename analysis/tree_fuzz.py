@@ -0,0 +1,406 @@
+"""
+Differential fuzzing of the B+ tree
+
+Runs long random sequences of insert/delete/search/range_query operations on
+BPlusTree and on a reference sorted map (two lists kept sorted with bisect), and
+fails on the first operation where they disagree. Every check_every operations,
+and at the end, the whole tree is compared with the reference and its structure
+is checked:
+- every leaf is at the same depth;
+- the keys of every node are sorted, and the keys of every subtree are between
+  the separators around it in the parent;
+- every node but the root holds between the minimum and m - 1 keys, an internal
+  node has one child more than keys, and the parent pointers are right;
+- the leaves are linked in key order both ways (next_leaf / prev_leaf).
+
+The operations alternate between growing and shrinking phases over a bounded key
+range, so the tree keeps splitting, borrowing and merging at every level. Each
+(seed, order) runs in its own process, and a failing sequence is shrunk (delta
+debugging: chunks of operations are removed while it still fails) to a short
+reproducer, printed as Python code.
+
+Run it with:
+    python3 -m analysis.tree_fuzz
+    python3 -m analysis.tree_fuzz --seeds 0-63 --orders 3,4,5,8,32,128 --ops 1e6 --check-every 10000
+It exits with status 1 when a seed fails.
+"""
+
+import argparse
+import os
+import random
+import signal
+import sys
+import time
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from analysis.benchmark import size_list
+from bplus_tree import BPlusTree, InternalNode, LeafNode
+
+DEFAULT_ORDERS = [3, 4, 5, 8, 16, 64]
+PHASE_OPS = 2_000  # Operations between a growing and a shrinking phase
+# (insert, delete, search, range) weights of the phases
+GROWING = (50, 20, 20, 10)
+SHRINKING = (15, 55, 20, 10)
+OPS = ("insert", "delete", "search", "range")
+
+
+class InvariantError(Exception):
+    """The tree disagrees with the reference, or its structure is broken"""
+
+
+class SortedMap:
+    """Reference model: sorted keys and their values, searched with bisect"""
+
+    def __init__(self):
+        self.keys = []
+        self.values = []
+
+    def insert(self, key, value):
+        idx = bisect_left(self.keys, key)
+        if idx < len(self.keys) and self.keys[idx] == key:
+            self.values[idx] = value
+        else:
+            self.keys.insert(idx, key)
+            self.values.insert(idx, value)
+
+    def delete(self, key):
+        idx = bisect_left(self.keys, key)
+        if idx < len(self.keys) and self.keys[idx] == key:
+            del self.keys[idx]
+            del self.values[idx]
+
+    def search_value(self, key):
+        idx = bisect_left(self.keys, key)
+        if idx < len(self.keys) and self.keys[idx] == key:
+            return self.values[idx]
+        return None
+
+    def range_query(self, start, end):
+        low, high = bisect_left(self.keys, start), bisect_right(self.keys, end)
+        return list(zip(self.keys[low:high], self.values[low:high]))
+
+    def items(self):
+        return list(zip(self.keys, self.values))
+
+
+def operations(seed, count, key_range):
+    """The operation sequence of a seed: ("insert", k, v), ("delete", k)..."""
+    rng = random.Random(seed)
+    for index in range(count):
+        weights = GROWING if index // PHASE_OPS % 2 == 0 else SHRINKING
+        op = rng.choices(OPS, weights)[0]
+        key = rng.randrange(key_range)
+        if op == "insert":
+            yield ("insert", key, index)
+        elif op == "range":
+            yield ("range", key, key + rng.randrange(key_range // 10 + 1))
+        else:
+            yield (op, key)
+
+
+def apply(tree, reference, op):
+    """Run one operation on both, raising InvariantError if the results differ"""
+    if op[0] == "insert":
+        tree.insert(op[1], op[2])
+        reference.insert(op[1], op[2])
+    elif op[0] == "delete":
+        tree.delete(op[1])
+        reference.delete(op[1])
+    elif op[0] == "search":
+        found, expected = tree.search_value(op[1]), reference.search_value(op[1])
+        if found != expected:
+            raise InvariantError(f"search({op[1]}) returned {found}, not {expected}")
+    else:
+        found, expected = tree.range_query(op[1], op[2]), reference.range_query(
+            op[1], op[2]
+        )
+        if found != expected:
+            raise InvariantError(
+                f"range_query({op[1]}, {op[2]}) returned {len(found)} pairs, "
+                f"not {len(expected)}"
+            )
+
+
+def check_invariants(tree, reference=None):
+    """Check the structure of the tree (and its content against the reference)"""
+    leaves = []
+    leaf_depths = set()
+    # (node, depth, lower bound, upper bound): the keys must be in [lower, upper)
+    stack = [(tree.root, 0, None, None)]
+    while stack:
+        node, depth, lower, upper = stack.pop()
+        keys = node.keys
+        if any(a >= b for a, b in zip(keys, keys[1:])):
+            raise InvariantError(f"Keys out of order in a node: {keys}")
+        if keys and (
+            (lower is not None and keys[0] < lower)
+            or (upper is not None and keys[-1] >= upper)
+        ):
+            raise InvariantError(f"Keys {keys} outside of [{lower}, {upper})")
+        if len(keys) > tree.m - 1:
+            raise InvariantError(f"Overfull node: {len(keys)} keys")
+        if node is not tree.root and len(keys) < tree.minimum_keys(node):
+            raise InvariantError(f"Underfull node: {len(keys)} keys")
+
+        if isinstance(node, LeafNode):
+            if len(node.values) != len(keys):
+                raise InvariantError("A leaf without as many values as keys")
+            leaves.append(node)
+            leaf_depths.add(depth)
+            continue
+        if not isinstance(node, InternalNode):
+            raise InvariantError(f"Unknown node type: {type(node).__name__}")
+        if len(node.children) != len(keys) + 1:
+            raise InvariantError(
+                f"Internal node with {len(keys)} keys and {len(node.children)} children"
+            )
+        if node is tree.root and not keys:
+            raise InvariantError("Internal root without keys")
+        bounds = [lower, *keys, upper]
+        for i, child in enumerate(node.children):
+            if child.parent is not node:
+                raise InvariantError("Wrong parent pointer")
+            stack.append((child, depth + 1, bounds[i], bounds[i + 1]))
+
+    if len(leaf_depths) != 1:
+        raise InvariantError(f"Leaves at different depths: {sorted(leaf_depths)}")
+    if tree.root.parent is not None:
+        raise InvariantError("The root has a parent")
+
+    # The stack visits the rightmost children first: sort the leaves by position
+    leaves.reverse()
+    previous = None
+    for leaf in leaves:
+        if leaf.prev_leaf is not previous:
+            raise InvariantError("Broken prev_leaf link")
+        if previous is not None and previous.next_leaf is not leaf:
+            raise InvariantError("Broken next_leaf link")
+        previous = leaf
+    if previous.next_leaf is not None:
+        raise InvariantError("The last leaf has a next_leaf")
+
+    if reference is not None and list(tree.items()) != reference.items():
+        raise InvariantError(
+            f"The tree holds {sum(1 for _ in tree.items())} entries, "
+            f"the reference {len(reference.keys)}"
+        )
+
+
+def replay(ops, order, check_every=1, tree_class=BPlusTree):
+    """
+    Run the operations on a new tree and the reference. Returns None, or
+    (index of the failing operation, message)
+    """
+    tree = tree_class(order)
+    reference = SortedMap()
+    index = -1
+    try:
+        for index, op in enumerate(ops):
+            apply(tree, reference, op)
+            if check_every and (index + 1) % check_every == 0:
+                check_invariants(tree, reference)
+        check_invariants(tree, reference)
+    except Exception as error:  # A crash of the tree is a failure too
+        message = str(error) or type(error).__name__
+        if not isinstance(error, InvariantError):
+            message = f"{type(error).__name__}: {message}"
+        return max(index, 0), message
+    return None
+
+
+def shrink(ops, order, tree_class=BPlusTree):
+    """
+    Shortest failing subsequence found by removing chunks of operations, from
+    halves down to single operations (ddmin). Every candidate is fully checked
+    after each operation.
+    """
+    failure = replay(ops, order, 1, tree_class)
+    if failure is None:
+        return ops
+    ops = ops[: failure[0] + 1]
+    chunk = len(ops) // 2
+    while chunk >= 1:
+        start = 0
+        while start < len(ops):
+            candidate = ops[:start] + ops[start + chunk :]
+            failure = replay(candidate, order, 1, tree_class)
+            if candidate and failure is not None:
+                ops = candidate[: failure[0] + 1]
+            else:
+                start += chunk
+        chunk //= 2
+    return ops
+
+
+def reproducer(ops, order, failure=""):
+    """Python code replaying the operations, then checking the tree"""
+    lines = [
+        "from analysis.tree_fuzz import check_invariants",
+        "from bplus_tree import BPlusTree",
+        f"tree = BPlusTree({order})",
+    ]
+    for op in ops:
+        if op[0] == "insert":
+            lines.append(f"tree.insert({op[1]!r}, {op[2]!r})")
+        elif op[0] == "delete":
+            lines.append(f"tree.delete({op[1]!r})")
+        elif op[0] == "search":
+            lines.append(f"tree.search_value({op[1]!r})")
+        else:
+            lines.append(f"tree.range_query({op[1]!r}, {op[2]!r})")
+    lines.append(
+        f"check_invariants(tree)  # {failure}" if failure else "check_invariants(tree)"
+    )
+    return "\n".join(lines)
+
+
+def run_seed(seed, order, ops, check_every, key_range, tree_class=BPlusTree):
+    """
+    Worker: fuzz one (seed, order). Returns its result, with the shrunk reproducer
+    when it failed. The time of the invariant checks is counted apart.
+    """
+    tree = tree_class(order)
+    reference = SortedMap()
+    clock = time.perf_counter
+    checking = 0.0
+    start = clock()
+    done = 0
+    failure = None
+    try:
+        for op in operations(seed, ops, key_range):
+            apply(tree, reference, op)
+            done += 1
+            if check_every and done % check_every == 0:
+                check_start = clock()
+                check_invariants(tree, reference)
+                checking += clock() - check_start
+        check_start = clock()
+        check_invariants(tree, reference)
+        checking += clock() - check_start
+    except Exception as error:
+        failure = str(error) or type(error).__name__
+    elapsed = clock() - start
+
+    result = {
+        "seed": seed,
+        "order": order,
+        "ops": done,
+        "entries": len(reference.keys),
+        "elapsed_s": elapsed,
+        "check_s": checking,
+        "ops_per_s": done / (elapsed - checking) if elapsed > checking else None,
+        "failure": failure,
+    }
+    if failure is not None:
+        # The operations up to the first failing check, then shrunk
+        failing = list(operations(seed, done + 1, key_range))
+        shrunk = shrink(failing, order, tree_class)
+        result["reproducer"] = reproducer(shrunk, order, failure)
+        result["reproducer_ops"] = len(shrunk)
+    return result
+
+
+def ignore_interrupts():
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def run_fuzz(
+    seeds,
+    orders=DEFAULT_ORDERS,
+    ops=100_000,
+    check_every=1_000,
+    key_range=10_000,
+    workers=None,
+    log=print,
+):
+    """Fuzz every (seed, order) in a pool of processes. Returns the results"""
+    cells = [(seed, order) for seed in seeds for order in orders]
+    results = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        workers or os.cpu_count() or 1, initializer=ignore_interrupts
+    ) as pool:
+        futures = [
+            pool.submit(run_seed, seed, order, ops, check_every, key_range)
+            for seed, order in cells
+        ]
+        try:
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                status = "FAILED" if result["failure"] else "ok"
+                log(
+                    f"[{len(results)}/{len(cells)}] seed {result['seed']:<6}"
+                    f"order {result['order']:<5}{result['ops']:>12,} ops"
+                    f"{result['ops_per_s'] or 0:>12,.0f} ops/s  {status}"
+                )
+        except KeyboardInterrupt:
+            for future in futures:
+                future.cancel()
+            raise
+    elapsed = time.perf_counter() - start
+    total = sum(result["ops"] for result in results)
+    log(
+        f"\n{total:,} operations in {elapsed:.1f} s: {total / elapsed:,.0f} ops/s "
+        f"over {workers or os.cpu_count() or 1} processes, "
+        f"{sum(1 for r in results if r['failure'])} failed seed(s)"
+    )
+    return sorted(results, key=lambda result: (result["seed"], result["order"]))
+
+
+def seed_list(text):
+    """ "0-63" or "1,5,9" """
+    seeds = []
+    for part in text.split(","):
+        first, _, last = part.partition("-")
+        seeds.extend(range(int(first), int(last or first) + 1))
+    return seeds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Differential fuzzing of the B+ tree")
+    parser.add_argument("--seeds", type=seed_list, default=seed_list("0-7"))
+    parser.add_argument(
+        "--orders", type=size_list, default=DEFAULT_ORDERS, help="tree orders"
+    )
+    parser.add_argument(
+        "--ops", type=size_list, default=[100_000], help="operations per seed (1e6)"
+    )
+    parser.add_argument(
+        "--check-every",
+        type=int,
+        default=1_000,
+        help="operations between full checks (0: only at the end)",
+    )
+    parser.add_argument("--key-range", type=int, default=10_000)
+    parser.add_argument(
+        "--workers", type=int, default=None, help="default: one per CPU"
+    )
+    args = parser.parse_args(argv)
+    if any(order < 3 for order in args.orders):
+        parser.error("the order of a B+ tree is at least 3")
+
+    try:
+        results = run_fuzz(
+            args.seeds,
+            args.orders,
+            args.ops[0],
+            args.check_every,
+            args.key_range,
+            args.workers,
+        )
+    except KeyboardInterrupt:
+        sys.exit(130)
+    failures = [result for result in results if result["failure"]]
+    for result in failures:
+        print(
+            f"\nseed {result['seed']}, order {result['order']}: {result['failure']}"
+            f"\nShrunk to {result['reproducer_ops']} operations:\n"
+            f"{result['reproducer']}"
+        )
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+Filesystem workload generator and trace replayer
+
+The other benchmarks time raw tree operations; this one times the shell commands
+on realistic traffic, so changes to commands.py can be measured.
+
+generate
+    Writes a synthetic trace: first the commands building a hierarchy (fan-out
+    subdirectories per directory, depth levels, file-ratio files per directory on
+    average), then a "# measure" line, then random traffic following a command
+    mix (ls=25,cd=15,...). The traffic only uses paths that exist at that point
+    of the trace, so every command does real work.
+
+replay
+    Replays a trace (generated, or recorded with python3 shell.py --record) on a
+    fresh filesystem, repeats times. The commands before "# measure" build the
+    filesystem and aren't timed. Reports the latency distribution of every
+    command and saves it in the format of the benchmark harness (the operation is
+    "vfs:<command>"), so two replays can be compared with
+    python3 -m analysis.compare_benchmarks compare before.json after.json
+
+Run it with:
+    python3 -m analysis.vfs_workload generate --depth 5 --fan-out 4 --commands 20000
+    python3 -m analysis.vfs_workload replay analysis/vfs_trace.txt --order 64 --output after.json
+"""
+
+import argparse
+import os
+import random
+import sys
+from analysis.benchmark import machine_metadata, save, summarize
+from commands import VirtualFileSystem
+from layouts import LAYOUTS
+from replay import report_commands, run_script
+
+MEASURE = "# measure"
+DEFAULT_MIX = {
+    "ls": 25,
+    "cd": 15,
+    "cat": 20,
+    "touch": 12,
+    "mkdir": 3,
+    "rm": 8,
+    "echo": 7,
+    "mv": 5,
+    "find": 5,
+}
+
+
+class Picker:
+    """List with O(1) random choice, append and removal (swap with the last item)"""
+
+    def __init__(self):
+        self.items = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, item):
+        self.positions[item] = len(self.items)
+        self.items.append(item)
+
+    def remove(self, item):
+        idx = self.positions.pop(item)
+        last = self.items.pop()
+        if idx < len(self.items):
+            self.items[idx] = last
+            self.positions[last] = idx
+
+    def choice(self, rng):
+        return self.items[rng.randrange(len(self.items))]
+
+
+class WorkloadGenerator:
+    def __init__(self, fan_out=4, depth=4, file_ratio=8.0, seed=0):
+        self.fan_out = fan_out
+        self.depth = depth
+        self.file_ratio = file_ratio
+        self.rng = random.Random(seed)
+        self.dirs = Picker()
+        self.files = Picker()
+        self.created = 0  # Counter for the names of new entries
+
+    def new_files(self, directory):
+        """Files of a new directory: file_ratio on average"""
+        count = int(self.file_ratio)
+        if self.rng.random() < self.file_ratio - count:
+            count += 1
+        base = "" if directory == "/" else directory
+        for i in range(count):
+            path = f"{base}/file_{i:03d}.txt"
+            self.files.add(path)
+            yield f"touch {path}"
+
+    def build(self):
+        """Command lines creating the hierarchy, parents before children"""
+        level = ["/"]
+        yield from self.new_files("/")
+        for depth in range(1, self.depth + 1):
+            below = []
+            for parent in level:
+                base = "" if parent == "/" else parent
+                for i in range(self.fan_out):
+                    path = f"{base}/dir{depth}_{i:02d}"
+                    self.dirs.add(path)
+                    below.append(path)
+                    yield f"mkdir {path}"
+                    yield from self.new_files(path)
+            level = below
+
+    def new_name(self, prefix):
+        self.created += 1
+        return f"{prefix}_{self.created:06d}"
+
+    def command(self, op):
+        """One command line of the traffic, or None if the op can't run right now"""
+        rng = self.rng
+        if op in ("cat", "echo", "rm", "mv") and not self.files:
+            return None
+        if op in ("cd", "find") and not self.dirs:
+            return None
+
+        if op == "ls":
+            return "ls" if rng.random() < 0.3 else f"ls {self.any_dir()}"
+        if op == "cd":
+            return f"cd {self.dirs.choice(rng)}"
+        if op == "cat":
+            return f"cat {self.files.choice(rng)}"
+        if op == "echo":
+            redirect = ">>" if rng.random() < 0.5 else ">"
+            return f"echo {self.new_name('line')} {redirect} {self.files.choice(rng)}"
+        if op == "touch":
+            path = f"{self.any_dir().rstrip('/')}/{self.new_name('new')}.txt"
+            self.files.add(path)
+            return f"touch {path}"
+        if op == "mkdir":
+            path = f"{self.any_dir().rstrip('/')}/{self.new_name('dir')}"
+            self.dirs.add(path)
+            return f"mkdir {path}"
+        if op == "rm":
+            path = self.files.choice(rng)
+            self.files.remove(path)
+            return f"rm {path}"
+        if op == "mv":
+            path = self.files.choice(rng)
+            target = f"{path.rsplit('/', 1)[0]}/{self.new_name('moved')}.txt"
+            self.files.remove(path)
+            self.files.add(target)
+            return f"mv {path} {target}"
+        if op == "find":
+            return f"find {self.dirs.choice(rng)} -name *.txt"
+        raise ValueError(f"Unknown command in the mix: {op}")
+
+    def any_dir(self):
+        return self.dirs.choice(self.rng) if self.dirs else "/"
+
+    def traffic(self, count, mix=DEFAULT_MIX):
+        """count command lines drawn from the mix (command -> weight)"""
+        ops = list(mix)
+        weights = [mix[op] for op in ops]
+        produced = 0
+        while produced < count:
+            line = self.command(self.rng.choices(ops, weights)[0])
+            if line is not None:
+                produced += 1
+                yield line
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        op, _, weight = part.partition("=")
+        if op not in DEFAULT_MIX or not weight.isdigit():
+            raise ValueError(f"Invalid mix entry: {part}")
+        mix[op] = int(weight)
+    if not any(mix.values()):
+        raise ValueError("The mix has no command")
+    return mix
+
+
+def write_trace(path, generator, commands, mix=DEFAULT_MIX):
+    with open(path, "w") as f:
+        f.write(
+            f"# Synthetic workload: fan-out {generator.fan_out}, depth {generator.depth},"
+            f" {generator.file_ratio:g} files per directory\n"
+        )
+        for line in generator.build():
+            f.write(line + "\n")
+        f.write(MEASURE + "\n")
+        for line in generator.traffic(commands, mix):
+            f.write(line + "\n")
+
+
+def split_trace(lines):
+    """(setup, measured) command lines; everything is measured without a marker"""
+    lines = [line.rstrip("\n") for line in lines]
+    if MEASURE in lines:
+        idx = lines.index(MEASURE)
+        return lines[:idx], lines[idx + 1 :]
+    return [], lines
+
+
+def replay(
+    trace, order=4, layout="path", indexes=True, repeats=3, by_command=None, log=print
+):
+    """
+    Replay the trace repeats times on fresh filesystems.
+    Returns the run in the format of the benchmark harness, one record per command.
+    The latencies of every repeat are added to the by_command dict if given.
+    """
+    with open(trace) as f:
+        setup, measured = split_trace(f)
+
+    latencies = {} if by_command is None else by_command
+    repeat_means = {}
+    for repeat in range(repeats):
+        vfs = VirtualFileSystem(order=order, layout=layout, indexes=indexes)
+        try:
+            run_script(vfs, setup)
+            entries = sum(1 for _ in vfs.tree.items())
+            current = {}
+            run_script(vfs, measured, by_command=current)
+        finally:
+            vfs.searcher.close()
+        for op, values in current.items():
+            latencies.setdefault(op, []).extend(values)
+            repeat_means.setdefault(op, []).append(sum(values) / len(values))
+        log(
+            f"Repeat {repeat + 1}/{repeats}: {sum(map(len, current.values())):,} "
+            f"commands on {entries:,} entries"
+        )
+
+    results = []
+    for op, values in sorted(latencies.items(), key=lambda item: -len(item[1])):
+        result = {
+            "operation": f"vfs:{op}",
+            "distribution": os.path.basename(trace),
+            "size": entries,
+            "order": order,
+            "ops": len(values) // repeats,
+            "repeats": repeats,
+        }
+        result.update(summarize(values))
+        result["repeat_means_ns"] = repeat_means[op]
+        result["ops_per_s"] = 1e9 / (sum(values) / len(values))
+        results.append(result)
+    settings = {"layout": layout, "indexes": indexes, "repeats": repeats}
+    return {"metadata": machine_metadata(), "settings": settings, "results": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Filesystem workload traces")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="write a synthetic trace")
+    generate.add_argument("--fan-out", type=int, default=4)
+    generate.add_argument("--depth", type=int, default=4)
+    generate.add_argument(
+        "--file-ratio", type=float, default=8.0, help="files per directory"
+    )
+    generate.add_argument(
+        "--commands", type=int, default=10_000, help="commands of traffic"
+    )
+    generate.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=DEFAULT_MIX,
+        help="command weights, like ls=25,cd=15,cat=20,touch=12",
+    )
+    generate.add_argument("--seed", type=int, default=0)
+    generate.add_argument("--output", default="analysis/vfs_trace.txt")
+
+    replayer = commands.add_parser("replay", help="replay a trace")
+    replayer.add_argument("trace")
+    replayer.add_argument("--order", type=int, default=4)
+    replayer.add_argument("--layout", choices=sorted(LAYOUTS), default="path")
+    replayer.add_argument("--no-indexes", action="store_true")
+    replayer.add_argument("--repeats", type=int, default=3)
+    replayer.add_argument("--output", help="save the results as JSON")
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        generator = WorkloadGenerator(
+            args.fan_out, args.depth, args.file_ratio, args.seed
+        )
+        write_trace(args.output, generator, args.commands, args.mix)
+        print(
+            f"{len(generator.dirs):,} directories, {len(generator.files):,} files "
+            f"at the end, trace written to {args.output}"
+        )
+        return
+
+    by_command = {}
+    try:
+        run = replay(
+            args.trace,
+            args.order,
+            args.layout,
+            not args.no_indexes,
+            args.repeats,
+            by_command,
+        )
+    except OSError as error:
+        parser.error(str(error))
+    report_commands(by_command, sys.stdout)
+    if args.output:
+        save(run, args.output)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# asyncio facade over a BPlusTree, for code running on an event loop (the Textual
+# shell, vfs_server.py, services built on vfs_client.py)
+# A tree operation is plain CPU work that never gives the loop a chance to run, so:
+#   - scans are async generators: they read leaves_per_yield leaves, give the event
+#     loop a turn, then carry on from the last key read with a new descent, so the
+#     tree may change between two chunks without breaking the scan;
+#   - the heavy operations (load of many entries, compact) run in an executor
+#     thread, and the other operations wait for them on an asyncio.Lock;
+#   - get() calls made during the same turn of the loop are coalesced into one
+#     BPlusTree.search_values call, which looks the keys up in sorted order and
+#     reuses the leaf of the previous key instead of descending again.
+# Point inserts and deletes are cheaper than a trip to a thread, they run inline.
+# The tree must only be changed through the facade while it is in use.
+
+import asyncio
+from bplus_tree import InternalNode
+
+LEAVES_PER_YIELD = 64
+
+
+class Coalescer:
+    """
+    Calls made during one turn of the event loop, resolved together:
+        lookup = Coalescer(lock, lambda keys: [...one result per key...])
+        value = await lookup(key)
+    resolve runs (under lock) once for the whole batch, in the next turn.
+    """
+
+    def __init__(self, lock, resolve):
+        self.lock = lock
+        self.resolve = resolve
+        self.pending = []  # (argument, future)
+        self.task = None
+        self.batches = 0  # resolve calls
+        self.calls = 0  # Arguments resolved
+
+    def __call__(self, argument):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((argument, future))
+        if self.task is None:
+            self.task = loop.create_task(self.flush())
+        return future
+
+    async def flush(self):
+        async with self.lock:  # The calls arriving meanwhile join the batch
+            self.task = None
+            batch, self.pending = self.pending, []
+            try:
+                results = self.resolve([argument for argument, _ in batch])
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                return
+        self.batches += 1
+        self.calls += len(batch)
+        for (_, future), result in zip(batch, results):
+            if not future.done():  # The caller may have been cancelled
+                future.set_result(result)
+
+
+def load_items(tree, items):
+    """Bulk load into an empty tree, plain inserts into a filled one"""
+    if tree.root.keys:
+        for key, value in items:
+            tree.insert(key, value)
+    else:  # The last value of a key wins, like with insert
+        tree.bulk_load(sorted(dict(items).items()))
+
+
+def first_leaf(tree):
+    node = tree.root
+    while isinstance(node, InternalNode):
+        node = node.children[0]
+    return node
+
+
+class AsyncBPlusTree:
+    def __init__(self, tree, executor=None, leaves_per_yield=LEAVES_PER_YIELD):
+        """executor: where the heavy operations run (None: the loop's default one)"""
+        self.tree = tree
+        self.executor = executor
+        self.leaves_per_yield = leaves_per_yield
+        self.lock = asyncio.Lock()
+        self.get = Coalescer(self.lock, tree.search_values)
+
+    async def get_many(self, keys):
+        async with self.lock:
+            return self.tree.search_values(keys)
+
+    async def insert(self, key, value):
+        async with self.lock:
+            self.tree.insert(key, value)
+
+    async def delete(self, key):
+        async with self.lock:
+            self.tree.delete(key)
+
+    async def offload(self, function, *args):
+        """Run function(*args) in the executor, alone on the tree"""
+        async with self.lock:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, function, *args)
+
+    async def load(self, items):
+        """Insert many (key, value) pairs, bottom-up when the tree is empty"""
+        await self.offload(load_items, self.tree, list(items))
+
+    async def compact(self):
+        """Rebuild the tree with full leaves (see BPlusTree.bulk_load)"""
+        await self.offload(lambda tree: tree.bulk_load(list(tree.items())), self.tree)
+
+    async def scan(self, start=None, stop=None):
+        """
+        Yield the key-value pairs of [start, stop) (from the first key if start is
+        None, to the last if stop is None), letting the loop run between chunks
+        """
+        last = None  # Every key up to this one was read
+        while True:
+            chunk = []
+            done = False
+            async with self.lock:
+                if last is None:
+                    leaf = (
+                        first_leaf(self.tree)
+                        if start is None
+                        else self.tree.search(start)
+                    )
+                else:  # Carry on after the last key read, the tree may have changed
+                    leaf = self.tree.search(last)
+                    if leaf.keys and leaf.keys[-1] <= last:
+                        leaf = leaf.next_leaf
+                for _ in range(self.leaves_per_yield):
+                    if leaf is None:
+                        done = True
+                        break
+                    for key, value in zip(leaf.keys, leaf.values):
+                        if stop is not None and key >= stop:
+                            done = True
+                            break
+                        if (last is None or key > last) and (
+                            start is None or key >= start
+                        ):
+                            chunk.append((key, value))
+                    if done:
+                        break
+                    if leaf.keys:
+                        last = leaf.keys[-1]
+                    leaf = leaf.next_leaf
+            for item in chunk:
+                yield item
+            if done or leaf is None:
+                return
+            await asyncio.sleep(0)  # Give the other tasks a turn
+
+    async def range_query(self, start, end):
+        """All the key-value pairs of [start, end], like BPlusTree.range_query"""
+        result = []
+        items = self.scan(start)
+        try:  # contextlib.aclosing needs Python 3.10
+            async for key, value in items:
+                if key > end:
+                    break
+                result.append((key, value))
+        finally:
+            await items.aclose()
+        return result
+
+    def items(self):
+        return self.scan()
@@ -0,0 +1,155 @@
+# asyncio facade over a VirtualFileSystem, the filesystem version of async_tree.py
+#   - ls, find and grep are async generators: they read entries_per_yield results
+#     of the scan at a time and give the event loop a turn in between (grep reads
+#     its chunks in the executor, since it waits for its worker processes);
+#   - rm and mv of a directory (every entry below it is removed or re-keyed), load
+#     (many command lines) and compact run in an executor thread;
+#   - cat() calls made during the same turn of the loop are answered together,
+#     under a single acquisition of the locks;
+#   - the other commands are cheap and run inline.
+# The operations of the facade are ordered by an asyncio.Lock, and take the
+# filesystem lock (vfs.lock) as well, so other threads using the same
+# filesystem (vfs_server.py sessions) are excluded too. A scan can't carry on after
+# the tree changed under it, through the facade or not (the layout counts its
+# changes), it raises RuntimeError instead (like a dict changed during iteration).
+
+import asyncio
+from itertools import islice
+from async_tree import Coalescer
+from dispatcher import EXIT, Stream, dispatch
+from layouts import normalize_path
+
+ENTRIES_PER_YIELD = 256
+
+
+class AsyncVirtualFileSystem:
+    def __init__(self, vfs, executor=None, entries_per_yield=ENTRIES_PER_YIELD):
+        """executor: where the heavy operations run (None: the loop's default one)"""
+        self.vfs = vfs
+        self.executor = executor
+        self.entries_per_yield = entries_per_yield
+        self.lock = asyncio.Lock()
+        self.cat = Coalescer(self.lock, self.cat_many)
+
+    @property
+    def cwd(self):
+        return self.vfs.cwd
+
+    def cat_many(self, names):
+        with self.vfs.lock.read():
+            return [self.vfs.cat(name) for name in names]
+
+    async def is_dir(self, name):
+        async with self.lock:
+            with self.vfs.lock.read():
+                meta = self.vfs.layout.lookup(normalize_path(self.vfs.cwd, name))
+        return bool(meta) and meta.get("type") == "dir"
+
+    # ----- Changes -----
+
+    async def change(self, function, *args, offload=False):
+        """Run function(*args) alone on the filesystem, in the executor if offload"""
+        async with self.lock:
+            if not offload:
+                return self.write_locked(function, args)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, self.write_locked, function, args
+            )
+
+    def write_locked(self, function, args):
+        with self.vfs.lock.write():
+            return function(*args)
+
+    async def mkdir(self, name):
+        return await self.change(self.vfs.mkdir, name)
+
+    async def touch(self, name):
+        return await self.change(self.vfs.touch, name)
+
+    async def write(self, name, text, append=False):
+        return await self.change(self.vfs.write, name, text, append)
+
+    async def cd(self, path=None):
+        async with self.lock:
+            with self.vfs.lock.write():
+                return self.vfs.cd(path)
+
+    async def rm(self, name):
+        directory = await self.is_dir(name)
+        return await self.change(self.vfs.rm, name, offload=directory)
+
+    async def mv(self, src, dst):
+        directory = await self.is_dir(src)
+        return await self.change(self.vfs.mv, src, dst, offload=directory)
+
+    async def load(self, lines):
+        """Run shell command lines (a script building a filesystem) in the executor"""
+        await self.change(run_lines, self.vfs, list(lines), offload=True)
+
+    async def compact(self):
+        """Rebuild the trees of the filesystem with full leaves"""
+        await self.change(compact_trees, self.vfs, offload=True)
+
+    # ----- Scans -----
+
+    async def scan(self, lines, offload=False):
+        """Yield the lines of a scan of the filesystem, chunk by chunk"""
+        changes = self.vfs.layout.changes
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                async with self.lock:
+                    if offload:
+                        chunk = await loop.run_in_executor(
+                            self.executor, self.read_chunk, lines, changes
+                        )
+                    else:
+                        chunk = self.read_chunk(lines, changes)
+                for line in chunk:
+                    yield line
+                if len(chunk) < self.entries_per_yield:
+                    return
+                await asyncio.sleep(0)  # Give the other tasks a turn
+        finally:
+            try:
+                lines.close()
+            except ValueError:
+                pass  # Cancelled while a chunk is read in the executor
+
+    def read_chunk(self, lines, changes):
+        with self.vfs.lock.read():  # No change between the check and the reads
+            if self.vfs.layout.changes != changes:
+                raise RuntimeError("The filesystem changed during the scan")
+            return list(islice(lines, self.entries_per_yield))
+
+    def ls(self, path=None, entry_type=None):
+        return self.scan(self.vfs.iter_ls(path, entry_type))
+
+    def find(self, path=None, name=None, pattern=None, regex=None, entry_type=None):
+        return self.scan(self.vfs.iter_find(path, name, pattern, regex, entry_type))
+
+    def grep(self, pattern, path=None):
+        return self.scan(self.vfs.iter_grep(pattern, path), offload=True)
+
+
+def run_lines(vfs, lines):
+    """Runs in the executor, under the write lock taken by change"""
+    for line in lines:
+        cmd = line.strip()
+        if not cmd or cmd.startswith("#"):
+            continue
+        output = dispatch(vfs, cmd)
+        if output is EXIT:
+            break
+        if isinstance(output, Stream):
+            output.render()
+
+
+def compact_trees(vfs):
+    trees = [vfs.tree]
+    if vfs.indexes:
+        trees += [vfs.indexes.by_extension, vfs.indexes.by_type]
+    for tree in trees:
+        tree.bulk_load(list(tree.items()))
+    vfs.layout.changes += 1  # The nodes the scans were reading are gone
@@ -5,6 +5,10 @@
 # The order specifies the maximum number of children a node can have;
 # A leaf node in a B+ Tree of order (m) can hold a maximum of (m - 1) keys.
 
+from bisect import bisect_left
+from contextlib import contextmanager
+from types import MethodType
+
 
 class LeafNode:
     """
@@ -61,6 +65,8 @@ class BPlusTree:
     B+ tree class to manage all the operations.
     """
 
+    counters = None  # TreeCounters while the operations are counted
+
     def __init__(self, m):
         self.m = m
         self.root = LeafNode(m)
@@ -68,6 +74,113 @@ class BPlusTree:
     def __str__(self):
         return f"BPlusTree(order={self.m}, root={self.root})"
 
+    # ----- Instrumentation -----
+
+    def enable_stats(self, node_accesses=False):
+        """
+        Start counting node visits, comparisons, splits, borrows, merges and
+        fix_parent_key recursions (read them with stats()).
+        The counting versions of the methods are installed on this tree only, so a
+        tree that isn't counted runs the plain methods and pays nothing.
+        node_accesses: also count the searches going through each node (see
+        TreeCounters), to find the hot nodes of a workload.
+        """
+        if self.counters is None:
+            self.counters = TreeCounters()
+            for name, method in COUNTED_METHODS.items():
+                setattr(self, name, MethodType(method, self))
+        if node_accesses and self.counters.node_accesses is None:
+            self.counters.node_accesses = {}
+        return self.counters
+
+    def disable_stats(self):
+        if self.counters is not None:
+            for name in COUNTED_METHODS:
+                delattr(self, name)
+            del self.counters
+
+    @contextmanager
+    def counting(self, node_accesses=False):
+        """
+        Count the operations of a block only:
+            with tree.counting() as counters:
+                tree.insert(key, value)
+            print(counters.splits())
+        If the tree was already counted, the counts of the block are also added to
+        its counters afterwards.
+        """
+        outer = self.counters
+        self.disable_stats()
+        counters = self.enable_stats(node_accesses)
+        try:
+            yield counters
+        finally:
+            self.disable_stats()
+            if outer is not None:
+                outer.add(counters)
+                self.enable_stats()
+                self.counters = outer
+
+    def stats(self):
+        """
+        Snapshot of the shape of the tree (one walk, level by level): height, node
+        and entry counts, and the fill distribution of the nodes (fill_histogram[i]
+        counts the leaves filled between i*10% and (i+1)*10%).
+        Also holds the operation counters when they are enabled.
+        """
+        height = leaves = internal_nodes = entries = children = 0
+        histogram = [0] * 10
+        min_fill, max_fill = 1.0, 0.0
+        level = [self.root]
+        while level:
+            height += 1
+            below = []
+            for node in level:
+                if isinstance(node, InternalNode):
+                    internal_nodes += 1
+                    children += len(node.children)
+                    below.extend(node.children)
+                    continue
+                leaves += 1
+                entries += len(node.keys)
+                fill = len(node.keys) / (self.m - 1)
+                histogram[min(9, int(fill * 10))] += 1
+                min_fill = min(min_fill, fill)
+                max_fill = max(max_fill, fill)
+            level = below
+
+        stats = {
+            "order": self.m,
+            "height": height,
+            "entries": entries,
+            "leaves": leaves,
+            "internal_nodes": internal_nodes,
+            "leaf_fill": entries / (leaves * (self.m - 1)),
+            "leaf_fill_min": min_fill,
+            "leaf_fill_max": max_fill,
+            "leaf_fill_histogram": histogram,
+            "internal_fill": (
+                children / (internal_nodes * self.m) if internal_nodes else None
+            ),
+        }
+        if self.counters is not None:
+            stats["counters"] = self.counters.as_dict()
+        return stats
+
+    # ----- Pickling -----
+
+    def __getstate__(self):
+        """
+        Pickling the nodes directly recurses once per leaf through the linked list,
+        so only the sorted entries are saved and the nodes are rebuilt on load.
+        """
+        return {"m": self.m, "items": list(self.items())}
+
+    def __setstate__(self, state):
+        self.__init__(state["m"])
+        for key, value in state["items"]:
+            self.insert(key, value)
+
     # ----- Search Method and Search Helpers -----
 
     def search(self, key):
@@ -120,28 +233,88 @@ class BPlusTree:
         # If key not found
         return None
 
-    def visualization(self):
+    def search_values(self, keys):
         """
-        Function made by AI to help with the tree visualization
+        Values of many keys (None for the missing ones), in the order given.
+        The keys are looked up in sorted order, so a key falling in the leaf of the
+        previous one is found there without descending from the root again.
         """
-
-        def _fmt(keys):
-            return ",".join(map(str, keys))
-
-        def _walk(node, depth=0) -> str:
-            indent = "  " * depth
+        keys = list(keys)
+        values = [None] * len(keys)
+        leaf = None
+        for i in sorted(range(len(keys)), key=keys.__getitem__):
+            key = keys[i]
+            if leaf is None or not leaf.keys or key > leaf.keys[-1]:
+                leaf = self.search(key)
+            index = bisect_left(leaf.keys, key)
+            if index < len(leaf.keys) and leaf.keys[index] == key:
+                values[i] = leaf.values[index]
+        return values
+
+    def visualization(self, out=None):
+        """
+        Print the tree, one node per line indented by its depth: internal nodes as
+        <k1,k2>, leaves as [k1,k2]. Lines are written as the walk goes (to out, a
+        file, or stdout), so a large tree is never held in one string.
+        filesystem_visualization/tree_structure.py draws large trees level by level.
+        """
+        if self.root is None:
+            print("<empty>", file=out)
+            return
+        stack = [(self.root, 0)]
+        while stack:
+            node, depth = stack.pop()
+            keys = ",".join(map(str, node.keys))
             if isinstance(node, LeafNode):
-                return f"{indent}[{_fmt(node.keys)}]\n"
+                print(f"{'  ' * depth}[{keys}]", file=out)
             else:
-                out = f"{indent}<{_fmt(node.keys)}>\n"
-                for child in node.children:
-                    out += _walk(child, depth + 1)
-                return out
+                print(f"{'  ' * depth}<{keys}>", file=out)
+                stack.extend((child, depth + 1) for child in reversed(node.children))
 
-        if self.root is None:
-            print("<empty>")
-        else:
-            print(_walk(self.root), end="")
+    # ----- Bulk Loading -----
+
+    def bulk_load(self, items):
+        """
+        Replace the content of the tree with (key, value) pairs sorted by key, without
+        duplicates. The tree is built bottom-up in one pass: the leaves are filled
+        (m - 1 keys, the last ones share what is left), then each level of internal
+        nodes is built over the one below, with no search and no split.
+        Inserting keys in order only fills the leaves about half, so rebuilding a
+        tree from its own items() also compacts it.
+        """
+        items = list(items)
+        if any(a[0] >= b[0] for a, b in zip(items, items[1:])):
+            raise ValueError("bulk_load needs keys sorted without duplicates")
+        self.root = LeafNode(self.m)
+        if not items:
+            return
+
+        level = []
+        previous = None
+        for start, end in even_ranges(len(items), self.m - 1):
+            leaf = LeafNode(self.m)
+            leaf.keys = [key for key, _ in items[start:end]]
+            leaf.values = [value for _, value in items[start:end]]
+            leaf.prev_leaf = previous
+            if previous is not None:
+                previous.next_leaf = leaf
+            previous = leaf
+            level.append(leaf)
+        lowest = [leaf.keys[0] for leaf in level]  # Smallest key below each node
+
+        while len(level) > 1:
+            parents = []
+            parent_lowest = []
+            for start, end in even_ranges(len(level), self.m):
+                node = InternalNode(self.m)
+                node.children = level[start:end]
+                node.keys = lowest[start + 1 : end]
+                for child in node.children:
+                    child.parent = node
+                parents.append(node)
+                parent_lowest.append(lowest[start])
+            level, lowest = parents, parent_lowest
+        self.root = level[0]
 
     # ----- Insert Method and Insert Helpers -----
 
@@ -339,20 +512,29 @@ class BPlusTree:
             self.delete_entry(affected_parent)
 
     # Rebalancing Utilities
-    def fix_parent_key(self, node):
-        """Update parent separator when the first key in a leaf changes."""
+    def fix_parent_key(self, node, smallest=None):
+        """
+        Update the separator on the left of node's subtree when the first key in a leaf changes.
+        smallest is the new first key of the subtree (the leaf's first key at the start).
+        """
         parent = node.parent
-        if not parent or not node.keys:
+        if smallest is None:
+            if not node.keys:
+                return
+            smallest = node.keys[0]
+        if not parent:
             return
 
         # Find position of this node in parent's children
         pos = parent.children.index(node)
 
-        # If this is not the leftmost child, update the separator key
+        # If this is not the leftmost child, its separator is in this parent
         if pos > 0:
-            parent.keys[pos - 1] = node.keys[0]
-            # Recursively fix parent if it's also not the leftmost
-            self.fix_parent_key(parent)
+            parent.keys[pos - 1] = smallest
+        else:
+            # Leftmost child: the separator on its left is further up.
+            # (An internal node's own first key is not the smallest key of its subtree)
+            self.fix_parent_key(parent, smallest)
 
     def borrow_from_left(self, node, left, parent, sep_idx):
         """Move one key from the left sibling to node (with parent update)"""
@@ -428,6 +610,36 @@ class BPlusTree:
 
         return result
 
+    def scan(self, start, stop=None):
+        """
+        Lazily yield key-value pairs in the half-open range [start, stop).
+        If stop is None the scan runs until the last leaf.
+        The tree must not be modified while the generator is being consumed.
+        """
+        current_leaf = self.search(start)  # Find the starting leaf
+
+        while current_leaf:
+            for key, value in zip(current_leaf.keys, current_leaf.values):
+                if stop is not None and key >= stop:
+                    return  # Early termination when pass the end
+
+                if key >= start:
+                    yield key, value
+
+            current_leaf = current_leaf.next_leaf
+
+    def items(self):
+        """
+        Lazily yield every key-value pair in sorted order.
+        """
+        current_leaf = self.root
+        while isinstance(current_leaf, InternalNode):
+            current_leaf = current_leaf.children[0]
+
+        while current_leaf:
+            yield from zip(current_leaf.keys, current_leaf.values)
+            current_leaf = current_leaf.next_leaf
+
     def get_all_leaf_keys(self):
         """
         Return all keys in the tree in sorted order.
@@ -449,3 +661,182 @@ class BPlusTree:
             )  # Move to next leaf after processing all keys
 
         return keys
+
+
+def even_ranges(count, most):
+    """
+    Split range(count) into as few (start, end) slices of at most `most` items as
+    possible, with sizes differing by one at most: every slice then holds at least
+    the minimum of a B+ tree node (see bulk_load).
+    """
+    parts = -(-count // most)
+    size, extra = divmod(count, parts)
+    start = 0
+    for i in range(parts):
+        end = start + size + (i < extra)
+        yield start, end
+        start = end
+
+
+# ----- Instrumentation -----
+# Counting versions of the BPlusTree methods, installed on a tree by enable_stats().
+# The wrappers call the plain methods, which call the other methods through the
+# instance, so recursive calls (insert_in_parent, fix_parent_key) are counted too.
+
+
+class TreeCounters:
+    """
+    Operation counters of a BPlusTree:
+        node_visits               nodes visited going down the tree (root to leaf)
+        comparisons               key comparisons to route through the internal nodes
+                                  and to find a key in a leaf (search_value, insert_at_leaf)
+        leaf_splits               leaves split in two by an insert
+        internal_splits           internal nodes split by insert_in_parent
+        root_splits               splits of the root (the tree grew one level)
+        borrows                   keys moved from a sibling during a delete
+        merges                    siblings merged by merge_nodes during a delete
+        fix_parent_key_calls      calls of fix_parent_key, recursive ones included
+        fix_parent_key_max_depth  deepest fix_parent_key recursion (1 = no recursion)
+    With enable_stats(node_accesses=True), node_accesses maps each node a search went
+    through (every operation starts with one) to the number of such searches. It
+    keeps those nodes alive, merged or not, until reset().
+    """
+
+    FIELDS = (
+        "node_visits",
+        "comparisons",
+        "leaf_splits",
+        "internal_splits",
+        "root_splits",
+        "borrows",
+        "merges",
+        "fix_parent_key_calls",
+        "fix_parent_key_max_depth",
+    )
+    __slots__ = FIELDS + ("fix_parent_key_depth", "node_accesses")
+
+    def __init__(self):
+        self.node_accesses = None
+        self.reset()
+
+    def reset(self):
+        for field in self.FIELDS:
+            setattr(self, field, 0)
+        self.fix_parent_key_depth = 0
+        if self.node_accesses is not None:
+            self.node_accesses = {}
+
+    def splits(self):
+        return self.leaf_splits + self.internal_splits
+
+    def add(self, other):
+        for field in self.FIELDS:
+            if field == "fix_parent_key_max_depth":
+                self.fix_parent_key_max_depth = max(
+                    self.fix_parent_key_max_depth, other.fix_parent_key_max_depth
+                )
+            else:
+                setattr(self, field, getattr(self, field) + getattr(other, field))
+        if self.node_accesses is not None and other.node_accesses:
+            accesses = self.node_accesses
+            for node, count in other.node_accesses.items():
+                accesses[node] = accesses.get(node, 0) + count
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __repr__(self):
+        return f"TreeCounters({self.as_dict()})"
+
+
+def counted_search(tree, key):
+    # Same walk as BPlusTree.search, counting the nodes and the comparisons
+    counters = tree.counters
+    accesses = counters.node_accesses
+    current_node = tree.root
+    while isinstance(current_node, InternalNode):
+        node_keys = current_node.keys
+        child_index = len(node_keys)
+        for i in range(len(node_keys)):
+            if key < node_keys[i]:
+                child_index = i
+                break
+        counters.node_visits += 1
+        counters.comparisons += min(child_index + 1, len(node_keys))
+        if accesses is not None:
+            accesses[current_node] = accesses.get(current_node, 0) + 1
+        current_node = current_node.children[child_index]
+    counters.node_visits += 1
+    if accesses is not None and current_node is not None:
+        accesses[current_node] = accesses.get(current_node, 0) + 1
+    return current_node
+
+
+def counted_search_value(tree, key):
+    leaf = tree.search(key)
+    for i in range(len(leaf.keys)):
+        if leaf.keys[i] == key:
+            tree.counters.comparisons += i + 1
+            return leaf.values[i]
+    tree.counters.comparisons += len(leaf.keys)
+    return None
+
+
+def counted_insert_at_leaf(tree, leaf, key, value):
+    examined = len(leaf.keys)
+    BPlusTree.insert_at_leaf(tree, leaf, key, value)
+    # The scan stopped on the key's position (or went through every key to append it)
+    tree.counters.comparisons += min(leaf.keys.index(key) + 1, examined)
+
+
+def counted_insert_in_parent(tree, original_node, key, new_right_node):
+    # Called once for every node split, with the left half of the split node
+    counters = tree.counters
+    if isinstance(original_node, LeafNode):
+        counters.leaf_splits += 1
+    else:
+        counters.internal_splits += 1
+    if original_node.parent is None:
+        counters.root_splits += 1
+    BPlusTree.insert_in_parent(tree, original_node, key, new_right_node)
+
+
+def counted_borrow_from_left(tree, node, left, parent, sep_idx):
+    tree.counters.borrows += 1
+    BPlusTree.borrow_from_left(tree, node, left, parent, sep_idx)
+
+
+def counted_borrow_from_right(tree, node, right, parent, sep_idx):
+    tree.counters.borrows += 1
+    BPlusTree.borrow_from_right(tree, node, right, parent, sep_idx)
+
+
+def counted_merge_nodes(tree, left, right, parent, sep_idx):
+    tree.counters.merges += 1
+    BPlusTree.merge_nodes(tree, left, right, parent, sep_idx)
+
+
+def counted_fix_parent_key(tree, node, smallest=None):
+    counters = tree.counters
+    counters.fix_parent_key_calls += 1
+    counters.fix_parent_key_depth += 1
+    counters.fix_parent_key_max_depth = max(
+        counters.fix_parent_key_max_depth, counters.fix_parent_key_depth
+    )
+    try:
+        BPlusTree.fix_parent_key(tree, node, smallest)
+    finally:
+        counters.fix_parent_key_depth -= 1
+
+
+# BPlusTree method name -> counting version
+COUNTED_METHODS = {
+    "search": counted_search,
+    "search_value": counted_search_value,
+    "insert_at_leaf": counted_insert_at_leaf,
+    "insert_in_parent": counted_insert_in_parent,
+    "borrow_from_left": counted_borrow_from_left,
+    "borrow_from_right": counted_borrow_from_right,
+    "merge_nodes": counted_merge_nodes,
+    "fix_parent_key": counted_fix_parent_key,
+}
@@ -1,89 +1,451 @@
-from bplus_tree import BPlusTree
+import re
+from heapq import merge
+from operator import itemgetter
+from layouts import LAYOUTS, normalize_path, split_path, join_path
+from dentry_cache import DentryCache, MISSING
+from indexes import SecondaryIndexes, Transaction
+from content_search import ContentSearcher
+from locks import ReadWriteLock
+from metrics import METERED, STREAMING, CommandMetrics
+from patterns import (
+    compile_glob,
+    compile_regex,
+    glob_extension,
+    glob_prefix,
+    regex_prefix,
+)
+
+FIND_TYPES = {"f": "file", "d": "dir"}
+CANCEL_CHECK_INTERVAL = 1024  # Entries scanned between two polls of a cancel check
+
+
+def until_cancelled(entries, cancelled):
+    """
+    The entries of a scan, stopping early once cancelled() returns True. It is
+    polled while entries are scanned, not only when one matches, so a scan
+    finding nothing can still be stopped.
+    """
+    if cancelled is None:
+        yield from entries
+        return
+    for count, entry in enumerate(entries, 1):
+        if count % CANCEL_CHECK_INTERVAL == 0 and cancelled():
+            return
+        yield entry
 
 
 class VirtualFileSystem:
-    def __init__(self, order=4):
-        self.tree = BPlusTree(order)
+    metrics = None  # CommandMetrics while enable_metrics() is on
+
+    def __init__(
+        self,
+        order=4,
+        layout="path",
+        cache_size=1024,
+        indexes=False,
+        grep_workers=4,
+        grep_batch_size=64,
+    ):
+        # layout="path" keys the tree by full path strings,
+        # layout="inode" uses an inode table plus (parent inode, name) directory entries
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown layout: {layout}")
+        self.layout = LAYOUTS[layout](order)
+        self.tree = self.layout.tree
         self.cwd = "/"
-        self.tree.insert("/", {"type": "dir"})
+        self.dentries = DentryCache(cache_size)  # cache_size=0 disables it
+        # Optional (extension, path) and (type, path) indexes used by find and ls filters
+        self.indexes = SecondaryIndexes(order) if indexes else None
+        # Process pool used by grep, started on the first parallel search
+        self.searcher = ContentSearcher(grep_workers, grep_batch_size)
+        # Taken by callers running commands from several threads (see dispatcher.py)
+        self.lock = ReadWriteLock()
+
+    def __getstate__(self):
+        # Used by snapshot.py: only the entries and the session are saved,
+        # the cache, the grep pool and the lock are recreated on load
+        state = self.__dict__.copy()
+        state["dentries"] = self.dentries.capacity
+        state["searcher"] = (self.searcher.workers, self.searcher.batch_size)
+        del state["lock"]
+        for name in METERED:  # The metrics are per session too
+            state.pop(name, None)
+        state.pop("metrics", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.dentries = DentryCache(state["dentries"])
+        self.searcher = ContentSearcher(*state["searcher"])
+        self.lock = ReadWriteLock()
 
     def mkdir(self, name):
         path = self.__full__path(name)
-        if self.tree.search_value(path):
+        if self.__lookup(path):
             return f"Directory '{name}' already exists"
-        self.tree.insert(path, {"type": "dir"})
+        parent = split_path(path)[0]
+        if not self.__is_dir(parent):
+            return f"No such directory: {parent}"
+        self.__insert_entry(path, {"type": "dir"})
         return f"Directory '{name}' created"
 
-    def ls(self, path=None):
-        if not path:
-            path = self.cwd
+    def ls(self, path=None, entry_type=None):
+        contents = list(self.iter_ls(path, entry_type))
+        return " ".join(contents) if contents else "[empty]"
 
-        path = path.rstrip("/")
-        if not path:
-            path = "/"
+    def iter_ls(self, path=None, entry_type=None, cancelled=None):
+        """
+        Lazily yield the names in a directory (directories end with "/").
+        Errors are yielded as a single message line. The listing stops early
+        once cancelled(), if given, returns True.
+        """
+        path = self.__full__path(path) if path else self.cwd
 
-        if not self.tree.search_value(path):
-            return f"No such directory: {path}"
+        if not self.__lookup(path):
+            yield f"No such directory: {path}"
+            return
+        if entry_type is not None and entry_type not in FIND_TYPES:
+            yield f"Unknown type: {entry_type}"
+            return
+        kind = FIND_TYPES.get(entry_type)
 
-        # Get all paths and filter children
-        contents = []
-        prefix = path if path == "/" else path + "/"
+        # Only the direct children are listed
+        for name, meta in until_cancelled(self.__children(path, kind), cancelled):
+            # Check if it's a directory
+            if meta.get("type") == "dir":
+                name = name + "/"
+            yield name
 
-        for key in self.tree.get_all_leaf_keys():
-            if key != path and key.startswith(prefix):
-                name = key.split("/")[-1]
-                if name:
-                    # Check if it's a directory
-                    item_type = self.tree.search_value(key).get("type")
-                    if item_type == "dir":
-                        name = name + "/"
-                    contents.append(name)
+    def __children(self, path, kind=None):
+        """Direct children of a directory, optionally only the ones of the given type"""
+        if kind and self.indexes and not self.layout.exact_children:
+            # The type index only holds the matching descendants, which beats
+            # scanning every descendant of the directory
+            below = path if path == "/" else path + "/"
+            for child, meta in self.indexes.type_range(kind, path):
+                name = child[len(below) :]
+                if "/" not in name:
+                    yield name, meta
+            return
 
-        return " ".join(contents) if contents else "[empty]"
+        for name, meta in self.layout.children(path):
+            if not kind or meta.get("type") == kind:
+                yield name, meta
+
+    def iter_completions(self, path, prefix):
+        """
+        Lazily yield the names in directory path that start with prefix, sorted
+        (directories end with "/"). Used by the tab completion of the shell.
+        """
+        path = self.__full__path(path)
+        if not self.__is_dir(path):
+            return
+        for name, meta in self.layout.children_with_prefix(path, prefix):
+            yield name + "/" if meta.get("type") == "dir" else name
 
     def cd(self, path=None):
         if not path:
             self.cwd = "/"
             return "Moved to the root directory"
 
-        if path == "..":
-            if self.cwd == "/":
-                return "Already at root directory"
-            self.cwd = "/".join(self.cwd.rstrip("/").split("/")[:-1])
-            if not self.cwd:
-                self.cwd = "/"
-            return f"Moved to {self.cwd}"
+        if path == ".." and self.cwd == "/":
+            return "Already at root directory"
 
+        path = self.__full__path(path)
         if path == "/":
             self.cwd = "/"
             return "Moved to the root directory"
 
-        path = self.__full__path(path)
-        val = self.tree.search_value(path)
-        if val and val.get("type") == "dir":
+        if self.__is_dir(path):
             self.cwd = path
             return f"Moved to {path}"
         else:
             return f"No such directory: {path}"
 
     def __full__path(self, name):
-        if name.startswith("/"):
-            return name.rstrip("/")
-        if self.cwd == "/":
-            return "/" + name.rstrip("/")
-        return self.cwd.rstrip("/") + "/" + name.rstrip("/")
+        return normalize_path(self.cwd, name)
+
+    def __lookup(self, path):
+        """Metadata of a normalized path (or None), going through the dentry cache"""
+        meta = self.dentries.get(path)
+        if meta is MISSING:
+            meta = self.layout.lookup(path)
+            self.dentries.put(path, meta)
+        return meta
+
+    def __is_dir(self, path):
+        val = self.__lookup(path)
+        return bool(val) and val.get("type") == "dir"
+
+    def __insert_entry(self, path, meta):
+        """Insert into the primary storage and the secondary indexes as one unit"""
+        with Transaction() as tx:
+            self.layout.insert(path, meta)
+            tx.on_rollback(self.layout.delete, path)
+            if self.indexes:
+                self.indexes.add(path, meta)
+        self.dentries.invalidate(path)  # Drop the negative entry
+
+    def __delete_entry(self, path):
+        """Remove an entry with its whole subtree from the storage and the indexes"""
+        if not self.indexes:
+            self.layout.delete(path)
+        else:
+            entries = list(self.layout.walk(path))
+            with Transaction() as tx:
+                self.layout.delete(path)
+                tx.on_rollback(self.__restore, entries)
+                for entry_path, meta in entries:
+                    self.indexes.remove(entry_path, meta)
+                    tx.on_rollback(self.indexes.add, entry_path, meta)
+        self.dentries.invalidate_tree(path)
+
+    def __restore(self, entries):
+        for entry_path, meta in entries:  # Parents always come before their children
+            self.layout.insert(entry_path, meta)
+
+    def __rename_entry(self, old, new):
+        """Move an entry with its whole subtree, re-keying the index entries"""
+        if not self.indexes:
+            self.layout.rename(old, new)
+        else:
+            entries = list(self.layout.walk(old))
+            with Transaction() as tx:
+                self.layout.rename(old, new)
+                tx.on_rollback(self.layout.rename, new, old)
+                for entry_path, meta in entries:
+                    moved = new + entry_path[len(old) :]
+                    self.indexes.remove(entry_path, meta)
+                    tx.on_rollback(self.indexes.add, entry_path, meta)
+                    self.indexes.add(moved, meta)
+                    tx.on_rollback(self.indexes.remove, moved, meta)
+        self.dentries.invalidate_tree(old)
+        self.dentries.invalidate_tree(new)  # May hold negative entries
+
+    def cache_stats(self):
+        """Hit/miss counters of the dentry cache"""
+        return self.dentries.stats()
+
+    def session(self):
+        """
+        Another view of this filesystem with its own working directory, for one
+        client of a shared filesystem (see vfs_server.py). The tree, the caches,
+        the lock, the grep pool and the metrics are shared.
+        A session whose directory is moved by another session keeps the old path.
+        """
+        view = object.__new__(VirtualFileSystem)
+        view.__dict__.update(self.__dict__)
+        view.cwd = "/"
+        if self.metrics is not None:  # The timed methods are bound to self
+            for name in METERED:
+                del view.__dict__[name]
+            del view.metrics
+            view.enable_metrics(self.metrics)
+        return view
+
+    def enable_metrics(self, metrics=None):
+        """
+        Time every command of this filesystem into per-command latency histograms
+        (see metrics.py): the command methods are replaced by timed versions on the
+        instance, so a filesystem without metrics runs the plain methods.
+        metrics: record into these CommandMetrics (shared by sessions)
+        """
+        if self.metrics is None:
+            self.metrics = metrics or CommandMetrics()
+            for name, command in METERED.items():
+                wrap = (
+                    self.metrics.timed_stream
+                    if name in STREAMING
+                    else self.metrics.timed
+                )
+                setattr(self, name, wrap(getattr(self, name), command))
+        return self.metrics
+
+    def disable_metrics(self):
+        if self.metrics is not None:
+            for name in METERED:
+                delattr(self, name)
+            del self.metrics
 
     def touch(self, name):
         path = self.__full__path(name)
-        if self.tree.search_value(path):
+        if self.__lookup(path):
             return f"File '{name}' already exists"
-        self.tree.insert(path, {"type": "file"})
+        parent = split_path(path)[0]
+        if not self.__is_dir(parent):
+            return f"No such directory: {parent}"
+        self.__insert_entry(path, {"type": "file", "content": ""})
         return f"File '{name}' created"
 
+    def write(self, name, text, append=False):
+        """Replace (or append to) the content of a file, creating it if needed"""
+        path = self.__full__path(name)
+        meta = self.__lookup(path)
+        if meta is None:
+            created = self.touch(name)
+            meta = self.__lookup(path)
+            if meta is None:
+                return created  # Parent directory is missing
+        if meta.get("type") != "file":
+            return f"'{name}' is a directory"
+
+        content = meta.get("content", "") if append else ""
+        meta["content"] = content + text + "\n"
+        return f"File '{name}' written"
+
+    def cat(self, name):
+        meta = self.__lookup(self.__full__path(name))
+        if meta is None:
+            return f"File '{name}' does not exist"
+        if meta.get("type") != "file":
+            return f"'{name}' is a directory"
+        return meta.get("content", "").rstrip("\n")
+
     def rm(self, name):
         path = self.__full__path(name)
-        if self.tree.search_value(path):
-            self.tree.delete(path)
+        if path != "/" and self.__lookup(path):
+            # Removing a directory also removes everything inside it
+            self.__delete_entry(path)
             return f"File '{name}' deleted"
         else:
             return f"File '{name}' does not exist"
+
+    def mv(self, src, dst):
+        old = self.__full__path(src)
+        new = self.__full__path(dst)
+        if old == "/" or not self.__lookup(old):
+            return f"File '{src}' does not exist"
+
+        # Moving into an existing directory keeps the original name
+        if self.__is_dir(new):
+            new = join_path(new, split_path(old)[1])
+        if self.__lookup(new):
+            return f"File '{dst}' already exists"
+        if new.startswith(old + "/"):
+            return f"Cannot move '{src}' inside itself"
+        parent = split_path(new)[0]
+        if not self.__is_dir(parent):
+            return f"No such directory: {parent}"
+
+        self.__rename_entry(old, new)
+
+        # Keep the shell inside the moved directory if it was there
+        if self.cwd == old or self.cwd.startswith(old + "/"):
+            self.cwd = new + self.cwd[len(old) :]
+        return f"'{src}' moved to '{dst}'"
+
+    def iter_find(
+        self,
+        path=None,
+        name=None,
+        pattern=None,
+        regex=None,
+        entry_type=None,
+        cancelled=None,
+    ):
+        """
+        Lazily yield the paths under `path` matching all the given filters:
+            name       -> glob matched against the entry name (find -name)
+            pattern    -> glob matched against the full path (find -path)
+            regex      -> regex matched against the full path (find -regex)
+            entry_type -> "f" for files or "d" for directories (find -type)
+        Errors are yielded as a single message line. The scan stops early once
+        cancelled(), if given, returns True.
+        """
+        root = self.__full__path(path) if path else self.cwd
+        if not self.__lookup(root):
+            yield f"No such directory: {root}"
+            return
+        if entry_type is not None and entry_type not in FIND_TYPES:
+            yield f"Unknown type: {entry_type}"
+            return
+        kind = FIND_TYPES.get(entry_type)
+
+        # Compile every pattern once for the whole scan
+        name_matcher = compile_glob(name) if name is not None else None
+        path_matchers = []
+        prefixes = []
+        if pattern is not None:
+            path_matchers.append(compile_glob(pattern))
+            prefixes.append(glob_prefix(pattern))
+        if regex is not None:
+            try:
+                path_matchers.append(compile_regex(regex))
+            except re.error as e:
+                yield f"Invalid regex '{regex}': {e}"
+                return
+            prefixes.append(regex_prefix(regex))
+
+        # Full-path patterns must start with their literal prefix, so only that key range is scanned
+        prefix = max(prefixes, key=len, default="")
+        if any(not prefix.startswith(other) for other in prefixes):
+            return  # Two incompatible prefixes can't both match
+
+        candidates = self.__find_candidates(root, prefix, kind, name)
+        for entry_path, meta in until_cancelled(candidates, cancelled):
+            if kind and meta.get("type") != kind:
+                continue
+            if name_matcher and not name_matcher.match(
+                split_path(entry_path)[1] or "/"
+            ):
+                continue
+            if all(matcher.fullmatch(entry_path) for matcher in path_matchers):
+                yield entry_path
+
+    def __find_candidates(self, root, prefix, kind, name):
+        """
+        Entries under root that may match: a single index range when an index
+        can answer the query, otherwise a walk of the (prefix-narrowed) subtree.
+        """
+        ext = glob_extension(name) if name is not None else None
+        root_meta = self.__lookup(root)
+        if not self.indexes or root_meta.get("type") != "dir" or not (ext or kind):
+            yield from self.layout.walk(root, prefix)
+            return
+
+        if root.startswith(prefix):
+            yield root, root_meta  # The index ranges only cover the descendants
+        if not ext:
+            yield from self.indexes.type_range(kind, root, prefix)
+        elif kind == "file":
+            yield from self.indexes.extension_range(ext, root, prefix)
+        elif kind == "dir":  # The extension index only holds files
+            yield from self.indexes.type_range("dir", root, prefix)
+        else:  # A directory can be named like a file too: add them, in path order
+            yield from merge(
+                self.indexes.extension_range(ext, root, prefix),
+                self.indexes.type_range("dir", root, prefix),
+                key=itemgetter(0),
+            )
+
+    def find(self, path=None, name=None, pattern=None, regex=None, entry_type=None):
+        results = list(self.iter_find(path, name, pattern, regex, entry_type))
+        return "\n".join(results) if results else "[no matches]"
+
+    def iter_grep(self, pattern, path=None, cancelled=None):
+        """
+        Lazily yield "path:line:text" for every line matching the regex in the
+        files under `path`. Files are searched in parallel, results keep the file order.
+        No more files are read once cancelled(), if given, returns True.
+        """
+        root = self.__full__path(path) if path else self.cwd
+        if not self.__lookup(root):
+            yield f"No such directory: {root}"
+            return
+        try:
+            re.compile(pattern)  # Fail here rather than inside the workers
+        except re.error as e:
+            yield f"Invalid regex '{pattern}': {e}"
+            return
+
+        candidates = self.__find_candidates(root, "", "file", None)
+        files = (
+            (entry_path, meta.get("content", ""))
+            for entry_path, meta in until_cancelled(candidates, cancelled)
+            if meta.get("type") == "file" and meta.get("content")
+        )
+        yield from self.searcher.search(pattern, files)
+
+    def grep(self, pattern, path=None):
+        results = list(self.iter_grep(pattern, path))
+        return "\n".join(results) if results else "[no matches]"
@@ -0,0 +1,95 @@
+# Tab completion of command names and paths for the shell
+# Filtering every key of the tree on each key press would be O(N). Instead, the names of
+# a directory that start with the typed prefix are a range of the tree, read with a
+# bounded scan (at most `limit` names). The candidates are cached per (directory, prefix):
+# typing more characters filters a cached list instead of scanning the tree again.
+# The cache has to be cleared when the filesystem changes (see clear()).
+
+from collections import OrderedDict
+from itertools import islice
+from os.path import commonprefix
+from dispatcher import COMMANDS
+from layouts import normalize_path
+
+
+class Completion:
+    """
+    Result of a completion: the new input text and the candidates to show
+    (empty when the text could be completed without ambiguity).
+    """
+
+    def __init__(self, text, candidates=(), truncated=False):
+        self.text = text
+        self.candidates = list(candidates)
+        self.truncated = truncated  # More candidates than the scan limit
+
+
+class Completer:
+    def __init__(self, vfs, limit=1000, cache_size=64):
+        self.vfs = vfs
+        self.limit = limit
+        self.cache_size = cache_size
+        # (directory, prefix) -> (sorted names, truncated), most recently used last
+        self.cache = OrderedDict()
+        self.scans = 0  # Tree scans done (cache misses), for tests and benchmarks
+
+    def clear(self):
+        self.cache.clear()
+
+    def candidates(self, directory, prefix):
+        """
+        Names in directory starting with prefix (directories end with "/").
+        Returns (names, truncated); truncated means the limit was hit.
+        """
+        key = (directory, prefix)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        # A complete list for a shorter prefix already contains every answer
+        for end in range(len(prefix) - 1, -1, -1):
+            cached = self.cache.get((directory, prefix[:end]))
+            if cached is not None and not cached[1]:
+                names = [name for name in cached[0] if name.startswith(prefix)]
+                return self.remember(key, (names, False))
+
+        self.scans += 1
+        names = list(
+            islice(self.vfs.iter_completions(directory, prefix), self.limit + 1)
+        )
+        truncated = len(names) > self.limit
+        return self.remember(key, (names[: self.limit], truncated))
+
+    def remember(self, key, result):
+        self.cache[key] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return result
+
+    def complete(self, text):
+        """Complete the last word of text, like bash: first a command, then paths"""
+        head, _, word = text.rpartition(" ")
+        if not head.strip():  # Still typing the command name
+            names = sorted(name for name in COMMANDS if name.startswith(word))
+            truncated = False
+            base = ""
+        else:
+            base, _, prefix = word.rpartition("/")
+            if word.startswith("/") or base:
+                base += "/"
+            directory = normalize_path(self.vfs.cwd, base or ".")
+            names, truncated = self.candidates(directory, prefix)
+
+        if not names:
+            return Completion(text)
+        if len(names) == 1 and not truncated:
+            name = names[0]
+            end = "" if name.endswith("/") else " "  # Keep going inside directories
+            return Completion(text[: len(text) - len(word)] + base + name + end)
+
+        # Ambiguous: extend up to the common prefix, and show the candidates
+        common = commonprefix(names) if not truncated else ""
+        completed = text[: len(text) - len(word)] + base + common
+        if len(completed) > len(text):
+            return Completion(completed)
+        return Completion(text, names, truncated)
@@ -0,0 +1,79 @@
+# Parallel content search (grep) for the VirtualFileSystem
+# Searching file contents is CPU-bound, so the files are split into batches and
+# searched in a pool of worker processes, using every core instead of one.
+# Batches are submitted through a bounded window and their results are yielded
+# in submission order, so matches stream back in the same order as the files.
+# concurrent.futures (and multiprocessing) is only imported when the pool is started,
+# it is the slowest import of the shell otherwise.
+
+import re
+import threading
+from collections import deque
+from itertools import islice
+
+
+def search_batch(pattern, batch):
+    """
+    Runs inside a worker process.
+    batch is a list of (path, content); returns the matching "path:line:text" strings.
+    """
+    # Compiled once per batch (and cached by re inside each worker)
+    regex = re.compile(pattern)
+    matches = []
+    for path, content in batch:
+        for number, line in enumerate(content.splitlines(), 1):
+            if regex.search(line):
+                matches.append(f"{path}:{number}:{line}")
+    return matches
+
+
+def make_batches(files, batch_size):
+    """Lazily group an iterable of (path, content) into lists of batch_size"""
+    files = iter(files)
+    while True:
+        batch = list(islice(files, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class ContentSearcher:
+    """
+    Owns the process pool used by grep.
+    With workers=1 the search runs in the calling process (no pool at all).
+    """
+
+    def __init__(self, workers=4, batch_size=64):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.pool = None  # Started on the first parallel search, then reused
+        self.pool_lock = threading.Lock()  # Searches may start from several threads
+
+    def search(self, pattern, files):
+        """Yield every matching line of files (iterable of (path, content)), in order"""
+        batches = make_batches(files, self.batch_size)
+        if self.workers <= 1:
+            for batch in batches:
+                yield from search_batch(pattern, batch)
+            return
+
+        with self.pool_lock:
+            if self.pool is None:
+                from concurrent.futures import ProcessPoolExecutor
+
+                self.pool = ProcessPoolExecutor(self.workers)
+
+        # Keep at most two batches per worker in flight so huge trees don't get
+        # copied to the workers all at once
+        pending = deque()
+        for batch in batches:
+            pending.append(self.pool.submit(search_batch, pattern, batch))
+            if len(pending) >= self.workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
@@ -0,0 +1,73 @@
+# Dentry cache for the VirtualFileSystem
+# Shell sessions keep resolving the same handful of paths (cd, ls, mkdir, touch, rm),
+# so the metadata of recently used paths is kept in a bounded LRU map.
+# Paths that don't exist are cached too (negative entries), which makes
+# repeated "already exists" / "no such directory" checks just as cheap.
+# Lookups reorder the LRU map, so even read-only commands running in parallel
+# threads go through a small mutex.
+
+import threading
+from collections import OrderedDict
+
+MISSING = object()  # Returned by get() when the path is not cached at all
+
+
+class DentryCache:
+    """
+    LRU map of normalized path -> metadata (or None for a negative entry).
+    A capacity of 0 disables caching.
+    """
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.mutex = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, path):
+        with self.mutex:
+            if path in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(path)  # Most recently used goes to the end
+                return self.entries[path]
+            self.misses += 1
+            return MISSING
+
+    def put(self, path, meta):
+        if self.capacity <= 0:
+            return
+        with self.mutex:
+            self.entries[path] = meta
+            self.entries.move_to_end(path)
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)  # Evict the least recently used
+
+    def invalidate(self, path):
+        with self.mutex:
+            self.entries.pop(path, None)
+
+    def invalidate_tree(self, path):
+        """Drop the path and every cached path below it"""
+        prefix = path if path == "/" else path + "/"
+        with self.mutex:
+            self.entries.pop(path, None)
+            for key in [key for key in self.entries if key.startswith(prefix)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.mutex:
+            self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self.entries),
+            "capacity": self.capacity,
+        }
@@ -0,0 +1,179 @@
+# Command dispatcher shared by the Textual shell and the headless script mode
+# It turns one command line into a VirtualFileSystem call. It must not import Textual,
+# so scripts and traces can be replayed without loading the UI at all.
+
+from metrics import stats_command
+from profiling import parse_profile, profile_command
+
+EXIT = object()  # Returned when the command asks the shell to quit
+
+# Commands that change the tree or the session (cwd) and need the exclusive lock
+MUTATIONS = {"mkdir", "touch", "rm", "mv", "cd"}
+
+FIND_OPTIONS = {
+    "-name": "name",
+    "-path": "pattern",
+    "-regex": "regex",
+    "-type": "entry_type",
+}
+LS_OPTIONS = {"-type": "entry_type"}
+CANCELLABLE = {"ls", "find", "grep"}  # Handlers taking a cancel check (see dispatch)
+
+
+class Stream:
+    """
+    Output of a command that produces its lines lazily (ls, find, grep).
+    The caller decides how to consume it: render() joins everything,
+    iterating lets the shell show partial results or stop early.
+    """
+
+    def __init__(self, lines, sep="\n", empty="[no matches]"):
+        self.lines = lines
+        self.sep = sep
+        self.empty = empty
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def join(self, lines):
+        return self.sep.join(lines) or self.empty
+
+    def render(self):
+        return self.join(self.lines)
+
+    def close(self):
+        """Stop the underlying scan (used when a command is cancelled)"""
+        if hasattr(self.lines, "close"):
+            self.lines.close()
+
+
+def parse_options(params, options):
+    """
+    Parse "[dir] [-flag value]..." for commands like
+    "find [dir] [-name glob] [-path glob] [-regex re] [-type f|d]".
+    Returns the keyword arguments for the VirtualFileSystem method, or None if invalid.
+    """
+    kwargs = {}
+    if params and not params[0].startswith("-"):
+        kwargs["path"] = params[0]
+        params = params[1:]
+    if len(params) % 2:
+        return None
+    for flag, value in zip(params[::2], params[1::2]):
+        if flag not in options:
+            return None
+        kwargs[options[flag]] = value
+    return kwargs
+
+
+def echo(vfs, params):
+    """echo <text> [> file | >> file]"""
+    for redirect, append in ((">>", True), (">", False)):
+        if redirect in params[:-1]:
+            idx = params.index(redirect)
+            text = " ".join(params[:idx])
+            return vfs.write(params[idx + 1], text, append=append)
+    return " ".join(params)
+
+
+def ls(vfs, params, cancelled=None):
+    kwargs = parse_options(params, LS_OPTIONS)
+    if kwargs is None:
+        return None
+    lines = vfs.iter_ls(**kwargs, cancelled=cancelled)
+    return Stream(lines, sep=" ", empty="[empty]")
+
+
+def find(vfs, params, cancelled=None):
+    kwargs = parse_options(params, FIND_OPTIONS)
+    if kwargs is None:
+        return None
+    return Stream(vfs.iter_find(**kwargs, cancelled=cancelled))
+
+
+def grep(vfs, params, cancelled=None):
+    if not 1 <= len(params) <= 2:
+        return None
+    return Stream(vfs.iter_grep(*params, cancelled=cancelled))
+
+
+# Every handler takes (vfs, params) and returns the output, or None when the
+# arguments are incomplete. ls, find and grep return a Stream so the caller
+# can show the results while the scan is still running.
+COMMANDS = {
+    "mkdir": lambda vfs, params: vfs.mkdir(params[0]) if params else None,
+    "ls": ls,
+    "cd": lambda vfs, params: vfs.cd(params[0] if params else None),
+    "touch": lambda vfs, params: vfs.touch(params[0]) if params else None,
+    "rm": lambda vfs, params: vfs.rm(params[0]) if params else None,
+    "mv": lambda vfs, params: (
+        vfs.mv(params[0], params[1]) if len(params) >= 2 else None
+    ),
+    "find": find,
+    "grep": grep,
+    "echo": echo,
+    "cat": lambda vfs, params: vfs.cat(params[0]) if params else None,
+    "stats": stats_command,
+    "profile": profile_command,
+    "exit": lambda vfs, params: EXIT,
+}
+
+
+def is_mutation(cmd):
+    args = cmd.split()
+    if not args:
+        return False
+    if args[0] == "profile":  # The lock of the profiled command
+        parsed = parse_profile(args[1:])
+        return parsed is not None and is_mutation(parsed[1])
+    if args[0] == "echo":  # Only when redirected into a file
+        return ">" in args or ">>" in args
+    return args[0] in MUTATIONS
+
+
+def writes_host_file(cmd):
+    """
+    Whether the command writes a file of the machine running it (stats --json FILE,
+    profile --out FILE), not of the virtual filesystem
+    """
+    args = cmd.split()
+    if not args:
+        return False
+    if args[0] == "profile":
+        parsed = parse_profile(args[1:])
+        return parsed is not None and (
+            parsed[0]["out"] is not None or writes_host_file(parsed[1])
+        )
+    return args[:2] == ["stats", "--json"] and len(args) > 2
+
+
+def locked(vfs, cmd):
+    """
+    The lock a command has to hold while it runs (including consuming its Stream):
+    shared for read-only commands, exclusive for mutations.
+    """
+    return vfs.lock.write() if is_mutation(cmd) else vfs.lock.read()
+
+
+def dispatch(vfs, cmd, cancelled=None):
+    """
+    Run one command line against the filesystem.
+    Returns a string, a Stream of output lines, EXIT, or None for an empty line.
+    cancelled: called from time to time while a Stream scans the filesystem, the
+    scan stops once it returns True.
+    """
+    args = cmd.split()
+    if not args:
+        return None
+    op, params = args[0], args[1:]
+
+    handler = COMMANDS.get(op)
+    if handler is None:
+        output = None
+    elif op in CANCELLABLE:
+        output = handler(vfs, params, cancelled)
+    else:
+        output = handler(vfs, params)
+    if output is None:
+        return f"Unknown or incomplete command: {cmd.strip()}"
+    return output
@@ -0,0 +1,88 @@
+# Streaming DOT and SVG export of a filesystem hierarchy (see hierarchy.py)
+# Both formats are written line by line while walking the visible entries, without
+# matplotlib and without keeping the drawing in memory.
+#   DOT: one node and one edge per entry, laid out by Graphviz (dot -Tsvg fs.dot)
+#   SVG: an indented tree (like a file browser) drawn directly, one row per entry,
+#        which stays readable and fast to render with a million rows
+# Colors match the matplotlib drawing: directories in blue, files in green, and the
+# summary nodes of the level of detail in gray.
+
+from html import escape
+from filesystem_visualization.hierarchy import Entry, visible
+
+COLORS = {"dir": "lightblue", "file": "lightgreen", "summary": "lightgray"}
+ROW_HEIGHT = 18
+INDENT = 18
+CHAR_WIDTH = 7  # Average width of a character of the 12px monospace font
+
+
+def kind(item):
+    if not isinstance(item, Entry):
+        return "summary"
+    return "dir" if item.is_dir else "file"
+
+
+def label(item):
+    """Directories end with "/" and show how many entries they hold"""
+    if kind(item) != "dir":
+        return item.name
+    name = item.name if item.name == "/" else item.name + "/"
+    return f"{name} ({item.size:,})" if item.size else name
+
+
+def dot_string(text):
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def write_dot(root, out, max_children=None, max_depth=None):
+    """Write the visible hierarchy as a Graphviz digraph. Returns the number of nodes"""
+    out.write("digraph filesystem {\n")
+    out.write("  rankdir=LR;\n  node [shape=box, style=filled, fontsize=10];\n")
+    count = 0
+    for _, item, parent in visible(root, max_children, max_depth):
+        out.write(
+            f"  n{count} [label={dot_string(label(item))}, "
+            f"fillcolor={COLORS[kind(item)]}];\n"
+        )
+        if parent is not None:
+            out.write(f"  n{parent} -> n{count};\n")
+        count += 1
+    out.write("}\n")
+    return count
+
+
+def write_svg(root, out, max_children=None, max_depth=None):
+    """
+    Write the visible hierarchy as an indented tree: each entry on its own row,
+    joined to its parent by an elbow line. Returns the number of rows.
+    """
+    # A first walk sizes the drawing, the SVG header needs it
+    rows = 0
+    width = 0
+    for depth, item, _ in visible(root, max_children, max_depth):
+        rows += 1
+        width = max(width, (depth + 1) * INDENT + len(label(item)) * CHAR_WIDTH)
+
+    height = rows * ROW_HEIGHT + ROW_HEIGHT // 2
+    out.write(
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width + INDENT}" '
+        f'height="{height}" font-family="monospace" font-size="12">\n'
+    )
+    out.write(
+        "<style>path{fill:none;stroke:#888}"
+        + "".join(f"circle.{name}{{fill:{color}}}" for name, color in COLORS.items())
+        + "circle{stroke:#333}</style>\n"
+    )
+    # Where the vertical line to the next row at each depth starts: below the parent,
+    # or at the previous sibling (rows come parents first, so one value per depth)
+    line_start = [None]
+    for row, (depth, item, _) in enumerate(visible(root, max_children, max_depth)):
+        x = depth * INDENT + INDENT // 2
+        y = row * ROW_HEIGHT + ROW_HEIGHT // 2 + 4
+        if depth:
+            out.write(f'<path d="M{x - INDENT},{line_start[depth]}V{y}H{x - 5}"/>\n')
+        line_start[depth:] = [y, y + 5]
+        out.write(f'<circle class="{kind(item)}" cx="{x}" cy="{y}" r="5"/>')
+        out.write(f'<text x="{x + 9}" y="{y + 4}">{escape(label(item))}</text>\n')
+    out.write("</svg>\n")
+    return rows
@@ -9,62 +9,44 @@
 # This shows the logical filesystem structure, not the actual B+ tree internals
 # The B+ tree stores all these paths as keys in leaf nodes at the same level
 
-import matplotlib.pyplot as plt
-from matplotlib.patches import Ellipse
+# matplotlib is only imported when drawing, collecting the structure doesn't need it
+#
+# The matplotlib drawing places every node and only suits small filesystems. For large
+# ones, --format dot/svg streams the hierarchy (hierarchy.py, export.py) without
+# matplotlib, collapsing large or deep directories into summary nodes:
+#   python3 -m filesystem_visualization.filesystem_visualization --format svg \
+#       --snapshot fs.snap --max-children 20 --max-depth 4
+# The nodes of the B+ tree itself are drawn by tree_structure.py, level by level.
+
+import argparse
+import sys
 from filesystem_visualization.filesystem_example import create_sample_filesystem
-from bplus_tree import InternalNode, LeafNode
+from bplus_tree import InternalNode
+from filesystem_visualization.tree_structure import levels
+from layouts import join_path
 
 
 def collect_bplustree_structure(tree):
     """
-    Traverse the B+ tree and collect all nodes (internal and leaves),
-    their keys, children, and depth. Returns a dict of node_id -> node dict.
+    Number the nodes of the B+ tree level by level (root first), without copying
+    them: returns a dict of id(node) -> node number.
     """
-    nodes = {}
-    node_id_counter = [0]
-
-    def traverse(node, depth, parent_id=None):
-        node_id = node_id_counter[0]
-        node_id_counter[0] += 1
-        node_type = "internal" if isinstance(node, InternalNode) else "leaf"
-        node_dict = {
-            "id": node_id,
-            "type": node_type,
-            "keys": list(node.keys),
-            "depth": depth,
-            "parent": parent_id,
-            "children": [],
-            "node": node,
-        }
-        nodes[node_id] = node_dict
-        if node_type == "internal":
-            for child in node.children:
-                child_id = traverse(child, depth + 1, node_id)
-                node_dict["children"].append(child_id)
-        return node_id
-
-    traverse(tree.root, 0)
-    return nodes
+    node_ids = {}
+    for level in levels(tree):
+        for node in level:
+            node_ids[id(node)] = len(node_ids)
+    return node_ids
 
 
 def get_dir_children(vfs, dir_path):
     """
     Return the children (files/dirs) of a directory path in the virtual filesystem.
     """
-    all_keys = vfs.tree.get_all_leaf_keys()
-    children = []
-    prefix = dir_path.rstrip("/") + "/" if dir_path != "/" else "/"
-    for k in all_keys:
-        if k == dir_path:
-            continue
-        if k.startswith(prefix):
-            rest = k[len(prefix):]
-            if "/" not in rest:
-                children.append(k)
-    return children
-
-
-def collect_dircentric_nodes(vfs, nodes, dir_path, depth, parent_id=None, level_nodes=None, edges=None):
+    # A range scan of the directory, not of every key in the tree
+    return [join_path(dir_path, name) for name, _ in vfs.layout.children(dir_path)]
+
+
+def collect_dircentric_nodes(vfs, node_ids, dir_path, depth, parent_id=None, level_nodes=None, edges=None):
     """
     First pass: Recursively collect all nodes in directory-centric order, grouped by depth.
     Returns: level_nodes (dict: depth -> list of (node_id, label, type)), edges (list of (parent_id, child_id))
@@ -80,10 +62,12 @@ def collect_dircentric_nodes(vfs, nodes, dir_path, depth, parent_id=None, level_
     if parent_id is not None:
         edges.append((parent_id, dir_node_id))
     # Internal node(s) for this DIR
-    children = get_dir_children(vfs, dir_path)
+    # The layout gives the metadata of the children and the tree key of the first one
+    # (its path, or (parent inode, name) on the inode layout)
+    children = [(join_path(dir_path, name), meta) for name, meta in vfs.layout.children(dir_path)]
     internal_ids = []
     if children:
-        first_child = children[0]
+        first_child = vfs.layout.key(children[0][0])
         current = vfs.tree.root
         while isinstance(current, InternalNode):
             idx = 0
@@ -92,11 +76,7 @@ def collect_dircentric_nodes(vfs, nodes, dir_path, depth, parent_id=None, level_
                     idx = i
                     break
                 idx = i + 1
-            internal_id = None
-            for nid, n in nodes.items():
-                if n["node"] is current:
-                    internal_id = nid
-                    break
+            internal_id = node_ids.get(id(current))
             if internal_id is not None:
                 int_label = str(current.keys)
                 int_node_id = f"internal:{internal_id}:{dir_path}"
@@ -106,10 +86,9 @@ def collect_dircentric_nodes(vfs, nodes, dir_path, depth, parent_id=None, level_
             current = current.children[idx]
     parent_for_leaves = internal_ids[-1] if internal_ids else dir_node_id
     # Children (files/dirs)
-    for child in children:
-        val = vfs.tree.search_value(child)
-        if val and val.get("type") == "dir":
-            collect_dircentric_nodes(vfs, nodes, child, depth + 2, parent_for_leaves, level_nodes, edges)
+    for child, meta in children:
+        if meta.get("type") == "dir":
+            collect_dircentric_nodes(vfs, node_ids, child, depth + 2, parent_for_leaves, level_nodes, edges)
         else:
             file_node_id = f"file:{child}"
             file_label = child.split("/")[-1]
@@ -137,10 +116,13 @@ def assign_level_aligned_positions(level_nodes, x_spacing=20, y_spacing=3):
 
 
 def draw_filesystem_level_aligned(vfs):
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import Ellipse
+
     tree = vfs.tree
-    nodes = collect_bplustree_structure(tree)
+    node_ids = collect_bplustree_structure(tree)
     # First pass: collect nodes by level and edges
-    level_nodes, edges = collect_dircentric_nodes(vfs, nodes, "/", 0)
+    level_nodes, edges = collect_dircentric_nodes(vfs, node_ids, "/", 0)
     # Second pass: assign positions
     positions = assign_level_aligned_positions(level_nodes)
     plt.figure(figsize=(18, 8))
@@ -185,8 +167,65 @@ def draw_filesystem_level_aligned(vfs):
     print("File generated at filesystem_visualization/filesystem_tree.png")
 
 
+def export_filesystem(vfs, path, fmt, max_children=None, max_depth=None, root="/"):
+    """Stream the hierarchy under root to a DOT or SVG file. Returns the node count"""
+    from filesystem_visualization.export import write_dot, write_svg
+    from filesystem_visualization.hierarchy import build_hierarchy
+
+    hierarchy = build_hierarchy(vfs, root)
+    if hierarchy is None:
+        raise ValueError(f"No such directory: {root}")
+    write = write_dot if fmt == "dot" else write_svg
+    with open(path, "w") as out:
+        return write(hierarchy, out, max_children, max_depth)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Draw the filesystem as a tree")
+    parser.add_argument("--format", choices=["png", "dot", "svg"], default="png")
+    parser.add_argument("--snapshot", help="draw a saved filesystem (snapshot.py)")
+    parser.add_argument("--root", default="/", help="directory to draw")
+    parser.add_argument(
+        "--max-children",
+        type=int,
+        default=50,
+        help="children shown per directory, the others become a summary node (0: all)",
+    )
+    parser.add_argument(
+        "--max-depth", type=int, default=None, help="deeper directories are summarized"
+    )
+    parser.add_argument(
+        "--output", help="default: filesystem_visualization/filesystem_tree.FORMAT"
+    )
+    args = parser.parse_args(argv)
+
+    if args.snapshot:
+        import snapshot
+
+        fs = snapshot.load(args.snapshot)
+    else:
+        print("Creating filesystem...")
+        fs = create_sample_filesystem()
+    try:
+        if args.format == "png":
+            print("Drawing level-aligned filesystem visualization...")
+            draw_filesystem_level_aligned(fs)
+            return
+        output = args.output or f"filesystem_visualization/filesystem_tree.{args.format}"
+        count = export_filesystem(
+            fs,
+            output,
+            args.format,
+            args.max_children or None,
+            args.max_depth,
+            args.root,
+        )
+        print(f"{count:,} nodes written to {output}")
+    except ValueError as error:
+        sys.exit(str(error))
+    finally:
+        fs.searcher.close()
+
+
 if __name__ == "__main__":
-    print("Creating filesystem...")
-    fs = create_sample_filesystem()
-    print("Drawing level-aligned filesystem visualization...")
-    draw_filesystem_level_aligned(fs)
+    main()
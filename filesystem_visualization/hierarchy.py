@@ -0,0 +1,105 @@
+# Directory hierarchy of a VirtualFileSystem, built in a single pass
+# The entries come from one walk of the layout (a range scan along the leaf chain for
+# the path layout), and every parent is seen before its children, so each entry is
+# attached to its parent as it arrives: O(N) whatever the depth.
+#
+# visible() picks what a rendering shows (level of detail): directories with too many
+# children show the first ones and a summary node for the rest, and directories
+# deeper than max_depth are collapsed into a summary node, so the size of the drawing
+# stays bounded on filesystems with millions of entries.
+
+import gc
+
+
+class Entry:
+    """A file or directory, with its subtree size once the hierarchy is built"""
+
+    __slots__ = ("path", "name", "is_dir", "children", "size")
+
+    def __init__(self, path, name, is_dir):
+        self.path = path
+        self.name = name
+        self.is_dir = is_dir
+        self.children = [] if is_dir else None
+        self.size = 0  # Number of entries below this one
+
+
+class Summary:
+    """Stands for entries a rendering doesn't show one by one"""
+
+    __slots__ = ("entries", "dirs", "files")
+
+    def __init__(self, hidden):
+        self.entries = sum(1 + entry.size for entry in hidden)
+        self.dirs = sum(1 for entry in hidden if entry.is_dir)
+        self.files = len(hidden) - self.dirs
+
+    @property
+    def name(self):
+        if not self.dirs:
+            return f"... {self.files:,} more files"
+        if self.entries == self.dirs + self.files:
+            return f"... {self.dirs:,} more dirs, {self.files:,} files"
+        return f"... {self.dirs + self.files:,} more ({self.entries:,} entries)"
+
+
+def build_hierarchy(vfs, path="/"):
+    """Root Entry of the subtree at path (None if it doesn't exist)"""
+    dirs = {}  # Only directories can be parents
+    order = []  # Directories in creation order, parents first
+    root = None
+    # Millions of new objects and no garbage: the collector would only rescan them
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        for entry_path, meta in vfs.layout.walk(path):
+            parent, _, name = entry_path.rpartition("/")  # split_path, inlined
+            entry = Entry(entry_path, name or "/", meta.get("type") == "dir")
+            if root is None:
+                root = entry
+            else:
+                dirs[parent or "/"].children.append(entry)
+            if entry.is_dir:
+                dirs[entry_path] = entry
+                order.append(entry)
+    finally:
+        if collecting:
+            gc.enable()
+
+    # Children were created after their parent: add the sizes up in reverse
+    for entry in reversed(order):
+        entry.size = len(entry.children) + sum(
+            child.size for child in entry.children if child.is_dir
+        )
+    return root
+
+
+def visible(root, max_children=None, max_depth=None):
+    """
+    Yield (depth, item, parent index) for everything a rendering shows, parents first
+    (depth-first, in name order). item is an Entry or a Summary, the parent index
+    counts the items yielded before (None for the root).
+    max_children: directories show that many children and a Summary of the rest
+    max_depth: the children of directories at that depth are one Summary
+    """
+    index = 0
+    stack = [(0, root, None)]
+    while stack:
+        depth, item, parent = stack.pop()
+        yield depth, item, parent
+        current = index
+        index += 1
+        if not isinstance(item, Entry) or not item.children:
+            continue
+
+        children = item.children
+        if max_depth is not None and depth >= max_depth:
+            shown, hidden = [], children
+        elif max_children is not None and len(children) > max_children:
+            shown, hidden = children[: max_children - 1], children[max_children - 1 :]
+        else:
+            shown, hidden = children, []
+        if hidden:
+            stack.append((depth + 1, Summary(hidden), current))
+        for child in reversed(shown):  # The first child comes out of the stack first
+            stack.append((depth + 1, child, current))
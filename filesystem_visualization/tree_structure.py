@@ -0,0 +1,328 @@
+# Structure of a large B+ tree, drawn level by level
+# BPlusTree.visualization() prints every node and export.py draws the filesystem; this
+# shows the nodes of the tree itself, one row per level, without one object per node:
+# levels wider than max_nodes are cut into max_nodes runs of consecutive nodes
+# ("collapse", each box stands for its whole run) or show max_nodes nodes picked at
+# regular intervals ("sample", each box is one real node). Boxes are colored by
+#   fill      keys / (m - 1), red for sparse nodes to green for full ones
+#   accesses  searches through the node, from tree.counting(node_accesses=True),
+#             per node of the run and relative to the hottest box of its level
+# Boxes are placed along each level by node position, so the children of a node are
+# drawn below it. Output is a text heat strip per level, or an SVG written row by row.
+#   python3 -m filesystem_visualization.tree_structure --entries 1000000 --order 32 \
+#       --metric accesses --lookups 200000 --distribution zipf --format svg
+
+import argparse
+import math
+import random
+from html import escape
+from bplus_tree import BPlusTree, InternalNode
+
+DEFAULT_MAX_NODES = 64
+METRICS = ["fill", "accesses"]
+MODES = ["collapse", "sample"]
+SHADES = " ░▒▓█"
+SVG_WIDTH = 1200
+LABEL_WIDTH = 230
+ROW_HEIGHT = 40
+BOX_HEIGHT = 24
+
+
+def levels(tree):
+    """Yield the nodes of each level as a list, root first (one level at a time)"""
+    level = [tree.root] if tree.root is not None else []
+    while level:
+        yield level
+        if not isinstance(level[0], InternalNode):
+            return
+        level = [child for node in level for child in node.children]
+
+
+def height(tree):
+    """Number of levels, going down the leftmost path"""
+    count = 0
+    node = tree.root
+    while node is not None:
+        count += 1
+        node = node.children[0] if isinstance(node, InternalNode) else None
+    return count
+
+
+class Group:
+    """A run of consecutive nodes of one level, drawn as one box"""
+
+    __slots__ = (
+        "first",
+        "count",
+        "keys",
+        "accesses",
+        "min_fill",
+        "max_fill",
+        "low",
+        "high",
+    )
+
+    def __init__(self, first):
+        self.first = first  # Position of the first node in its level
+        self.count = 0
+        self.keys = 0
+        self.accesses = 0
+        self.min_fill = 1.0
+        self.max_fill = 0.0
+        self.low = self.high = None  # Smallest and largest keys of the run
+
+    def add(self, node, capacity, accesses):
+        if not self.count:
+            self.low = node.keys[0] if node.keys else None
+        if node.keys:
+            self.high = node.keys[-1]
+        fill = len(node.keys) / capacity
+        self.min_fill = min(self.min_fill, fill)
+        self.max_fill = max(self.max_fill, fill)
+        self.count += 1
+        self.keys += len(node.keys)
+        if accesses:
+            self.accesses += accesses.get(node, 0)
+
+    def fill(self, capacity):
+        return self.keys / (self.count * capacity)
+
+    def heat(self):
+        """Accesses per node of the run"""
+        return self.accesses / self.count
+
+
+def groups(
+    level, capacity, accesses=None, max_nodes=DEFAULT_MAX_NODES, mode="collapse"
+):
+    """The boxes of a level: a Group per node, or max_nodes of them on wide levels"""
+    size = len(level)
+    if size <= max_nodes:
+        picks = range(size)
+    elif mode == "sample":  # Evenly spaced, the first and last nodes included
+        picks = [i * (size - 1) // (max_nodes - 1) for i in range(max_nodes)]
+    else:
+        picks = None
+
+    result = []
+    if picks is not None:
+        for i in picks:
+            group = Group(i)
+            group.add(level[i], capacity, accesses)
+            result.append(group)
+        return result
+    for box in range(max_nodes):
+        group = Group(box * size // max_nodes)
+        for node in level[group.first : (box + 1) * size // max_nodes]:
+            group.add(node, capacity, accesses)
+        result.append(group)
+    return result
+
+
+def scan(
+    tree, metric="fill", max_nodes=DEFAULT_MAX_NODES, mode="collapse", accesses=None
+):
+    """
+    Yield (depth, nodes in the level, groups, intensities) level by level, root
+    first. The intensity of a box is in [0, 1]: its fill, or for accesses its
+    accesses per node on a log scale, relative to the hottest box of the level.
+    accesses: node -> count, the node_accesses of TreeCounters (by default those of
+    the tree, if it is counting them)
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric: {metric}")
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode: {mode}")
+    if metric == "fill":
+        accesses = None
+    elif accesses is None:
+        if tree.counters is None or tree.counters.node_accesses is None:
+            raise ValueError("No access counts: use tree.counting(node_accesses=True)")
+        accesses = tree.counters.node_accesses
+    capacity = tree.m - 1
+    for depth, level in enumerate(levels(tree)):
+        boxes = groups(level, capacity, accesses, max_nodes, mode)
+        if metric == "fill":
+            intensities = [group.fill(capacity) for group in boxes]
+        else:
+            hottest = math.log1p(max(group.heat() for group in boxes))
+            intensities = [
+                math.log1p(group.heat()) / hottest if hottest else 0.0
+                for group in boxes
+            ]
+        yield depth, len(level), boxes, intensities
+
+
+def level_name(depth, size, levels_count):
+    if depth == levels_count - 1:
+        return f"leaves   {size:>9,}"
+    return f"level {depth:<2} {size:>9,}"
+
+
+def level_summary(boxes, capacity, metric):
+    if metric == "fill":
+        keys = sum(group.keys for group in boxes)
+        nodes = sum(group.count for group in boxes)
+        low = min(group.min_fill for group in boxes)
+        return f"fill {keys / (nodes * capacity):.0%} (min {low:.0%})"
+    return f"{sum(group.accesses for group in boxes):,} accesses"
+
+
+def text_lines(
+    tree, metric="fill", max_nodes=DEFAULT_MAX_NODES, mode="collapse", accesses=None
+):
+    """
+    One heat strip per level, a character per box (" " to "█"), followed by the
+    average fill or the access count of the nodes drawn
+    """
+    levels_count = height(tree)
+    capacity = tree.m - 1
+    rows = scan(tree, metric, max_nodes, mode, accesses)
+    for depth, size, boxes, intensities in rows:
+        strip = "".join(SHADES[round(t * (len(SHADES) - 1))] for t in intensities)
+        summary = level_summary(boxes, capacity, metric)
+        yield f"{level_name(depth, size, levels_count)} |{strip}| {summary}"
+
+
+def color(metric, intensity):
+    """Red (sparse) to green (full) for fill, pale yellow to red (hot) for accesses"""
+    if metric == "fill":
+        return f"hsl({round(120 * intensity)},70%,60%)"
+    return f"hsl({round(50 * (1 - intensity))},90%,{round(95 - 45 * intensity)}%)"
+
+
+def tooltip(group, capacity, metric):
+    if group.count == 1:
+        text = f"node {group.first:,}: {group.keys} keys"
+    else:
+        last = group.first + group.count - 1
+        text = f"nodes {group.first:,}-{last:,}: {group.keys:,} keys"
+    text += f"\nkeys {group.low!r} to {group.high!r}"
+    text += f"\nfill {group.fill(capacity):.0%}"
+    if group.count > 1:
+        text += f" (min {group.min_fill:.0%}, max {group.max_fill:.0%})"
+    if metric == "accesses":
+        text += f"\n{group.accesses:,} accesses"
+    return escape(text)
+
+
+def write_svg(
+    tree,
+    out,
+    metric="fill",
+    max_nodes=DEFAULT_MAX_NODES,
+    mode="collapse",
+    accesses=None,
+):
+    """
+    Write the levels as rows of boxes, a box per group, as wide as the share of the
+    level its run covers (its gap up to the next pick when sampling). Hovering a box
+    shows its nodes, key range, fill and accesses. Returns the number of boxes.
+    """
+    levels_count = height(tree)
+    capacity = tree.m - 1
+    draw_width = SVG_WIDTH - LABEL_WIDTH
+    out.write(
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{SVG_WIDTH + 10}" '
+        f'height="{max(levels_count, 1) * ROW_HEIGHT + 10}" '
+        'font-family="monospace" font-size="12">\n'
+    )
+    out.write("<style>rect{stroke:#444;stroke-width:0.5}</style>\n")
+    count = 0
+    rows = scan(tree, metric, max_nodes, mode, accesses)
+    for depth, size, boxes, intensities in rows:
+        y = depth * ROW_HEIGHT + 10
+        name = level_name(depth, size, levels_count).replace("  ", " ")
+        summary = level_summary(boxes, capacity, metric)
+        out.write(f'<text x="0" y="{y + 10}">{escape(name)} nodes</text>')
+        out.write(f'<text x="0" y="{y + 24}">{escape(summary)}</text>\n')
+        ends = [group.first for group in boxes[1:]] + [size]
+        for group, end, intensity in zip(boxes, ends, intensities):
+            x = LABEL_WIDTH + draw_width * group.first / size
+            width = max(draw_width * (end - group.first) / size, 1)
+            if mode == "sample" and size > max_nodes:  # Leave the gap visible
+                width = max(width - 2, 1)
+            out.write(
+                f'<rect x="{x:.1f}" y="{y}" width="{width:.1f}" '
+                f'height="{BOX_HEIGHT}" fill="{color(metric, intensity)}">'
+                f"<title>{tooltip(group, capacity, metric)}</title></rect>\n"
+            )
+            count += 1
+    out.write("</svg>\n")
+    return count
+
+
+def build_random_tree(entries, order, seed=0):
+    """Tree of the keys 0..entries-1 inserted in random order (uneven fill)"""
+    keys = list(range(entries))
+    random.Random(seed).shuffle(keys)
+    tree = BPlusTree(order)
+    for key in keys:
+        tree.insert(key, key)
+    return tree
+
+
+def run_lookups(tree, lookups, distribution, seed=0):
+    """Count the node accesses of lookups of existing keys"""
+    from analysis.benchmark import key_indexes
+
+    keys = [key for key, _ in tree.items()]
+    if not keys:
+        return
+    indexes = key_indexes(distribution, len(keys), lookups, random.Random(seed))
+    tree.enable_stats(node_accesses=True)
+    for index in indexes:
+        tree.search_value(keys[index])
+
+
+def main(argv=None):
+    from analysis.benchmark import DISTRIBUTIONS
+
+    parser = argparse.ArgumentParser(description="Draw the levels of a B+ tree")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--snapshot", help="draw the tree of a saved filesystem")
+    source.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--order", type=int, default=32)
+    parser.add_argument("--metric", choices=METRICS, default="fill")
+    parser.add_argument("--mode", choices=MODES, default="collapse")
+    parser.add_argument("--max-nodes", type=int, default=DEFAULT_MAX_NODES)
+    parser.add_argument(
+        "--lookups", type=int, help="lookups to count (default: 100,000 for accesses)"
+    )
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="zipf")
+    parser.add_argument("--format", choices=["text", "svg"], default="text")
+    parser.add_argument(
+        "--output", help="default: filesystem_visualization/tree_structure.svg"
+    )
+    args = parser.parse_args(argv)
+    if args.max_nodes < 2:
+        parser.error("--max-nodes must be at least 2")
+    lookups = args.lookups
+    if lookups is None and args.metric == "accesses":
+        lookups = 100_000
+    if args.metric == "accesses" and not lookups:
+        parser.error("--metric accesses needs lookups to count")
+
+    if args.snapshot:
+        import snapshot
+
+        fs = snapshot.load(args.snapshot)
+        fs.searcher.close()
+        tree = fs.tree
+    else:
+        tree = build_random_tree(args.entries, args.order)
+    if lookups:
+        run_lookups(tree, lookups, args.distribution)
+
+    if args.format == "text":
+        for line in text_lines(tree, args.metric, args.max_nodes, args.mode):
+            print(line)
+        return
+    output = args.output or "filesystem_visualization/tree_structure.svg"
+    with open(output, "w") as out:
+        count = write_svg(tree, out, args.metric, args.max_nodes, args.mode)
+    print(f"{count:,} boxes written to {output}")
+
+
+if __name__ == "__main__":
+    main()
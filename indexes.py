@@ -0,0 +1,72 @@
+# Secondary indexes for the VirtualFileSystem
+# The primary storage only answers "what is at this path?". Queries like "all .py files"
+# or "all directories under /src" would have to scan every entry, so two extra B+ trees
+# are kept in sync with it:
+#   by_extension: (extension, path) -> meta   (files only)
+#   by_type:      (type, path) -> meta
+# Both are sorted by path inside each extension/type, so a subtree is a single range.
+
+from bplus_tree import BPlusTree
+from layouts import narrow_prefix, prefix_end
+
+
+def extension(path):
+    """Extension of the entry name, including the dot ("" if there is none)"""
+    name = path.rpartition("/")[2]
+    return name[name.rindex(".") :] if "." in name else ""
+
+
+class SecondaryIndexes:
+    def __init__(self, order):
+        self.by_extension = BPlusTree(order)
+        self.by_type = BPlusTree(order)
+
+    def add(self, path, meta):
+        self.by_type.insert((meta["type"], path), meta)
+        if meta["type"] == "file":
+            self.by_extension.insert((extension(path), path), meta)
+
+    def remove(self, path, meta):
+        self.by_type.delete((meta["type"], path))
+        if meta["type"] == "file":
+            self.by_extension.delete((extension(path), path))
+
+    def _range(self, tree, field, root, prefix):
+        narrowed = narrow_prefix(root, prefix)
+        if narrowed is None:
+            return
+        start = (field, narrowed)
+        stop = (field, prefix_end(narrowed))
+        for (_, path), meta in tree.scan(start, stop):
+            yield path, meta
+
+    def type_range(self, kind, root, prefix=""):
+        """Yield (path, meta) of every `kind` entry below root starting with prefix"""
+        return self._range(self.by_type, kind, root, prefix)
+
+    def extension_range(self, ext, root, prefix=""):
+        """Yield (path, meta) of every file with extension `ext` below root starting with prefix"""
+        return self._range(self.by_extension, ext, root, prefix)
+
+
+class Transaction:
+    """
+    Groups the updates of the primary tree and its indexes.
+    Every applied step registers its inverse, and if any step raises,
+    the inverses run in reverse order so the trees stay consistent.
+    """
+
+    def __init__(self):
+        self.undo = []
+
+    def on_rollback(self, func, *args):
+        self.undo.append((func, args))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            for func, args in reversed(self.undo):
+                func(*args)
+        return False  # Re-raise the original error
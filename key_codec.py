@@ -0,0 +1,237 @@
+# Order-preserving binary encoding of tree keys
+# encode_key turns an int, a str, a bytes or a tuple of those (nested at will) into
+# bytes whose order is the order of the keys: a < b exactly when
+# encode_key(a) < encode_key(b). Comparing two keys is then one memcmp of two bytes
+# objects, whatever their type, instead of Python comparisons going element by
+# element through tuples; and keys of different types can share a tree (ints sort
+# before strings, then bytes, then tuples). decode_key reverses it.
+# The layout follows the FoundationDB tuple encoding: every value starts with a type
+# tag, so the encodings are self-delimiting and a tuple is just its elements one
+# after the other, closed by END:
+#   int     INT_ZERO for 0; INT_ZERO + n then n big-endian bytes for a positive int
+#           of n <= 8 bytes, INT_ZERO - n then the ones' complement for a negative
+#           one (a larger magnitude sorts lower); longer ints use INT_POS_BIG n /
+#           INT_NEG_BIG (255 - n) and up to 255 bytes
+#   str     STR, the UTF-8 bytes (code point order) with every 0x00 escaped as
+#           0x00 0xFF, then 0x00
+#   bytes   BYTES, then the same escaping as str
+#   tuple   TUPLE, the elements, then END; END sorts below every tag, so a tuple
+#           sorts before the longer tuples it is a prefix of
+# The encoding is a plain bytes string, so it can also be stored as is by an on-disk
+# or snapshot format. EncodedBPlusTree is a BPlusTree keyed by it.
+
+from operator import itemgetter
+from bplus_tree import BPlusTree
+
+END = 0x00
+INT_NEG_BIG = 0x17
+INT_ZERO = 0x20
+INT_POS_BIG = 0x29
+STR = 0x40
+BYTES = 0x41
+TUPLE = 0x50
+MAX_INT_BYTES = 255
+ZERO_KEY = bytes((INT_ZERO,))
+STR_TAG = bytes((STR,))
+BYTES_TAG = bytes((BYTES,))
+TUPLE_TAG = bytes((TUPLE,))
+TERMINATOR = bytes((END,))
+POSITIVE_TAGS = [bytes((INT_ZERO + size,)) for size in range(9)]
+NEGATIVE_TAGS = [bytes((INT_ZERO - size,)) for size in range(9)]
+
+
+# ----- Encoding -----
+
+
+def encode_int(value):
+    if value == 0:
+        return ZERO_KEY
+    size = (value.bit_length() + 7) >> 3  # Bytes of abs(value)
+    if value > 0:
+        if size <= 8:
+            return POSITIVE_TAGS[size] + value.to_bytes(size, "big")
+        body = value.to_bytes(size, "big")
+        return bytes((INT_POS_BIG, check_size(size))) + body
+    body = (value + (1 << (size << 3)) - 1).to_bytes(size, "big")
+    if size <= 8:
+        return NEGATIVE_TAGS[size] + body
+    return bytes((INT_NEG_BIG, MAX_INT_BYTES - check_size(size))) + body
+
+
+def check_size(size):
+    if size > MAX_INT_BYTES:
+        raise ValueError(f"Integer key too large to encode: {size} bytes")
+    return size
+
+
+def escape(data):
+    return data.replace(b"\x00", b"\x00\xff")
+
+
+def encode_str(value):
+    return STR_TAG + escape(value.encode()) + TERMINATOR
+
+
+def encode_bytes(value):
+    return BYTES_TAG + escape(value) + TERMINATOR
+
+
+def encode_tuple(value):
+    parts = [TUPLE_TAG]
+    for item in value:
+        encoder = ENCODERS.get(type(item))
+        parts.append(encoder(item) if encoder else encode_key(item))
+    parts.append(TERMINATOR)
+    return b"".join(parts)
+
+
+ENCODERS = {
+    int: encode_int,
+    bool: encode_int,  # Like in Python comparisons, True is 1
+    str: encode_str,
+    bytes: encode_bytes,
+    tuple: encode_tuple,
+}
+
+
+def encode_key(key):
+    """The order-preserving bytes of an int, str, bytes or tuple key"""
+    encoder = ENCODERS.get(type(key))
+    if encoder is None:
+        raise TypeError(f"Can't encode a key of type {type(key).__name__}")
+    return encoder(key)
+
+
+def encode_str_prefix(prefix):
+    """
+    The bytes every encoded str starting with prefix starts with (and only those):
+    the encoding without its terminator.
+    """
+    return STR_TAG + escape(prefix.encode())
+
+
+def bytes_prefix_end(prefix):
+    """
+    Smallest bytes greater than every bytes starting with prefix, None if there is
+    none (prefix is only 0xFF bytes). The bytes version of layouts.prefix_end.
+    """
+    stripped = prefix.rstrip(b"\xff")
+    if not stripped:
+        return None
+    return stripped[:-1] + bytes((stripped[-1] + 1,))
+
+
+# ----- Decoding -----
+
+
+def decode_key(data):
+    """The key encoded by encode_key. Raises ValueError on malformed data"""
+    try:
+        key, end = decode_at(data, 0)
+    except IndexError:
+        raise ValueError("Truncated key encoding") from None
+    if end != len(data):
+        raise ValueError(f"Trailing bytes after the key at offset {end}")
+    return key
+
+
+def unescape_at(data, start):
+    """(unescaped bytes, offset after the terminator) of a str/bytes body"""
+    end = data.index(0, start)
+    while end + 1 < len(data) and data[end + 1] == 0xFF:
+        end = data.index(0, end + 2)
+    return data[start:end].replace(b"\x00\xff", b"\x00"), end + 1
+
+
+def decode_at(data, offset):
+    """(key, offset after it) of the value encoded at offset"""
+    tag = data[offset]
+    if tag == STR:
+        raw, end = unescape_at(data, offset + 1)
+        return raw.decode(), end
+    if tag == BYTES:
+        return unescape_at(data, offset + 1)
+    if tag == TUPLE:
+        items = []
+        offset += 1
+        while data[offset] != END:
+            item, offset = decode_at(data, offset)
+            items.append(item)
+        return tuple(items), offset + 1
+    if INT_NEG_BIG <= tag <= INT_POS_BIG:
+        if tag == INT_ZERO:
+            return 0, offset + 1
+        if tag == INT_POS_BIG:
+            size, offset = data[offset + 1], offset + 2
+        elif tag == INT_NEG_BIG:
+            size, offset = MAX_INT_BYTES - data[offset + 1], offset + 2
+        else:
+            size, offset = abs(tag - INT_ZERO), offset + 1
+        end = offset + size
+        if end > len(data):
+            raise ValueError("Truncated integer in a key encoding")
+        value = int.from_bytes(data[offset:end], "big")
+        if tag < INT_ZERO:
+            value -= (1 << (8 * size)) - 1
+        return value, end
+    raise ValueError(f"Unknown type tag 0x{tag:02x} at offset {offset}")
+
+
+# ----- Tree -----
+
+
+class EncodedBPlusTree:
+    """
+    A BPlusTree whose keys are stored encoded: same interface with the original
+    keys, but every comparison in the tree is a bytes comparison, and keys of
+    different types can be mixed. Scans decode the keys they return.
+    """
+
+    def __init__(self, m):
+        self.m = m
+        self.tree = BPlusTree(m)
+
+    def __str__(self):
+        return f"EncodedBPlusTree(order={self.m}, root={self.tree.root})"
+
+    def insert(self, key, value):
+        self.tree.insert(encode_key(key), value)
+
+    def delete(self, key):
+        self.tree.delete(encode_key(key))
+
+    def search_value(self, key):
+        return self.tree.search_value(encode_key(key))
+
+    def search_values(self, keys):
+        return self.tree.search_values([encode_key(key) for key in keys])
+
+    def bulk_load(self, items):
+        """(key, value) pairs without duplicate keys, in any order"""
+        encoded = [(encode_key(key), value) for key, value in items]
+        encoded.sort(key=itemgetter(0))
+        self.tree.bulk_load(encoded)
+
+    def range_query(self, start, end):
+        return [
+            (decode_key(key), value)
+            for key, value in self.tree.range_query(encode_key(start), encode_key(end))
+        ]
+
+    def scan(self, start, stop=None):
+        stop = None if stop is None else encode_key(stop)
+        for key, value in self.tree.scan(encode_key(start), stop):
+            yield decode_key(key), value
+
+    def scan_prefix(self, prefix):
+        """The entries whose key is a str starting with prefix, in order"""
+        start = encode_str_prefix(prefix)
+        for key, value in self.tree.scan(start, bytes_prefix_end(start)):
+            yield decode_key(key), value
+
+    def items(self):
+        for key, value in self.tree.items():
+            yield decode_key(key), value
+
+    def stats(self):
+        return self.tree.stats()
@@ -0,0 +1,315 @@
+# Storage layouts used by the VirtualFileSystem
+# Both layouts expose the same small interface (lookup, insert, delete, children,
+# children_with_prefix, walk, rename),
+# so the filesystem commands don't need to know how the entries are stored.
+#
+# PathLayout: a single B+ tree keyed by the full path string ("/houses/stark/arya.txt");
+# InodeLayout: an inode table plus a directory-entry B+ tree keyed by (parent inode, name) tuples.
+
+from bplus_tree import BPlusTree
+
+
+def prefix_end(prefix):
+    """
+    Return the smallest string that is greater than every string starting with prefix.
+    Used as the exclusive upper bound of a prefix range scan.
+    """
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def normalize_path(cwd, path):
+    """
+    Resolve path against the cwd into a normalized absolute path.
+    Handles ".", ".." (never going above the root) and repeated slashes.
+    """
+    if not path.startswith("/"):
+        path = cwd + "/" + path
+
+    parts = []
+    for part in path.split("/"):
+        if part in ("", "."):
+            continue
+        if part == "..":
+            if parts:
+                parts.pop()
+            continue
+        parts.append(part)
+    return "/" + "/".join(parts)
+
+
+def narrow_prefix(root, prefix):
+    """
+    Narrowest prefix covering the descendants of root that start with prefix.
+    Returns None if no descendant can start with prefix.
+    """
+    below = root if root == "/" else root + "/"
+    if prefix.startswith(below):
+        return prefix
+    if below.startswith(prefix):
+        return below
+    return None
+
+
+def split_path(path):
+    """Split a normalized absolute path into (parent path, name)"""
+    parent, _, name = path.rpartition("/")
+    return parent or "/", name
+
+
+def join_path(parent, name):
+    return "/" + name if parent == "/" else parent + "/" + name
+
+
+class PathLayout:
+    """
+    Every entry is stored under its full path.
+    Lookups are a single descent, but keys are long strings and renaming a
+    directory has to rewrite the key of every descendant.
+    """
+
+    exact_children = False  # Listing a directory scans all its descendants
+    changes = 0  # Inserts, deletes and renames so far (see async_vfs.py)
+
+    def __init__(self, order):
+        self.tree = BPlusTree(order)
+        self.tree.insert("/", {"type": "dir"})
+
+    def lookup(self, path):
+        return self.tree.search_value(path)
+
+    def key(self, path):
+        """The key of the entry in the tree"""
+        return path
+
+    def insert(self, path, meta):
+        self.changes += 1
+        self.tree.insert(path, meta)
+
+    def delete(self, path):
+        """Remove the entry and everything stored below it"""
+        self.changes += 1
+        keys = [path] + [key for key, _ in self.descendants(path)]
+        for key in keys:
+            self.tree.delete(key)
+
+    def descendants(self, path, prefix=""):
+        """
+        Yield (path, meta) for every entry below path whose path starts with prefix.
+        All the keys below a directory are contiguous ([path/, path0)), and so are the
+        keys starting with a prefix, so this is a single range scan.
+        """
+        narrowed = narrow_prefix(path, prefix)
+        if narrowed is None:
+            return
+        for key, meta in self.tree.scan(narrowed, prefix_end(narrowed)):
+            if key != path:  # "/" is inside its own range
+                yield key, meta
+
+    def children(self, path):
+        """Yield (name, meta) for the direct children of a directory, sorted by name"""
+        below = path if path == "/" else path + "/"
+        for key, meta in self.descendants(path):
+            name = key[len(below) :]
+            if "/" not in name:
+                yield name, meta
+
+    def children_with_prefix(self, path, prefix):
+        """
+        Yield (name, meta) for the direct children whose name starts with prefix, sorted.
+        Scans [path/prefix, path/prefix_end) but jumps over the entries stored below
+        each subdirectory with a new descent, so they are never read one by one.
+        """
+        below = path if path == "/" else path + "/"
+        start = below + prefix
+        stop = prefix_end(start)
+        while True:
+            for key, meta in self.tree.scan(start, stop):
+                name = key[len(below) :]
+                if not name:  # "/" is inside its own range
+                    continue
+                if "/" not in name:
+                    yield name, meta
+                    continue
+                # First entry below a subdirectory, resume right after its subtree
+                start = prefix_end(below + name.split("/")[0] + "/")
+                break
+            else:
+                return
+
+    def walk(self, path, prefix=""):
+        """
+        Yield (path, meta) for the entry and all its descendants.
+        Only paths starting with prefix are returned, and the scanned key range is narrowed to them.
+        """
+        meta = self.lookup(path)
+        if meta is None:
+            return
+        if path.startswith(prefix):
+            yield path, meta
+        yield from self.descendants(path, prefix)
+
+    def rename(self, old, new):
+        self.changes += 1
+        # Every descendant key embeds the old path, so all of them have to move
+        moved = list(self.walk(old))
+        for key, _ in moved:
+            self.tree.delete(key)
+        for key, meta in moved:
+            self.tree.insert(new + key[len(old) :], meta)
+
+
+class InodeLayout:
+    """
+    Entries live in an inode table (inode number -> metadata) and the tree only
+    stores directory entries: (parent inode, name) -> inode.
+    Listing a directory is an exact range scan and renaming only moves one dentry.
+    """
+
+    ROOT = 0
+    exact_children = True  # Listing a directory only scans its own dentries
+    changes = 0  # Inserts, deletes and renames so far (see async_vfs.py)
+
+    def __init__(self, order):
+        self.tree = BPlusTree(order)
+        self.inodes = {self.ROOT: {"type": "dir"}}
+        self.next_ino = self.ROOT + 1
+
+    def resolve(self, path):
+        """Walk the dentries from the root and return the inode number (or None)"""
+        ino = self.ROOT
+        for name in path.split("/"):
+            if not name:
+                continue
+            ino = self.tree.search_value((ino, name))
+            if ino is None:
+                return None
+        return ino
+
+    def lookup(self, path):
+        ino = self.resolve(path)
+        return None if ino is None else self.inodes[ino]
+
+    def key(self, path):
+        """The key of the entry's dentry in the tree (the root has none)"""
+        parent, name = split_path(path)
+        return self.resolve(parent), name
+
+    def insert(self, path, meta):
+        self.changes += 1
+        parent, name = split_path(path)
+        parent_ino = self.resolve(parent)
+        if parent_ino is None:
+            raise KeyError(parent)
+
+        ino = self.tree.search_value((parent_ino, name))
+        if ino is None:  # New entry, allocate an inode for it
+            ino = self.next_ino
+            self.next_ino += 1
+            self.tree.insert((parent_ino, name), ino)
+        self.inodes[ino] = meta
+
+    def delete(self, path):
+        """Remove the entry and everything stored below it"""
+        self.changes += 1
+        parent, name = split_path(path)
+        parent_ino = self.resolve(parent)
+        if parent_ino is None:
+            return
+        ino = self.tree.search_value((parent_ino, name))
+        if ino is None:
+            return
+
+        # Collect the whole subtree before touching the tree
+        dentries = [(parent_ino, name)]
+        pending = [ino]
+        while pending:
+            current = pending.pop()
+            for key, child in self.tree.scan((current,), (current + 1,)):
+                dentries.append(key)
+                pending.append(child)
+            del self.inodes[current]
+
+        for key in dentries:
+            self.tree.delete(key)
+
+    def _scan_dir(self, ino):
+        # (ino,) sorts before every (ino, name) and (ino + 1,) after all of them
+        for (_, name), child in self.tree.scan((ino,), (ino + 1,)):
+            yield name, child
+
+    def children(self, path):
+        """Yield (name, meta) for the direct children of a directory, sorted by name"""
+        ino = self.resolve(path)
+        if ino is None:
+            return
+        for name, child in self._scan_dir(ino):
+            yield name, self.inodes[child]
+
+    def children_with_prefix(self, path, prefix):
+        """Yield (name, meta) for the direct children whose name starts with prefix, sorted"""
+        ino = self.resolve(path)
+        if ino is None:
+            return
+        if not prefix:
+            entries = self._scan_dir(ino)
+        else:
+            entries = (
+                (name, child)
+                for (_, name), child in self.tree.scan(
+                    (ino, prefix), (ino, prefix_end(prefix))
+                )
+            )
+        for name, child in entries:
+            yield name, self.inodes[child]
+
+    def walk(self, path, prefix=""):
+        """
+        Yield (path, meta) for the entry and all its descendants (depth-first).
+        Only paths starting with prefix are returned, directories that can't lead to
+        one of them are never scanned.
+        """
+        ino = self.resolve(path)
+        if ino is None:
+            return
+        stack = [(path, ino)]
+        while stack:
+            current, ino = stack.pop()
+            if current.startswith(prefix):
+                yield current, self.inodes[ino]
+
+            below = current if current == "/" else current + "/"
+            if not (current.startswith(prefix) or prefix.startswith(below)):
+                continue  # Nothing below this entry can match
+
+            rest = prefix[len(below) :] if prefix.startswith(below) else ""
+            if "/" in rest:  # The prefix goes through exactly one child
+                name = rest.split("/")[0]
+                child = self.tree.search_value((ino, name))
+                entries = [] if child is None else [(name, child)]
+            elif rest:  # Only children whose name starts with rest
+                entries = [
+                    (name, child)
+                    for (_, name), child in self.tree.scan(
+                        (ino, rest), (ino, prefix_end(rest))
+                    )
+                ]
+            else:
+                entries = list(self._scan_dir(ino))
+
+            # Reversed so the children come out of the stack in name order
+            for name, child in reversed(entries):
+                stack.append((join_path(current, name), child))
+
+    def rename(self, old, new):
+        self.changes += 1
+        old_parent, old_name = split_path(old)
+        new_parent, new_name = split_path(new)
+        old_parent_ino = self.resolve(old_parent)
+        new_parent_ino = self.resolve(new_parent)
+
+        ino = self.tree.search_value((old_parent_ino, old_name))
+        self.tree.delete((old_parent_ino, old_name))
+        self.tree.insert((new_parent_ino, new_name), ino)
+
+
+LAYOUTS = {"path": PathLayout, "inode": InodeLayout}
@@ -0,0 +1,53 @@
+# Readers-writer lock used to run filesystem commands from several threads
+# Any number of read-only commands (ls, find, grep, cat) can scan the tree at the same
+# time, while a mutation (mkdir, touch, rm, mv, cd, echo >) runs alone.
+# Waiting writers block new readers, so a stream of scans can't starve mutations.
+
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.readers = 0
+        self.writer = False
+        self.waiting_writers = 0
+
+    @contextmanager
+    def read(self, blocking=True):
+        """
+        Shared access. With blocking=False it doesn't wait for the writers:
+        it yields False right away if it can't get the lock (and True otherwise).
+        """
+        with self.cond:
+            acquired = blocking or not (self.writer or self.waiting_writers)
+            if acquired:
+                while self.writer or self.waiting_writers:
+                    self.cond.wait()
+                self.readers += 1
+        if not acquired:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            with self.cond:
+                self.readers -= 1
+                if not self.readers:
+                    self.cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self.cond:
+            self.waiting_writers += 1
+            while self.writer or self.readers:
+                self.cond.wait()
+            self.waiting_writers -= 1
+            self.writer = True
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.writer = False
+                self.cond.notify_all()
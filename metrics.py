@@ -0,0 +1,314 @@
+# Command metrics of the VirtualFileSystem, shown by the "stats" shell command
+# VirtualFileSystem.enable_metrics() wraps the command methods of one filesystem so
+# every call is timed into a latency histogram of its command. The histograms are
+# HDR-style: log-linear buckets with a fixed relative error (under 1%), so recording
+# is O(1), the memory doesn't grow with the number of commands and any percentile
+# can be read back. A filesystem without metrics runs the plain methods.
+
+import math
+import os
+import sys
+import threading
+import time
+
+SUB_BUCKET_BITS = 7  # 128 buckets per power of 2: values are kept within 1/128
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+PERCENTILES = [50, 90, 99, 99.9]
+
+# VirtualFileSystem method -> command it is recorded under. ls, find and grep call
+# their iter_ version: only the outermost call of a command is recorded.
+METERED = {
+    "mkdir": "mkdir",
+    "touch": "touch",
+    "rm": "rm",
+    "mv": "mv",
+    "cd": "cd",
+    "cat": "cat",
+    "write": "echo",
+    "ls": "ls",
+    "iter_ls": "ls",
+    "find": "find",
+    "iter_find": "find",
+    "grep": "grep",
+    "iter_grep": "grep",
+}
+STREAMING = {"iter_ls", "iter_find", "iter_grep"}  # Timed until they are drained
+
+
+def bucket_index(value):
+    """Bucket of a non-negative integer value"""
+    shift = max(0, value.bit_length() - SUB_BUCKET_BITS - 1)
+    return shift * SUB_BUCKETS + (value >> shift)
+
+
+def bucket_range(index):
+    """(lowest, highest) value recorded in a bucket"""
+    shift = max(0, index // SUB_BUCKETS - 1)
+    sub = index - shift * SUB_BUCKETS
+    return sub << shift, ((sub + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """Counts of values (nanoseconds) per log-linear bucket, with exact min/max/total"""
+
+    def __init__(self):
+        self.counts = {}  # Bucket index -> count, only the buckets used
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        index = bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def add(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, q):
+        """Nearest-rank percentile, as the highest value of its bucket (None if empty)"""
+        if not self.count:
+            return None
+        rank = min(self.count, max(1, math.ceil(q / 100 * self.count)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(bucket_range(index)[1], self.max)
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def as_dict(self):
+        result = {
+            "count": self.count,
+            "total_ns": self.total,
+            "min_ns": self.min,
+            "max_ns": self.max,
+            "mean_ns": self.mean(),
+        }
+        for q in PERCENTILES:
+            result[f"p{q:g}_ns"] = self.percentile(q)
+        result["buckets"] = [
+            [*bucket_range(index), self.counts[index]] for index in sorted(self.counts)
+        ]
+        return result
+
+
+class CommandMetrics:
+    """Latency histogram of every command run since the metrics were enabled"""
+
+    def __init__(self):
+        self.histograms = {}
+        self.started = time.monotonic()
+        self.mutex = threading.Lock()  # Read-only commands run in parallel threads
+        self.local = threading.local()  # Set while a thread runs a timed command
+
+    def record(self, command, elapsed):
+        with self.mutex:
+            histogram = self.histograms.get(command)
+            if histogram is None:
+                histogram = self.histograms[command] = LatencyHistogram()
+            histogram.record(elapsed)
+
+    def reset(self):
+        with self.mutex:
+            self.histograms = {}
+            self.started = time.monotonic()
+
+    def timed(self, method, command):
+        """method, recording the time of its outermost calls into command's histogram"""
+        local = self.local
+        clock = time.perf_counter_ns
+
+        def call(*args, **kwargs):
+            if getattr(local, "running", False):  # Called by another command
+                return method(*args, **kwargs)
+            local.running = True
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                local.running = False
+                self.record(command, elapsed)
+
+        return call
+
+    def timed_stream(self, method, command):
+        """Same as timed() for a method returning an iterator"""
+        local = self.local
+
+        def call(*args, **kwargs):
+            lines = method(*args, **kwargs)
+            if getattr(local, "running", False):
+                return lines
+            return self.drain_timer(lines, command)
+
+        return call
+
+    def drain_timer(self, lines, command):
+        """
+        Yields the lines, recording the time spent producing them once the iterator
+        is drained or closed. The time the caller spends on each line isn't counted.
+        """
+        clock = time.perf_counter_ns
+        busy = 0
+        try:
+            while True:
+                start = clock()
+                try:
+                    line = next(lines)
+                except StopIteration:
+                    return
+                finally:
+                    busy += clock() - start
+                yield line
+        finally:
+            lines.close()
+            self.record(command, busy)
+
+    def snapshot(self):
+        """Counts, throughput and latencies of every command, the most frequent first"""
+        with self.mutex:
+            uptime = time.monotonic() - self.started
+            commands = {}
+            for command, histogram in sorted(
+                self.histograms.items(), key=lambda item: -item[1].count
+            ):
+                commands[command] = histogram.as_dict()
+                commands[command]["ops_per_s"] = (
+                    1e9 * histogram.count / histogram.total if histogram.total else None
+                )
+        count = sum(command["count"] for command in commands.values())
+        return {
+            "uptime_s": uptime,
+            "commands": count,
+            "commands_per_s": count / uptime if uptime else None,
+            "by_command": commands,
+        }
+
+
+def memory_usage():
+    """Resident memory of the process in bytes (current, peak), None when unknown"""
+    current = peak = None
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass  # Not Linux
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak *= 1 if sys.platform == "darwin" else 1024  # Bytes on macOS, KiB elsewhere
+    except ImportError:
+        pass  # Windows
+    if current is not None and peak is not None:
+        peak = max(peak, current)  # statm also counts the shared pages
+    return {"rss_bytes": current, "peak_rss_bytes": peak}
+
+
+def collect_stats(vfs):
+    """Everything the stats command shows, as a JSON-compatible dict"""
+    return {
+        "metrics": vfs.metrics.snapshot() if vfs.metrics else None,
+        "tree": vfs.tree.stats(),
+        "dentry_cache": vfs.cache_stats(),
+        "memory": memory_usage(),
+    }
+
+
+def microseconds(ns):
+    return "-" if ns is None else f"{ns / 1000:.1f}"
+
+
+def megabytes(size):
+    return "?" if size is None else f"{size / 2**20:.1f} MB"
+
+
+def format_stats(stats):
+    """Text of the stats command"""
+    lines = []
+    metrics = stats["metrics"]
+    if metrics is None:
+        lines.append("Command metrics are off ('stats on' starts recording)")
+    else:
+        lines.append(
+            f"{metrics['commands']:,} commands in {metrics['uptime_s']:.2f} s"
+            f" ({metrics['commands_per_s'] or 0:,.1f} commands/s)"
+        )
+        if metrics["by_command"]:
+            lines.append(
+                f"{'command':<8}{'count':>9}{'p50':>10}{'p99':>10}{'max':>10}"
+                f"{'ops/s':>10}   (latencies in us)"
+            )
+        for command, values in metrics["by_command"].items():
+            lines.append(
+                f"{command:<8}{values['count']:>9,}"
+                f"{microseconds(values['p50_ns']):>10}"
+                f"{microseconds(values['p99_ns']):>10}"
+                f"{microseconds(values['max_ns']):>10}"
+                f"{values['ops_per_s'] or 0:>10,.0f}"
+            )
+
+    tree = stats["tree"]
+    lines.append(
+        f"Tree: order {tree['order']}, height {tree['height']}, "
+        f"{tree['entries']:,} entries, {tree['leaves']:,} leaves "
+        f"({tree['leaf_fill']:.0%} full)"
+    )
+    cache = stats["dentry_cache"]
+    lines.append(
+        f"Dentry cache: {cache['hit_rate']:.1%} hits "
+        f"({cache['hits']:,} hits, {cache['misses']:,} misses), "
+        f"{cache['size']:,}/{cache['capacity']:,} entries"
+    )
+    memory = stats["memory"]
+    lines.append(
+        f"Memory: {megabytes(memory['rss_bytes'])} resident, "
+        f"{megabytes(memory['peak_rss_bytes'])} peak"
+    )
+    return "\n".join(lines)
+
+
+def stats_command(vfs, params):
+    """stats [on | off | reset | --json [FILE]]"""
+    if not params:
+        return format_stats(collect_stats(vfs))
+    if params == ["on"]:
+        vfs.enable_metrics()
+        return "Command metrics on"
+    if params == ["off"]:
+        vfs.disable_metrics()
+        return "Command metrics off"
+    if params == ["reset"]:
+        if vfs.metrics:
+            vfs.metrics.reset()
+        return "Command metrics reset"
+    if params[0] == "--json" and len(params) <= 2:
+        import json
+
+        text = json.dumps(collect_stats(vfs), indent=2)
+        if len(params) == 1:
+            return text
+        try:
+            with open(params[1], "w") as f:
+                f.write(text + "\n")
+        except OSError as e:
+            return f"Cannot write {params[1]}: {e.strerror}"
+        return f"Stats written to {params[1]}"
+    return None
@@ -0,0 +1,96 @@
+# Virtualized output pane for the Textual shell
+# Rendering a whole listing through Static.update means building one giant string and
+# letting Textual lay all of it out. Instead, the pane keeps the output lines in a
+# bounded scrollback buffer and only renders the rows that are visible on screen
+# (Textual's line API calls render_line once per visible row).
+
+from rich.cells import cell_len
+from rich.segment import Segment
+from textual.geometry import Size
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+
+
+class Scrollback:
+    """
+    Fixed-capacity ring buffer of lines with O(1) random access.
+    When it is full, the oldest lines are dropped.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.lines = []
+        self.start = 0  # Position of the oldest line once the buffer is full
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __getitem__(self, index):
+        return self.lines[(self.start + index) % self.capacity]
+
+    def extend(self, lines):
+        """Append lines, returns how many old lines were dropped"""
+        dropped = 0
+        for line in lines:
+            if len(self.lines) < self.capacity:
+                self.lines.append(line)
+            else:
+                self.lines[self.start] = line
+                self.start = (self.start + 1) % self.capacity
+                dropped += 1
+        return dropped
+
+
+def pack_words(words, width, sep=" "):
+    """
+    Lazily group words (ls names) into rows that fit in width, so a directory
+    with 100k entries becomes many short rows instead of one giant line.
+    """
+    row = ""
+    for word in words:
+        if row and len(row) + len(sep) + len(word) > width:
+            yield row
+            row = word
+        else:
+            row = row + sep + word if row else word
+    if row:
+        yield row
+
+
+class OutputPane(ScrollView):
+    DEFAULT_CSS = """
+    OutputPane {
+        height: 1fr;
+    }
+    """
+
+    def __init__(self, max_lines=50_000, **kwargs):
+        super().__init__(**kwargs)
+        self.scrollback = Scrollback(max_lines)
+        self.max_width = 0
+
+    def write_lines(self, lines):
+        """Append lines, following the output if the view was at the bottom"""
+        if not lines:
+            return
+        follow = self.scroll_offset.y >= self.max_scroll_y
+        dropped = self.scrollback.extend(lines)
+        self.max_width = max(self.max_width, max(cell_len(line) for line in lines))
+        self.virtual_size = Size(self.max_width, len(self.scrollback))
+
+        if follow:
+            self.scroll_end(animate=False)
+        elif dropped:  # Keep the same lines on screen while old ones are dropped
+            self.scroll_to(y=max(0, self.scroll_offset.y - dropped), animate=False)
+        self.refresh()
+
+    def render_line(self, y):
+        scroll_x, scroll_y = self.scroll_offset
+        index = scroll_y + y
+        width = self.size.width
+        if index >= len(self.scrollback):
+            return Strip.blank(width, self.rich_style)
+
+        text = self.scrollback[index]
+        strip = Strip([Segment(text, self.rich_style)], cell_len(text))
+        return strip.crop_extend(scroll_x, scroll_x + width, self.rich_style)
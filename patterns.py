@@ -0,0 +1,67 @@
+# Pattern helpers for the find command
+# Patterns are compiled once per command, and their literal prefix (the part before
+# the first wildcard) is used to narrow the range of keys that has to be scanned.
+
+import fnmatch
+import re
+
+GLOB_SPECIAL = "*?["
+REGEX_SPECIAL = ".^$*+?{}[]\\|()"
+REGEX_OPTIONAL = "*?{"  # Quantifiers that make the previous character optional
+
+
+def compile_glob(pattern):
+    """Compile a shell glob into a regex matching the whole string"""
+    return re.compile(fnmatch.translate(pattern))
+
+
+def compile_regex(pattern):
+    return re.compile(pattern)
+
+
+def glob_prefix(pattern):
+    """Literal characters before the first wildcard of a glob"""
+    for i, char in enumerate(pattern):
+        if char in GLOB_SPECIAL:
+            return pattern[:i]
+    return pattern
+
+
+def glob_extension(pattern):
+    """
+    Extension that every name matching the glob ends with ("*.py" -> ".py"),
+    or None if the glob doesn't pin one down.
+    """
+    suffix = re.split(r"[*?\[\]]", pattern)[-1]
+    if "." not in suffix:
+        return None
+    return suffix[suffix.rindex(".") :]
+
+
+def regex_prefix(pattern):
+    """
+    Literal characters every match of the regex has to start with.
+    Conservative: returns "" whenever the pattern is not a plain literal run.
+    """
+    if "|" in pattern:  # Alternations can start with anything
+        return ""
+    if pattern.startswith("^"):
+        pattern = pattern[1:]
+
+    prefix = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\" and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+            literal, step = pattern[i + 1], 2  # Escaped punctuation like \. or \/
+        elif char in REGEX_SPECIAL:
+            break
+        else:
+            literal, step = char, 1
+
+        # "ab*" only guarantees "a"
+        if i + step < len(pattern) and pattern[i + step] in REGEX_OPTIONAL:
+            break
+        prefix.append(literal)
+        i += step
+    return "".join(prefix)
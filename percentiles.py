@@ -0,0 +1,10 @@
+# Latency statistics shared by the script mode (replay.py) and the benchmarks
+# (analysis/), kept apart so a benchmark doesn't import the shell entry point.
+
+import math
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted sequence"""
+    rank = math.ceil(q / 100 * len(sorted_values))  # 1-based
+    return sorted_values[min(len(sorted_values), max(1, rank)) - 1]
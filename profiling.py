@@ -0,0 +1,225 @@
+# Profiling of a single shell command: "profile [options] <command...>"
+# The command runs as usual (its output is dropped, only its size is shown) under
+# cProfile, or under a sampling profiler with --sample, and the functions of the
+# project (bplus_tree.py, commands.py, layouts.py...) that took the most time are
+# listed by cumulative time.
+#   profile find / -name *.txt                      -> cProfile, top 15 functions
+#   profile --out find.prof find / -name *.txt      -> also dump the pstats file
+#   profile --sample --out ls.folded ls /big        -> sampling, collapsed stacks
+# pstats files open with python3 -m pstats, snakeviz...; collapsed stacks ("a;b;c 12"
+# per line) with flamegraph.pl or speedscope. cProfile makes every Python call
+# slower, the sampler doesn't but misses what runs faster than its interval.
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TOP = 15
+DEFAULT_INTERVAL_MS = 1.0
+USAGE = "profile [--sample] [--interval ms] [--top n] [--out file] <command...>"
+
+
+def parse_profile(params):
+    """(options, command line) of "profile [options] <command...>", None if invalid"""
+    options = {"sample": False, "interval": DEFAULT_INTERVAL_MS, "top": DEFAULT_TOP}
+    options["out"] = None
+    params = list(params)
+    try:
+        while params and params[0].startswith("--"):
+            flag = params.pop(0)
+            if flag == "--sample":
+                options["sample"] = True
+            elif flag == "--interval":
+                options["interval"] = float(params.pop(0))
+            elif flag == "--top":
+                options["top"] = int(params.pop(0))
+            elif flag == "--out":
+                options["out"] = params.pop(0)
+            else:
+                return None
+    except (IndexError, ValueError):
+        return None
+    if not params or params[0] in ("profile", "exit") or options["interval"] <= 0:
+        return None
+    return options, " ".join(params)
+
+
+def in_project(filename):
+    """Files of the project, except this one"""
+    path = os.path.abspath(filename)  # Built-in functions have no .py file
+    return (
+        path.endswith(".py")
+        and os.path.dirname(path) == PROJECT_DIR
+        and path != os.path.abspath(__file__)
+    )
+
+
+def label(code):
+    """module:Class.function of a code object, the name used in collapsed stacks"""
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{qualname(code)}"
+
+
+def qualname(code):
+    """Class.function of a code object (co_qualname is Python 3.11+)"""
+    return getattr(code, "co_qualname", code.co_name)
+
+
+class SamplingProfiler:
+    """
+    Records the call stack of a function from another thread, every interval
+    seconds. Only the frames of the function and below are kept.
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.stacks = Counter()  # Tuple of code objects, outermost first -> samples
+        self.samples = 0
+        self.running = False
+
+    def runcall(self, func, *args):
+        """Call func(*args) while sampling it (like cProfile.Profile.runcall)"""
+        self.target = threading.get_ident()
+        self.base = sys._getframe()
+        stopped = threading.Event()
+        thread = threading.Thread(target=self.run, args=(stopped,), daemon=True)
+        # A thread holding the GIL is only interrupted every switch interval
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(switch_interval, self.interval))
+        self.running = True
+        thread.start()
+        try:
+            return func(*args)
+        finally:
+            self.running = False
+            stopped.set()
+            thread.join()
+            sys.setswitchinterval(switch_interval)
+
+    def run(self, stopped):
+        while not stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            if not self.running:  # The frame may be the profiler's own
+                break
+            stack = []
+            while frame is not None and frame is not self.base:
+                if frame.f_code.co_filename != __file__:  # Not the profiler's own
+                    stack.append(frame.f_code)
+                frame = frame.f_back
+            if frame is not None and stack:  # Still inside the profiled code
+                self.stacks[tuple(reversed(stack))] += 1
+                self.samples += 1
+
+    def collapsed(self):
+        """Lines of the collapsed-stack format, "outer;...;inner count" """
+        lines = Counter()
+        for stack, count in self.stacks.items():
+            lines[";".join(label(code) for code in stack)] += count
+        return [f"{stack} {count}" for stack, count in sorted(lines.items())]
+
+    def functions(self):
+        """{code: (self samples, cumulative samples)}, a function counts once per sample"""
+        result = {}
+        for stack, count in self.stacks.items():
+            for code in set(stack):
+                own, total = result.get(code, (0, 0))
+                result[code] = (own, total + count)
+            own, total = result[stack[-1]]
+            result[stack[-1]] = (own + count, total)
+        return result
+
+
+def run(command):
+    """Run the command line, draining streams. Returns the number of output lines"""
+    from dispatcher import Stream
+
+    output = command()
+    if isinstance(output, Stream):
+        return sum(1 for _ in output)
+    if isinstance(output, str):
+        return output.count("\n") + 1 if output else 0
+    return 0  # None for an empty line
+
+
+def cprofile_report(vfs, cmd, options):
+    import cProfile
+    import pstats
+    from dispatcher import dispatch
+
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    lines = profiler.runcall(run, lambda: dispatch(vfs, cmd))
+    elapsed = time.perf_counter() - start
+    if options["out"]:
+        profiler.dump_stats(options["out"])
+
+    rows = []
+    for (filename, line, name), values in pstats.Stats(profiler).stats.items():
+        calls, _, own, total, _ = values
+        if in_project(filename):
+            where = f"{os.path.basename(filename)}:{line}"
+            rows.append((total, own, calls, f"{name} ({where})"))
+    rows.sort(reverse=True)
+    header = f"{cmd}: {elapsed * 1000:.1f} ms under cProfile, {lines:,} lines of output"
+    return header, ["calls", *(f"{calls:,}" for _, _, calls, _ in rows)], rows
+
+
+def sampling_report(vfs, cmd, options):
+    from dispatcher import dispatch
+
+    sampler = SamplingProfiler(options["interval"] / 1000)
+    start = time.perf_counter()
+    lines = sampler.runcall(run, lambda: dispatch(vfs, cmd))
+    elapsed = time.perf_counter() - start
+    if options["out"]:
+        with open(options["out"], "w") as f:
+            f.writelines(line + "\n" for line in sampler.collapsed())
+
+    # Times are estimated from the share of the samples
+    per_sample = elapsed / sampler.samples if sampler.samples else 0
+    rows = []
+    for code, (own, total) in sampler.functions().items():
+        if in_project(code.co_filename):
+            where = f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}"
+            name = f"{qualname(code)} ({where})"
+            rows.append((total * per_sample, own * per_sample, total, name))
+    rows.sort(reverse=True)
+    header = (
+        f"{cmd}: {elapsed * 1000:.1f} ms, {sampler.samples:,} samples every "
+        f"{options['interval']:g} ms, {lines:,} lines of output"
+    )
+    return header, ["samples", *(f"{count:,}" for _, _, count, _ in rows)], rows
+
+
+def profile_command(vfs, params):
+    """profile [--sample] [--interval ms] [--top n] [--out file] <command...>"""
+    parsed = parse_profile(params)
+    if parsed is None:
+        return f"Usage: {USAGE}"
+    options, cmd = parsed
+    report = sampling_report if options["sample"] else cprofile_report
+    try:
+        header, counts, rows = report(vfs, cmd, options)
+    except OSError as e:
+        return f"Cannot write {options['out']}: {e.strerror}"
+
+    lines = [header]
+    if not rows:
+        lines.append(
+            "No samples: the command is faster than the interval"
+            if options["sample"]
+            else "No function of the project was called"
+        )
+        return "\n".join(lines)
+    width = max(len(count) for count in counts) + 2
+    lines.append(f"{'cumulative':>12}{'own':>10}{counts[0]:>{width}}  function")
+    for (total, own, _, name), count in zip(rows[: options["top"]], counts[1:]):
+        lines.append(
+            f"{total * 1000:>10.2f}ms{own * 1000:>8.2f}ms{count:>{width}}  {name}"
+        )
+    if options["out"]:
+        lines.append(f"Profile written to {options['out']}")
+    return "\n".join(lines)
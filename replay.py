@@ -0,0 +1,75 @@
+# Replay of shell command lines, used by the script mode of shell.py, the workload
+# replayer (analysis/vfs_workload.py) and the tests, with its latency reports.
+# Kept out of shell.py so the analysis code doesn't import the entry point.
+
+import sys
+import time
+from array import array
+from dispatcher import EXIT, Stream, dispatch
+from percentiles import percentile
+
+PERCENTILES = [50, 90, 99, 99.9]
+
+
+def run_script(vfs, lines, out=None, by_command=None, run=dispatch):
+    """
+    Replay command lines against the filesystem, writing each output to out
+    (None discards them). Blank lines and "#" comments are skipped.
+    Returns the latency of every command in nanoseconds. When by_command is a
+    dict, the latencies are also added to by_command[command name].
+    run: how a command runs, dispatch or vfs_client.remote_dispatch for a session
+    """
+    latencies = array("Q")  # Compact even for million-command traces
+    clock = time.perf_counter_ns
+    for line in lines:
+        cmd = line.strip()
+        if not cmd or cmd.startswith("#"):
+            continue
+
+        start = clock()
+        output = run(vfs, cmd)
+        if output is EXIT:
+            break
+        if isinstance(output, Stream):  # Streaming commands only finish once drained
+            output = output.render()
+        elapsed = clock() - start
+        latencies.append(elapsed)
+        if by_command is not None:
+            op = cmd.split(maxsplit=1)[0]
+            if op not in by_command:
+                by_command[op] = array("Q")
+            by_command[op].append(elapsed)
+
+        if out is not None:
+            out.write(output + "\n")
+    return latencies
+
+
+def report(latencies, elapsed, out=sys.stderr):
+    """Print the throughput and latency percentiles of a replay"""
+    count = len(latencies)
+    out.write(f"\n{count} commands in {elapsed:.3f} s")
+    if not count:
+        out.write("\n")
+        return
+    out.write(f" ({count / elapsed:,.0f} commands/s)\n")
+
+    ordered = sorted(latencies)
+    parts = [f"p{q:g}={percentile(ordered, q) / 1000:.1f}" for q in PERCENTILES]
+    parts.append(f"max={ordered[-1] / 1000:.1f}")
+    out.write("latency (us): " + " ".join(parts) + "\n")
+
+
+def report_commands(by_command, out=sys.stderr):
+    """Print the latency percentiles of every command name, the most frequent first"""
+    out.write(f"\n{'command':<10}{'count':>9}")
+    out.write("".join(f"{f'p{q:g}':>10}" for q in PERCENTILES))
+    out.write(f"{'max':>10}{'share':>8}   (latencies in us)\n")
+    total = sum(sum(values) for values in by_command.values()) or 1
+    for op, values in sorted(by_command.items(), key=lambda item: -len(item[1])):
+        ordered = sorted(values)
+        out.write(f"{op:<10}{len(ordered):>9,}")
+        out.write(
+            "".join(f"{percentile(ordered, q) / 1000:>10.1f}" for q in PERCENTILES)
+        )
+        out.write(f"{ordered[-1] / 1000:>10.1f}{sum(ordered) / total:>8.1%}\n")
@@ -0,0 +1,514 @@
+# Key-range sharding of a B+ tree across worker processes
+# A CPython process runs one tree operation at a time, on one core. ShardedBPlusTree
+# splits the key space into contiguous ranges, each owned by a BPlusTree living in its
+# own worker process (a shard). The process using it is the router: it finds the shard
+# owning a key with a binary search over the shard boundaries and talks to the
+# workers through pipes.
+#   - insert, delete and search_value go to the owning shard;
+#   - insert_many, get_many and delete_many are grouped by shard and sent to every
+#     shard before any reply is read, so the shards work at the same time;
+#   - range_query and scan fan out to the shards overlapping the range and merge the
+#     results in key order. The ranges are disjoint, so the merge is a concatenation
+#     in boundary order; scan pages through each shard SCAN_CHUNK entries at a time.
+# Every window operations, the router looks at the shards: while there are fewer
+# than max_shards, a shard holding more than max_entries keys is split at its median
+# key, or else the busiest one is split at the median of the keys it was asked for
+# (so the load is halved, not just the keys). With max_shards shards, a shard too
+# large or too busy moves its boundary with a neighbour instead.
+# A round trip through a pipe costs tens of microseconds, much more than a tree
+# operation: single point operations are slower than with a local tree, the
+# parallelism comes from the batches (see analysis/shard_benchmark.py).
+# Like BPlusTree, a ShardedBPlusTree is used by one thread at a time.
+
+import os
+import signal
+from bisect import bisect_left, bisect_right
+from collections import deque
+from itertools import islice, takewhile
+from multiprocessing import Pipe, Process
+from bplus_tree import BPlusTree
+from layouts import prefix_end
+
+DEFAULT_ORDER = 64
+DEFAULT_MAX_ENTRIES = 1_000_000
+DEFAULT_WINDOW = 50_000
+MIN_SPLIT_ENTRIES = 1_000  # Smaller shards are never split for their load
+HOT_FACTOR = 2  # Too busy: more than twice the operations of its lighter neighbour
+SAMPLE_EVERY = 8  # One key in SAMPLE_EVERY is kept to find the load median
+SAMPLE_SIZE = 1_024
+SCAN_CHUNK = 4_096
+
+
+# ----- Worker side -----
+
+
+def tree_from(order, items):
+    """B+ tree of sorted (key, value) pairs"""
+    tree = BPlusTree(order)
+    tree.bulk_load(items)
+    return tree
+
+
+class ShardTree:
+    """The tree of one shard, inside its worker process"""
+
+    REQUESTS = {
+        "insert",
+        "delete",
+        "get",
+        "insert_many",
+        "get_many",
+        "delete_many",
+        "range",
+        "scan",
+        "cut",
+        "load",
+        "key_at",
+    }
+
+    def __init__(self, order):
+        self.order = order
+        self.tree = BPlusTree(order)
+        self.entries = 0
+
+    def contains(self, key):
+        return key in self.tree.search(key).keys
+
+    def insert(self, key, value):
+        self.entries += not self.contains(key)
+        self.tree.insert(key, value)
+
+    def delete(self, key):
+        if self.contains(key):
+            self.tree.delete(key)
+            self.entries -= 1
+
+    def get(self, key):
+        return self.tree.search_value(key)
+
+    def insert_many(self, items):
+        for key, value in items:
+            self.insert(key, value)
+
+    def get_many(self, keys):
+        return self.tree.search_values(keys)
+
+    def delete_many(self, keys):
+        for key in keys:
+            self.delete(key)
+
+    def range(self, start, end):
+        return self.tree.range_query(start, end)
+
+    def scan(self, start, stop, after, limit):
+        """
+        At most limit entries of [start, stop), from the first key if start is None;
+        after: start is the last key already returned, skip it
+        """
+        items = self.tree.items() if start is None else self.tree.scan(start, stop)
+        if start is None and stop is not None:
+            items = takewhile(lambda item: item[0] < stop, items)
+        chunk = list(islice(items, limit + after))
+        if after and chunk and chunk[0][0] == start:
+            return chunk[1:]
+        return chunk[:limit]
+
+    def cut(self, key, upper):
+        """Remove and return the entries from key on (upper) or below key"""
+        items = list(self.tree.items())
+        index = bisect_left([k for k, _ in items], key)
+        kept, removed = (items[:index], items[index:])
+        if not upper:
+            kept, removed = removed, kept
+        self.tree = tree_from(self.order, kept)
+        self.entries = len(kept)
+        return removed
+
+    def load(self, items):
+        self.insert_many(items)
+
+    def key_at(self, index):
+        """The key at a position of the shard, in key order"""
+        return next(islice(self.tree.items(), index, None))[0]
+
+
+def serve(conn, order):
+    """
+    Runs inside a worker process: answers the router's requests until the pipe is
+    closed. A request is (name of a ShardTree method, args), a batch being a
+    single request with a list argument; a reply is (ok, result or exception,
+    number of entries of the shard).
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C is handled by the router
+    shard = ShardTree(order)
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        try:
+            name, args = request
+            if name not in ShardTree.REQUESTS:
+                raise ValueError(f"Unknown request: {name}")
+            reply = (True, getattr(shard, name)(*args), shard.entries)
+        except Exception as error:  # Sent back and raised in the router
+            reply = (False, error, shard.entries)
+        conn.send(reply)
+
+
+# ----- Router side -----
+
+
+class Shard:
+    """A worker process and what the router knows about it"""
+
+    __slots__ = ("process", "conn", "entries", "operations", "sample", "seen")
+
+    def __init__(self, order):
+        self.conn, worker_conn = Pipe()
+        self.process = Process(target=serve, args=(worker_conn, order), daemon=True)
+        self.process.start()
+        worker_conn.close()
+        self.entries = 0
+        self.operations = 0  # In the current window
+        self.sample = deque(maxlen=SAMPLE_SIZE)  # Keys asked in the window
+        self.seen = 0
+
+    def send(self, name, *args):
+        self.conn.send((name, args))
+
+    def receive(self):
+        ok, result, self.entries = self.conn.recv()
+        if not ok:
+            raise result
+        return result
+
+    def call(self, name, *args):
+        self.send(name, *args)
+        return self.receive()
+
+    def count(self, keys):
+        """Account for operations on keys (a list)"""
+        self.operations += len(keys)
+        start = -self.seen % SAMPLE_EVERY
+        self.sample.extend(keys[start::SAMPLE_EVERY])
+        self.seen += len(keys)
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass  # The worker is already gone
+        self.conn.close()
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+def receive_all(shards):
+    """
+    The replies of shards that were each sent a request, in the same order. Every
+    reply is read before the first error is raised, so no pipe is left holding the
+    answer to an earlier request.
+    """
+    results = []
+    error = None
+    for shard in shards:
+        try:
+            results.append(shard.receive())
+        except Exception as e:
+            error = error or e
+            results.append(None)
+    if error is not None:
+        raise error
+    return results
+
+
+class ShardedBPlusTree:
+    """
+    B+ tree partitioned by key range over worker processes, with the interface of
+    BPlusTree for its data (insert, delete, search_value, range_query, scan, items).
+    boundaries: lowest keys of the shards after the first one, to start with several
+    shards; otherwise one shard is started and split as it grows.
+    max_shards: default, one per CPU.
+    """
+
+    def __init__(
+        self,
+        order=DEFAULT_ORDER,
+        boundaries=(),
+        max_shards=None,
+        max_entries=DEFAULT_MAX_ENTRIES,
+        window=DEFAULT_WINDOW,
+    ):
+        self.m = order
+        self.max_shards = max_shards or os.cpu_count() or 1
+        self.max_entries = max_entries
+        self.window = window
+        self.operations = 0  # Since the last maintenance
+        self.lows = sorted(boundaries)  # lows[i] is the lowest key of shard i + 1
+        self.shards = [Shard(order) for _ in range(len(self.lows) + 1)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+        self.shards = []
+
+    def __len__(self):
+        return sum(shard.entries for shard in self.shards)
+
+    def shard_index(self, key):
+        return bisect_right(self.lows, key)
+
+    def counted(self, shard, keys):
+        shard.count(keys)
+        self.operations += len(keys)
+
+    def maybe_maintain(self):
+        if self.window and self.operations >= self.window:
+            self.maintain()
+
+    # ----- Point operations -----
+
+    def call(self, key, name, *args):
+        shard = self.shards[self.shard_index(key)]
+        self.counted(shard, [key])
+        result = shard.call(name, key, *args)
+        self.maybe_maintain()
+        return result
+
+    def insert(self, key, value):
+        self.call(key, "insert", value)
+
+    def delete(self, key):
+        self.call(key, "delete")
+
+    def search_value(self, key):
+        return self.call(key, "get")
+
+    # ----- Batches -----
+
+    def group(self, keys):
+        """{shard index: positions in keys}"""
+        groups = {}
+        lows = self.lows
+        for position, key in enumerate(keys):
+            groups.setdefault(bisect_right(lows, key), []).append(position)
+        return groups
+
+    def fan_out(self, name, keys, args):
+        """
+        Send each shard its part of a batch (args[i] goes with keys[i]), then
+        collect the replies. Returns {shard index: (positions, result)}
+        """
+        groups = self.group(keys)
+        for index, positions in groups.items():
+            shard = self.shards[index]
+            self.counted(shard, [keys[p] for p in positions])
+            shard.send(name, [args[p] for p in positions])
+        # Every shard is busy before the first reply is read
+        replies = receive_all([self.shards[index] for index in groups])
+        self.maybe_maintain()
+        return {
+            index: (positions, reply)
+            for (index, positions), reply in zip(groups.items(), replies)
+        }
+
+    def insert_many(self, items):
+        items = list(items)
+        self.fan_out("insert_many", [key for key, _ in items], items)
+
+    def get_many(self, keys):
+        """The values of keys (None for missing ones), in the same order"""
+        keys = list(keys)
+        values = [None] * len(keys)
+        for positions, found in self.fan_out("get_many", keys, keys).values():
+            for position, value in zip(positions, found):
+                values[position] = value
+        return values
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        self.fan_out("delete_many", keys, keys)
+
+    # ----- Range scans -----
+
+    def overlapping(self, start, stop):
+        """Indexes of the shards holding keys of [start, stop] (None: unbounded)"""
+        first = 0 if start is None else self.shard_index(start)
+        last = len(self.shards) - 1 if stop is None else self.shard_index(stop)
+        return range(first, last + 1)
+
+    def range_query(self, start, end):
+        """All key-value pairs in [start, end], asked to every shard at once"""
+        indexes = self.overlapping(start, end)
+        for index in indexes:
+            self.shards[index].send("range", start, end)
+        result = []
+        # Shards in key order: their results are in order
+        for entries in receive_all([self.shards[index] for index in indexes]):
+            result.extend(entries)
+        return result
+
+    def scan(self, start=None, stop=None):
+        """
+        Lazily yield key-value pairs in [start, stop), from the first key if start
+        is None, to the last if stop is None. Nothing is left pending between two
+        chunks, and every chunk is asked to the shard owning the key the scan has
+        reached at that time, so the tree can be modified (and split or rebalanced)
+        while a scan is consumed without entries being repeated or skipped.
+        """
+        key, after = start, False  # The scan goes on from key (excluded if after)
+        while True:
+            index = 0 if key is None else self.shard_index(key)
+            chunk = self.shards[index].call("scan", key, stop, after, SCAN_CHUNK)
+            done = False
+            if len(chunk) == SCAN_CHUNK:
+                key, after = chunk[-1][0], True
+            elif index < len(self.lows) and (stop is None or self.lows[index] < stop):
+                key, after = self.lows[index], False  # The next shard
+            else:
+                done = True
+            yield from chunk
+            if done:
+                return
+
+    def scan_prefix(self, prefix):
+        """Lazily yield the entries whose (string) key starts with prefix"""
+        return self.scan(prefix, prefix_end(prefix)) if prefix else self.scan()
+
+    def items(self):
+        return self.scan()
+
+    # ----- Splits and rebalancing -----
+
+    def split(self, index, key):
+        """Start a new shard with the entries of shard index from key on"""
+        shard = self.shards[index]
+        moved = shard.call("cut", key, True)
+        new = Shard(self.m)
+        new.call("load", moved)
+        self.shards.insert(index + 1, new)
+        self.lows.insert(index, key)
+
+    def movable(self, index, key):
+        """
+        Whether key can become the lowest key of shard index: strictly inside the
+        range of shards index - 1 and index, so neither of them is left empty
+        """
+        low = self.lows[index - 2] if index > 1 else None
+        high = self.lows[index] if index < len(self.lows) else None
+        return (low is None or key > low) and (high is None or key < high)
+
+    def move_boundary(self, index, key):
+        """Make key the lowest key of shard index, moving entries from its neighbour"""
+        if not self.movable(index, key):
+            raise ValueError(f"{key!r} is not inside shards {index - 1} and {index}")
+        left, right = self.shards[index - 1], self.shards[index]
+        if key < self.lows[index - 1]:
+            right.call("load", left.call("cut", key, True))
+        elif key > self.lows[index - 1]:
+            left.call("load", right.call("cut", key, False))
+        self.lows[index - 1] = key
+
+    def in_range(self, index, key):
+        """Whether key is inside shard index, above its lowest key"""
+        low = self.lows[index - 1] if index else None
+        high = self.lows[index] if index < len(self.lows) else None
+        return (low is None or key > low) and (high is None or key < high)
+
+    def load_median(self, *indexes):
+        keys = sorted(key for index in indexes for key in self.shards[index].sample)
+        return keys[len(keys) // 2] if keys else None
+
+    def maintain(self):
+        """
+        One split or boundary move if a shard is too large or too busy, then start a
+        new window. Returns a description of what was done, or None.
+        """
+        done = None
+        try:
+            done = self.split_or_move()
+        finally:
+            self.operations = 0
+            for shard in self.shards:
+                shard.operations = shard.seen = 0
+                shard.sample.clear()
+        return done
+
+    def split_or_move(self):
+        shards = self.shards
+        largest = max(range(len(shards)), key=lambda i: shards[i].entries)
+        busiest = max(range(len(shards)), key=lambda i: shards[i].operations)
+        if len(shards) < self.max_shards:
+            if shards[largest].entries > self.max_entries:
+                self.split(
+                    largest,
+                    shards[largest].call("key_at", shards[largest].entries // 2),
+                )
+                return f"split shard {largest} (size)"
+            key = self.load_median(busiest)
+            if (
+                shards[busiest].operations
+                and shards[busiest].entries >= MIN_SPLIT_ENTRIES
+                and key is not None
+                and self.in_range(busiest, key)
+            ):
+                self.split(busiest, key)
+                return f"split shard {busiest} (load)"
+            return None
+        if len(shards) == 1:
+            return None
+
+        if shards[largest].entries > self.max_entries:
+            index = largest
+            other = self.lighter_neighbour(index, lambda shard: shard.entries)
+            left, right = sorted((index, other))
+            target = (shards[left].entries + shards[right].entries) // 2
+            if shards[left].entries > target:  # The left one gives its top entries
+                key = shards[left].call("key_at", target)
+            else:
+                key = shards[right].call("key_at", shards[right].entries - target)
+            if not self.movable(right, key):
+                return None
+            self.move_boundary(right, key)
+            return f"moved boundary {right} (size)"
+        other = self.lighter_neighbour(busiest, lambda shard: shard.operations)
+        if shards[busiest].operations > HOT_FACTOR * shards[other].operations:
+            left, right = sorted((busiest, other))
+            key = self.load_median(left, right)
+            if (
+                key is not None
+                and key != self.lows[right - 1]
+                and self.movable(right, key)
+            ):
+                self.move_boundary(right, key)
+                return f"moved boundary {right} (load)"
+        return None
+
+    def lighter_neighbour(self, index, weight):
+        neighbours = [i for i in (index - 1, index + 1) if 0 <= i < len(self.shards)]
+        return min(neighbours, key=lambda i: weight(self.shards[i]))
+
+    def stats(self):
+        """One dict per shard, in key order: key range, entries, pid"""
+        result = []
+        for index, shard in enumerate(self.shards):
+            result.append(
+                {
+                    "low": self.lows[index - 1] if index else None,
+                    "high": self.lows[index] if index < len(self.lows) else None,
+                    "entries": shard.entries,
+                    "window_operations": shard.operations,
+                    "pid": shard.process.pid,
+                }
+            )
+        return result
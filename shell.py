@@ -1,61 +1,164 @@
-from textual.app import App, ComposeResult
-from textual.containers import Vertical
-from textual.widgets import Input, Static
+# Entry point of the B+ tree terminal
+#   python3 shell.py                     -> interactive Textual shell
+#   python3 shell.py --script cmds.txt   -> run a command file without the UI
+#   python3 shell.py < cmds.txt          -> same, reading the commands from stdin
+#   python3 shell.py --snapshot fs.snap  -> start from a saved filesystem (snapshot.py)
+#   python3 shell.py --record trace.txt  -> also append every command to a trace (traces.py)
+#   python3 shell.py --connect vfs.sock  -> a session on a shared filesystem (vfs_server.py)
+# The script mode never imports Textual, and prints the throughput and the
+# per-command latency percentiles once all the commands were replayed.
+# Startup time matters (tools spawn this entry point a lot): only cheap modules are
+# imported here, see analysis/startup_benchmark.py for the import-time budget.
+
+import argparse
+import sys
+import time
+from functools import partial
 from commands import VirtualFileSystem
+from layouts import LAYOUTS
+from replay import report, report_commands, run_script
+
+
+def __getattr__(name):
+    # "from shell import BPlusTreeShell" keeps working, Textual is only imported on demand
+    if name == "BPlusTreeShell":
+        from tui import BPlusTreeShell
+
+        return BPlusTreeShell
+    raise AttributeError(f"module 'shell' has no attribute '{name}'")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="B+ tree virtual filesystem shell")
+    parser.add_argument(
+        "--script",
+        metavar="FILE",
+        help="run the commands of FILE without the UI ('-' reads from stdin)",
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="don't print command outputs in script mode",
+    )
+    parser.add_argument("--order", type=int, default=4, help="B+ tree order")
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="path")
+    parser.add_argument(
+        "--snapshot", metavar="FILE", help="start from a saved filesystem"
+    )
+    parser.add_argument(
+        "--save-snapshot",
+        metavar="FILE",
+        help="save the filesystem to FILE once the script ran",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="FILE",
+        help="append every command run to the trace FILE (a replayable script)",
+    )
+    parser.add_argument(
+        "--connect",
+        metavar="SOCKET",
+        help="open a session on the filesystem served at SOCKET (vfs_server.py)",
+    )
+    parser.add_argument(
+        "--per-command",
+        action="store_true",
+        help="also print the latency percentiles of each command in script mode",
+    )
+    args = parser.parse_args(argv)
+
+    if args.connect:
+        return attach(parser, args)
+    if args.snapshot:
+        import snapshot
+
+        load = partial(snapshot.load, args.snapshot)
+    else:
+        load = partial(
+            VirtualFileSystem, order=args.order, layout=args.layout, indexes=True
+        )
+
+    if args.record:
+        from traces import TraceRecorder
+
+        load = partial(lambda load: TraceRecorder(load(), args.record), load)
+
+    # Without a script and with a terminal attached, start the interactive shell.
+    # It builds the filesystem itself, after its first frame is on screen.
+    if args.script is None and sys.stdin.isatty():
+        if args.save_snapshot:
+            parser.error("--save-snapshot needs a script")
+        from tui import BPlusTreeShell
+
+        BPlusTreeShell(load=load).run()
+        return
+
+    try:
+        vfs = load()
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+
+    script = sys.stdin if args.script in (None, "-") else open(args.script)
+    try:
+        start = time.perf_counter()
+        by_command = {} if args.per_command else None
+        latencies = run_script(
+            vfs, script, None if args.quiet else sys.stdout, by_command
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        vfs.searcher.close()
+        if script is not sys.stdin:
+            script.close()
+        if args.record:
+            vfs.close()
+    sys.stdout.flush()
+    report(latencies, elapsed)
+    if by_command:
+        report_commands(by_command)
+
+    if args.save_snapshot:
+        import snapshot
+
+        snapshot.save(vfs.vfs if args.record else vfs, args.save_snapshot)
+
+
+def attach(parser, args):
+    """--connect: the shell or the script runs on a filesystem server"""
+    from vfs_client import connect, remote_dispatch
+
+    if args.snapshot or args.save_snapshot or args.record:
+        parser.error(
+            "--connect can't be used with --snapshot, --save-snapshot, --record"
+        )
+    try:
+        session = connect(args.connect)
+    except OSError as error:
+        parser.error(f"Cannot connect to {args.connect}: {error}")
+
+    if args.script is None and sys.stdin.isatty():
+        from tui import BPlusTreeShell
+
+        BPlusTreeShell(session=session).run()
+        return
 
-# To exit the shell interface, just type "exit"
-
-
-class BPlusTreeShell(App):
-    CSS_PATH = None  # No custom CSS, minimal
-    BINDINGS = [("ctrl+c", "quit", "Quit")]
-
-    def compose(self) -> ComposeResult:
-        yield Static("B+ Tree Virtual Filesystem", id="header")
-        yield Static("", id="output", expand=True)
-        yield Input(placeholder="Digite um comando...", id="input")
-        yield Static(f"fakerational:/$", id="cwd")
-
-    def on_mount(self):
-        self.vfs = VirtualFileSystem()
-        self.output = self.query_one("#output", Static)
-        self.input = self.query_one("#input", Input)
-        self.cwd_label = self.query_one("#cwd", Static)
-        self.prompt()
-
-    def prompt(self, text=""):
-        self.output.update(f"fakerational:{self.vfs.cwd}$ {text}")
-
-    async def on_input_submitted(self, event: Input.Submitted):
-        cmd = event.value.strip()
-        if not cmd:
-            return
-        args = cmd.split()
-        op = args[0]
-        params = args[1:]
-        output = ""
-
-        if op == "mkdir" and params:
-            output = self.vfs.mkdir(params[0])
-        elif op == "ls":
-            output = self.vfs.ls(params[0] if params else None)
-        elif op == "cd":
-            output = self.vfs.cd(params[0] if params else None)
-        elif op == "touch" and params:
-            output = self.vfs.touch(params[0])
-        elif op == "rm" and params:
-            output = self.vfs.rm(params[0])
-        elif op == "exit":
-            await self.action_quit()
-            return
-        else:
-            output = f"Unknown or incomplete command: {cmd}"
-
-        # Update the output and cwd
-        self.output.update(f"fakerational:{self.vfs.cwd}$ {cmd}\n{output}")
-        self.cwd_label.update(f"fakerational:{self.vfs.cwd}$")
-        self.input.value = ""
+    script = sys.stdin if args.script in (None, "-") else open(args.script)
+    try:
+        start = time.perf_counter()
+        by_command = {} if args.per_command else None
+        out = None if args.quiet else sys.stdout
+        latencies = run_script(session, script, out, by_command, remote_dispatch)
+        elapsed = time.perf_counter() - start
+    finally:
+        session.close()
+        session.pool.close()
+        if script is not sys.stdin:
+            script.close()
+    sys.stdout.flush()
+    report(latencies, elapsed)
+    if by_command:
+        report_commands(by_command)
 
 
 if __name__ == "__main__":
-    BPlusTreeShell().run()
+    main()
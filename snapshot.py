@@ -0,0 +1,27 @@
+# Filesystem snapshots
+# Replaying a long command script to rebuild a large filesystem is slow, so a filesystem
+# can be saved once and loaded by later sessions:
+#   python3 shell.py --script build.txt --quiet --save-snapshot fs.snap
+#   python3 shell.py --snapshot fs.snap
+# The interactive shell loads the snapshot in the background after its first frame.
+
+import pickle
+
+SNAPSHOT_VERSION = 1
+
+
+def save(vfs, path):
+    with open(path, "wb") as f:
+        pickle.dump((SNAPSHOT_VERSION, vfs), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load(path):
+    """Return the VirtualFileSystem saved in path, raises ValueError if it isn't a snapshot"""
+    with open(path, "rb") as f:
+        try:
+            version, vfs = pickle.load(f)
+        except (pickle.UnpicklingError, EOFError, TypeError, ValueError) as error:
+            raise ValueError(f"Not a filesystem snapshot: {path}") from error
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}: {path}")
+    return vfs
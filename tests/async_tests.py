@@ -0,0 +1,219 @@
+import asyncio
+import random
+import unittest
+from analysis.tree_fuzz import check_invariants
+from async_tree import AsyncBPlusTree
+from async_vfs import AsyncVirtualFileSystem
+from bplus_tree import BPlusTree
+from commands import VirtualFileSystem
+
+# To test it, run python3 -m tests.async_tests
+
+# Thirtieth Test - asyncio facades: chunked scans, executor offload, coalesced lookups
+
+
+def leaf_count(tree):
+    return tree.stats()["leaves"]
+
+
+class TestBulkLoad(unittest.TestCase):
+    def test_bulk_load_builds_a_valid_tree(self):
+        for order in (3, 4, 5, 32):
+            for size in (0, 1, order - 1, order, 100, 1000):
+                with self.subTest(order=order, size=size):
+                    tree = BPlusTree(order)
+                    items = [(key, str(key)) for key in range(size)]
+                    tree.bulk_load(items)
+                    check_invariants(tree)
+                    self.assertEqual(list(tree.items()), items)
+                    for key in range(0, size, 2):  # Still a normal tree
+                        tree.delete(key)
+                    tree.insert(-1, "-1")
+                    check_invariants(tree)
+
+    def test_bulk_load_needs_sorted_keys(self):
+        with self.assertRaises(ValueError):
+            BPlusTree(4).bulk_load([(2, "b"), (1, "a")])
+        with self.assertRaises(ValueError):
+            BPlusTree(4).bulk_load([(1, "a"), (1, "b")])
+
+    def test_search_values(self):
+        tree = BPlusTree(4)
+        for key in range(0, 200, 2):
+            tree.insert(key, key * 10)
+        keys = list(range(-5, 205))
+        random.Random(0).shuffle(keys)
+        self.assertEqual(
+            tree.search_values(keys),
+            [key * 10 if 0 <= key < 200 and key % 2 == 0 else None for key in keys],
+        )
+        self.assertEqual(BPlusTree(4).search_values(["x"]), [None])
+
+
+class TestAsyncBPlusTree(unittest.TestCase):
+    def setUp(self):
+        self.tree = BPlusTree(4)
+        for key in range(1000):
+            self.tree.insert(key, key)
+
+    def test_scans(self):
+        async def scenario(facade):
+            everything = [item async for item in facade.items()]
+            part = [item async for item in facade.scan(10, 20)]
+            return everything, part, await facade.range_query(990, 5000)
+
+        everything, part, tail = asyncio.run(
+            scenario(AsyncBPlusTree(self.tree, None, 3))
+        )
+        self.assertEqual(everything, [(k, k) for k in range(1000)])
+        self.assertEqual(part, [(k, k) for k in range(10, 20)])
+        self.assertEqual(tail, [(k, k) for k in range(990, 1000)])
+
+    def test_scan_yields_to_the_loop(self):
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(len(seen))
+                await asyncio.sleep(0)
+
+        seen = []
+
+        async def scenario():
+            task = asyncio.create_task(ticker())
+            async for key, _ in AsyncBPlusTree(self.tree, None, 10).scan():
+                seen.append(key)
+            task.cancel()
+
+        asyncio.run(scenario())
+        self.assertEqual(seen, list(range(1000)))
+        self.assertGreater(len(set(ticks)), 10)  # The ticker ran during the scan
+
+    def test_scan_survives_changes_between_chunks(self):
+        async def scenario(facade):
+            seen = []
+            async for key, _ in facade.scan():
+                seen.append(key)
+                if key % 50 == 0:  # Delete ahead, insert behind and further ahead
+                    await facade.delete(key + 25)
+                    await facade.insert(key + 25.5, None)
+                    await facade.insert(-key - 1, None)
+            return seen
+
+        seen = asyncio.run(scenario(AsyncBPlusTree(self.tree, None, 2)))
+        self.assertEqual(seen, sorted(seen))
+        self.assertNotIn(25, seen)
+        self.assertIn(75.5, seen)
+        self.assertFalse([key for key in seen if key < 0])
+        check_invariants(self.tree)
+
+    def test_concurrent_gets_are_coalesced(self):
+        async def scenario(facade):
+            values = await asyncio.gather(
+                *(facade.get(key) for key in range(995, 1005))
+            )
+            return values, facade.get.batches
+
+        values, batches = asyncio.run(scenario(AsyncBPlusTree(self.tree)))
+        self.assertEqual(values, [995, 996, 997, 998, 999] + [None] * 5)
+        self.assertEqual(batches, 1)
+
+    def test_load_in_the_executor(self):
+        async def scenario(facade):
+            loading = asyncio.create_task(facade.load((k, -k) for k in range(5000)))
+            await asyncio.sleep(0)
+            value = await facade.get(4999)  # Waits for the load
+            await loading
+            await facade.load([(5000, "x"), (3, "y")])
+            return value
+
+        facade = AsyncBPlusTree(BPlusTree(8))
+        self.assertEqual(asyncio.run(scenario(facade)), -4999)
+        check_invariants(facade.tree)
+        self.assertEqual(facade.tree.search_value(3), "y")
+        self.assertEqual(len(list(facade.tree.items())), 5001)
+
+    def test_compact(self):
+        before = leaf_count(self.tree)  # Filled in key order: half-full leaves
+        asyncio.run(AsyncBPlusTree(self.tree).compact())
+        check_invariants(self.tree)
+        self.assertEqual(leaf_count(self.tree), 334)  # 1000 keys, 3 per leaf
+        self.assertLess(leaf_count(self.tree), before)
+        self.assertEqual(list(self.tree.items()), [(k, k) for k in range(1000)])
+
+
+class TestAsyncVirtualFileSystem(unittest.TestCase):
+    def setUp(self):
+        self.vfs = VirtualFileSystem(order=4, indexes=True)
+        self.addCleanup(self.vfs.searcher.close)
+        self.fs = AsyncVirtualFileSystem(self.vfs, entries_per_yield=16)
+        self.script = ["mkdir /data"] + [
+            f"echo line {i} > /data/f{i:03}.txt" for i in range(100)
+        ]
+
+    def run_async(self, coroutine):
+        return asyncio.run(coroutine)
+
+    def test_commands_and_scans(self):
+        async def scenario():
+            await self.fs.load(self.script)
+            await self.fs.cd("/data")
+            listing = [name async for name in self.fs.ls()]
+            found = [path async for path in self.fs.find("/", name="f09*")]
+            matches = [line async for line in self.fs.grep("line 4[0-2]$")]
+            texts = await asyncio.gather(
+                *(self.fs.cat(f"f{i:03}.txt") for i in range(5))
+            )
+            return listing, found, matches, texts
+
+        listing, found, matches, texts = self.run_async(scenario())
+        self.assertEqual(len(listing), 100)
+        self.assertEqual(found, [f"/data/f{i:03}.txt" for i in range(90, 100)])
+        self.assertEqual(len(matches), 3)
+        self.assertEqual(texts, [f"line {i}" for i in range(5)])
+        self.assertEqual(self.fs.cat.batches, 1)
+        self.assertEqual(self.fs.cwd, "/data")
+
+    def test_scan_fails_after_a_change(self):
+        async def scenario():
+            await self.fs.load(self.script)
+            async for path in self.fs.find("/data"):
+                if path.endswith("f001.txt"):
+                    await self.fs.touch("/data/new.txt")
+
+        with self.assertRaises(RuntimeError):
+            self.run_async(scenario())
+
+    def test_scan_fails_after_a_change_of_another_session(self):
+        other = self.vfs.session()  # Like a vfs_server.py client
+
+        async def scenario():
+            await self.fs.load(self.script)
+            async for path in self.fs.find("/data"):
+                if path.endswith("f001.txt"):
+                    with self.vfs.lock.write():
+                        other.rm("/data/f050.txt")
+
+        with self.assertRaises(RuntimeError):
+            self.run_async(scenario())
+
+    def test_directory_removal_runs_in_the_executor(self):
+        async def scenario():
+            await self.fs.load(self.script)
+            removing = asyncio.create_task(self.fs.rm("/data"))
+            await asyncio.sleep(0)
+            missing = await self.fs.cat("/data/f000.txt")  # After the removal
+            await removing
+            await self.fs.mkdir("/data")
+            await self.fs.compact()
+            return missing, [name async for name in self.fs.ls("/")]
+
+        missing, listing = self.run_async(scenario())
+        self.assertEqual(missing, "File '/data/f000.txt' does not exist")
+        self.assertEqual(listing, ["data/"])
+        check_invariants(self.vfs.tree)
+        self.assertEqual(list(self.vfs.iter_find("/", name="*.txt")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import io
+import subprocess
+import sys
+import unittest
+from commands import VirtualFileSystem
+from dispatcher import EXIT, dispatch
+from percentiles import percentile
+from replay import run_script
+
+# To test it, run python3 -m tests.batch_tests
+
+# Twelfth Test - Shared dispatcher and the headless script mode
+
+
+class TestDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.fs = VirtualFileSystem()
+
+    def test_commands(self):
+        self.assertEqual(dispatch(self.fs, "mkdir docs"), "Directory 'docs' created")
+        self.assertEqual(dispatch(self.fs, "ls -type d").render(), "docs/")
+        self.assertEqual(list(dispatch(self.fs, "find / -type d")), ["/", "/docs"])
+        self.assertIs(dispatch(self.fs, "exit"), EXIT)
+        self.assertIsNone(dispatch(self.fs, "   "))
+
+    def test_incomplete_commands(self):
+        for cmd in ["mkdir", "mv a", "ls -type", "find / -size 3", "nope"]:
+            with self.subTest(cmd=cmd):
+                self.assertEqual(
+                    dispatch(self.fs, cmd), f"Unknown or incomplete command: {cmd}"
+                )
+
+
+class TestScriptMode(unittest.TestCase):
+    def test_run_script(self):
+        script = [
+            "mkdir a",
+            "",
+            "# comment",
+            "cd a",
+            "touch x.py",
+            "ls",
+            "exit",
+            "ls /",
+        ]
+        out = io.StringIO()
+        latencies = run_script(VirtualFileSystem(), script, out)
+        self.assertEqual(len(latencies), 4)
+        self.assertEqual(
+            out.getvalue(),
+            "Directory 'a' created\nMoved to /a\nFile 'x.py' created\nx.py\n",
+        )
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertEqual(percentile([7], 99.9), 7)
+
+    def test_percentile_ranks(self):
+        five = [10, 20, 30, 40, 50]
+        self.assertEqual(percentile(five, 50), 30)
+        self.assertEqual(percentile(five, 90), 50)
+        self.assertEqual(percentile(five, 0), 10)
+        values = list(range(1, 1001))
+        self.assertEqual(percentile(values, 50), 500)
+        self.assertEqual(percentile(values, 99), 990)
+        self.assertEqual(percentile(values, 99.9), 1000)
+
+    def test_script_mode_does_not_import_textual(self):
+        code = (
+            "import sys, io, shell\n"
+            "sys.stdin = io.StringIO('mkdir a\\nls\\n')\n"
+            "shell.main(['--script', '-'])\n"
+            "assert 'textual' not in sys.modules\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("a/", result.stdout)
+        self.assertIn("commands/s", result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
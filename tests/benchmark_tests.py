@@ -0,0 +1,85 @@
+import random
+import unittest
+from collections import Counter
+from analysis.benchmark import (
+    build_tree,
+    key_indexes,
+    measure,
+    parse_operation,
+    run_suite,
+)
+
+# To test it, run python3 -m tests.benchmark_tests
+
+# Seventeenth Test - Benchmark harness
+
+
+class TestWorkloads(unittest.TestCase):
+    def test_sequential_and_reverse(self):
+        rng = random.Random(1)
+        keys = key_indexes("sequential", 10, 15, rng)
+        self.assertEqual(len(keys), 15)
+        self.assertTrue(all((b - a) % 10 == 1 for a, b in zip(keys, keys[1:])))
+        keys = key_indexes("reverse", 10, 15, rng)
+        self.assertTrue(all((a - b) % 10 == 1 for a, b in zip(keys, keys[1:])))
+
+    def test_random_and_zipf_stay_in_range(self):
+        for distribution in ("random", "zipf"):
+            keys = key_indexes(distribution, 1000, 5000, random.Random(2))
+            self.assertTrue(all(0 <= key < 1000 for key in keys))
+
+    def test_zipf_is_skewed(self):
+        keys = key_indexes("zipf", 100_000, 20_000, random.Random(3))
+        hottest = Counter(keys).most_common(1)[0][1]
+        self.assertGreater(hottest, len(keys) * 0.05)  # Uniform would be ~0.2 hits
+
+    def test_operations(self):
+        self.assertEqual(parse_operation("search"), ("search", None))
+        self.assertEqual(parse_operation("mixed:90"), ("mixed", 0.9))
+        self.assertEqual(parse_operation("mixed"), ("mixed", 0.9))
+        for invalid in ("fly", "mixed:150", "search:10"):
+            with self.assertRaises(ValueError):
+                parse_operation(invalid)
+        with self.assertRaises(ValueError):
+            key_indexes("gaussian", 10, 10, random.Random())
+
+
+class TestMeasure(unittest.TestCase):
+    def test_writes_are_undone(self):
+        tree = build_tree(500, 4)
+        before = list(tree.items())
+        for operation in ("insert", "delete", "mixed:50"):
+            for distribution in ("sequential", "zipf"):
+                measure(tree, 500, operation, distribution, ops=200, repeats=2)
+                self.assertEqual(list(tree.items()), before)
+
+    def test_result_record(self):
+        tree = build_tree(1000, 8)
+        result = measure(tree, 1000, "search", "random", ops=100, repeats=3)
+        self.assertEqual(result["size"], 1000)
+        self.assertEqual(result["order"], 8)
+        self.assertEqual(len(result["repeat_means_ns"]), 3)
+        self.assertLessEqual(result["min_ns"], result["median_ns"])
+        self.assertLessEqual(result["median_ns"], result["p95_ns"])
+        self.assertLessEqual(result["p95_ns"], result["p99_ns"])
+        self.assertLessEqual(result["p99_ns"], result["max_ns"])
+        self.assertGreater(result["ops_per_s"], 0)
+
+    def test_suite(self):
+        run = run_suite(
+            [100, 1000],
+            ["search", "range"],
+            ["sequential", "random"],
+            order=4,
+            ops=50,
+            repeats=1,
+            log=lambda line: None,
+        )
+        self.assertEqual(len(run["results"]), 8)
+        for field in ("python", "platform", "cpu_count", "timer_overhead_ns"):
+            self.assertIn(field, run["metadata"])
+        self.assertEqual(run["settings"]["order"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
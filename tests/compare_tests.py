@@ -0,0 +1,97 @@
+import math
+import unittest
+from analysis.compare_benchmarks import (
+    best_model,
+    bootstrap_ratio,
+    compare,
+    fit_complexity,
+)
+
+# To test it, run python3 -m tests.compare_tests
+
+# Eighteenth Test - Comparing benchmark runs and fitting their complexity
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def record(operation, size, repeat_means, median=None):
+    return {
+        "operation": operation,
+        "distribution": "random",
+        "size": size,
+        "order": 64,
+        "median_ns": median if median is not None else repeat_means[0],
+        "repeat_means_ns": repeat_means,
+    }
+
+
+class TestCompare(unittest.TestCase):
+    def test_identical_runs(self):
+        run = {"results": [record("search", 1000, [100, 102, 98, 101, 99])]}
+        (row,) = compare(run, run)
+        self.assertEqual(row[3], 1.0)
+        self.assertEqual(row[-1], "same")
+
+    def test_regression_and_speedup(self):
+        old = {
+            "results": [
+                record("search", 1000, [100, 102, 98, 101, 99]),
+                record("insert", 1000, [200, 205, 195, 202, 198]),
+            ]
+        }
+        new = {
+            "results": [
+                record("search", 1000, [150, 152, 149, 151, 148]),
+                record("insert", 1000, [100, 101, 99, 102, 98]),
+                record("delete", 1000, [100]),  # Not in the old run
+            ]
+        }
+        rows = {row[0][0]: row for row in compare(old, new, threshold=0.05)}
+        self.assertEqual(set(rows), {"search", "insert"})
+        self.assertEqual(rows["search"][-1], "REGRESSION")
+        self.assertAlmostEqual(rows["search"][3], 1.5, places=2)
+        self.assertEqual(rows["insert"][-1], "faster")
+
+    def test_noise_is_not_a_regression(self):
+        old = {"results": [record("search", 1000, [100, 140, 70, 130, 60])]}
+        new = {"results": [record("search", 1000, [110, 150, 80, 140, 70])]}
+        (row,) = compare(old, new, threshold=0.05)
+        low, high = row[4]
+        self.assertLess(low, 1)
+        self.assertGreater(high, 1)
+        self.assertEqual(row[-1], "same")
+
+    def test_bootstrap_interval_contains_ratio(self):
+        low, high = bootstrap_ratio([100, 101, 99], [200, 202, 198])
+        self.assertLessEqual(low, 2.0)
+        self.assertGreaterEqual(high, 2.0)
+
+
+class TestFit(unittest.TestCase):
+    def test_models(self):
+        cases = {
+            "O(1)": [500, 510, 495, 505],
+            "O(log n)": [30 * math.log(n) for n in SIZES],
+            "O(n)": [300 + 0.5 * n for n in SIZES],
+            "O(n log n)": [1000 + 0.01 * n * math.log(n) for n in SIZES],
+        }
+        for expected, times in cases.items():
+            self.assertEqual(best_model(SIZES, times)[0], expected)
+
+    def test_linear_operation_is_a_regression(self):
+        run = {
+            "results": [
+                record("search", n, [1], median=400 + 20 * math.log(n)) for n in SIZES
+            ]
+            + [record("range", n, [1], median=200 + 0.2 * n) for n in SIZES]
+            + [record("insert", n, [1], median=100) for n in SIZES[:2]]  # Too few sizes
+        }
+        rows = {row[0]: row for row in fit_complexity(run)}
+        self.assertEqual(set(rows), {"search", "range"})
+        self.assertEqual(rows["search"][-1], "ok")
+        self.assertEqual(rows["range"][3], "O(n)")
+        self.assertEqual(rows["range"][-1], "REGRESSION")
+
+
+if __name__ == "__main__":
+    unittest.main()
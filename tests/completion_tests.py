@@ -0,0 +1,156 @@
+import threading
+import unittest
+from commands import VirtualFileSystem
+from completion import Completer
+from layouts import InodeLayout, PathLayout
+from locks import ReadWriteLock
+
+# To test it, run python3 -m tests.completion_tests
+
+# Sixteenth Test - Tab completion with prefix range scans
+
+
+class ChildrenWithPrefixMixin:
+    layout_class = None
+
+    def setUp(self):
+        self.layout = self.layout_class(4)
+        for path in ["/a", "/a/x", "/a/y", "/ab", "/a!", "/b", "/a/x/deep"]:
+            kind = "file" if path in ("/a/y", "/a!", "/a/x/deep") else "dir"
+            self.layout.insert(path, {"type": kind})
+
+    def names(self, path, prefix):
+        return [name for name, _ in self.layout.children_with_prefix(path, prefix)]
+
+    def test_direct_children_only(self):
+        self.assertEqual(self.names("/", ""), ["a", "a!", "ab", "b"])
+        self.assertEqual(self.names("/", "a"), ["a", "a!", "ab"])
+        self.assertEqual(self.names("/a", ""), ["x", "y"])
+        self.assertEqual(self.names("/a", "x"), ["x"])
+        self.assertEqual(self.names("/a", "z"), [])
+
+
+class TestPathChildrenWithPrefix(ChildrenWithPrefixMixin, unittest.TestCase):
+    layout_class = PathLayout
+
+    def test_skips_subdirectory_entries(self):
+        for i in range(1000):
+            self.layout.insert(f"/a/x/file_{i:04d}", {"type": "file"})
+        scanned = []
+        scan = self.layout.tree.scan
+
+        def counting_scan(start, stop=None):
+            for item in scan(start, stop):
+                scanned.append(item[0])
+                yield item
+
+        self.layout.tree.scan = counting_scan
+        self.assertEqual(self.names("/a", ""), ["x", "y"])
+        self.assertLess(len(scanned), 10)  # The 1000 files below /a/x are jumped over
+
+
+class TestInodeChildrenWithPrefix(ChildrenWithPrefixMixin, unittest.TestCase):
+    layout_class = InodeLayout
+
+
+class TestCompleter(unittest.TestCase):
+    def setUp(self):
+        self.fs = VirtualFileSystem(layout="path")
+        self.fs.mkdir("/houses")
+        self.fs.mkdir("/houses/stark")
+        self.fs.mkdir("/hobbits")
+        self.fs.touch("/houses/stark/arya.txt")
+        self.fs.touch("/houses/stark/ned.txt")
+        self.completer = Completer(self.fs)
+
+    def complete(self, text):
+        return self.completer.complete(text)
+
+    def test_commands(self):
+        self.assertEqual(self.complete("mk").text, "mkdir ")
+        result = self.complete("c")
+        self.assertEqual(result.text, "c")
+        self.assertEqual(result.candidates, ["cat", "cd"])
+
+    def test_paths(self):
+        self.assertEqual(self.complete("ls hou").text, "ls houses/")
+        self.assertEqual(self.complete("ls houses/st").text, "ls houses/stark/")
+        self.assertEqual(
+            self.complete("cat /houses/stark/a").text, "cat /houses/stark/arya.txt "
+        )
+        self.assertEqual(self.complete("ls ho").candidates, ["hobbits/", "houses/"])
+        self.assertEqual(self.complete("ls nothing").text, "ls nothing")
+        self.assertEqual(self.complete("ls /missing/a").candidates, [])
+
+    def test_common_prefix(self):
+        self.fs.touch("/houses/stark/arya_notes.txt")
+        self.assertEqual(
+            self.complete("cat houses/stark/a").text, "cat houses/stark/arya"
+        )
+
+    def test_relative_to_cwd(self):
+        self.fs.cd("/houses/stark")
+        self.assertEqual(self.complete("cat n").text, "cat ned.txt ")
+        self.assertEqual(self.complete("ls ../../hob").text, "ls ../../hobbits/")
+
+    def test_typing_refines_the_cached_list(self):
+        for i in range(50):
+            self.fs.touch(f"/houses/file_{i:02d}")
+        self.complete("ls /houses/")
+        self.assertEqual(self.completer.scans, 1)
+        result = self.complete("ls /houses/file_1")
+        self.assertEqual(result.candidates, [f"file_1{i}" for i in range(10)])
+        self.assertEqual(self.completer.scans, 1)  # Filtered, no new scan
+
+    def test_limit(self):
+        completer = Completer(self.fs, limit=3)
+        for i in range(10):
+            self.fs.touch(f"/houses/file_{i}")
+        result = completer.complete("ls /houses/file_")
+        self.assertTrue(result.truncated)
+        self.assertEqual(result.candidates, ["file_0", "file_1", "file_2"])
+        # A truncated list can't be refined, the longer prefix is scanned again
+        self.assertEqual(
+            completer.complete("ls /houses/file_9").text, "ls /houses/file_9 "
+        )
+        self.assertEqual(completer.scans, 2)
+
+    def test_clear_after_changes(self):
+        self.assertEqual(
+            self.complete("ls /houses/stark/").candidates, ["arya.txt", "ned.txt"]
+        )
+        self.fs.touch("/houses/stark/bran.txt")
+        self.completer.clear()
+        self.assertEqual(
+            self.complete("ls /houses/stark/").candidates,
+            ["arya.txt", "bran.txt", "ned.txt"],
+        )
+
+
+class TestNonBlockingRead(unittest.TestCase):
+    def test_gives_up_while_writing(self):
+        lock = ReadWriteLock()
+        with lock.read(blocking=False) as acquired:
+            self.assertTrue(acquired)
+
+        writing = threading.Event()
+        done = threading.Event()
+
+        def writer():
+            with lock.write():
+                writing.set()
+                done.wait(2)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        writing.wait(2)
+        with lock.read(blocking=False) as acquired:
+            self.assertFalse(acquired)
+        done.set()
+        thread.join()
+        with lock.write():  # The failed attempt didn't leave a reader behind
+            pass
+
+
+if __name__ == "__main__":
+    unittest.main()
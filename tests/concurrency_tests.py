@@ -0,0 +1,93 @@
+import threading
+import time
+import unittest
+from commands import VirtualFileSystem
+from dispatcher import Stream, dispatch, is_mutation, locked
+from locks import ReadWriteLock
+
+# To test it, run python3 -m tests.concurrency_tests
+
+# Thirteenth Test - Running commands from several threads
+
+
+class TestReadWriteLock(unittest.TestCase):
+    def test_readers_share_the_lock(self):
+        lock = ReadWriteLock()
+        inside = []
+        barrier = threading.Barrier(3, timeout=2)
+
+        def reader():
+            with lock.read():
+                inside.append(1)
+                barrier.wait()  # Only passes if all readers are inside together
+
+        threads = [threading.Thread(target=reader) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(inside), 3)
+
+    def test_writer_is_exclusive(self):
+        lock = ReadWriteLock()
+        events = []
+
+        def writer(name):
+            with lock.write():
+                events.append(f"{name} in")
+                time.sleep(0.01)
+                events.append(f"{name} out")
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for i in range(0, len(events), 2):
+            self.assertEqual(events[i].split()[0], events[i + 1].split()[0])
+
+
+class TestConcurrentCommands(unittest.TestCase):
+    def test_is_mutation(self):
+        self.assertTrue(is_mutation("mkdir a"))
+        self.assertTrue(is_mutation("echo hi > a.txt"))
+        self.assertFalse(is_mutation("echo hi"))
+        self.assertFalse(is_mutation("find / -name *.py"))
+
+    def test_mixed_threads_stay_consistent(self):
+        fs = VirtualFileSystem(order=4, indexes=True)
+        fs.mkdir("/shared")
+
+        def run(cmd):
+            with locked(fs, cmd):
+                output = dispatch(fs, cmd)
+                return output.render() if isinstance(output, Stream) else output
+
+        def writer(n):
+            for i in range(100):
+                run(f"touch /shared/w{n}_{i:03d}")
+                if i % 2:
+                    run(f"rm /shared/w{n}_{i - 1:03d}")
+
+        def reader():
+            for _ in range(50):
+                names = run("ls /shared").split()
+                self.assertEqual(names, sorted(names))
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(3)]
+        threads += [threading.Thread(target=reader) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        expected = sorted(f"w{n}_{i:03d}" for n in range(3) for i in range(1, 100, 2))
+        self.assertEqual(fs.ls("/shared").split(), expected)
+        self.assertEqual(
+            sorted(fs.iter_find("/shared", entry_type="f")),
+            [f"/shared/{name}" for name in expected],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
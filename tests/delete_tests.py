@@ -45,3 +45,16 @@ print(" Delete(20), Delete(25) -> causing tree shrink. Result:\n")
 tree.delete(20)
 tree.delete(25)
 tree.visualization()
+
+# 5) Deleting a key must keep the separators of the ancestors valid
+# (regression: the grandparent separator used to be replaced by the parent's first key)
+print("\n----- Test 5 -----")
+tree = BPlusTree(4)
+for k in [1, 2, 20, 21, 30, 31, 40, 50, 41, 60, 70]:
+    tree.insert(k, str(k))
+tree.delete(60)
+assert tree.search_value(40) == "40"
+tree.insert(45, "45")
+keys = tree.get_all_leaf_keys()
+assert keys == sorted(keys), keys
+tree.visualization()
@@ -0,0 +1,101 @@
+import unittest
+from commands import VirtualFileSystem
+from dentry_cache import DentryCache, MISSING
+from layouts import normalize_path
+
+# To test it, run python3 -m tests.dentry_cache_tests
+
+# Eighth Test - Path normalization and the dentry cache
+
+
+class TestNormalizePath(unittest.TestCase):
+    def test_normalization(self):
+        cases = [
+            ("/", "a/b", "/a/b"),
+            ("/a/b", "..", "/a"),
+            ("/a/b", "../..", "/"),
+            ("/a", "../../..", "/"),
+            ("/a", "./b/./c/", "/a/b/c"),
+            ("/a", "//x///y", "/x/y"),
+            ("/a/b", "../c/../d", "/a/d"),
+        ]
+        for cwd, path, expected in cases:
+            with self.subTest(cwd=cwd, path=path):
+                self.assertEqual(normalize_path(cwd, path), expected)
+
+
+class TestDentryCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = DentryCache(capacity=2)
+        cache.put("/a", {"type": "dir"})
+        cache.put("/b", None)
+        cache.get("/a")  # /a becomes the most recently used
+        cache.put("/c", {"type": "file"})
+        self.assertIs(cache.get("/b"), MISSING)
+        self.assertEqual(cache.get("/a"), {"type": "dir"})
+        self.assertEqual(cache.stats()["hits"], 2)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_negative_entries(self):
+        cache = DentryCache()
+        cache.put("/missing", None)
+        self.assertIsNone(cache.get("/missing"))
+
+    def test_invalidate_tree(self):
+        cache = DentryCache()
+        for path in ["/a", "/a/b", "/a/b/c", "/ab"]:
+            cache.put(path, {"type": "dir"})
+        cache.invalidate_tree("/a")
+        self.assertEqual(list(cache.entries), ["/ab"])
+
+
+class TestFilesystemCache(unittest.TestCase):
+    def setUp(self):
+        self.fs = VirtualFileSystem()
+        self.fs.mkdir("projects")
+        self.fs.mkdir("projects/python")
+
+    def test_repeated_cd_hits_cache(self):
+        self.fs.cd("/projects/python")
+        hits = self.fs.cache_stats()["hits"]
+        self.fs.cd("/")
+        self.fs.cd("/projects/python")
+        self.assertGreater(self.fs.cache_stats()["hits"], hits)
+
+    def test_multi_segment_cd(self):
+        self.fs.cd("projects/python/../python/.")
+        self.assertEqual(self.fs.cwd, "/projects/python")
+        self.fs.cd("../..")
+        self.assertEqual(self.fs.cwd, "/")
+        self.assertEqual(self.fs.cd(".."), "Already at root directory")
+
+    def test_negative_entry_invalidated_on_create(self):
+        self.assertEqual(self.fs.cd("docs"), "No such directory: /docs")
+        self.fs.mkdir("docs")
+        self.assertEqual(self.fs.cd("docs"), "Moved to /docs")
+
+    def test_rm_invalidates_subtree(self):
+        self.fs.cd("/projects/python")
+        self.fs.cd("/")
+        self.fs.rm("projects")
+        self.assertEqual(
+            self.fs.cd("/projects/python"), "No such directory: /projects/python"
+        )
+        self.assertEqual(self.fs.mkdir("projects"), "Directory 'projects' created")
+
+    def test_mv_invalidates_both_sides(self):
+        self.fs.cd("/work/python")  # Negative entry for the destination
+        self.fs.mv("/projects", "/work")
+        self.assertEqual(self.fs.cd("/work/python"), "Moved to /work/python")
+        self.assertEqual(self.fs.cd("/projects"), "No such directory: /projects")
+
+    def test_disabled_cache(self):
+        fs = VirtualFileSystem(cache_size=0)
+        fs.mkdir("a")
+        fs.cd("a")
+        self.assertEqual(fs.cache_stats()["size"], 0)
+        self.assertEqual(fs.cwd, "/a")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+from commands import CANCEL_CHECK_INTERVAL, VirtualFileSystem
+from dispatcher import dispatch
+from patterns import glob_prefix, regex_prefix
+
+# To test it, run python3 -m tests.find_tests
+
+# Ninth Test - The find command and its prefix-pruned scans
+
+
+class TestPatternPrefixes(unittest.TestCase):
+    def test_glob_prefix(self):
+        self.assertEqual(glob_prefix("/src/*.py"), "/src/")
+        self.assertEqual(glob_prefix("main.py"), "main.py")
+        self.assertEqual(glob_prefix("[ab]*"), "")
+
+    def test_regex_prefix(self):
+        self.assertEqual(regex_prefix(r"/src/.*\.py"), "/src/")
+        self.assertEqual(regex_prefix(r"^/src/lib"), "/src/lib")
+        self.assertEqual(regex_prefix(r"/srcs?/"), "/src")
+        self.assertEqual(regex_prefix(r"/a\.b/x"), "/a.b/x")
+        self.assertEqual(regex_prefix(r"/a|/b"), "")
+        self.assertEqual(regex_prefix(r"\d+"), "")
+
+
+class FindTestsMixin:
+    layout = None
+
+    def setUp(self):
+        self.fs = VirtualFileSystem(layout=self.layout)
+        for d in ["src", "src/lib", "src/lib/utils", "docs", "src-old"]:
+            self.fs.mkdir(d)
+        for f in [
+            "src/main.py",
+            "src/lib/tree.py",
+            "src/lib/utils/io.py",
+            "src/lib/README.md",
+            "docs/index.md",
+            "src-old/main.py",
+        ]:
+            self.fs.touch(f)
+
+    def find(self, **kwargs):
+        return list(self.fs.iter_find(**kwargs))
+
+    def test_find_by_name(self):
+        self.assertEqual(
+            self.find(path="/src", name="*.py"),
+            ["/src/lib/tree.py", "/src/lib/utils/io.py", "/src/main.py"],
+        )
+
+    def test_find_by_type(self):
+        self.assertEqual(
+            self.find(path="/src", entry_type="d"),
+            ["/src", "/src/lib", "/src/lib/utils"],
+        )
+        self.assertEqual(self.find(name="*.md", entry_type="f"), self.find(name="*.md"))
+
+    def test_find_by_path_and_regex(self):
+        self.assertEqual(self.find(pattern="/src/lib/*.md"), ["/src/lib/README.md"])
+        self.assertEqual(
+            self.find(regex=r"/src/lib/u.*\.py"),
+            ["/src/lib/utils/io.py"],
+        )
+        self.assertEqual(self.find(regex=r"/src-old/.*"), ["/src-old/main.py"])
+
+    def test_relative_start(self):
+        self.fs.cd("src")
+        self.assertEqual(
+            self.find(path="lib/utils"), ["/src/lib/utils", "/src/lib/utils/io.py"]
+        )
+
+    def test_errors(self):
+        self.assertEqual(self.find(path="/missing"), ["No such directory: /missing"])
+        self.assertEqual(self.find(entry_type="x"), ["Unknown type: x"])
+        self.assertTrue(self.find(regex="(")[0].startswith("Invalid regex"))
+        self.assertEqual(self.fs.find(name="*.rs"), "[no matches]")
+
+    def test_find_is_lazy(self):
+        for i in range(500):
+            self.fs.touch(f"/docs/page{i:03d}.md")
+        matches = self.fs.iter_find(path="/docs", name="page*")
+        self.assertEqual(next(matches), "/docs/page000.md")
+
+
+class TestFindPathLayout(FindTestsMixin, unittest.TestCase):
+    layout = "path"
+
+    def test_prefix_bounds_the_scan(self):
+        for i in range(1000):
+            self.fs.touch(f"/docs/page{i:04d}.md")
+
+        # Count how many leaves the scan walks through
+        visited = []
+        scan = self.fs.tree.scan
+
+        def counting_scan(start, stop=None):
+            for item in scan(start, stop):
+                visited.append(item[0])
+                yield item
+
+        self.fs.tree.scan = counting_scan
+        self.assertEqual(len(self.find(regex=r"/src/lib/.*\.py")), 2)
+        self.assertTrue(all(key.startswith("/src/lib/") for key in visited))
+
+    def test_cancel_a_scan_without_matches(self):
+        for i in range(3 * CANCEL_CHECK_INTERVAL):
+            self.fs.touch(f"/docs/page{i:04d}.md")
+        polls = []
+
+        def cancelled():
+            polls.append(len(polls))
+            return len(polls) == 2
+
+        self.assertEqual(self.find(name="*.rs", cancelled=cancelled), [])
+        self.assertEqual(len(polls), 2)  # Stopped at the second poll
+        self.fs.write("/docs/page3000.md", "nothing")  # After the first poll
+        lines = dispatch(self.fs, "grep nothing /", cancelled=lambda: True)
+        self.assertEqual(list(lines), [])
+        self.assertEqual(len(list(dispatch(self.fs, "grep nothing /"))), 1)
+        self.assertEqual(len(self.find(name="*.md", cancelled=lambda: False)), 3074)
+
+
+class TestFindInodeLayout(FindTestsMixin, unittest.TestCase):
+    layout = "inode"
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+import unittest
+from analysis.tree_fuzz import (
+    InvariantError,
+    SortedMap,
+    check_invariants,
+    operations,
+    replay,
+    run_seed,
+    seed_list,
+    shrink,
+)
+from bplus_tree import BPlusTree, InternalNode, LeafNode
+
+# To test it, run python3 -m tests.fuzz_tests
+
+# Twenty-fifth Test - Differential fuzzing against a reference sorted map
+
+
+def build(keys, order=4):
+    tree = BPlusTree(order)
+    for key in keys:
+        tree.insert(key, key)
+    return tree
+
+
+def leftmost_leaf(tree):
+    node = tree.root
+    while isinstance(node, InternalNode):
+        node = node.children[0]
+    return node
+
+
+class LinkBugTree(BPlusTree):
+    """Forgets to update prev_leaf when two leaves merge"""
+
+    def merge_nodes(self, left, right, parent, sep_idx):
+        after = right.next_leaf if isinstance(left, LeafNode) else None
+        stale = after.prev_leaf if after else None
+        super().merge_nodes(left, right, parent, sep_idx)
+        if after:
+            after.prev_leaf = stale
+
+
+class LostKeyTree(BPlusTree):
+    """Never deletes the key 7"""
+
+    def delete(self, key):
+        if key != 7:
+            super().delete(key)
+
+
+class TestReference(unittest.TestCase):
+    def test_sorted_map(self):
+        reference = SortedMap()
+        for key in [5, 1, 3, 5]:
+            reference.insert(key, key * 10)
+        reference.delete(3)
+        reference.delete(42)
+        self.assertEqual(reference.items(), [(1, 10), (5, 50)])
+        self.assertEqual(reference.search_value(5), 50)
+        self.assertIsNone(reference.search_value(3))
+        self.assertEqual(reference.range_query(0, 4), [(1, 10)])
+
+    def test_operations_are_reproducible(self):
+        first = list(operations(3, 5000, 100))
+        self.assertEqual(first, list(operations(3, 5000, 100)))
+        self.assertNotEqual(first, list(operations(4, 5000, 100)))
+        self.assertEqual(
+            {op[0] for op in first}, {"insert", "delete", "search", "range"}
+        )
+
+    def test_seed_list(self):
+        self.assertEqual(seed_list("0-3,7"), [0, 1, 2, 3, 7])
+
+
+class TestInvariants(unittest.TestCase):
+    def test_valid_trees(self):
+        for order in (3, 4, 5, 16):
+            tree = build(range(500), order)
+            check_invariants(tree)
+            for key in range(0, 500, 3):
+                tree.delete(key)
+            check_invariants(tree)
+        check_invariants(BPlusTree(4))
+
+    def test_broken_links(self):
+        tree = build(range(100))
+        leaf = leftmost_leaf(tree)
+        leaf.next_leaf.prev_leaf = None
+        with self.assertRaisesRegex(InvariantError, "prev_leaf"):
+            check_invariants(tree)
+
+    def test_keys_out_of_bounds(self):
+        tree = build(range(100))
+        leaf = leftmost_leaf(tree)
+        leaf.keys[-1] = 1000
+        with self.assertRaises(InvariantError):
+            check_invariants(tree)
+
+    def test_underfull_leaf(self):
+        tree = build(range(100), order=8)
+        leaf = leftmost_leaf(tree)
+        del leaf.keys[1:], leaf.values[1:]
+        with self.assertRaisesRegex(InvariantError, "Underfull"):
+            check_invariants(tree)
+
+    def test_different_content(self):
+        tree = build(range(10))
+        reference = SortedMap()
+        for key in range(9):
+            reference.insert(key, key)
+        with self.assertRaisesRegex(InvariantError, "10 entries"):
+            check_invariants(tree, reference)
+
+
+class TestFuzzing(unittest.TestCase):
+    def test_tree_passes(self):
+        for order in (3, 4, 7):
+            result = run_seed(1, order, 5000, 250, 500)
+            self.assertIsNone(result["failure"])
+            self.assertEqual(result["ops"], 5000)
+            self.assertGreater(result["ops_per_s"], 0)
+
+    def test_structural_bug_is_found_and_shrunk(self):
+        result = run_seed(0, 4, 20_000, 500, 2000, tree_class=LinkBugTree)
+        self.assertEqual(result["failure"], "Broken prev_leaf link")
+        self.assertLess(result["reproducer_ops"], 30)
+        self.assertIn("tree.delete(", result["reproducer"])
+        self.assertTrue(result["reproducer"].endswith("# Broken prev_leaf link"))
+
+    def test_shrinks_to_the_minimal_sequence(self):
+        ops = list(operations(2, 3000, 50))
+        ops += [("insert", 7, -1), ("delete", 7), ("search", 7)]
+        self.assertIsNotNone(replay(ops, 4, 100, LostKeyTree))
+        shrunk = shrink(ops, 4, LostKeyTree)
+        self.assertEqual(len(shrunk), 2)
+        self.assertEqual([op[:2] for op in shrunk], [("insert", 7), ("delete", 7)])
+        self.assertIsNone(replay(shrunk, 4))  # Only the buggy tree fails
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from commands import VirtualFileSystem
+
+# To test it, run python3 -m tests.grep_tests
+
+# Eleventh Test - File contents and the parallel grep
+
+
+class GrepTestsMixin:
+    workers = None
+
+    def setUp(self):
+        self.fs = VirtualFileSystem(grep_workers=self.workers, grep_batch_size=3)
+        self.fs.mkdir("logs")
+        for i in range(20):
+            self.fs.write(f"logs/day{i:02d}.log", f"start {i}")
+            if i % 3 == 0:
+                self.fs.write(f"logs/day{i:02d}.log", "ERROR disk full", append=True)
+        self.fs.write("notes.txt", "no errors here")
+
+    def tearDown(self):
+        self.fs.searcher.close()
+
+    def test_results_keep_file_order(self):
+        expected = [f"/logs/day{i:02d}.log:2:ERROR disk full" for i in range(0, 20, 3)]
+        self.assertEqual(list(self.fs.iter_grep("ERROR", "/logs")), expected)
+
+    def test_regex_and_subtree(self):
+        self.assertEqual(self.fs.grep("^no err"), "/notes.txt:1:no errors here")
+        self.assertEqual(self.fs.grep("^no err", "/logs"), "[no matches]")
+
+    def test_errors(self):
+        self.assertEqual(self.fs.grep("x", "/missing"), "No such directory: /missing")
+        self.assertTrue(self.fs.grep("(").startswith("Invalid regex"))
+
+
+class TestGrepInProcess(GrepTestsMixin, unittest.TestCase):
+    workers = 1
+
+
+class TestGrepProcessPool(GrepTestsMixin, unittest.TestCase):
+    workers = 2
+
+
+class TestFileContent(unittest.TestCase):
+    def test_write_and_cat(self):
+        fs = VirtualFileSystem()
+        self.assertEqual(fs.write("a.txt", "one"), "File 'a.txt' written")
+        fs.write("a.txt", "two", append=True)
+        self.assertEqual(fs.cat("a.txt"), "one\ntwo")
+        fs.write("a.txt", "three")
+        self.assertEqual(fs.cat("a.txt"), "three")
+        fs.mkdir("dir")
+        self.assertEqual(fs.write("dir", "x"), "'dir' is a directory")
+        self.assertEqual(fs.write("missing/a.txt", "x"), "No such directory: /missing")
+        self.assertEqual(fs.cat("b.txt"), "File 'b.txt' does not exist")
+
+
+if __name__ == "__main__":
+    unittest.main()
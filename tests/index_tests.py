@@ -0,0 +1,128 @@
+import unittest
+from commands import VirtualFileSystem
+from indexes import extension
+from patterns import glob_extension
+
+# To test it, run python3 -m tests.index_tests
+
+# Tenth Test - Secondary indexes by extension and by type
+
+
+class TestExtensions(unittest.TestCase):
+    def test_extension(self):
+        self.assertEqual(extension("/src/main.py"), ".py")
+        self.assertEqual(extension("/src/archive.tar.gz"), ".gz")
+        self.assertEqual(extension("/src/Makefile"), "")
+        self.assertEqual(extension("/src.d/Makefile"), "")
+
+    def test_glob_extension(self):
+        self.assertEqual(glob_extension("*.py"), ".py")
+        self.assertEqual(glob_extension("test_*.tar.gz"), ".gz")
+        self.assertIsNone(glob_extension("*.p?"))
+        self.assertIsNone(glob_extension("*"))
+
+
+class IndexTestsMixin:
+    layout = None
+
+    def setUp(self):
+        self.fs = VirtualFileSystem(layout=self.layout, indexes=True)
+        self.plain = VirtualFileSystem(layout=self.layout)
+        for fs in (self.fs, self.plain):
+            for d in ["src", "src/lib", "docs"]:
+                fs.mkdir(d)
+            for f in ["src/main.py", "src/lib/tree.py", "src/lib/notes.md", "a.py"]:
+                fs.touch(f)
+
+    def indexed(self):
+        return {
+            "types": [key for key, _ in self.fs.indexes.by_type.scan(("",))],
+            "extensions": [key for key, _ in self.fs.indexes.by_extension.scan(("",))],
+        }
+
+    def test_indexes_follow_the_primary_tree(self):
+        self.fs.mv("/src/lib", "/docs/lib")
+        self.fs.rm("/src")
+        self.assertEqual(
+            self.indexed(),
+            {
+                "types": [
+                    ("dir", "/docs"),
+                    ("dir", "/docs/lib"),
+                    ("file", "/a.py"),
+                    ("file", "/docs/lib/notes.md"),
+                    ("file", "/docs/lib/tree.py"),
+                ],
+                "extensions": [
+                    (".md", "/docs/lib/notes.md"),
+                    (".py", "/a.py"),
+                    (".py", "/docs/lib/tree.py"),
+                ],
+            },
+        )
+
+    def test_find_uses_the_same_results(self):
+        queries = [
+            {"name": "*.py"},
+            {"path": "/src", "name": "*.py"},
+            {"entry_type": "d"},
+            {"path": "/src", "entry_type": "f", "regex": r"/src/lib/.*"},
+            {"name": "t*.py", "entry_type": "f"},
+            {"name": "*.py", "entry_type": "d"},
+        ]
+        for query in queries:
+            with self.subTest(query=query):
+                self.assertEqual(
+                    sorted(self.fs.iter_find(**query)),
+                    sorted(self.plain.iter_find(**query)),
+                )
+
+    def test_find_dotted_directories(self):
+        for fs in (self.fs, self.plain):
+            fs.mkdir("pkg.py")
+            fs.touch("pkg.py/setup.py")
+        for query in [{"name": "*.py"}, {"name": "*.py", "entry_type": "d"}]:
+            with self.subTest(query=query):
+                self.assertEqual(
+                    sorted(self.fs.iter_find(**query)),
+                    sorted(self.plain.iter_find(**query)),
+                )
+        self.assertIn("/pkg.py", list(self.fs.iter_find(name="*.py")))
+
+    def test_ls_filters(self):
+        self.assertEqual(self.fs.ls("/src", entry_type="d"), "lib/")
+        self.assertEqual(self.fs.ls("/src", entry_type="f"), "main.py")
+        self.assertEqual(self.fs.ls("/", entry_type="f"), "a.py")
+        self.assertEqual(self.fs.ls("/docs", entry_type="f"), "[empty]")
+
+    def test_failed_index_update_rolls_back(self):
+        add = self.fs.indexes.add
+
+        def broken_add(path, meta):
+            # Only new paths fail, so the rollback itself can still re-add entries
+            if path.startswith(("/code", "/docs/readme")):
+                raise RuntimeError("index is full")
+            add(path, meta)
+
+        self.fs.indexes.add = broken_add
+        with self.assertRaises(RuntimeError):
+            self.fs.touch("/docs/readme.md")
+        self.assertEqual(self.fs.ls("/docs"), "[empty]")
+
+        before = self.indexed()
+        with self.assertRaises(RuntimeError):
+            self.fs.mv("/src", "/code")
+        self.assertEqual(self.fs.ls("/"), "a.py docs/ src/")
+        self.assertEqual(self.indexed(), before)
+
+
+class TestIndexesPathLayout(IndexTestsMixin, unittest.TestCase):
+    layout = "path"
+
+
+class TestIndexesInodeLayout(IndexTestsMixin, unittest.TestCase):
+    layout = "inode"
+
+
+if __name__ == "__main__":
+    unittest.main()
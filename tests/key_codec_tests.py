@@ -0,0 +1,127 @@
+import contextlib
+import io
+import pickle
+import random
+import unittest
+from analysis.key_codec_benchmark import run_key_codec_benchmark
+from key_codec import EncodedBPlusTree, decode_key, encode_key
+
+# To test it, run python3 -m tests.key_codec_tests
+
+# Thirty-first Test - Order-preserving key encoding and the encoded tree
+
+
+def random_key(rng, kind, depth=0):
+    if kind == "int":
+        return rng.choice(
+            [rng.randint(-300, 300), rng.randint(-(2**70), 2**70), -(2**64), 2**64]
+        )
+    if kind in ("str", "bytes"):
+        text = "".join(rng.choice("a\x00\xffé/z") for _ in range(rng.randint(0, 4)))
+        return text if kind == "str" else text.encode()
+    kinds = ["int", "str", "bytes"] + (["tuple"] if depth < 2 else [])
+    return tuple(
+        random_key(rng, rng.choice(kinds), depth + 1) for _ in range(rng.randint(0, 3))
+    )
+
+
+class TestKeyCodec(unittest.TestCase):
+    def test_order_is_preserved(self):
+        rng = random.Random(0)
+        for kind in ("int", "str", "bytes", "tuple"):
+            keys = [random_key(rng, kind) for _ in range(2000)]
+            if kind == "tuple":  # Python can't compare mixed element types
+                keys = [key for key in keys if all(type(k) is int for k in key)]
+            with self.subTest(kind=kind):
+                self.assertEqual(sorted(keys, key=encode_key), sorted(keys))
+
+    def test_round_trip(self):
+        rng = random.Random(1)
+        for kind in ("int", "str", "bytes", "tuple"):
+            for _ in range(500):
+                key = random_key(rng, kind)
+                self.assertEqual(decode_key(encode_key(key)), key)
+
+    def test_prefixes_and_mixed_types(self):
+        ordered = [
+            -(2**80),
+            -256,
+            -1,
+            0,
+            1,
+            2**80,
+            "",
+            "a",
+            "a\x00",
+            "a\x00b",
+            "ab",
+            b"",
+            b"a",
+            (),
+            (1,),
+            (1, ""),
+            (1, "a"),
+            (2,),
+            ((1,), 2),
+        ]
+        encoded = [encode_key(key) for key in ordered]
+        self.assertEqual(encoded, sorted(encoded))
+
+    def test_errors(self):
+        with self.assertRaises(TypeError):
+            encode_key(1.5)
+        with self.assertRaises(TypeError):
+            encode_key((1, None))
+        with self.assertRaises(ValueError):
+            encode_key(2 ** (8 * 256))
+        for data in [b"", b"\x40abc", b"\x28\x01", b"\x99", encode_key(1) + b"\x00"]:
+            with self.subTest(data=data), self.assertRaises(ValueError):
+                decode_key(data)
+
+
+class TestEncodedTree(unittest.TestCase):
+    def setUp(self):
+        self.tree = EncodedBPlusTree(4)
+        self.keys = [3, -7, "b", "a/x", "a\x00", b"raw", (1, "x"), (1, "y"), (0, 5)]
+        for key in self.keys:
+            self.tree.insert(key, repr(key))
+
+    def test_mixed_keys(self):
+        self.assertEqual(
+            [key for key, _ in self.tree.items()],
+            [-7, 3, "a\x00", "a/x", "b", b"raw", (0, 5), (1, "x"), (1, "y")],
+        )
+        self.assertEqual(self.tree.search_value((1, "y")), "(1, 'y')")
+        self.assertEqual(self.tree.search_values(["b", 4, -7]), ["'b'", None, "-7"])
+        self.tree.delete("b")
+        self.assertIsNone(self.tree.search_value("b"))
+
+    def test_ranges(self):
+        self.assertEqual(
+            [key for key, _ in self.tree.range_query(0, "b")], [3, "a\x00", "a/x", "b"]
+        )
+        self.assertEqual(
+            [key for key, _ in self.tree.scan((1,), (2,))], [(1, "x"), (1, "y")]
+        )
+        self.assertEqual(
+            [key for key, _ in self.tree.scan_prefix("a")], ["a\x00", "a/x"]
+        )
+        self.assertEqual(list(self.tree.scan_prefix("c")), [])
+
+    def test_bulk_load_and_pickle(self):
+        tree = EncodedBPlusTree(5)
+        items = [((i % 7, f"n{i}"), i) for i in range(300)]
+        tree.bulk_load(reversed(items))
+        self.assertEqual(list(tree.items()), sorted(items))
+        copy = pickle.loads(pickle.dumps(tree))
+        self.assertEqual(list(copy.items()), sorted(items))
+
+    def test_benchmark_runs(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = run_key_codec_benchmark(500, ["paths", "tuples"], 8, 1)
+        self.assertEqual(set(results), {"paths", "tuples"})
+        self.assertEqual(len(results["tuples"]), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
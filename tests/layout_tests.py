@@ -0,0 +1,89 @@
+import unittest
+from commands import VirtualFileSystem
+
+# To test it, run python3 -m tests.layout_tests
+
+# Seventh Test - Both storage layouts must behave the same way
+
+
+class LayoutTestsMixin:
+    layout = None
+
+    def setUp(self):
+        self.fs = VirtualFileSystem(order=4, layout=self.layout)
+        self.fs.mkdir("projects")
+        self.fs.mkdir("projects/python")
+        self.fs.touch("projects/python/main.py")
+        self.fs.touch("projects/notes.txt")
+        self.fs.mkdir("projects-old")
+
+    def test_ls_lists_direct_children_only(self):
+        self.assertEqual(self.fs.ls(), "projects/ projects-old/")
+        self.assertEqual(self.fs.ls("/projects"), "notes.txt python/")
+        self.assertEqual(self.fs.ls("/projects-old"), "[empty]")
+
+    def test_missing_parent(self):
+        self.assertEqual(self.fs.touch("nope/file.txt"), "No such directory: /nope")
+        self.assertEqual(
+            self.fs.mkdir("projects/notes.txt/x"),
+            "No such directory: /projects/notes.txt",
+        )
+
+    def test_cd(self):
+        self.fs.cd("projects/python")
+        self.assertEqual(self.fs.cwd, "/projects/python")
+        self.assertEqual(self.fs.ls(), "main.py")
+        self.fs.cd("..")
+        self.assertEqual(self.fs.cwd, "/projects")
+        self.assertEqual(
+            self.fs.cd("notes.txt"), "No such directory: /projects/notes.txt"
+        )
+
+    def test_rm_directory_removes_subtree(self):
+        self.fs.rm("projects")
+        self.assertEqual(self.fs.ls(), "projects-old/")
+        self.assertEqual(
+            self.fs.cd("/projects/python"), "No such directory: /projects/python"
+        )
+        self.fs.mkdir("projects")
+        self.assertEqual(self.fs.ls("/projects"), "[empty]")
+
+    def test_mv_renames_subtree(self):
+        self.fs.cd("/projects/python")
+        self.assertEqual(
+            self.fs.mv("/projects", "/work"), "'/projects' moved to '/work'"
+        )
+        self.assertEqual(self.fs.cwd, "/work/python")
+        self.assertEqual(self.fs.ls("/work/python"), "main.py")
+        self.assertEqual(self.fs.ls("/"), "projects-old/ work/")
+
+    def test_mv_into_directory(self):
+        self.fs.mv("/projects/notes.txt", "/projects-old")
+        self.assertEqual(self.fs.ls("/projects-old"), "notes.txt")
+        self.assertEqual(
+            self.fs.mv("/projects", "/projects/python"),
+            "Cannot move '/projects' inside itself",
+        )
+        self.assertEqual(self.fs.mv("/missing", "/x"), "File '/missing' does not exist")
+
+    def test_many_entries(self):
+        for i in range(200):
+            self.fs.touch(f"/projects-old/f{i:03d}")
+        self.assertEqual(len(self.fs.ls("/projects-old").split()), 200)
+        for i in range(0, 200, 2):
+            self.fs.rm(f"/projects-old/f{i:03d}")
+        self.assertEqual(
+            self.fs.ls("/projects-old").split(), [f"f{i:03d}" for i in range(1, 200, 2)]
+        )
+
+
+class TestPathLayout(LayoutTestsMixin, unittest.TestCase):
+    layout = "path"
+
+
+class TestInodeLayout(LayoutTestsMixin, unittest.TestCase):
+    layout = "inode"
+
+
+if __name__ == "__main__":
+    unittest.main()
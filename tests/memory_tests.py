@@ -0,0 +1,75 @@
+import unittest
+from analysis.memory_benchmark import (
+    make_keys,
+    measure_memory,
+    run_memory_suite,
+    tree_shape,
+)
+from bplus_tree import BPlusTree
+
+# To test it, run python3 -m tests.memory_tests
+
+# Nineteenth Test - Memory footprint benchmark
+
+
+class TestTreeShape(unittest.TestCase):
+    def test_single_leaf(self):
+        tree = BPlusTree(4)
+        for key in (1, 2, 3):
+            tree.insert(key, key)
+        shape = tree_shape(tree)
+        self.assertEqual(shape["height"], 1)
+        self.assertEqual(shape["leaves"], 1)
+        self.assertEqual(shape["internal_nodes"], 0)
+        self.assertEqual(shape["leaf_fill"], 1.0)
+
+    def test_counts_every_node(self):
+        tree = BPlusTree(4)
+        for key in range(200):
+            tree.insert(key, key)
+        shape = tree_shape(tree)
+        leaves, leaf = 0, tree.root
+        while hasattr(leaf, "children"):
+            leaf = leaf.children[0]
+        while leaf:
+            leaves += 1
+            leaf = leaf.next_leaf
+        self.assertEqual(shape["leaves"], leaves)
+        self.assertGreater(shape["internal_nodes"], 0)
+        self.assertEqual(shape["lists"], 2 * (leaves + shape["internal_nodes"]))
+        self.assertGreater(shape["height"], 3)
+        self.assertTrue(0.5 <= shape["leaf_fill"] <= 1)
+
+
+class TestMeasureMemory(unittest.TestCase):
+    def test_key_types(self):
+        self.assertEqual(make_keys("int", 3), [0, 1, 2])
+        self.assertEqual(len(set(make_keys("path", 1000))), 1000)
+        self.assertTrue(all(key.count("/") >= 5 for key in make_keys("path", 10)))
+        with self.assertRaises(ValueError):
+            make_keys("float", 3)
+
+    def test_record(self):
+        small = measure_memory("short", 2000, 8)
+        self.assertEqual(small["size"], 2000)
+        self.assertGreater(small["tree_bytes_per_entry"], 8)  # At least the references
+        self.assertGreater(small["key_bytes_per_entry"], 40)  # A str object each
+        large = measure_memory("short", 2000, 256)
+        self.assertLess(large["tree_bytes_per_entry"], small["tree_bytes_per_entry"])
+        self.assertLess(large["height"], small["height"])
+
+    def test_longer_keys_take_more_memory(self):
+        run = run_memory_suite([500], [16], ["int", "path"], log=lambda line: None)
+        by_type = {r["key_type"]: r for r in run["results"]}
+        self.assertGreater(
+            by_type["path"]["key_bytes_per_entry"],
+            by_type["int"]["key_bytes_per_entry"],
+        )
+
+    def test_sequential_inserts_leave_leaves_half_full(self):
+        record = measure_memory("int", 5000, 64, insert_order="sequential")
+        self.assertLess(record["leaf_fill"], 0.6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import json
+import os
+import pickle
+import random
+import tempfile
+import unittest
+from commands import VirtualFileSystem
+from dispatcher import Stream, dispatch
+from metrics import METERED, LatencyHistogram, bucket_index, bucket_range
+from percentiles import percentile
+
+# To test it, run python3 -m tests.metrics_tests
+
+# Twenty-third Test - Latency histograms and the stats command
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_buckets(self):
+        for value in [0, 1, 255, 256, 257, 1000, 10**6, 10**9 + 7, 2**40]:
+            low, high = bucket_range(bucket_index(value))
+            self.assertTrue(low <= value <= high)
+            self.assertLessEqual(high - low, value / 128)
+
+    def test_percentiles_within_one_percent(self):
+        rng = random.Random(0)
+        values = [int(rng.lognormvariate(11, 1.5)) for _ in range(20000)]
+        histogram = LatencyHistogram()
+        for value in values:
+            histogram.record(value)
+        ordered = sorted(values)
+        for q in [50, 90, 99, 99.9]:
+            exact = percentile(ordered, q)
+            self.assertAlmostEqual(histogram.percentile(q), exact, delta=exact / 100)
+        self.assertEqual(histogram.percentile(100), max(values))
+        self.assertEqual((histogram.min, histogram.max), (ordered[0], ordered[-1]))
+        self.assertEqual(histogram.count, len(values))
+
+    def test_nearest_rank(self):
+        histogram = LatencyHistogram()
+        for value in [10, 20, 30, 40, 50]:  # Small values have exact buckets
+            histogram.record(value)
+        self.assertEqual(histogram.percentile(50), 30)
+        self.assertEqual(histogram.percentile(90), 50)
+        self.assertEqual(histogram.percentile(20), 10)
+        self.assertEqual(histogram.percentile(0), 10)
+
+    def test_add(self):
+        first, second, both = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+        for value in range(0, 5000, 7):
+            (first if value % 2 else second).record(value)
+            both.record(value)
+        first.add(second)
+        self.assertEqual(first.as_dict(), both.as_dict())
+
+    def test_empty(self):
+        histogram = LatencyHistogram()
+        self.assertIsNone(histogram.percentile(50))
+        self.assertEqual(histogram.as_dict()["buckets"], [])
+
+
+class TestCommandMetrics(unittest.TestCase):
+    def setUp(self):
+        self.fs = VirtualFileSystem(indexes=True)
+        self.metrics = self.fs.enable_metrics()
+
+    def tearDown(self):
+        self.fs.searcher.close()
+
+    def counts(self):
+        by_command = self.metrics.snapshot()["by_command"]
+        return {command: values["count"] for command, values in by_command.items()}
+
+    def test_commands_are_counted_once(self):
+        self.fs.mkdir("/docs")
+        self.fs.write("/docs/a.txt", "hello")  # Creates the file with touch
+        self.fs.ls("/docs")  # Goes through iter_ls
+        self.fs.cat("/docs/a.txt")
+        self.assertEqual(self.counts(), {"mkdir": 1, "echo": 1, "ls": 1, "cat": 1})
+
+    def test_streams_are_recorded_when_drained(self):
+        self.fs.mkdir("/docs")
+        output = dispatch(self.fs, "find / -type d")
+        self.assertIsInstance(output, Stream)
+        self.assertNotIn("find", self.counts())
+        self.assertEqual(output.render(), "/\n/docs")
+        self.assertEqual(self.counts()["find"], 1)
+
+        output = dispatch(self.fs, "ls /")
+        next(iter(output))
+        output.close()  # Cancelled
+        self.assertEqual(self.counts()["ls"], 1)
+
+    def test_stats_command(self):
+        dispatch(self.fs, "mkdir /docs")
+        text = dispatch(self.fs, "stats")
+        self.assertIn("mkdir", text)
+        self.assertIn("Tree: order 4, height 1, 2 entries", text)
+        self.assertIn("Dentry cache:", text)
+        self.assertIn("Memory:", text)
+
+        self.assertEqual(dispatch(self.fs, "stats reset"), "Command metrics reset")
+        self.assertEqual(self.counts(), {})
+        self.assertIn("Unknown or incomplete", dispatch(self.fs, "stats now"))
+
+    def test_json_export(self):
+        dispatch(self.fs, "touch /a.txt")
+        data = json.loads(dispatch(self.fs, "stats --json"))
+        self.assertEqual(data["metrics"]["by_command"]["touch"]["count"], 1)
+        self.assertEqual(data["tree"]["entries"], 2)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "stats.json")
+            self.assertEqual(
+                dispatch(self.fs, f"stats --json {path}"), f"Stats written to {path}"
+            )
+            with open(path) as f:
+                self.assertEqual(json.load(f)["dentry_cache"]["capacity"], 1024)
+            missing = os.path.join(tmp, "missing", "stats.json")
+            self.assertIn("Cannot write", dispatch(self.fs, f"stats --json {missing}"))
+
+    def test_disable(self):
+        self.assertEqual(dispatch(self.fs, "stats off"), "Command metrics off")
+        self.assertIsNone(self.fs.metrics)
+        for name in METERED:
+            self.assertNotIn(name, vars(self.fs))
+        self.assertIn("Command metrics are off", dispatch(self.fs, "stats"))
+        dispatch(self.fs, "stats on")
+        self.assertIsNotNone(self.fs.metrics)
+
+    def test_snapshot_leaves_the_metrics_out(self):
+        self.fs.mkdir("/docs")
+        copy = pickle.loads(pickle.dumps(self.fs))
+        try:
+            self.assertIsNone(copy.metrics)
+            self.assertEqual(copy.ls("/"), "docs/")
+        finally:
+            copy.searcher.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import asyncio
+import unittest
+from textual.app import App
+from output_pane import OutputPane, Scrollback, pack_words
+
+# To test it, run python3 -m tests.output_pane_tests
+
+# Fourteenth Test - Virtualized output pane of the shell
+
+
+class TestScrollback(unittest.TestCase):
+    def test_keeps_lines_in_order(self):
+        buf = Scrollback(5)
+        self.assertEqual(buf.extend(["a", "b", "c"]), 0)
+        self.assertEqual([buf[i] for i in range(len(buf))], ["a", "b", "c"])
+
+    def test_drops_the_oldest_lines_when_full(self):
+        buf = Scrollback(3)
+        buf.extend(["a", "b"])
+        self.assertEqual(buf.extend(["c", "d", "e"]), 2)
+        self.assertEqual(len(buf), 3)
+        self.assertEqual([buf[i] for i in range(len(buf))], ["c", "d", "e"])
+
+        self.assertEqual(buf.extend(["f"]), 1)
+        self.assertEqual([buf[i] for i in range(len(buf))], ["d", "e", "f"])
+
+
+class TestPackWords(unittest.TestCase):
+    def test_rows_fit_the_width(self):
+        rows = list(pack_words(["aa", "bb", "cc", "dd", "ee"], 8))
+        self.assertEqual(rows, ["aa bb cc", "dd ee"])
+
+    def test_long_word_gets_its_own_row(self):
+        rows = list(pack_words(["a", "verylongname", "b"], 5))
+        self.assertEqual(rows, ["a", "verylongname", "b"])
+
+    def test_is_lazy(self):
+        def words():
+            yield "first"
+            yield "second"
+            raise AssertionError("Pulled more words than needed")
+
+        rows = pack_words(words(), 3)
+        self.assertEqual(next(rows), "first")
+
+    def test_empty(self):
+        self.assertEqual(list(pack_words([], 10)), [])
+
+
+class PaneApp(App):
+    def compose(self):
+        yield OutputPane(max_lines=100, id="output")
+
+
+class TestOutputPane(unittest.TestCase):
+    def run_app(self, check):
+        async def main():
+            app = PaneApp()
+            async with app.run_test(size=(40, 10)) as pilot:
+                await check(app.query_one(OutputPane), pilot)
+
+        asyncio.run(main())
+
+    def test_follows_the_output(self):
+        async def check(pane, pilot):
+            pane.write_lines([f"line {i}" for i in range(50)])
+            await pilot.pause()
+            self.assertEqual(pane.virtual_size.height, 50)
+            self.assertEqual(pane.scroll_offset.y, pane.max_scroll_y)
+            self.assertEqual(
+                pane.render_line(pane.size.height - 1).text.strip(), "line 49"
+            )
+
+        self.run_app(check)
+
+    def test_scrollback_is_bounded(self):
+        async def check(pane, pilot):
+            for start in range(0, 300, 30):
+                pane.write_lines([f"line {i}" for i in range(start, start + 30)])
+            await pilot.pause()
+            self.assertEqual(len(pane.scrollback), 100)
+            self.assertEqual(pane.virtual_size.height, 100)
+            self.assertEqual(pane.scrollback[0], "line 200")
+
+        self.run_app(check)
+
+    def test_keeps_position_when_scrolled_up(self):
+        async def check(pane, pilot):
+            pane.write_lines([f"line {i}" for i in range(50)])
+            await pilot.pause()
+            pane.scroll_to(y=10, animate=False)
+            await pilot.pause()
+            pane.write_lines(["new"])
+            await pilot.pause()
+            self.assertEqual(pane.scroll_offset.y, 10)
+            self.assertEqual(pane.render_line(0).text.strip(), "line 10")
+
+        self.run_app(check)
+
+
+if __name__ == "__main__":
+    unittest.main()
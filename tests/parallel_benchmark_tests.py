@@ -0,0 +1,110 @@
+import json
+import os
+import tempfile
+import unittest
+from analysis.complexity_analysis import BPlusTreeComplexityAnalysis
+from analysis.parallel_benchmark import (
+    cell_key,
+    read_checkpoint,
+    run_parallel_suite,
+    sweep,
+)
+
+# To test it, run python3 -m tests.parallel_benchmark_tests
+
+# Twentieth Test - Parallel benchmark runner with checkpoints
+
+SETTINGS = dict(ops=50, repeats=1, warmups=0)
+
+
+class TestParallelSuite(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.checkpoint = os.path.join(directory.name, "checkpoint.jsonl")
+        self.logs = []
+
+    def run_suite(self, sizes, orders, **kwargs):
+        return run_parallel_suite(
+            sizes,
+            ["search", "insert"],
+            orders,
+            ["random"],
+            workers=2,
+            checkpoint=self.checkpoint,
+            log=self.logs.append,
+            **SETTINGS,
+            **kwargs,
+        )
+
+    def test_sweep(self):
+        cells = sweep([100, 1000], ["search", "insert"], [4, 64], ["random", "zipf"])
+        self.assertEqual(len(cells), 16)
+        self.assertEqual(len(set(map(cell_key, cells))), 16)
+        self.assertTrue(all(cell["size"] == 100 for cell in cells[:8]))
+
+    def test_results_in_sweep_order(self):
+        run = self.run_suite([100, 500], [4, 8])
+        self.assertEqual(len(run["results"]), 8)
+        self.assertEqual(
+            [cell_key(r) for r in run["results"]],
+            [
+                cell_key(c)
+                for c in sweep([100, 500], ["search", "insert"], [4, 8], ["random"])
+            ],
+        )
+        self.assertEqual(run["settings"]["orders"], [4, 8])
+        self.assertEqual(run["settings"]["workers"], 2)
+        self.assertTrue(all(r["build_s"] >= 0 for r in run["results"]))
+
+    def test_resume_from_checkpoint(self):
+        self.run_suite([100], [4])
+        with open(self.checkpoint) as f:
+            self.assertEqual(len(f.readlines()), 3)  # Settings + 2 cells
+        self.logs.clear()
+        run = self.run_suite([100, 200], [4])  # Extend the sweep
+        self.assertEqual(len(run["results"]), 4)
+        measured = [line for line in self.logs if line.startswith("[")]
+        self.assertEqual(len(measured), 2)  # Only the new cells
+        self.assertTrue(all("n=200" in line for line in measured))
+        self.assertEqual(len(read_checkpoint(self.checkpoint, self.settings())), 4)
+
+    def test_other_settings_are_rejected(self):
+        self.run_suite([100], [4])
+        with self.assertRaises(ValueError):
+            self.run_suite([100], [4], seed=7)
+
+    def test_corrupted_checkpoint(self):
+        with open(self.checkpoint, "w") as f:
+            f.write('{"settings": \n')
+        with self.assertRaises(ValueError):
+            read_checkpoint(self.checkpoint, self.settings())
+
+    def settings(self):
+        with open(self.checkpoint) as f:
+            return json.loads(f.readline())["settings"]
+
+
+class TestLoadResults(unittest.TestCase):
+    def test_one_order_and_distribution(self):
+        results = [
+            {
+                "operation": "search",
+                "distribution": d,
+                "size": s,
+                "order": m,
+                "median_ns": s,
+            }
+            for s in (1000, 100)
+            for m in (4, 64)
+            for d in ("random", "zipf")
+        ]
+        analyzer = BPlusTreeComplexityAnalysis()
+        analyzer.load_results({"results": results}, order=64, distribution="zipf")
+        self.assertEqual(list(analyzer.results), ["Search (existing)"])
+        self.assertEqual(analyzer.results["Search (existing)"]["sizes"], [100, 1000])
+        self.assertEqual(analyzer.results["Search (existing)"]["times"], [1e-7, 1e-6])
+
+
+if __name__ == "__main__":
+    unittest.main()
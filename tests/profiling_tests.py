@@ -0,0 +1,110 @@
+import os
+import pstats
+import tempfile
+import unittest
+from commands import VirtualFileSystem
+from dispatcher import dispatch, is_mutation
+from profiling import SamplingProfiler, label, parse_profile
+
+# To test it, run python3 -m tests.profiling_tests
+
+# Twenty-fourth Test - Profiling shell commands
+
+
+def busy(n):
+    total = 0
+    for i in range(n):
+        total += i * i
+    return total
+
+
+class TestParsing(unittest.TestCase):
+    def test_options(self):
+        options, cmd = parse_profile(
+            ["--sample", "--interval", "0.5", "--top", "3", "ls", "/"]
+        )
+        self.assertEqual(cmd, "ls /")
+        self.assertTrue(options["sample"])
+        self.assertEqual((options["interval"], options["top"]), (0.5, 3))
+        self.assertIsNone(options["out"])
+
+    def test_invalid(self):
+        for params in ([], ["--top"], ["--top", "x", "ls"], ["--what", "ls"]):
+            self.assertIsNone(parse_profile(params))
+        self.assertIsNone(parse_profile(["profile", "ls"]))
+        self.assertIsNone(parse_profile(["--interval", "0", "ls"]))
+        self.assertIsNone(parse_profile(["--sample", "exit"]))
+
+    def test_lock_of_the_profiled_command(self):
+        self.assertTrue(is_mutation("profile --top 3 mkdir /docs"))
+        self.assertFalse(is_mutation("profile --sample ls /"))
+        self.assertFalse(is_mutation("profile --top"))
+
+
+class TestSamplingProfiler(unittest.TestCase):
+    def test_samples_the_function(self):
+        sampler = SamplingProfiler(interval=0.0005)
+        self.assertEqual(sampler.runcall(busy, 2_000_000), busy(2_000_000))
+        self.assertGreater(sampler.samples, 0)
+        for stack in sampler.stacks:
+            self.assertEqual(label(stack[0]), "profiling_tests:busy")
+        functions = sampler.functions()
+        self.assertEqual(sum(own for own, _ in functions.values()), sampler.samples)
+
+        lines = sampler.collapsed()
+        self.assertTrue(lines)
+        self.assertEqual(
+            sum(int(line.rsplit(" ", 1)[1]) for line in lines), sampler.samples
+        )
+
+
+class TestProfileCommand(unittest.TestCase):
+    def setUp(self):
+        self.fs = VirtualFileSystem(indexes=True)
+        for i in range(50):
+            self.fs.mkdir(f"/dir_{i}")
+            for j in range(20):
+                self.fs.touch(f"/dir_{i}/file_{j}.txt")
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.fs.searcher.close()
+        self.tmp.cleanup()
+
+    def test_cprofile(self):
+        path = os.path.join(self.tmp.name, "find.prof")
+        text = dispatch(self.fs, f"profile --top 5 --out {path} find / -name file_1*")
+        lines = text.split("\n")
+        self.assertIn("under cProfile, 550 lines of output", lines[0])
+        self.assertEqual(len(lines), 1 + 1 + 5 + 1)
+        self.assertIn("iter_find (commands.py:", text)
+        self.assertNotIn("built-in", text)
+        self.assertEqual(lines[-1], f"Profile written to {path}")
+        self.assertTrue(pstats.Stats(path).stats)
+
+    def test_profiled_command_runs(self):
+        dispatch(self.fs, "profile mkdir /new")
+        self.assertEqual(self.fs.ls("/new"), "[empty]")
+
+    def test_sampling(self):
+        path = os.path.join(self.tmp.name, "find.folded")
+        text = dispatch(
+            self.fs, f"profile --sample --interval 0.1 --out {path} find / -path /dir_*"
+        )
+        self.assertIn("samples every 0.1 ms, 1,050 lines of output", text)
+        with open(path) as f:
+            for line in f:
+                stack, count = line.rsplit(" ", 1)
+                self.assertTrue(stack.startswith(("commands:", "dispatcher:")))
+                self.assertGreater(int(count), 0)
+
+    def test_usage(self):
+        self.assertTrue(dispatch(self.fs, "profile").startswith("Usage: profile"))
+        for line in ("profile exit", "profile --sample exit"):
+            self.assertTrue(dispatch(self.fs, line).startswith("Usage: profile"))
+        missing = os.path.join(self.tmp.name, "missing", "x.prof")
+        self.assertIn("Cannot write", dispatch(self.fs, f"profile --out {missing} ls"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+import random
+import unittest
+from analysis.shard_benchmark import run_shard_benchmark
+from itertools import islice
+from sharded_tree import SCAN_CHUNK, ShardedBPlusTree, ShardTree
+
+# To test it, run python3 -m tests.sharded_tree_tests
+
+# Twenty-eighth Test - Key-range sharded tree: routing, fan-out scans, splits
+
+
+class TestShardTree(unittest.TestCase):
+    """The worker side, called directly"""
+
+    def setUp(self):
+        self.shard = ShardTree(4)
+        self.shard.insert_many([(key, str(key)) for key in range(0, 100, 2)])
+
+    def test_entries_count_new_keys_only(self):
+        self.shard.insert(10, "again")
+        self.shard.delete(11)
+        self.assertEqual(self.shard.entries, 50)
+        self.shard.delete(10)
+        self.assertEqual(self.shard.entries, 49)
+
+    def test_scan_pages(self):
+        first = self.shard.scan(None, 50, False, 10)
+        self.assertEqual([key for key, _ in first], list(range(0, 20, 2)))
+        rest = self.shard.scan(18, 50, True, 100)
+        self.assertEqual([key for key, _ in rest], list(range(20, 50, 2)))
+        self.assertEqual(
+            self.shard.scan(None, 5, False, 10), [(0, "0"), (2, "2"), (4, "4")]
+        )
+
+    def test_cut(self):
+        upper = self.shard.cut(51, True)
+        self.assertEqual(upper[0], (52, "52"))
+        self.assertEqual(self.shard.entries, 26)
+        lower = self.shard.cut(10, False)
+        self.assertEqual([key for key, _ in lower], [0, 2, 4, 6, 8])
+        self.assertEqual(self.shard.key_at(0), 10)
+
+
+class TestShardedTree(unittest.TestCase):
+    def setUp(self):
+        self.tree = ShardedBPlusTree(8, boundaries=[1000, 2000], max_shards=3)
+        self.addCleanup(self.tree.close)
+        self.keys = list(range(3000))
+        random.Random(0).shuffle(self.keys)
+
+    def test_point_operations_route_to_one_shard(self):
+        for key in self.keys[:300]:
+            self.tree.insert(key, key * 2)
+        self.assertEqual(len(self.tree), 300)
+        key = self.keys[0]
+        self.assertEqual(self.tree.search_value(key), key * 2)
+        self.tree.delete(key)
+        self.assertIsNone(self.tree.search_value(key))
+        sizes = [shard["entries"] for shard in self.tree.stats()]
+        self.assertEqual(sum(sizes), 299)
+        self.assertEqual(len(set(s["pid"] for s in self.tree.stats())), 3)
+
+    def test_batches(self):
+        self.tree.insert_many((key, -key) for key in self.keys)
+        self.assertEqual(
+            [shard["entries"] for shard in self.tree.stats()], [1000, 1000, 1000]
+        )
+        self.assertEqual(
+            self.tree.get_many([2999, 5, 3000, 1500]), [-2999, -5, None, -1500]
+        )
+        self.tree.delete_many(range(0, 3000, 3))
+        self.assertEqual(len(self.tree), 2000)
+
+    def test_scans_merge_in_order(self):
+        self.tree.insert_many((key, key) for key in self.keys)
+        self.assertEqual(list(self.tree.items()), [(k, k) for k in range(3000)])
+        self.assertEqual(
+            self.tree.range_query(990, 2010), [(k, k) for k in range(990, 2011)]
+        )
+        self.assertEqual(list(self.tree.scan(1999, 2001)), [(1999, 1999), (2000, 2000)])
+        self.assertEqual(self.tree.range_query(5000, 6000), [])
+
+    def test_scan_pages_through_large_shards(self):
+        with ShardedBPlusTree(16, window=0) as tree:
+            tree.insert_many((key, None) for key in range(10_000))
+            keys = [key for key, _ in tree.scan(3)]
+            self.assertEqual(keys, list(range(3, 10_000)))
+
+    def test_prefix_scan(self):
+        self.tree.close()
+        with ShardedBPlusTree(4, boundaries=["/b", "/c"]) as tree:
+            paths = ["/a/x", "/b", "/b/y", "/b/z", "/bz", "/c/w"]
+            tree.insert_many((path, len(path)) for path in paths)
+            self.assertEqual(
+                [key for key, _ in tree.scan_prefix("/b/")], ["/b/y", "/b/z"]
+            )
+            self.assertEqual([key for key, _ in tree.scan_prefix("")], paths)
+
+    def test_worker_errors_are_raised(self):
+        self.tree.insert(1, "one")
+        with self.assertRaises(TypeError):
+            self.tree.insert("one", 1)  # Not comparable with 1000
+        self.assertEqual(self.tree.search_value(1), "one")
+
+    def test_failed_batch_leaves_no_pending_reply(self):
+        self.tree.close()
+        with ShardedBPlusTree(4, boundaries=[(5,)]) as tree:
+            tree.insert_many([((1, 2), "a"), ((9, 9), "b")])
+            with self.assertRaises(TypeError):
+                tree.get_many([(1, "x"), (9, 9)])  # (1, "x") < (1, 2) fails
+            self.assertEqual(tree.search_value((9, 9)), "b")
+            self.assertEqual(
+                tree.range_query((0,), (10,)), [((1, 2), "a"), ((9, 9), "b")]
+            )
+
+
+class TestSplits(unittest.TestCase):
+    def test_large_shard_splits_at_its_median(self):
+        with ShardedBPlusTree(16, max_shards=2, max_entries=3000, window=0) as tree:
+            tree.insert_many((key, key) for key in range(4000))
+            self.assertEqual(tree.maintain(), "split shard 0 (size)")
+            self.assertEqual([s["entries"] for s in tree.stats()], [2000, 2000])
+            self.assertEqual(tree.stats()[1]["low"], 2000)
+            self.assertEqual(list(tree.items()), [(k, k) for k in range(4000)])
+
+    def test_busy_shard_splits_at_its_load_median(self):
+        with ShardedBPlusTree(16, max_shards=2, window=4000) as tree:
+            tree.insert_many((key, key) for key in range(4000))  # Splits at 2000
+            self.assertEqual(len(tree.stats()), 2)
+            self.assertEqual(tree.stats()[1]["low"], 2000)
+
+    def test_hot_shard_moves_its_boundary(self):
+        with ShardedBPlusTree(16, [2000], max_shards=2, window=0) as tree:
+            tree.insert_many((key, key) for key in range(4000))
+            tree.maintain()
+            tree.get_many([key % 500 for key in range(5000)])  # The first shard is hot
+            tree.get_many([3000])
+            self.assertEqual(tree.maintain(), "moved boundary 1 (load)")
+            low = tree.stats()[1]["low"]
+            self.assertLess(low, 500)
+            self.assertEqual(len(tree), 4000)
+            self.assertEqual(list(tree.range_query(0, 3999))[low], (low, low))
+
+    def test_size_rebalance_at_max_shards(self):
+        with ShardedBPlusTree(16, [100], 2, max_entries=2000, window=0) as tree:
+            tree.insert_many((key, key) for key in range(3000))
+            self.assertEqual(tree.maintain(), "moved boundary 1 (size)")
+            self.assertEqual([s["entries"] for s in tree.stats()], [1500, 1500])
+            self.assertEqual(list(tree.items()), [(k, k) for k in range(3000)])
+
+    def test_scan_follows_splits_and_moves(self):
+        with ShardedBPlusTree(16, window=0) as tree:
+            tree.insert_many((key, None) for key in range(20_000))
+            scan = tree.scan()
+            keys = [key for key, _ in islice(scan, SCAN_CHUNK)]
+            tree.split(0, 2000)  # The next key of the scan is now in shard 1
+            keys += [key for key, _ in islice(scan, SCAN_CHUNK)]
+            tree.move_boundary(1, 9000)  # ... and back in shard 0
+            keys += [key for key, _ in scan]
+            self.assertEqual(keys, list(range(20_000)))
+
+    def test_boundary_leaving_an_empty_shard(self):
+        with ShardedBPlusTree(8, [1000, 2000], max_shards=3, window=0) as tree:
+            tree.insert_many((key, key) for key in range(3000))
+            for index, key in [(2, 1000), (2, 500), (1, 2000), (1, 2500)]:
+                with self.assertRaises(ValueError):
+                    tree.move_boundary(index, key)
+            tree.move_boundary(2, 1001)
+            self.assertEqual([s["entries"] for s in tree.stats()], [1000, 1, 1999])
+            self.assertEqual(list(tree.items()), [(k, k) for k in range(3000)])
+
+        results = run_shard_benchmark(2000, (1, 2), 2000, 500, 16)
+        self.assertEqual([count for count, *_ in results], [1, 2])
+        self.assertTrue(all(reads > 0 and writes > 0 for *_, reads, writes in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
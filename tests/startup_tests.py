@@ -0,0 +1,100 @@
+import os
+import pickle
+import tempfile
+import unittest
+import snapshot
+from analysis.startup_benchmark import forbidden_imports, imported_modules
+from bplus_tree import BPlusTree
+from commands import VirtualFileSystem
+
+# To test it, run python3 -m tests.startup_tests
+
+# Fifteenth Test - Lazy imports and filesystem snapshots
+
+
+class TestLazyImports(unittest.TestCase):
+    def test_shell_does_not_import_heavy_modules(self):
+        modules = imported_modules("shell")
+        self.assertIn("commands", modules)
+        self.assertEqual(
+            forbidden_imports(modules, ["textual", "multiprocessing", "matplotlib"]),
+            [],
+        )
+
+    def test_analysis_does_not_import_matplotlib(self):
+        modules = imported_modules("analysis.complexity_analysis")
+        self.assertEqual(forbidden_imports(modules, ["matplotlib", "numpy"]), [])
+
+
+class TestTreePickling(unittest.TestCase):
+    def test_round_trip(self):
+        tree = BPlusTree(4)
+        for i in range(5000):  # Enough leaves to overflow the recursion limit
+            tree.insert(i, f"value_{i}")
+
+        copy = pickle.loads(pickle.dumps(tree))
+        self.assertEqual(list(copy.items()), list(tree.items()))
+        copy.insert(-1, "new")
+        copy.delete(100)
+        self.assertEqual(copy.search_value(-1), "new")
+        self.assertIsNone(copy.search_value(100))
+        self.assertEqual(tree.search_value(100), "value_100")
+
+
+class SnapshotTestsMixin:
+    layout = None
+
+    def setUp(self):
+        self.fs = VirtualFileSystem(layout=self.layout, indexes=True)
+        self.fs.mkdir("/src")
+        self.fs.mkdir("/src/lib")
+        self.fs.touch("/src/main.py")
+        self.fs.write("/src/lib/util.py", "def util():\n    pass")
+        self.fs.cd("/src")
+        self.path = os.path.join(tempfile.mkdtemp(), "fs.snap")
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_round_trip(self):
+        snapshot.save(self.fs, self.path)
+        loaded = snapshot.load(self.path)
+
+        self.assertEqual(loaded.cwd, "/src")
+        self.assertEqual(loaded.ls(), "lib/ main.py")
+        self.assertEqual(loaded.cat("lib/util.py"), "def util():\n    pass")
+        self.assertEqual(
+            loaded.find("/", name="*.py"), "/src/lib/util.py\n/src/main.py"
+        )
+        self.assertIs(loaded.tree, loaded.layout.tree)
+
+    def test_loaded_filesystem_is_usable(self):
+        snapshot.save(self.fs, self.path)
+        loaded = snapshot.load(self.path)
+
+        loaded.touch("/src/new.py")
+        loaded.rm("/src/lib")
+        self.assertEqual(loaded.find("/", name="*.py"), "/src/main.py\n/src/new.py")
+        self.assertEqual(loaded.cache_stats()["capacity"], 1024)
+        with loaded.lock.write():
+            pass
+        # The original filesystem is untouched
+        self.assertEqual(self.fs.ls(), "lib/ main.py")
+
+    def test_invalid_snapshot(self):
+        with open(self.path, "w") as f:
+            f.write("not a snapshot")
+        with self.assertRaises(ValueError):
+            snapshot.load(self.path)
+
+
+class TestPathSnapshot(SnapshotTestsMixin, unittest.TestCase):
+    layout = "path"
+
+
+class TestInodeSnapshot(SnapshotTestsMixin, unittest.TestCase):
+    layout = "inode"
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import pickle
+import random
+import unittest
+from bplus_tree import COUNTED_METHODS, BPlusTree
+
+# To test it, run python3 -m tests.stats_tests
+
+# Twenty-second Test - Operation counters and tree.stats()
+
+
+def build(keys, order=4):
+    tree = BPlusTree(order)
+    for key in keys:
+        tree.insert(key, key)
+    return tree
+
+
+class TestStats(unittest.TestCase):
+    def test_empty_tree(self):
+        stats = BPlusTree(4).stats()
+        self.assertEqual(stats["height"], 1)
+        self.assertEqual(stats["entries"], 0)
+        self.assertEqual(stats["leaves"], 1)
+        self.assertEqual(stats["internal_nodes"], 0)
+        self.assertIsNone(stats["internal_fill"])
+        self.assertNotIn("counters", stats)
+
+    def test_shape(self):
+        keys = list(range(1000))
+        random.Random(1).shuffle(keys)
+        tree = build(keys, order=8)
+        stats = tree.stats()
+        self.assertEqual(stats["entries"], 1000)
+        self.assertEqual(sum(stats["leaf_fill_histogram"]), stats["leaves"])
+        self.assertTrue(
+            stats["leaf_fill_min"] <= stats["leaf_fill"] <= stats["leaf_fill_max"]
+        )
+        self.assertAlmostEqual(stats["leaf_fill"], 1000 / (stats["leaves"] * 7))
+        leaf, depth = tree.root, 1
+        while hasattr(leaf, "children"):
+            leaf, depth = leaf.children[0], depth + 1
+        self.assertEqual(stats["height"], depth)
+
+
+class TestCounters(unittest.TestCase):
+    def test_splits(self):
+        tree = BPlusTree(4)
+        with tree.counting() as counters:
+            for key in (1, 2, 3):
+                tree.insert(key, key)
+            self.assertEqual(counters.splits(), 0)
+            tree.insert(4, 4)  # The leaf overflows and the root splits
+        self.assertEqual(counters.leaf_splits, 1)
+        self.assertEqual(counters.root_splits, 1)
+        self.assertEqual(counters.internal_splits, 0)
+
+        with tree.counting() as counters:
+            for key in range(5, 200):
+                tree.insert(key, key)
+        self.assertGreater(counters.internal_splits, 0)
+        self.assertEqual(counters.root_splits, tree.stats()["height"] - 2)
+
+    def test_visits_and_comparisons(self):
+        tree = build(range(500), order=8)
+        height = tree.stats()["height"]
+        with tree.counting() as counters:
+            self.assertEqual(tree.search_value(250), 250)
+        self.assertEqual(counters.node_visits, height)
+        self.assertGreater(counters.comparisons, height - 1)
+
+        leaf = tree.search(0)
+        with tree.counting() as counters:
+            tree.search_value(leaf.keys[1])
+        # The first internal key of every level is enough to route to the leftmost leaf
+        self.assertEqual(counters.comparisons, (height - 1) + 2)
+
+    def test_deletes(self):
+        keys = list(range(2000))
+        random.Random(2).shuffle(keys)
+        tree = build(keys)
+        with tree.counting() as counters:
+            for key in keys[:1500]:
+                tree.delete(key)
+        self.assertGreater(counters.borrows, 0)
+        self.assertGreater(counters.merges, 0)
+        self.assertGreater(counters.fix_parent_key_calls, 0)
+        self.assertGreater(counters.fix_parent_key_max_depth, 1)
+        self.assertEqual(counters.fix_parent_key_depth, 0)
+        self.assertEqual(list(tree.items()), [(k, k) for k in sorted(keys[1500:])])
+
+    def test_counting_gives_the_same_tree(self):
+        keys = list(range(3000))
+        random.Random(3).shuffle(keys)
+        plain = build(keys)
+        counted = BPlusTree(4)
+        with counted.counting():
+            for key in keys:
+                counted.insert(key, key)
+            for key in keys[::2]:
+                counted.delete(key)
+        for key in keys[::2]:
+            plain.delete(key)
+        self.assertEqual(list(counted.items()), list(plain.items()))
+        self.assertEqual(counted.stats(), plain.stats())
+
+
+class TestToggling(unittest.TestCase):
+    def test_disabled_tree_runs_the_plain_methods(self):
+        tree = build(range(10))
+        counters = tree.enable_stats()
+        self.assertIs(tree.enable_stats(), counters)  # Already enabled
+        tree.search_value(3)
+        stats = tree.stats()
+        self.assertEqual(stats["counters"]["node_visits"], stats["height"])
+        tree.disable_stats()
+        self.assertIsNone(tree.counters)
+        for name in COUNTED_METHODS:
+            self.assertNotIn(name, vars(tree))
+        tree.disable_stats()  # Already disabled
+
+    def test_nested_blocks_add_to_the_outer_counters(self):
+        tree = build(range(100))
+        outer = tree.enable_stats()
+        tree.search_value(1)
+        with tree.counting() as inner:
+            tree.search_value(2)
+        self.assertIs(tree.counters, outer)
+        self.assertEqual(outer.node_visits, 2 * inner.node_visits)
+        tree.search_value(3)
+        self.assertEqual(outer.node_visits, 3 * inner.node_visits)
+
+    def test_block_ends_on_error(self):
+        tree = build(range(10))
+        with self.assertRaises(KeyError):
+            with tree.counting():
+                raise KeyError
+        self.assertIsNone(tree.counters)
+
+    def test_pickled_tree_is_not_counted(self):
+        tree = build(range(50))
+        tree.enable_stats()
+        copy = pickle.loads(pickle.dumps(tree))
+        self.assertIsNone(copy.counters)
+        self.assertEqual(list(copy.items()), list(tree.items()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,214 @@
+import io
+import random
+import unittest
+from xml.etree import ElementTree
+from bplus_tree import BPlusTree
+from commands import VirtualFileSystem
+from filesystem_visualization.filesystem_visualization import (
+    collect_bplustree_structure,
+    collect_dircentric_nodes,
+)
+from filesystem_visualization.filesystem_example import create_sample_filesystem
+from filesystem_visualization.tree_structure import (
+    build_random_tree,
+    groups,
+    height,
+    levels,
+    scan,
+    text_lines,
+    write_svg,
+)
+
+# To test it, run python3 -m tests.tree_structure_tests
+
+# Twenty-seventh Test - Level-by-level tree structure, node access counts and heatmaps
+
+
+def small_tree():
+    tree = BPlusTree(4)
+    for key in [10, 20, 5, 6, 12, 30, 7, 17, 3, 8]:
+        tree.insert(key, str(key))
+    return tree
+
+
+class TestVisualization(unittest.TestCase):
+    def test_same_lines_as_before(self):
+        out = io.StringIO()
+        small_tree().visualization(out)
+        self.assertEqual(
+            out.getvalue(),
+            "<6,10,20>\n  [3,5]\n  [6,7,8]\n  [10,12,17]\n  [20,30]\n",
+        )
+
+    def test_empty_and_deep_trees(self):
+        out = io.StringIO()
+        BPlusTree(4).visualization(out)
+        self.assertEqual(out.getvalue(), "[]\n")  # The root is an empty leaf
+        tree = BPlusTree(3)  # Deep: the walk doesn't recurse
+        for key in range(5000):
+            tree.insert(key, key)
+        out = io.StringIO()
+        tree.visualization(out)
+        self.assertEqual(out.getvalue().count("["), tree.stats()["leaves"])
+
+
+class TestNodeAccesses(unittest.TestCase):
+    def test_searches_are_counted_per_node(self):
+        tree = small_tree()
+        with tree.counting(node_accesses=True) as counters:
+            for _ in range(3):
+                tree.search_value(30)
+            tree.search_value(3)
+        accesses = counters.node_accesses
+        self.assertEqual(accesses[tree.root], 4)
+        self.assertEqual(accesses[tree.search(30)], 3)
+        self.assertEqual(accesses[tree.search(3)], 1)
+        self.assertEqual(sum(accesses.values()), counters.node_visits)
+        self.assertNotIn("node_accesses", counters.as_dict())
+
+    def test_off_by_default_and_reset(self):
+        tree = small_tree()
+        counters = tree.enable_stats()
+        tree.search_value(3)
+        self.assertIsNone(counters.node_accesses)
+        tree.enable_stats(node_accesses=True)
+        tree.search_value(3)
+        self.assertEqual(counters.node_accesses[tree.root], 1)
+        counters.reset()
+        self.assertEqual(counters.node_accesses, {})
+
+    def test_nested_blocks_add_up(self):
+        tree = small_tree()
+        with tree.counting(node_accesses=True) as outer:
+            tree.search_value(3)
+            with tree.counting(node_accesses=True):
+                tree.search_value(3)
+            self.assertEqual(outer.node_accesses[tree.root], 2)
+
+
+class TestLevels(unittest.TestCase):
+    def test_levels_and_node_numbers(self):
+        tree = build_random_tree(2000, 5)
+        shape = [len(level) for level in levels(tree)]
+        stats = tree.stats()
+        self.assertEqual(len(shape), stats["height"])
+        self.assertEqual(height(tree), stats["height"])
+        self.assertEqual(shape[-1], stats["leaves"])
+        self.assertEqual(sum(shape), stats["leaves"] + stats["internal_nodes"])
+        node_ids = collect_bplustree_structure(tree)
+        self.assertEqual(node_ids[id(tree.root)], 0)
+        self.assertEqual(len(node_ids), sum(shape))
+        self.assertEqual(len(list(levels(BPlusTree(4)))), 1)
+
+    def test_collapse_covers_every_node(self):
+        level = list(levels(build_random_tree(3000, 4)))[-1]
+        boxes = groups(level, 3, max_nodes=7)
+        self.assertEqual(len(boxes), 7)
+        self.assertEqual(sum(group.count for group in boxes), len(level))
+        self.assertEqual(sum(group.keys for group in boxes), 3000)
+        self.assertEqual([group.low for group in boxes][0], 0)
+        self.assertEqual(boxes[-1].high, 2999)
+        ends = [group.first + group.count for group in boxes]
+        self.assertEqual(ends[:-1], [group.first for group in boxes[1:]])
+
+    def test_sample_keeps_first_and_last(self):
+        level = list(levels(build_random_tree(3000, 4)))[-1]
+        boxes = groups(level, 3, max_nodes=5, mode="sample")
+        self.assertEqual([group.count for group in boxes], [1] * 5)
+        self.assertEqual(boxes[0].first, 0)
+        self.assertEqual(boxes[-1].first, len(level) - 1)
+        narrow = groups(level[:3], 3, max_nodes=5, mode="sample")
+        self.assertEqual([group.first for group in narrow], [0, 1, 2])
+
+    def test_sparse_region_shows(self):
+        tree = BPlusTree(8)
+        for key in range(2000, 4000):  # Appends leave the leaves about half full
+            tree.insert(key, key)
+        keys = list(range(2000))
+        random.Random(1).shuffle(keys)
+        for key in keys:  # Random inserts fill them better
+            tree.insert(key, key)
+        _, _, boxes, fills = list(scan(tree, max_nodes=8))[-1]
+        self.assertLess(max(fills[4:]), min(fills[:4]))
+        self.assertTrue(all(0 <= fill <= 1 for fill in fills))
+
+    def test_hot_region_shows(self):
+        tree = build_random_tree(5000, 8)
+        with self.assertRaises(ValueError):
+            list(scan(tree, "accesses"))
+        with tree.counting(node_accesses=True) as counters:
+            for _ in range(20):
+                for key in range(100):  # The lowest keys are hot
+                    tree.search_value(key)
+            for key in range(0, 5000, 50):
+                tree.search_value(key)
+        rows = scan(tree, "accesses", 10, accesses=counters.node_accesses)
+        *_, boxes, heat = list(rows)[-1]
+        self.assertEqual(heat[0], 1.0)
+        self.assertTrue(all(value < 1.0 for value in heat[1:]))
+        self.assertGreaterEqual(boxes[0].accesses, 2000)
+
+
+class TestRendering(unittest.TestCase):
+    def test_text(self):
+        tree = build_random_tree(5000, 6)
+        lines = list(text_lines(tree, max_nodes=20))
+        self.assertEqual(len(lines), height(tree))
+        self.assertTrue(lines[-1].startswith("leaves"))
+        self.assertIn("fill", lines[0])
+        strip = lines[-1].split("|")[1]
+        self.assertEqual(len(strip), 20)
+        empty = list(text_lines(BPlusTree(4)))
+        self.assertEqual(len(empty), 1)
+        self.assertIn("fill 0%", empty[0])
+
+    def test_svg(self):
+        tree = build_random_tree(5000, 6)
+        with tree.counting(node_accesses=True) as counters:
+            for key in range(0, 5000, 7):
+                tree.search_value(key)
+        for metric in ("fill", "accesses"):
+            for mode in ("collapse", "sample"):
+                out = io.StringIO()
+                count = write_svg(tree, out, metric, 16, mode, counters.node_accesses)
+                root = ElementTree.fromstring(out.getvalue())
+                rects = root.findall("{http://www.w3.org/2000/svg}rect")
+                self.assertEqual(len(rects), count)
+                titles = [rect[0].text for rect in rects]
+                self.assertTrue(all("fill" in title for title in titles))
+                if metric == "accesses":
+                    self.assertTrue(all("accesses" in title for title in titles))
+
+    def test_matplotlib_structure(self):
+        fs = create_sample_filesystem()
+        try:
+            node_ids = collect_bplustree_structure(fs.tree)
+            level_nodes, edges = collect_dircentric_nodes(fs, node_ids, "/", 0)
+        finally:
+            fs.searcher.close()
+        self.assertEqual(level_nodes[0][0][0], "dir:/")
+        self.assertTrue(edges)
+
+    def test_matplotlib_structure_of_both_layouts(self):
+        nodes = {}
+        for layout in ("path", "inode"):
+            fs = VirtualFileSystem(order=3, layout=layout)
+            for d in ["docs", "docs/drafts", "src"]:
+                fs.mkdir(d)
+            for f in ["docs/a.txt", "docs/drafts/b.txt", "src/main.py", "z.md"]:
+                fs.touch(f)
+            node_ids = collect_bplustree_structure(fs.tree)
+            level_nodes, _ = collect_dircentric_nodes(fs, node_ids, "/", 0)
+            nodes[layout] = {
+                node_id
+                for level in level_nodes.values()
+                for node_id, _, kind in level
+                if kind != "internal"
+            }
+        self.assertEqual(nodes["inode"], nodes["path"])
+        self.assertIn("dir:/docs/drafts", nodes["inode"])
+        self.assertIn("file:/docs/drafts/b.txt", nodes["inode"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,272 @@
+import asyncio
+import io
+import os
+import tempfile
+import threading
+import unittest
+from commands import VirtualFileSystem
+from dispatcher import EXIT
+from replay import run_script
+from vfs_client import (
+    AsyncSession,
+    ClientPool,
+    ConnectionPool,
+    ServerError,
+    remote_dispatch,
+)
+from vfs_protocol import (
+    CHUNK_BYTES,
+    COMMAND,
+    DONE,
+    REQUEST,
+    RESPONSE,
+    ProtocolError,
+    chunks,
+    encode_request,
+    encode_response,
+    split_frames,
+)
+from vfs_server import VFSServer, serve
+
+# To test it, run python3 -m tests.vfs_server_tests
+
+# Twenty-ninth Test - Filesystem server: protocol, sessions, pipelining, pooled clients
+
+
+class TestProtocol(unittest.TestCase):
+    def test_frames_round_trip(self):
+        data = encode_request(7, 3, COMMAND, "ls /é") + encode_request(8, 3, COMMAND)
+        buffer = bytearray(data[:-2])  # The second frame is incomplete
+        self.assertEqual(split_frames(buffer, REQUEST), [(7, 3, COMMAND, "ls /é")])
+        buffer += data[-2:]
+        self.assertEqual(split_frames(buffer, REQUEST), [(8, 3, COMMAND, "")])
+        self.assertEqual(buffer, b"")
+
+        buffer = bytearray(encode_response(9, DONE, "/home"))
+        self.assertEqual(split_frames(buffer, RESPONSE), [(9, DONE, "/home")])
+
+    def test_invalid_length(self):
+        with self.assertRaises(ProtocolError):
+            split_frames(bytearray(b"\xff\xff\xff\xff" + b"x" * 10), REQUEST)
+
+    def test_chunks_split_at_line_ends(self):
+        text = "\n".join("line %05d" % i for i in range(20_000))
+        pieces = list(chunks(text))
+        self.assertEqual("".join(pieces), text)
+        self.assertGreater(len(pieces), 1)
+        self.assertTrue(all(len(piece) <= CHUNK_BYTES for piece in pieces))
+        self.assertTrue(all(piece.endswith("\n") for piece in pieces[:-1]))
+        self.assertEqual(list(chunks("")), [""])
+
+
+class ServerTestCase(unittest.TestCase):
+    """A server on its own event loop in a thread, for the whole class"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.dir.name, "vfs.sock")
+        cls.vfs = VirtualFileSystem(order=4)
+        cls.vfs.enable_metrics()
+        cls.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        cls.task = cls.loop.create_task(serve(cls.vfs, cls.path, 2, ready))
+        cls.thread = threading.Thread(target=cls.run_server)
+        cls.thread.start()
+        ready.wait(10)
+
+    @classmethod
+    def run_server(cls):
+        try:
+            cls.loop.run_until_complete(cls.task)
+        except asyncio.CancelledError:
+            pass  # Stopped by tearDownClass
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.loop.call_soon_threadsafe(cls.task.cancel)
+        cls.thread.join(10)
+        cls.loop.close()
+        cls.vfs.searcher.close()
+        cls.dir.cleanup()
+
+    def run_async(self, coroutine):
+        return asyncio.run(coroutine)
+
+
+class TestAsyncClient(ServerTestCase):
+    def test_sessions_have_their_own_cwd(self):
+        async def scenario():
+            async with ClientPool(self.path, 2) as pool:
+                first = await pool.session()
+                second = await pool.session()
+                await first.run("mkdir /own")
+                await first.run("cd /own")
+                await second.run("touch /own/file.txt")
+                listing = await first.run("ls")
+                self.assertEqual(first.cwd, "/own")
+                self.assertEqual(second.cwd, "/")
+                await first.run("rm -r /own")
+                return listing
+
+        self.assertEqual(self.run_async(scenario()), "file.txt")
+
+    def test_pipelined_commands_run_in_order(self):
+        async def scenario():
+            async with ClientPool(self.path, 1) as pool:
+                session = await pool.session()
+                outputs = await session.run_many(
+                    ["mkdir /pipe", "cd /pipe"]
+                    + [f"echo {i} > f{i:03}.txt" for i in range(100)]
+                    + ["cat f042.txt", "ls", "cd /", "rm -r /pipe"]
+                )
+                return outputs, session
+
+        outputs, session = self.run_async(scenario())
+        self.assertEqual(outputs[-4], "42")
+        self.assertEqual(len(outputs[-3].split()), 100)
+        self.assertEqual(session.cwd, "/")
+
+    def test_concurrent_sessions_share_the_tree(self):
+        async def touch(pool, i):
+            session = await pool.session()
+            await session.run(f"touch /many/f{i}")
+            await session.close()
+
+        async def scenario():
+            async with ClientPool(self.path, 2) as pool:
+                session = await pool.session()
+                await session.run("mkdir /many")
+                await asyncio.gather(*(touch(pool, i) for i in range(40)))
+                listing = await session.run("ls /many")
+                await session.run("rm -r /many")
+                return listing
+
+        self.assertEqual(len(self.run_async(scenario()).split()), 40)
+
+    def test_completion_and_exit(self):
+        async def scenario():
+            async with ClientPool(self.path, 1) as pool:
+                session = await pool.session()
+                await session.run("mkdir /complete_me")
+                completion = await session.complete("cd /complete_")
+                await session.run("rm -r /complete_me")
+                await session.run("exit")
+                return completion, session.exited
+
+        completion, exited = self.run_async(scenario())
+        self.assertEqual(completion.text, "cd /complete_me/")
+        self.assertFalse(completion.truncated)
+        self.assertTrue(exited)
+
+    def test_host_files_are_not_written(self):
+        target = os.path.join(self.dir.name, "written")
+
+        async def scenario(cmd):
+            async with ClientPool(self.path, 1) as pool:
+                session = await pool.session()
+                return await session.run(cmd)
+
+        for cmd in (
+            f"stats --json {target}",
+            f"profile --out {target} ls",
+            f"profile --sample stats --json {target}",
+        ):
+            with self.subTest(cmd=cmd):
+                with self.assertRaisesRegex(ServerError, "not allowed"):
+                    self.run_async(scenario(cmd))
+        self.assertFalse(os.path.exists(target))
+        self.assertIn('"commands"', self.run_async(scenario("stats --json")))
+
+    def test_unknown_session(self):
+        async def scenario():
+            async with ClientPool(self.path, 1) as pool:
+                await pool.requests([(12345, COMMAND, "ls")])
+
+        with self.assertRaises(ServerError):
+            self.run_async(scenario())
+
+
+class TestSessionLifetime(unittest.TestCase):
+    def test_sessions_are_dropped_with_their_connections(self):
+        vfs = VirtualFileSystem(order=4)
+        self.addCleanup(vfs.searcher.close)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "vfs.sock")
+
+        async def until(condition):
+            for _ in range(100):  # The server sees the end of the stream soon after
+                if condition():
+                    return
+                await asyncio.sleep(0.01)
+
+        async def scenario():
+            server = VFSServer(vfs, path, 2)
+            await server.start()
+            try:
+                first, second = ClientPool(path, 1), ClientPool(path, 1)
+                own = await first.session()
+                shared = await first.session()
+                await AsyncSession(second, shared.id).run("ls")  # Another connection
+                await first.close()  # Without CLOSE, like a client that crashed
+                await until(lambda: own.id not in server.sessions)
+                after_first = set(server.sessions)
+                await second.close()
+                await until(lambda: not server.sessions)
+                return (
+                    own.id,
+                    shared.id,
+                    after_first,
+                    server.sessions,
+                    server.requests,
+                )
+            finally:
+                await server.close()
+
+        own, shared, after_first, after_both, requests = asyncio.run(scenario())
+        self.assertEqual(after_first, {shared})
+        self.assertNotIn(own, after_first)
+        self.assertEqual(after_both, {})
+        self.assertEqual(requests, 3)
+
+
+class TestBlockingClient(ServerTestCase):
+    def setUp(self):
+        self.pool = ConnectionPool(self.path, 2)
+        self.addCleanup(self.pool.close)
+
+    def test_threads_share_the_pool(self):
+        session = self.pool.session()
+        session.run("mkdir /threads")
+
+        def work(i):
+            own = self.pool.session()
+            own.run_many([f"touch /threads/f{i}", f"cd /threads"])
+            own.close()
+
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(session.run("ls /threads").split()), 10)
+        self.assertLessEqual(self.pool.opened, 2)
+        session.run("rm -r /threads")
+
+    def test_run_script_remote(self):
+        session = self.pool.session()
+        out = io.StringIO()
+        script = ["mkdir /script", "cd /script", "echo hi > a.txt", "cat a.txt"]
+        latencies = run_script(
+            session, script + ["exit", "ls"], out, None, remote_dispatch
+        )
+        self.assertEqual(len(latencies), 4)
+        self.assertIn("hi", out.getvalue())
+        self.assertIs(remote_dispatch(session, "exit"), EXIT)
+        self.assertEqual(session.cwd, "/script")
+        self.pool.session().run("rm -r /script")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import io
+import os
+import tempfile
+import unittest
+from xml.etree import ElementTree
+from commands import VirtualFileSystem
+from filesystem_visualization.export import write_dot, write_svg
+from filesystem_visualization.filesystem_visualization import (
+    export_filesystem,
+    get_dir_children,
+)
+from filesystem_visualization.hierarchy import Entry, Summary, build_hierarchy, visible
+
+# To test it, run python3 -m tests.visualization_tests
+
+# Twenty-sixth Test - Single-pass hierarchy, level of detail and DOT/SVG export
+
+
+def sample(layout="path"):
+    fs = VirtualFileSystem(layout=layout)
+    fs.mkdir("/docs")
+    fs.mkdir("/docs/drafts")
+    for i in range(30):
+        fs.touch(f"/docs/note_{i:02d}.txt")
+    fs.touch("/docs/drafts/plan.txt")
+    fs.mkdir("/docs-old")  # Sorts between "/docs" and "/docs/..."
+    fs.touch("/readme.md")
+    return fs
+
+
+class TestHierarchy(unittest.TestCase):
+    def test_both_layouts(self):
+        for layout in ("path", "inode"):
+            fs = sample(layout)
+            root = build_hierarchy(fs)
+            self.assertEqual(root.name, "/")
+            self.assertEqual(root.size, 35)
+            self.assertEqual(
+                [c.name for c in root.children], ["docs", "docs-old", "readme.md"]
+            )
+            docs = root.children[0]
+            self.assertEqual(docs.size, 32)
+            self.assertEqual(docs.children[-1].name, "note_29.txt")
+            self.assertIsNone(docs.children[-1].children)
+            fs.searcher.close()
+
+    def test_subtree_and_missing_root(self):
+        fs = sample()
+        self.assertEqual(build_hierarchy(fs, "/docs/drafts").size, 1)
+        self.assertIsNone(build_hierarchy(fs, "/nope"))
+
+    def test_get_dir_children(self):
+        fs = sample()
+        self.assertEqual(
+            get_dir_children(fs, "/"), ["/docs", "/docs-old", "/readme.md"]
+        )
+        self.assertEqual(
+            get_dir_children(fs, "/docs/drafts"), ["/docs/drafts/plan.txt"]
+        )
+
+
+class TestLevelOfDetail(unittest.TestCase):
+    def setUp(self):
+        self.root = build_hierarchy(sample())
+
+    def test_everything(self):
+        rows = list(visible(self.root))
+        self.assertEqual(len(rows), 36)
+        self.assertEqual([row[0] for row in rows[:4]], [0, 1, 2, 3])  # Depth-first
+        for depth, item, parent in rows[1:]:
+            self.assertEqual(rows[parent][0], depth - 1)
+            self.assertIn(item, rows[parent][1].children)
+
+    def test_max_children(self):
+        rows = list(visible(self.root, max_children=5))
+        docs = [item for depth, item, _ in rows if depth == 2]
+        self.assertEqual(len(docs), 5)
+        summary = docs[-1]
+        self.assertIsInstance(summary, Summary)
+        self.assertEqual((summary.files, summary.dirs), (27, 0))
+        self.assertEqual(summary.name, "... 27 more files")
+
+    def test_max_depth(self):
+        rows = list(visible(self.root, max_depth=1))
+        self.assertEqual(len(rows), 1 + 3 + 1)  # docs is summarized
+        summary = rows[2][1]
+        self.assertEqual(summary.entries, 32)
+        self.assertEqual(summary.name, "... 31 more (32 entries)")
+        self.assertIsInstance(rows[3][1], Entry)  # docs-old is empty
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.root = build_hierarchy(sample())
+
+    def test_dot(self):
+        out = io.StringIO()
+        count = write_dot(self.root, out, max_children=5)
+        text = out.getvalue()
+        self.assertEqual(count, 10)
+        self.assertTrue(text.startswith("digraph filesystem {"))
+        self.assertEqual(text.count(" -> "), count - 1)
+        self.assertIn('[label="docs/ (32)", fillcolor=lightblue]', text)
+        self.assertIn('[label="... 27 more files", fillcolor=lightgray]', text)
+
+    def test_svg_is_valid(self):
+        fs = VirtualFileSystem()
+        fs.mkdir("/a<b&c>")
+        out = io.StringIO()
+        self.assertEqual(write_svg(build_hierarchy(fs), out), 2)
+        svg = ElementTree.fromstring(out.getvalue())
+        texts = [
+            element.text for element in svg.iter("{http://www.w3.org/2000/svg}text")
+        ]
+        self.assertEqual(texts, ["/ (1)", "a<b&c>/"])
+
+    def test_export_file(self):
+        fs = sample()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "fs.svg")
+            self.assertEqual(export_filesystem(fs, path, "svg", max_depth=1), 5)
+            rows = ElementTree.parse(path).getroot()
+            self.assertEqual(len(rows.findall("{http://www.w3.org/2000/svg}path")), 4)
+            with self.assertRaises(ValueError):
+                export_filesystem(fs, path, "dot", root="/nope")
+
+
+if __name__ == "__main__":
+    unittest.main()
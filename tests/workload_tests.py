@@ -0,0 +1,170 @@
+import io
+import os
+import tempfile
+import unittest
+from analysis.vfs_workload import (
+    MEASURE,
+    Picker,
+    WorkloadGenerator,
+    parse_mix,
+    replay,
+    split_trace,
+    write_trace,
+)
+from commands import VirtualFileSystem
+from dispatcher import dispatch
+from replay import report_commands, run_script
+from traces import TraceRecorder
+
+# To test it, run python3 -m tests.workload_tests
+
+# Twenty-first Test - Workload generator, trace recorder and replayer
+
+ERRORS = ("does not exist", "No such", "already exists", "Unknown")
+
+
+class TestPicker(unittest.TestCase):
+    def test_add_remove(self):
+        picker = Picker()
+        for item in "abcde":
+            picker.add(item)
+        picker.remove("b")
+        picker.remove("e")
+        self.assertEqual(sorted(picker.items), ["a", "c", "d"])
+        self.assertEqual(picker.positions, {x: picker.items.index(x) for x in "acd"})
+
+
+class TestGenerator(unittest.TestCase):
+    def test_hierarchy(self):
+        generator = WorkloadGenerator(fan_out=3, depth=2, file_ratio=2, seed=1)
+        lines = list(generator.build())
+        mkdirs = [line for line in lines if line.startswith("mkdir")]
+        self.assertEqual(len(mkdirs), 3 + 9)
+        self.assertEqual(len(generator.files), 2 * (1 + 3 + 9))
+        self.assertIn("mkdir /dir1_02/dir2_01", lines)
+
+    def test_file_ratio_is_an_average(self):
+        generator = WorkloadGenerator(fan_out=10, depth=2, file_ratio=0.5, seed=2)
+        list(generator.build())
+        self.assertTrue(30 < len(generator.files) < 80)  # ~55 expected
+
+    def test_traffic_only_uses_existing_paths(self):
+        generator = WorkloadGenerator(fan_out=3, depth=3, file_ratio=3, seed=3)
+        fs = VirtualFileSystem(order=8)
+        out = io.StringIO()
+        run_script(fs, generator.build(), out)
+        run_script(fs, generator.traffic(3000), out)
+        errors = [
+            line for line in out.getvalue().split("\n") if line.startswith(ERRORS)
+        ]
+        self.assertEqual(errors, [])
+        files = {path for path in fs.find("/", entry_type="f").split("\n")}
+        self.assertEqual(files, set(generator.files.items))
+
+    def test_mix(self):
+        self.assertEqual(parse_mix("ls=3,cat=1"), {"ls": 3, "cat": 1})
+        for invalid in ("ls", "fly=2", "ls=0"):
+            with self.assertRaises(ValueError):
+                parse_mix(invalid)
+        generator = WorkloadGenerator(depth=2, seed=4)
+        list(generator.build())
+        ops = {line.split()[0] for line in generator.traffic(200, {"cat": 1, "cd": 1})}
+        self.assertEqual(ops, {"cat", "cd"})
+
+
+class TestTraces(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "trace.txt")
+
+    def test_recorded_trace_replays_the_session(self):
+        session = [
+            "mkdir docs",
+            "cd docs",
+            "touch a.py",
+            "echo hello world >> a.py",
+            "ls -type f",
+            "find / -name *.py -type f",
+            "grep hello /docs",
+            "mv a.py b.py",
+            "cat b.py",
+            "cd ..",
+            "rm docs/b.py",
+        ]
+        recorder = TraceRecorder(VirtualFileSystem(), self.path)
+        expected = io.StringIO()
+        run_script(recorder, session, expected)
+        recorder.close()
+        recorder.vfs.searcher.close()
+
+        with open(self.path) as f:
+            trace = f.read().split("\n")
+        self.assertTrue(trace[0].startswith("# Trace recorded"))
+        self.assertEqual(trace[1:-1], session)  # Internal calls aren't recorded
+
+        replayed = io.StringIO()
+        fs = VirtualFileSystem()
+        run_script(fs, trace, replayed)
+        fs.searcher.close()
+        self.assertEqual(replayed.getvalue(), expected.getvalue())
+
+    def test_recorder_forwards_attributes(self):
+        fs = VirtualFileSystem()
+        recorder = TraceRecorder(fs, self.path)
+        dispatch(recorder, "mkdir x")
+        dispatch(recorder, "cd x")
+        self.assertEqual(recorder.cwd, "/x")
+        self.assertIs(recorder.tree, fs.tree)
+        recorder.close()
+
+    def test_per_command_latencies(self):
+        by_command = {}
+        latencies = run_script(
+            VirtualFileSystem(),
+            ["mkdir a", "ls", "ls /a", "cd a"],
+            by_command=by_command,
+        )
+        self.assertEqual(
+            {op: len(v) for op, v in by_command.items()}, {"mkdir": 1, "ls": 2, "cd": 1}
+        )
+        self.assertEqual(
+            sorted(latencies), sorted(x for v in by_command.values() for x in v)
+        )
+        out = io.StringIO()
+        report_commands(by_command, out)
+        self.assertEqual(out.getvalue().split("\n")[2].split()[:2], ["ls", "2"])
+
+
+class TestReplay(unittest.TestCase):
+    def test_replay_records(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.txt")
+            generator = WorkloadGenerator(fan_out=2, depth=2, file_ratio=2, seed=5)
+            write_trace(path, generator, 300)
+            with open(path) as f:
+                setup, measured = split_trace(f)
+            self.assertEqual(len(measured), 300)
+            self.assertTrue(
+                all(line.startswith(("mkdir", "touch", "#")) for line in setup)
+            )
+
+            by_command = {}
+            run = replay(
+                path, order=8, repeats=2, by_command=by_command, log=lambda line: None
+            )
+        self.assertEqual(sum(r["ops"] for r in run["results"]), 300)
+        self.assertEqual(sum(map(len, by_command.values())), 600)
+        for record in run["results"]:
+            self.assertTrue(record["operation"].startswith("vfs:"))
+            self.assertEqual(record["distribution"], "trace.txt")
+            self.assertEqual(record["size"], 1 + 2 + 4 + 2 * 7)  # Root, dirs and files
+            self.assertEqual(len(record["repeat_means_ns"]), 2)
+
+    def test_split_without_marker(self):
+        self.assertEqual(split_trace(["ls\n", "cd\n"]), ([], ["ls", "cd"]))
+        self.assertEqual(split_trace(["mkdir a", MEASURE, "ls"]), (["mkdir a"], ["ls"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+# Command traces of the VirtualFileSystem
+# A TraceRecorder wraps a filesystem and writes every command it receives as a shell
+# command line, so a trace is a plain script that the script mode can replay:
+#   python3 shell.py --record session.txt                 -> record an interactive session
+#   python3 shell.py --script session.txt --quiet --per-command
+# analysis/vfs_workload.py generates synthetic traces and compares replays.
+# Arguments containing spaces can't be replayed (the shell splits on whitespace),
+# like the commands typed in the shell itself.
+
+import datetime
+import threading
+from dispatcher import FIND_OPTIONS, LS_OPTIONS
+
+FIND_FLAGS = {kwarg: flag for flag, kwarg in FIND_OPTIONS.items()}
+LS_FLAGS = {kwarg: flag for flag, kwarg in LS_OPTIONS.items()}
+
+
+def with_options(op, path, flags, kwargs):
+    """ "op [path] [-flag value]..." (the inverse of dispatcher.parse_options)"""
+    parts = [op]
+    if path:
+        parts.append(path)
+    for kwarg, flag in flags.items():
+        if kwargs.get(kwarg) is not None:
+            parts += [flag, kwargs[kwarg]]
+    return " ".join(parts)
+
+
+# The cancel check of the scans (see dispatch) is not part of the command line
+def ls_line(path=None, entry_type=None, cancelled=None):
+    return with_options("ls", path, LS_FLAGS, {"entry_type": entry_type})
+
+
+def find_line(
+    path=None, name=None, pattern=None, regex=None, entry_type=None, cancelled=None
+):
+    kwargs = {"name": name, "pattern": pattern, "regex": regex}
+    kwargs["entry_type"] = entry_type
+    return with_options("find", path, FIND_FLAGS, kwargs)
+
+
+def grep_line(pattern, path=None, cancelled=None):
+    return f"grep {pattern} {path}" if path else f"grep {pattern}"
+
+
+def write_line(name, text, append=False):
+    return f"echo {text} {'>>' if append else '>'} {name}"
+
+
+# VirtualFileSystem method -> function building the command line of a call
+COMMAND_LINES = {
+    "mkdir": lambda name: f"mkdir {name}",
+    "touch": lambda name: f"touch {name}",
+    "rm": lambda name: f"rm {name}",
+    "cat": lambda name: f"cat {name}",
+    "mv": lambda src, dst: f"mv {src} {dst}",
+    "cd": lambda path=None: f"cd {path}" if path else "cd",
+    "write": write_line,
+    "ls": ls_line,
+    "iter_ls": ls_line,
+    "find": find_line,
+    "iter_find": find_line,
+    "grep": grep_line,
+    "iter_grep": grep_line,
+}
+
+
+class TraceRecorder:
+    """
+    Proxy of a VirtualFileSystem that appends every command call to a trace file.
+    Everything else (the tree, the lock, cwd...) is the wrapped filesystem's.
+    Calls made by the filesystem itself (write creating the file with touch) are not
+    recorded, so replaying the trace makes exactly the same calls.
+    """
+
+    def __init__(self, vfs, path):
+        self.vfs = vfs
+        self.trace = open(path, "a")
+        self.trace_lock = threading.Lock()  # Readers run commands concurrently
+        now = datetime.datetime.now().isoformat(timespec="seconds")
+        self.record(f"# Trace recorded on {now}, starting in {vfs.cwd}")
+
+    def record(self, line):
+        with self.trace_lock:
+            self.trace.write(line + "\n")
+            self.trace.flush()
+
+    def __getattr__(self, name):
+        attribute = getattr(self.vfs, name)
+        command_line = COMMAND_LINES.get(name)
+        if command_line is None:
+            return attribute
+
+        def recorded(*args, **kwargs):
+            self.record(command_line(*args, **kwargs))
+            return attribute(*args, **kwargs)
+
+        return recorded
+
+    def close(self):
+        with self.trace_lock:
+            self.trace.close()
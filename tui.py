@@ -0,0 +1,235 @@
+import time
+from functools import partial
+from textual.app import App, ComposeResult
+from textual.binding import Binding
+from textual.widgets import Input, Static
+from textual.worker import get_current_worker
+from commands import VirtualFileSystem
+from completion import Completer
+from dispatcher import EXIT, Stream, dispatch, is_mutation, locked
+from output_pane import OutputPane, pack_words
+
+# Textual interface of the shell, started by "python3 shell.py"
+# To exit the shell interface, just type "exit" (or press Ctrl+Q)
+#
+# Commands never run on the event loop: each one runs in a worker thread, so the UI
+# keeps responding during long scans. Ctrl+C cancels the running commands, and the
+# filesystem lock lets read-only commands run together while mutations run alone.
+# Results are appended to a virtualized output pane in chunks while the scan runs.
+# The filesystem itself is built (or loaded from a snapshot) in a worker thread once
+# the first frame is on screen, so a large filesystem doesn't delay the startup.
+# With a session of vfs_client.py (shell.py --connect), the commands and completions
+# run on a shared filesystem server instead, in the session's own directory.
+
+FLUSH_INTERVAL = 0.05  # Seconds between screen updates while a command is streaming
+SCROLLBACK_LINES = 50_000  # Older output (including older commands) is dropped
+
+
+class BPlusTreeShell(App):
+    CSS_PATH = None  # No custom CSS, minimal
+    BINDINGS = [
+        Binding("ctrl+c", "cancel", "Cancel command", priority=True),
+        Binding("ctrl+q", "quit", "Quit"),
+        Binding("tab", "complete", "Complete", priority=True),
+    ]
+
+    def __init__(self, vfs=None, load=None, session=None):
+        super().__init__()
+        self.vfs = vfs
+        self.session = session  # RemoteSession: the filesystem is on a server
+        # Called in a worker thread when no filesystem is given, returns the filesystem
+        self.load = load or partial(VirtualFileSystem, indexes=True)
+
+    def compose(self) -> ComposeResult:
+        yield Static("B+ Tree Virtual Filesystem", id="header")
+        yield OutputPane(max_lines=SCROLLBACK_LINES, id="output")
+        yield Static("", id="status")
+        yield Input(placeholder="Digite um comando...", id="input")
+        yield Static(f"fakerational:/$", id="cwd")
+
+    def on_mount(self):
+        self.output = self.query_one("#output", OutputPane)
+        self.status = self.query_one("#status", Static)
+        self.input = self.query_one("#input", Input)
+        self.cwd_label = self.query_one("#cwd", Static)
+        if self.session is not None:
+            self.ready(None)
+            return
+        if self.vfs is not None:
+            self.ready(self.vfs)
+            return
+        self.input.disabled = True
+        self.status.update("Loading filesystem...")
+        self.call_after_refresh(
+            self.run_worker, self.load_vfs, thread=True, exit_on_error=False
+        )
+
+    def load_vfs(self):
+        """Runs in a worker thread after the first frame was drawn"""
+        try:
+            vfs = self.load()
+            error = None
+        except (OSError, ValueError) as exc:  # Unreadable snapshot: start empty
+            vfs = VirtualFileSystem(indexes=True)
+            error = str(exc)
+        self.call_from_thread(self.ready, vfs, error)
+
+    @property
+    def cwd(self):
+        return (self.session or self.vfs).cwd
+
+    def ready(self, vfs, error=None):
+        self.vfs = vfs
+        if vfs is not None:
+            vfs.enable_metrics()  # Shown by the stats command
+            self.completer = Completer(vfs)
+        if error:
+            self.output.write_lines([error])
+        self.status.update("")
+        self.cwd_label.update(f"fakerational:{self.cwd}$")
+        self.input.disabled = False
+        self.input.focus()  # The output pane is focusable too (keyboard scrolling)
+        self.prompt()
+
+    def on_unmount(self):
+        if self.session is not None:
+            self.session.close()
+            self.session.pool.close()
+        if self.vfs is not None:
+            self.vfs.searcher.close()  # Stop the grep worker processes
+
+    def prompt(self, text=""):
+        self.output.write_lines([f"fakerational:{self.cwd}$ {text}"])
+
+    async def on_input_submitted(self, event: Input.Submitted):
+        cmd = event.value.strip()
+        if not cmd:
+            return
+        self.input.value = ""
+        self.status.update(f"Running '{cmd}'... (Ctrl+C to cancel)")
+        self.run_worker(
+            partial(self.execute, cmd),
+            thread=True,
+            group="commands",
+            exit_on_error=False,
+        )
+
+    def action_complete(self):
+        """Tab: complete the command or path being typed"""
+        if self.input.disabled:
+            return
+        if self.session is not None:
+            # A round trip on the UI thread, the server answers from a read scan
+            self.show_completion(self.session.complete(self.input.value))
+            return
+        if self.vfs is None:
+            return
+        # Never wait on the UI thread: while a mutation runs, just don't complete
+        with self.vfs.lock.read(blocking=False) as acquired:
+            if not acquired:
+                self.bell()
+                return
+            result = self.completer.complete(self.input.value)
+        self.show_completion(result)
+
+    def show_completion(self, result):
+        self.input.value = result.text
+        self.input.cursor_position = len(result.text)
+        if result.candidates:
+            width = max(self.output.size.width, 20)
+            rows = list(pack_words(result.candidates, width, "  "))
+            if result.truncated:
+                rows.append(f"... (more than {len(result.candidates)} matches)")
+            self.output.write_lines(rows)
+
+    def action_cancel(self):
+        """Ctrl+C: stop the running commands, the app keeps running"""
+        self.workers.cancel_group(self, "commands")
+
+    def execute(self, cmd):
+        """Runs in a worker thread, talks to the UI only through call_from_thread"""
+        worker = get_current_worker()
+        self.call_from_thread(self.prompt, cmd)
+        output = None
+        try:
+            if self.session is not None:
+                output = self.execute_remote(cmd)
+            else:
+                output = self.execute_local(worker, cmd)
+        finally:  # Even if the command failed, or the status stays "Running..."
+            if output is EXIT:
+                self.call_from_thread(self.exit)
+            else:
+                self.call_from_thread(self.finish, cmd)
+
+    def execute_local(self, worker, cmd):
+        """Run the command on the filesystem under its lock, returns its output"""
+        with locked(self.vfs, cmd):
+            output = dispatch(self.vfs, cmd, lambda: worker.is_cancelled)
+            if output is EXIT:
+                return output
+            if not isinstance(output, Stream):
+                self.call_from_thread(self.show_lines, output.split("\n"))
+            else:
+                self.stream(worker, cmd, output)
+        return output
+
+    def execute_remote(self, cmd):
+        """Run the command on the server, its output comes back whole"""
+        from vfs_client import remote_dispatch
+
+        try:
+            output = remote_dispatch(self.session, cmd)
+        except OSError as error:
+            output = f"Server unreachable: {error}"
+        if output is EXIT:
+            return output
+        rows = output.split("\n")
+        if cmd.split()[0] == "ls" and output != "[empty]":  # Pack names like locally
+            rows = pack_words(output.split(" "), max(self.output.size.width, 20), " ")
+        self.call_from_thread(self.show_lines, list(rows))
+        return output
+
+    def stream(self, worker, cmd, output):
+        """Pull rows from the command's iterator and append them chunk by chunk"""
+        rows = output
+        if output.sep != "\n":  # ls: pack the names into rows that fit the pane
+            rows = pack_words(output, max(self.output.size.width, 20), output.sep)
+
+        # call_from_thread waits for the UI, so lines are sent in time-based chunks
+        # instead of one by one: the scan never waits for more than ~20 repaints/s
+        count = 0
+        chunk = []
+        deadline = time.monotonic() + FLUSH_INTERVAL
+        for row in rows:
+            if worker.is_cancelled:
+                break
+            chunk.append(row)
+            count += 1
+            if time.monotonic() >= deadline:
+                self.call_from_thread(self.show_lines, chunk, cmd, count)
+                chunk = []
+                deadline = time.monotonic() + FLUSH_INTERVAL
+
+        # The scan also polls the worker, so it may end early without a row
+        if worker.is_cancelled:
+            output.close()
+            chunk.append("^C")
+        elif not count:
+            chunk.append(output.empty)
+        self.call_from_thread(self.show_lines, chunk)
+
+    def show_lines(self, lines, cmd=None, count=0):
+        self.output.write_lines(lines)
+        if cmd is not None:
+            self.status.update(f"Running '{cmd}'... {count:,} lines (Ctrl+C to cancel)")
+
+    def finish(self, cmd):
+        if is_mutation(cmd) and self.session is None:  # Cached completions are stale
+            self.completer.clear()
+        self.cwd_label.update(f"fakerational:{self.cwd}$")
+        running = [
+            w for w in self.workers if w.group == "commands" and not w.is_finished
+        ]
+        if len(running) <= 1:  # Only the worker calling this one
+            self.status.update("")
@@ -0,0 +1,342 @@
+# Clients of vfs_server.py (protocol in vfs_protocol.py)
+# Two flavours of the same thing:
+#   ClientPool / AsyncSession        asyncio, for load generators and services: every
+#                                    connection has a reader task matching responses to
+#                                    requests by id, so any number of requests can be in
+#                                    flight on it at once
+#   ConnectionPool / RemoteSession   blocking sockets, for the shell (its commands run
+#                                    in worker threads): a connection is checked out by
+#                                    one thread for one exchange, then returned
+# Both pools open connections on demand, up to their size, and reuse them.
+# A session runs its commands one after the other, or sends a list of them at once
+# with run_many (pipelining: one write, one batch on the server, one round trip).
+
+import asyncio
+import socket
+import threading
+from contextlib import contextmanager
+from vfs_protocol import (
+    CLOSE,
+    COMMAND,
+    COMPLETE,
+    ERROR,
+    EXIT,
+    MORE,
+    OPEN,
+    RESPONSE,
+    encode_request,
+    split_frames,
+)
+
+DEFAULT_POOL_SIZE = 4
+READ_SIZE = 256 * 1024
+
+
+class ServerError(Exception):
+    """The server answered ERROR (unknown session, failing command...)"""
+
+
+class Reply:
+    """The response to one request: its status, output (MORE frames) and body"""
+
+    __slots__ = ("status", "output", "body")
+
+    def __init__(self, status, output, body):
+        self.status = status
+        self.output = output
+        self.body = body
+
+    def check(self):
+        if self.status == ERROR:
+            raise ServerError(self.body)
+        return self
+
+
+class Completion:
+    """Same fields as completion.Completion, decoded from a COMPLETE response"""
+
+    def __init__(self, body):
+        text, truncated, *candidates = body.split("\n")
+        self.text = text
+        self.truncated = truncated == "+"
+        self.candidates = candidates
+
+
+# ----- asyncio client -----
+
+
+class Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.next_id = 0
+        self.pending = {}  # request id -> (future, output parts)
+        self.task = asyncio.get_running_loop().create_task(self.read_responses())
+
+    @classmethod
+    async def open(cls, path):
+        reader, writer = await asyncio.open_unix_connection(path)
+        return cls(reader, writer)
+
+    def send(self, requests):
+        """Write (session, opcode, body) requests at once. Returns their futures"""
+        loop = asyncio.get_running_loop()
+        frames = []
+        futures = []
+        for session, opcode, body in requests:
+            self.next_id = (self.next_id + 1) & 0xFFFFFFFF
+            future = loop.create_future()
+            self.pending[self.next_id] = (future, [])
+            frames.append(encode_request(self.next_id, session, opcode, body))
+            futures.append(future)
+        self.writer.write(b"".join(frames))
+        return futures
+
+    async def read_responses(self):
+        buffer = bytearray()
+        error = ConnectionError("Connection closed by the server")
+        try:
+            while True:
+                data = await self.reader.read(READ_SIZE)
+                if not data:
+                    break
+                buffer += data
+                for request_id, status, body in split_frames(buffer, RESPONSE):
+                    future, parts = self.pending[request_id]
+                    if status == MORE:
+                        parts.append(body)
+                        continue
+                    del self.pending[request_id]
+                    if not future.done():
+                        future.set_result(Reply(status, "".join(parts), body))
+        except Exception as exc:  # Broken stream: fail the requests in flight
+            error = exc
+        for future, _ in self.pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self.pending.clear()
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+        await self.task
+
+
+class ClientPool:
+    """Up to size connections to the server, the least busy one is used"""
+
+    def __init__(self, path, size=DEFAULT_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self.connections = []
+        self.opening = None
+
+    async def connection(self):
+        self.connections = [c for c in self.connections if not c.task.done()]
+        idle = min(self.connections, key=lambda c: len(c.pending), default=None)
+        if idle is not None and (
+            not idle.pending or len(self.connections) >= self.size
+        ):
+            return idle
+        if self.opening is None:  # One connection opened at a time
+            self.opening = asyncio.ensure_future(Connection.open(self.path))
+        try:
+            connection = await self.opening
+        finally:
+            self.opening = None
+        if connection not in self.connections:
+            self.connections.append(connection)
+        return connection
+
+    async def requests(self, requests):
+        """Send requests together on one connection. Returns their checked Replies"""
+        connection = await self.connection()
+        replies = await asyncio.gather(*connection.send(requests))
+        return [reply.check() for reply in replies]
+
+    async def session(self):
+        (reply,) = await self.requests([(0, OPEN, "")])
+        return AsyncSession(self, int(reply.body))
+
+    async def close(self):
+        for connection in self.connections:
+            await connection.close()
+        self.connections = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class AsyncSession:
+    def __init__(self, pool, session_id):
+        self.pool = pool
+        self.id = session_id
+        self.cwd = "/"
+        self.exited = False
+
+    async def run(self, cmd):
+        """Output of a command line"""
+        return (await self.run_many([cmd]))[0]
+
+    async def run_many(self, cmds):
+        """Outputs of command lines run in order, sent in a single write"""
+        replies = await self.pool.requests([(self.id, COMMAND, cmd) for cmd in cmds])
+        self.cwd = replies[-1].body
+        self.exited = any(reply.status == EXIT for reply in replies)
+        return [reply.output for reply in replies]
+
+    async def complete(self, text):
+        (reply,) = await self.pool.requests([(self.id, COMPLETE, text)])
+        return Completion(reply.body)
+
+    async def close(self):
+        await self.pool.requests([(self.id, CLOSE, "")])
+
+
+# ----- Blocking client -----
+
+
+class BlockingConnection:
+    def __init__(self, path):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path)
+        self.buffer = bytearray()
+        self.next_id = 0
+
+    def exchange(self, requests):
+        """Send (session, opcode, body) requests at once and wait for every Reply"""
+        frames = []
+        ids = []
+        for session, opcode, body in requests:
+            self.next_id = (self.next_id + 1) & 0xFFFFFFFF
+            ids.append(self.next_id)
+            frames.append(encode_request(self.next_id, session, opcode, body))
+        self.socket.sendall(b"".join(frames))
+
+        replies = {}
+        parts = []
+        while len(replies) < len(ids):  # Responses come back in request order
+            data = self.socket.recv(READ_SIZE)
+            if not data:
+                raise ConnectionError("Connection closed by the server")
+            self.buffer += data
+            for request_id, status, body in split_frames(self.buffer, RESPONSE):
+                if status == MORE:
+                    parts.append(body)
+                    continue
+                replies[request_id] = Reply(status, "".join(parts), body)
+                parts = []
+        return [replies[request_id] for request_id in ids]
+
+    def close(self):
+        self.socket.close()
+
+
+class ConnectionPool:
+    """Up to size connections, each used by one thread at a time"""
+
+    def __init__(self, path, size=DEFAULT_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self.idle = []
+        self.opened = 0
+        self.cond = threading.Condition()
+
+    @contextmanager
+    def connection(self):
+        with self.cond:
+            while not self.idle and self.opened >= self.size:
+                self.cond.wait()
+            connection = self.idle.pop() if self.idle else None
+            if connection is None:
+                self.opened += 1
+        if connection is None:
+            try:
+                connection = BlockingConnection(self.path)
+            except OSError:
+                with self.cond:
+                    self.opened -= 1
+                    self.cond.notify()
+                raise
+        broken = False
+        try:
+            yield connection
+        except (OSError, ConnectionError):
+            broken = True  # Don't give a half-read connection to someone else
+            raise
+        finally:
+            with self.cond:
+                if broken:
+                    connection.close()
+                    self.opened -= 1
+                else:
+                    self.idle.append(connection)
+                self.cond.notify()
+
+    def requests(self, requests):
+        with self.connection() as connection:
+            return [reply.check() for reply in connection.exchange(requests)]
+
+    def session(self):
+        (reply,) = self.requests([(0, OPEN, "")])
+        return RemoteSession(self, int(reply.body))
+
+    def close(self):
+        with self.cond:
+            for connection in self.idle:
+                connection.close()
+            self.opened -= len(self.idle)
+            self.idle = []
+
+
+class RemoteSession:
+    """A shell session on a server: the blocking version of AsyncSession"""
+
+    def __init__(self, pool, session_id):
+        self.pool = pool
+        self.id = session_id
+        self.cwd = "/"
+        self.exited = False
+
+    def run(self, cmd):
+        return self.run_many([cmd])[0]
+
+    def run_many(self, cmds):
+        replies = self.pool.requests([(self.id, COMMAND, cmd) for cmd in cmds])
+        self.cwd = replies[-1].body
+        self.exited = any(reply.status == EXIT for reply in replies)
+        return [reply.output for reply in replies]
+
+    def complete(self, text):
+        (reply,) = self.pool.requests([(self.id, COMPLETE, text)])
+        return Completion(reply.body)
+
+    def close(self):
+        try:
+            self.pool.requests([(self.id, CLOSE, "")])
+        except (OSError, ServerError):
+            pass  # The server is gone, so is the session
+
+
+def remote_dispatch(session, cmd):
+    """dispatcher.dispatch for a RemoteSession: the output text, or EXIT"""
+    from dispatcher import EXIT as EXIT_SHELL
+
+    if not cmd.split():
+        return None
+    try:
+        output = session.run(cmd)
+    except ServerError as error:
+        return f"Server error: {error}"
+    return EXIT_SHELL if session.exited else output
+
+
+def connect(path, size=DEFAULT_POOL_SIZE):
+    """A RemoteSession on the server listening at path (and its own pool)"""
+    return ConnectionPool(path, size).session()
@@ -0,0 +1,76 @@
+# Binary protocol between vfs_server.py and vfs_client.py
+# Every message is a frame: a 4-byte big-endian length, then that many bytes.
+#   request:  request id (uint32) | session (uint32) | opcode (uint8) | body
+#   response: request id (uint32) | status (uint8) | body
+# Bodies are UTF-8 text. Requests carry an id chosen by the client, and the responses
+# of a connection come back in request order, so a client can send many requests
+# without waiting (pipelining); the server runs the requests it reads together as
+# one batch and writes their responses with a single write.
+#
+# Opcodes and their responses:
+#   OPEN      start a session (own working directory) -> DONE, body: session id
+#   COMMAND   run a shell command line in a session -> MORE frames with the output,
+#             then DONE (or EXIT for "exit"), body: the session's cwd afterwards
+#   COMPLETE  tab-complete a shell input -> DONE, body: the completed text, then one
+#             candidate per line ("+" as the second line when truncated, "-" if not)
+#   CLOSE     end a session -> DONE
+# Any request can get ERROR instead, body: the reason.
+
+import struct
+
+REQUEST = struct.Struct(">IIIB")  # length, request id, session, opcode
+RESPONSE = struct.Struct(">IIB")  # length, request id, status
+LENGTH = struct.Struct(">I")
+MAX_FRAME = 16 * 1024 * 1024
+CHUNK_BYTES = 64 * 1024  # Outputs are split in MORE frames of about this size
+
+OPEN, COMMAND, COMPLETE, CLOSE = 1, 2, 3, 4
+MORE, DONE, EXIT, ERROR = 0, 1, 2, 3
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def encode_request(request_id, session, opcode, body=""):
+    data = body.encode()
+    return (
+        REQUEST.pack(REQUEST.size - 4 + len(data), request_id, session, opcode) + data
+    )
+
+
+def encode_response(request_id, status, body=""):
+    data = body.encode()
+    return RESPONSE.pack(RESPONSE.size - 4 + len(data), request_id, status) + data
+
+
+def split_frames(buffer, header):
+    """
+    Decode the complete frames at the start of buffer (a bytearray, consumed).
+    Returns a list of (header fields after the length..., body text).
+    """
+    frames = []
+    offset = 0
+    while len(buffer) - offset >= 4:
+        (length,) = LENGTH.unpack_from(buffer, offset)
+        if length > MAX_FRAME or length < header.size - 4:
+            raise ProtocolError(f"Invalid frame length: {length}")
+        end = offset + 4 + length
+        if end > len(buffer):
+            break
+        fields = header.unpack_from(buffer, offset)[1:]
+        body = bytes(buffer[offset + header.size : end]).decode()
+        frames.append((*fields, body))
+        offset = end
+    del buffer[:offset]
+    return frames
+
+
+def chunks(text, size=CHUNK_BYTES):
+    """Split an output into pieces of about size characters, at line ends if possible"""
+    start = 0
+    while len(text) - start > size:
+        end = text.rfind("\n", start, start + size) + 1 or start + size
+        yield text[start:end]
+        start = end
+    yield text[start:]
@@ -0,0 +1,271 @@
+# Filesystem server: one VirtualFileSystem shared by many shell sessions
+#   python3 vfs_server.py --socket vfs.sock [--snapshot fs.snap]
+#   python3 shell.py --connect vfs.sock          -> a shell session on that filesystem
+# An asyncio server listens on a Unix domain socket and speaks the binary protocol of
+# vfs_protocol.py. Every session (OPEN) is a view of the filesystem with its own
+# working directory (VirtualFileSystem.session), so cd in one shell doesn't move the
+# others, while all of them read and change the same tree.
+#
+# The event loop only reads and writes sockets: the requests of a connection that
+# arrived together (pipelined by the client) run as one batch in a thread pool, in
+# order, each under the filesystem lock of dispatcher.locked, and their responses go
+# out in a single write. Batches of different connections run at the same time, so
+# read-only commands share the tree and mutations run alone, like in the Textual
+# shell. While a batch runs, the requests that keep arriving wait in the socket and
+# form the next batch. A failing command answers ERROR and the server keeps going.
+# A session is dropped on CLOSE, or once every connection that used it is closed
+# (a client that crashed never sends CLOSE).
+# The commands writing files of the server's machine (stats --json FILE, profile
+# --out FILE) are refused: a client only reaches the virtual filesystem.
+
+import argparse
+import asyncio
+import os
+import signal
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from completion import Completer
+from dispatcher import (
+    EXIT,
+    Stream,
+    dispatch,
+    is_mutation,
+    locked,
+    writes_host_file,
+)
+from vfs_protocol import (
+    CHUNK_BYTES,
+    CLOSE,
+    COMMAND,
+    COMPLETE,
+    DONE,
+    ERROR,
+    MORE,
+    OPEN,
+    REQUEST,
+    ProtocolError,
+    chunks,
+    encode_response,
+    split_frames,
+)
+from vfs_protocol import EXIT as EXIT_STATUS
+
+DEFAULT_SOCKET = "vfs.sock"
+DEFAULT_THREADS = 4
+READ_SIZE = 256 * 1024
+
+
+def output_chunks(output):
+    """The text of a command's output in pieces (a Stream is drained as it goes)"""
+    if not isinstance(output, Stream):
+        yield from chunks(output)
+        return
+    parts = []
+    size = 0
+    empty = True
+    for line in output:
+        parts.append(line if empty else output.sep + line)
+        empty = False
+        size += len(parts[-1])
+        if size >= CHUNK_BYTES:
+            yield "".join(parts)
+            parts = []
+            size = 0
+    if empty:
+        yield output.empty
+    elif parts:
+        yield "".join(parts)
+
+
+class Session:
+    __slots__ = ("vfs", "completer", "connections")
+
+    def __init__(self, vfs):
+        self.vfs = vfs
+        self.completer = Completer(vfs)
+        self.connections = 0  # Open connections that used it (a pool has several)
+
+
+class VFSServer:
+    """Serves one filesystem on a Unix socket, see the top of the file"""
+
+    def __init__(self, vfs, path=DEFAULT_SOCKET, threads=DEFAULT_THREADS):
+        self.vfs = vfs
+        self.path = path
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix="vfs")
+        self.sessions = {}
+        self.next_session = 1
+        self.sessions_lock = threading.Lock()
+        self.server = None
+        self.requests = 0  # Requests answered
+        self.batches = 0  # Executor calls that answered them
+
+    async def start(self):
+        if os.path.exists(self.path):  # Left by a server that was killed
+            if not stat.S_ISSOCK(os.stat(self.path).st_mode):
+                raise OSError(f"{self.path} exists and is not a socket")
+            os.unlink(self.path)
+        self.server = await asyncio.start_unix_server(self.handle, path=self.path)
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+        self.executor.shutdown(wait=True)
+
+    async def handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        buffer = bytearray()
+        used = set()  # Ids of the sessions used on this connection
+        try:
+            while True:
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    break
+                buffer += data
+                batch = split_frames(buffer, REQUEST)
+                if batch:
+                    out = await loop.run_in_executor(
+                        self.executor, self.run_batch, batch, used
+                    )
+                    self.requests += len(batch)  # Counted on the loop thread
+                    self.batches += 1
+                    writer.write(out)
+                    await writer.drain()
+        except (ProtocolError, ConnectionError, UnicodeDecodeError):
+            pass  # A broken client only loses its own connection
+        finally:
+            writer.close()
+            self.release(used)
+
+    def release(self, used):
+        """Drop the sessions of a closed connection that no other connection uses"""
+        with self.sessions_lock:
+            for session_id in used:
+                session = self.sessions.get(session_id)
+                if session is not None:
+                    session.connections -= 1
+                    if not session.connections:
+                        del self.sessions[session_id]
+
+    def run_batch(self, batch, used):
+        """Runs in the thread pool: the responses of a batch of requests, in order"""
+        frames = []
+        for request_id, session, opcode, body in batch:
+            try:
+                frames.extend(self.run(request_id, session, opcode, body, used))
+            except Exception as error:  # The server outlives a failing command
+                message = f"{type(error).__name__}: {error}"
+                frames.append(encode_response(request_id, ERROR, message))
+        return b"".join(frames)
+
+    def run(self, request_id, session_id, opcode, body, used):
+        """used: the ids of the sessions used on the connection, updated"""
+        if opcode == OPEN:
+            with self.sessions_lock:
+                session_id = self.next_session
+                self.next_session += 1
+                self.sessions[session_id] = Session(self.vfs.session())
+                self.sessions[session_id].connections = 1
+                used.add(session_id)
+            return [encode_response(request_id, DONE, str(session_id))]
+
+        session = self.sessions.get(session_id)
+        if session is None:
+            return [encode_response(request_id, ERROR, f"No session {session_id}")]
+        if session_id not in used:
+            with self.sessions_lock:
+                if self.sessions.get(session_id) is session:  # Not just dropped
+                    session.connections += 1
+                    used.add(session_id)
+        vfs = session.vfs
+        if opcode == COMMAND:
+            if writes_host_file(body):
+                message = f"Writing files is not allowed over the server: {body}"
+                return [encode_response(request_id, ERROR, message)]
+            frames = []
+            with locked(vfs, body):
+                output = dispatch(vfs, body)
+                if output is EXIT:
+                    return [encode_response(request_id, EXIT_STATUS, vfs.cwd)]
+                for piece in output_chunks(output or ""):
+                    frames.append(encode_response(request_id, MORE, piece))
+            if is_mutation(body):  # Cached completions of every session may be stale
+                for other in list(self.sessions.values()):
+                    other.completer.clear()
+            frames.append(encode_response(request_id, DONE, vfs.cwd))
+            return frames
+        if opcode == COMPLETE:
+            with vfs.lock.read():
+                result = session.completer.complete(body)
+            lines = [result.text, "+" if result.truncated else "-"]
+            return [
+                encode_response(request_id, DONE, "\n".join(lines + result.candidates))
+            ]
+        if opcode == CLOSE:
+            with self.sessions_lock:
+                self.sessions.pop(session_id, None)
+            return [encode_response(request_id, DONE)]
+        return [encode_response(request_id, ERROR, f"Unknown opcode {opcode}")]
+
+
+async def serve(vfs, path, threads=DEFAULT_THREADS, ready=None):
+    """Run a server until cancelled. ready: an Event set once it listens"""
+    server = VFSServer(vfs, path, threads)
+    await server.start()
+    # kill: stop listening, which ends serve_forever and removes the socket file
+    try:
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, server.server.close)
+    except (ValueError, RuntimeError):
+        pass  # Signals are only handled by the main thread
+    if ready is not None:
+        ready.set()
+    try:
+        await server.server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    from commands import VirtualFileSystem
+    from layouts import LAYOUTS
+
+    parser = argparse.ArgumentParser(description="Serve a virtual filesystem")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    parser.add_argument("--snapshot", metavar="FILE", help="serve a saved filesystem")
+    parser.add_argument("--order", type=int, default=4, help="B+ tree order")
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="path")
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=DEFAULT_THREADS,
+        help="batches running at the same time",
+    )
+    args = parser.parse_args(argv)
+
+    if args.snapshot:
+        import snapshot
+
+        try:
+            vfs = snapshot.load(args.snapshot)
+        except (OSError, ValueError) as error:
+            parser.error(str(error))
+    else:
+        vfs = VirtualFileSystem(order=args.order, layout=args.layout, indexes=True)
+    vfs.enable_metrics()  # Shown by the stats command of every session
+    print(f"Serving on {args.socket} (Ctrl+C to stop)")
+    try:
+        asyncio.run(serve(vfs, args.socket, args.threads))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    finally:
+        vfs.searcher.close()
+
+
+if __name__ == "__main__":
+    main()